@@ -8,7 +8,7 @@ Advanced Features for AP Elite ERP System
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import os
@@ -22,7 +22,7 @@ from models import *
 
 # Get DB from environment
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Security
@@ -10,7 +10,7 @@ Advanced Integrations & Improvements for AP Elite ERP
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import os
@@ -33,7 +33,7 @@ import aiofiles
 
 # Get DB from environment
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Security
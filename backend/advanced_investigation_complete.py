@@ -10,14 +10,14 @@ import uuid
 import os
 import jwt
 from jwt.exceptions import InvalidTokenError
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 # Router
 investigation_complete_router = APIRouter(prefix="/api/investigation/advanced", tags=["Advanced Investigation"])
 
 # MongoDB
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # JWT Secret
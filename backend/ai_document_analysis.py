@@ -5,7 +5,7 @@ Using Emergent LLM Key with OpenAI GPT
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional
 import uuid
@@ -13,11 +13,12 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
+from ai_orchestrator import ai_orchestrator
 
 load_dotenv()
 
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
@@ -290,3 +291,20 @@ async def get_ai_status(current_user: dict = Depends(get_current_user)):
         "document_model": "gemini-2.0-flash (Google)",
         "status": "active" if api_key else "not_configured"
     }
+
+@ai_router.get("/orchestrator/cache")
+async def get_orchestrator_cache_metrics(current_user: dict = Depends(get_current_user)):
+    """Métricas do cache de respostas do orquestrador de IA"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    return ai_orchestrator.get_cache_metrics()
+
+@ai_router.delete("/orchestrator/cache")
+async def clear_orchestrator_cache(current_user: dict = Depends(get_current_user)):
+    """Limpa o cache de respostas do orquestrador de IA"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    ai_orchestrator.cache.clear()
+    return {"success": True, "message": "Cache de IA limpo"}
@@ -5,7 +5,13 @@ para análises avançadas de investigação
 """
 
 import os
+import re
+import json
+import time
 import asyncio
+import hashlib
+import sqlite3
+from collections import OrderedDict
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 import uuid
@@ -14,6 +20,91 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# ==================== CACHE DE RESPOSTAS ====================
+
+def normalize_prompt(text: str) -> str:
+    """Normaliza espaços para que prompts equivalentes gerem a mesma chave"""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens (~4 caracteres por token)"""
+    return (len(text or "") + 3) // 4
+
+
+class ResponseCache:
+    """
+    Cache LRU com TTL para respostas de IA, com persistência opcional
+    em SQLite (AI_CACHE_DB) compartilhada entre processos/reinícios
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 3600, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        if disk_path:
+            with sqlite3.connect(disk_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_cache ("
+                    "key TEXT PRIMARY KEY, entry TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, context: Optional[str]) -> str:
+        context_hash = hashlib.sha256(normalize_prompt(context or "").encode()).hexdigest()
+        raw = "\x1f".join([provider, model, normalize_prompt(prompt), context_hash])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.disk_path) as conn:
+            row = conn.execute("SELECT entry FROM ai_cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _disk_set(self, key: str, entry: Dict[str, Any]):
+        with sqlite3.connect(self.disk_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, entry, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry, ensure_ascii=False), entry["created_at"])
+            )
+            conn.execute("DELETE FROM ai_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna a entrada válida (com "source": memory/disk) ou None"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if not self._expired(entry):
+                self._memory.move_to_end(key)
+                return {**entry, "source": "memory"}
+            del self._memory[key]
+        if self.disk_path:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None and not self._expired(entry):
+                self._remember(key, entry)
+                return {**entry, "source": "disk"}
+        return None
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        self._remember(key, entry)
+        if self.disk_path:
+            await asyncio.to_thread(self._disk_set, key, entry)
+
+    def clear(self):
+        self._memory.clear()
+        if self.disk_path:
+            with sqlite3.connect(self.disk_path) as conn:
+                conn.execute("DELETE FROM ai_cache")
+
+
 class AIOrchestrator:
     """
     Orquestrador que gerencia múltiplos provedores de IA
@@ -41,6 +132,28 @@ class AIOrchestrator:
                 'description': 'Ótimo para processamento de grandes volumes de dados'
             }
         }
+        
+        self.cache = ResponseCache(
+            max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', 1000)),
+            ttl_seconds=int(os.environ.get('AI_CACHE_TTL_SECONDS', 3600)),
+            disk_path=os.environ.get('AI_CACHE_DB') or None
+        )
+        # Requisições idênticas em andamento (coalescidas em uma única chamada)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.metrics = {
+            'requests': 0,
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'errors': 0,
+            'latency_saved_seconds': 0.0,
+            'provider_latency_seconds': 0.0,
+            'tokens_spent_estimated': 0,
+            'tokens_saved_estimated': 0,
+            'by_provider': {}
+        }
     
     def create_chat(self, provider: str, session_id: str, system_message: str) -> LlmChat:
         """Cria uma instância de chat para o provedor especificado"""
@@ -59,13 +172,81 @@ class AIOrchestrator:
         return chat
     
     async def analyze_with_provider(
+        self,
+        provider: str,
+        prompt: str,
+        context: Optional[str] = None,
+        session_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Analisa com um provedor específico
+        
+        Respostas bem-sucedidas são cacheadas por (provedor, modelo, prompt
+        normalizado, hash do contexto); chamadas idênticas simultâneas são
+        coalescidas em uma única requisição ao provedor.
+        """
+        self.metrics['requests'] += 1
+        if not use_cache or provider not in self.providers:
+            return await self._send(provider, prompt, context, session_id)
+        
+        key = ResponseCache.make_key(provider, self.providers[provider]['model'], prompt, context)
+        
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.metrics['hits'] += 1
+            self.metrics[f"{cached['source']}_hits"] += 1
+            self.metrics['latency_saved_seconds'] += cached['latency']
+            self.metrics['tokens_saved_estimated'] += cached['tokens']
+            return {
+                'success': True,
+                'provider': provider,
+                'model': self.providers[provider]['model'],
+                'response': cached['response'],
+                'cached': True,
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.metrics['coalesced'] += 1
+            result = dict(await asyncio.shield(inflight))
+            if result['success']:
+                self.metrics['latency_saved_seconds'] += result.get('latency_seconds', 0)
+                self.metrics['tokens_saved_estimated'] += result.get('tokens_estimated', 0)
+            result['coalesced'] = True
+            return result
+        
+        self.metrics['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._send(provider, prompt, context, session_id)
+            if result['success']:
+                await self.cache.set(key, {
+                    'response': result['response'],
+                    'latency': result['latency_seconds'],
+                    'tokens': result['tokens_estimated'],
+                    'created_at': time.time()
+                })
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita "exception was never retrieved" quando não há chamadas coalescidas
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _send(
         self,
         provider: str,
         prompt: str,
         context: Optional[str] = None,
         session_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Analisa com um provedor específico"""
+        """Envia o prompt ao provedor (sem cache)"""
         if not session_id:
             session_id = str(uuid.uuid4())
         
@@ -76,19 +257,31 @@ class AIOrchestrator:
         if context:
             system_message += f"\n\nContexto adicional: {context}"
         
+        started = time.perf_counter()
         try:
             chat = self.create_chat(provider, session_id, system_message)
             user_message = UserMessage(text=prompt)
             response = await chat.send_message(user_message)
+            latency = time.perf_counter() - started
+            tokens = estimate_tokens(system_message) + estimate_tokens(prompt) + estimate_tokens(str(response))
+            
+            self.metrics['provider_latency_seconds'] += latency
+            self.metrics['tokens_spent_estimated'] += tokens
+            usage = self.metrics['by_provider'].setdefault(provider, {'requests': 0, 'tokens_estimated': 0})
+            usage['requests'] += 1
+            usage['tokens_estimated'] += tokens
             
             return {
                 'success': True,
                 'provider': provider,
                 'model': self.providers[provider]['model'],
                 'response': response,
+                'latency_seconds': round(latency, 3),
+                'tokens_estimated': tokens,
                 'timestamp': datetime.now().isoformat()
             }
         except Exception as e:
+            self.metrics['errors'] += 1
             return {
                 'success': False,
                 'provider': provider,
@@ -96,6 +289,21 @@ class AIOrchestrator:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Métricas do cache: taxa de acerto, latência economizada e gasto de tokens"""
+        lookups = self.metrics['hits'] + self.metrics['misses'] + self.metrics['coalesced']
+        return {
+            **self.metrics,
+            'hit_rate': round((self.metrics['hits'] + self.metrics['coalesced']) / lookups, 4) if lookups else 0.0,
+            'latency_saved_seconds': round(self.metrics['latency_saved_seconds'], 3),
+            'provider_latency_seconds': round(self.metrics['provider_latency_seconds'], 3),
+            'entries_in_memory': len(self.cache._memory),
+            'max_entries': self.cache.max_entries,
+            'ttl_seconds': self.cache.ttl_seconds,
+            'disk_store': self.cache.disk_path,
+            'inflight': len(self._inflight)
+        }
+    
     async def multi_provider_analysis(
         self,
         prompt: str,
@@ -309,7 +517,8 @@ class AIOrchestrator:
         return {
             'providers': self.providers,
             'available': list(self.providers.keys()),
-            'total': len(self.providers)
+            'total': len(self.providers),
+            'cache': self.get_cache_metrics()
         }
 
 
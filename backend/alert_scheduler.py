@@ -0,0 +1,423 @@
+"""
+Agendador de Alertas de Prazos (D-5 / D-3 / D-1)
+Heap em memória, ordenado por horário de disparo, com os alertas pendentes de
+três fontes: deadlines (deadline_manager), workflow_tasks (workflow_automation)
+e tribunais_prazos (integracao_tribunais). Carregado uma vez,
+atualizado a cada escrita (propagada entre workers pelo realtime_bus) e
+usado também para as consultas de "próximos prazos".
+"""
+
+import os
+import json
+import heapq
+import asyncio
+import bisect
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, date, time, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from mongo_registry import get_client
+
+import calendario_forense
+from realtime_bus import get_bus
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "test_database")
+client = get_client(MONGO_URL)
+db = client[DB_NAME]
+# Notificações são lidas pelo notifications_system no banco ap_elite
+notifications_db = client.ap_elite
+
+TZ = ZoneInfo(os.environ.get("ALERT_TIMEZONE", "America/Sao_Paulo"))
+ALERT_HOUR = int(os.environ.get("ALERT_HOUR", 8))
+FULL_RELOAD_SECONDS = int(os.environ.get("ALERT_FULL_RELOAD_SECONDS", 600))
+CHANGES_CHANNEL = "alerts:changes"
+AUTOSTART = os.environ.get("ALERT_SCHEDULER_AUTOSTART", "1") not in ("0", "false", "no")
+
+SOURCES = ("deadlines", "workflow_tasks", "tribunais")
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    """ISO (data ou data/hora) -> datetime com fuso; datas sem hora valem até o fim do dia"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, date):
+        return datetime.combine(value, time(23, 59, 59), tzinfo=TZ)
+    else:
+        texto = str(value).strip()
+        if texto.endswith("Z"):
+            texto = texto[:-1] + "+00:00"
+        try:
+            dt = datetime.fromisoformat(texto)
+        except ValueError:
+            return None
+        if len(texto) == 10:
+            return datetime.combine(dt.date(), time(23, 59, 59), tzinfo=TZ)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _alert_time(alert_date: date) -> datetime:
+    return datetime.combine(alert_date, time(ALERT_HOUR, 0), tzinfo=TZ)
+
+
+def _alerts_before(due: datetime, offsets) -> List[Tuple[datetime, str]]:
+    """Alertas D-n às ALERT_HOUR do dia (no fuso local), não no horário do vencimento"""
+    due_date = due.astimezone(TZ).date()
+    return [(_alert_time(due_date - timedelta(days=d)), f"d-{d}") for d in offsets]
+
+
+@dataclass
+class Entry:
+    """Prazo pendente de uma das fontes, com seus horários de alerta"""
+    source: str
+    ref_id: str
+    due: datetime
+    title: str
+    owner: Optional[str] = None
+    group: Optional[str] = None
+    alerts: List[Tuple[datetime, str]] = field(default_factory=list)
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.source, self.ref_id)
+
+
+# ==================== FONTES ====================
+
+def entry_from_deadline(doc: Dict[str, Any]) -> Optional[Entry]:
+    if doc.get("completed"):
+        return None
+    due = parse_datetime(doc.get("deadline"))
+    if due is None:
+        return None
+    flags = doc.get("alerts") or {}
+    offsets = [d for d, flag in ((5, flags.get("d5", False)), (3, flags.get("d3", True)), (1, flags.get("d1", True))) if flag]
+    if doc.get("autoAlerts") is False:
+        offsets = []
+    return Entry(
+        source="deadlines",
+        ref_id=doc["id"],
+        due=due,
+        title=f"{doc.get('processNumber', '')} - {doc.get('description') or doc.get('processTitle', '')}".strip(" -"),
+        owner=doc.get("created_by"),
+        alerts=_alerts_before(due, offsets),
+        data=doc
+    )
+
+
+def entry_from_task(doc: Dict[str, Any]) -> Optional[Entry]:
+    if doc.get("status") != "pending":
+        return None
+    due = parse_datetime(doc.get("due_date"))
+    if due is None:
+        return None
+    doc = {k: v for k, v in doc.items() if k != "_id"} | {"id": str(doc.get("_id", doc.get("id")))}
+    return Entry(
+        source="workflow_tasks",
+        ref_id=doc["id"],
+        due=due,
+        title=doc.get("title", "Tarefa"),
+        owner=doc.get("assigned_to"),
+        group=doc.get("workflow_id"),
+        alerts=_alerts_before(due, (5, 3, 1)),
+        data=doc
+    )
+
+
+def entry_from_prazo(prazo: Dict[str, Any]) -> Optional[Entry]:
+    """Prazo de tribunais_prazos (com campos do processo replicados)"""
+    if prazo.get("cumprido"):
+        return None
+    due = parse_datetime(prazo.get("data_limite"))
+    if due is None:
+        return None
+    calendario = calendario_forense.obter_calendario(
+        prazo.get("tribunal"), prazo.get("tribunal_uf"), prazo.get("comarca")
+    )
+    alerts = []
+    for label in prazo.get("alertas") or prazo.get("notificacoes") or ["d-5", "d-3", "d-1"]:
+        if not str(label).startswith("d-"):
+            continue
+        try:
+            dias = int(str(label)[2:])
+            alerts.append((_alert_time(calendario.subtrair_dias_uteis(due.date(), dias)), f"d-{dias}"))
+        except ValueError:
+            continue
+    processo_id = prazo["processo_id"]
+    return Entry(
+        source="tribunais",
+        ref_id=f"{processo_id}:{prazo['id']}",
+        due=due,
+        title=f"{prazo.get('numero_processo') or ''} - {prazo.get('descricao', '')}".strip(" -"),
+        owner=prazo.get("responsavel"),
+        group=processo_id,
+        alerts=alerts,
+        data={
+            "processo_id": processo_id,
+            "numero_processo": prazo.get("numero_processo"),
+            "tribunal": prazo.get("tribunal", "Desconhecido"),
+            "descricao": prazo.get("descricao"),
+            "data_limite": prazo.get("data_limite"),
+            "responsavel": prazo.get("responsavel")
+        }
+    )
+
+
+async def _load_source(source: str, ref_id: Optional[str] = None) -> List[Entry]:
+    if source == "deadlines":
+        query = {"id": ref_id} if ref_id else {"completed": {"$ne": True}}
+        docs = await db.deadlines.find(query, {"_id": 0}).to_list(None)
+        return [e for e in map(entry_from_deadline, docs) if e]
+    if source == "workflow_tasks":
+        if ref_id:
+            from bson import ObjectId
+            query = {"_id": ObjectId(ref_id)}
+        else:
+            query = {"status": "pending", "due_date": {"$exists": True}}
+        docs = await db.workflow_tasks.find(query).to_list(None)
+        return [e for e in map(entry_from_task, docs) if e]
+    if source == "tribunais":
+        query = {"processo_id": ref_id} if ref_id else {"cumprido": {"$ne": True}}
+        docs = await db.tribunais_prazos.find(query, {"_id": 0, "data_limite_dt": 0, "identificadores": 0}).to_list(None)
+        return [e for e in map(entry_from_prazo, docs) if e]
+    raise ValueError(f"Fonte desconhecida: {source}")
+
+
+# ==================== AGENDADOR ====================
+
+class AlertScheduler:
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], Entry] = {}
+        self.groups: Dict[Tuple[str, str], set] = {}
+        self._heap: List[Tuple[float, int, Tuple[str, str], str, int]] = []
+        self._by_due: List[Tuple[float, Tuple[str, str]]] = []
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self.loaded_at: Optional[datetime] = None
+        self.fired = 0
+        # id da notificação -> vencimento (timestamp); podado após o vencimento
+        self._dispatched: Dict[str, float] = {}
+
+    # ---------- Estrutura ----------
+
+    def upsert(self, entry: Entry):
+        self.remove(entry.key)
+        version = self._versions.get(entry.key, 0) + 1
+        self._versions[entry.key] = version
+        self.entries[entry.key] = entry
+        if entry.group:
+            self.groups.setdefault((entry.source, entry.group), set()).add(entry.key)
+        bisect.insort(self._by_due, (entry.due.timestamp(), entry.key))
+        earliest = self._heap[0][0] if self._heap else None
+        for fire_at, label in entry.alerts:
+            self._seq += 1
+            heapq.heappush(self._heap, (fire_at.timestamp(), self._seq, entry.key, label, version))
+            if earliest is None or fire_at.timestamp() < earliest:
+                self._wake.set()
+
+    def remove(self, key: Tuple[str, str]):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        # Itens do heap ficam obsoletos pela versão (remoção preguiçosa)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        i = bisect.bisect_left(self._by_due, (entry.due.timestamp(), key))
+        if i < len(self._by_due) and self._by_due[i][1] == key:
+            del self._by_due[i]
+        if entry.group:
+            keys = self.groups.get((entry.source, entry.group))
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.groups[(entry.source, entry.group)]
+
+    def replace_source(self, source: str, entries: List[Entry]):
+        for key in [k for k in self.entries if k[0] == source]:
+            self.remove(key)
+        for entry in entries:
+            self.upsert(entry)
+        self._compact()
+
+    def _compact(self):
+        """Reconstrói o heap sem itens obsoletos quando eles dominam"""
+        if len(self._heap) > 2 * sum(len(e.alerts) for e in self.entries.values()) + 64:
+            self._heap = [item for item in self._heap if self._versions.get(item[2]) == item[4] and item[2] in self.entries]
+            heapq.heapify(self._heap)
+
+    # ---------- Carga e atualização ----------
+
+    async def load(self):
+        await calendario_forense.sincronizar(db)
+        for source in SOURCES:
+            try:
+                self.replace_source(source, await _load_source(source))
+            except Exception as e:
+                logger.warning("Falha ao carregar prazos de %s: %s", source, e)
+        self.loaded_at = datetime.now(timezone.utc)
+        self._prune_dispatched(self.loaded_at.timestamp())
+
+    def _prune_dispatched(self, now_ts: float):
+        """Prazos vencidos não disparam mais alertas; seus ids podem sair da memória"""
+        self._dispatched = {k: due for k, due in self._dispatched.items() if due >= now_ts}
+
+    async def refresh(self, source: str, ref_id: str):
+        """Recarrega um item (ou todos os prazos de um processo, para tribunais)"""
+        if source == "tribunais":
+            stale = list(self.groups.get((source, ref_id), ()))
+        else:
+            stale = [(source, ref_id)]
+        entries = await _load_source(source, ref_id)
+        for key in stale:
+            self.remove(key)
+        for entry in entries:
+            self.upsert(entry)
+
+    async def _on_change(self, message: Dict[str, Any]):
+        try:
+            await self.refresh(message["source"], message["ref_id"])
+        except Exception as e:
+            logger.warning("Falha ao atualizar alerta %s: %s", message, e)
+
+    async def ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        async with self._start_lock:
+            if self._task is not None and not self._task.done():
+                return
+            await self.load()
+            await get_bus().subscribe(CHANGES_CHANNEL, self._on_change)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    # ---------- Disparo ----------
+
+    def due_alerts(self, now: Optional[datetime] = None) -> List[Tuple[Entry, str]]:
+        """Remove do heap e retorna os alertas vencidos de prazos ainda futuros"""
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        fired = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            _, _, key, label, version = heapq.heappop(self._heap)
+            entry = self.entries.get(key)
+            if entry is None or self._versions.get(key) != version:
+                continue
+            if entry.due.timestamp() < now_ts:
+                continue
+            fired.append((entry, label))
+        return fired
+
+    async def _dispatch(self, entry: Entry, label: str):
+        """Notificação idempotente (id determinístico evita duplicidade entre workers)"""
+        notification_id = f"alert:{entry.source}:{entry.ref_id}:{label}:{int(entry.due.timestamp())}"
+        if notification_id in self._dispatched:
+            return
+        notification = {
+            "id": notification_id,
+            "user_id": entry.owner,
+            "title": f"⚠️ {label.upper()}: {entry.title}",
+            "message": f"Prazo em {entry.due.astimezone(TZ).strftime('%d/%m/%Y %H:%M')}",
+            "type": "warning",
+            "link": "",
+            "source": entry.source,
+            "reference_id": entry.ref_id,
+            "alert": label,
+            "read": False,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        result = await notifications_db.notifications.update_one(
+            {"id": notification_id}, {"$setOnInsert": notification}, upsert=True
+        )
+        self._dispatched[notification_id] = entry.due.timestamp()
+        if result.upserted_id is not None:
+            self.fired += 1
+            if entry.owner:
+                from realtime_gateway import user_channel
+                await get_bus().publish(user_channel(entry.owner), {
+                    "text": json.dumps({"type": "deadline_alert", **{k: notification[k] for k in ("id", "title", "message", "alert")}})
+                })
+
+    async def _run(self):
+        last_reload = datetime.now(timezone.utc)
+        while True:
+            try:
+                for entry, label in self.due_alerts():
+                    await self._dispatch(entry, label)
+
+                now = datetime.now(timezone.utc)
+                if (now - last_reload).total_seconds() >= FULL_RELOAD_SECONDS:
+                    await self.load()
+                    last_reload = now
+
+                timeout = FULL_RELOAD_SECONDS
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - now.timestamp()))
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Erro no agendador de alertas: %s", e)
+                await asyncio.sleep(5)
+
+    # ---------- Consultas ----------
+
+    def upcoming(self, source: Optional[str] = None, until: Optional[datetime] = None,
+                 since: Optional[datetime] = None, limit: Optional[int] = None) -> List[Entry]:
+        """Prazos pendentes ordenados por vencimento, no intervalo [since, until]"""
+        start = bisect.bisect_left(self._by_due, (since.timestamp(),)) if since else 0
+        until_ts = until.timestamp() if until else None
+        result = []
+        for due_ts, key in self._by_due[start:]:
+            if until_ts is not None and due_ts > until_ts:
+                break
+            if source and key[0] != source:
+                continue
+            result.append(self.entries[key])
+            if limit and len(result) >= limit:
+                break
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {source: 0 for source in SOURCES}
+        for source, _ in self.entries:
+            counts[source] += 1
+        return {
+            "pending_deadlines": counts,
+            "scheduled_alerts": len(self._heap),
+            "next_alert_at": datetime.fromtimestamp(self._heap[0][0], timezone.utc).isoformat() if self._heap else None,
+            "fired": self.fired,
+            "dispatched_tracked": len(self._dispatched),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None
+        }
+
+
+scheduler = AlertScheduler()
+
+
+async def notify_change(source: str, ref_id: str):
+    """Chamado após escritas nas fontes; atualiza o agendador de todos os workers"""
+    await get_bus().publish(CHANGES_CHANNEL, {"source": source, "ref_id": ref_id})
+
+
+async def ensure_started():
+    await scheduler.ensure_started()
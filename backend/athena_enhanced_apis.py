@@ -5,7 +5,8 @@ APIs complementares para os módulos melhorados
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+import dashboard_rollups
 from datetime import datetime, timezone
 from typing import Optional
 import uuid
@@ -13,7 +14,7 @@ import os
 
 # Database connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 # Security
@@ -114,6 +115,7 @@ async def create_phone_interception(data: dict, current_user: dict = Depends(get
     }
     
     await db.phone_interceptions.insert_one(interception)
+    await dashboard_rollups.notify_write("phone_interceptions", interception)
     return {"message": "Interception created", "id": interception["id"]}
 
 # ==================== Data Interceptions APIs ====================
@@ -9,27 +9,16 @@ import asyncio
 import aiofiles
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Any, Optional
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Response
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel
 import uuid
 from pathlib import Path
 import os
-from reportlab.lib.pagesizes import A4, letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.linecharts import HorizontalLineChart
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')
-import seaborn as sns
-from io import BytesIO
-import base64
+from mongo_registry import get_client
+from pymongo import ASCENDING, DESCENDING
+
+import report_rendering
+from file_streaming import range_file_response
 
 # Import for LLM integration
 from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -45,6 +34,11 @@ llm_chat = LlmChat(
 # Router configuration
 reports_router = APIRouter(prefix="/api/reports")
 
+# MongoDB - metadados dos relatórios gerados
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+client = get_client(MONGO_URL)
+db = client[os.environ.get("DB_NAME", "ap_elite")]
+
 # File paths
 REPORTS_DATA_PATH = Path("/app/backend/reports_data")
 TEMPLATES_PATH = REPORTS_DATA_PATH / "templates"
@@ -88,41 +82,7 @@ class GeneratedReport(BaseModel):
 # ==================== REPORT GENERATION FUNCTIONS ====================
 
 class ReportGenerator:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
-
-    def setup_custom_styles(self):
-        """Configurar estilos personalizados"""
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Title'],
-            fontSize=24,
-            textColor=colors.darkblue,
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-        
-        # Header style
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            textColor=colors.darkred,
-            spaceBefore=20,
-            spaceAfter=12
-        ))
-        
-        # Subheader style
-        self.styles.add(ParagraphStyle(
-            name='SubHeader',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=colors.darkgreen,
-            spaceBefore=15,
-            spaceAfter=8
-        ))
+    """Coleta dados/IA no event loop e delega a renderização ao pool de processos"""
 
     async def generate_investigation_report(self, case_data: Dict, evidence_data: List[Dict], 
                                          network_data: Dict = None) -> str:
@@ -131,152 +91,15 @@ class ReportGenerator:
         report_id = str(uuid.uuid4())
         output_file = OUTPUT_PATH / f"investigation_report_{report_id}.pdf"
         
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            str(output_file),
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        # Story elements
-        story = []
-        
-        # Title page
-        story.append(Paragraph("RELATÓRIO DE INVESTIGAÇÃO CRIMINAL", self.styles['CustomTitle']))
-        story.append(Spacer(1, 20))
-        
-        # Case information
-        case_info = [
-            ["Número do Caso:", case_data.get("case_number", "N/A")],
-            ["Título:", case_data.get("title", "N/A")],
-            ["Status:", case_data.get("status", "N/A")],
-            ["Prioridade:", case_data.get("priority", "N/A")],
-            ["Data de Criação:", case_data.get("created_at", "N/A")],
-            ["Última Atualização:", case_data.get("updated_at", "N/A")]
-        ]
-        
-        case_table = Table(case_info, colWidths=[2*inch, 4*inch])
-        case_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(case_table)
-        story.append(Spacer(1, 30))
-
-        # Executive summary (AI-generated)
-        story.append(Paragraph("RESUMO EXECUTIVO", self.styles['SectionHeader']))
-        
-        # Generate AI summary
+        # Etapas de I/O (IA e cronologia) no event loop
         ai_summary = await self.generate_ai_summary(case_data, evidence_data, network_data)
-        story.append(Paragraph(ai_summary.get("executive_summary", "Resumo em processamento..."), 
-                              self.styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Evidence analysis
-        story.append(Paragraph("ANÁLISE DE EVIDÊNCIAS", self.styles['SectionHeader']))
-        
-        if evidence_data:
-            evidence_summary = []
-            for i, evidence in enumerate(evidence_data[:10], 1):  # Limit to 10 evidence items
-                evidence_summary.append([
-                    str(i),
-                    evidence.get("name", "N/A"),
-                    evidence.get("type", "N/A"),
-                    evidence.get("created_at", "N/A")[:10] if evidence.get("created_at") else "N/A"
-                ])
-            
-            evidence_table = Table([["#", "Nome", "Tipo", "Data"]] + evidence_summary,
-                                 colWidths=[0.5*inch, 2.5*inch, 1.5*inch, 1.5*inch])
-            evidence_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(evidence_table)
-        else:
-            story.append(Paragraph("Nenhuma evidência encontrada.", self.styles['Normal']))
-        
-        story.append(Spacer(1, 20))
-
-        # AI analysis results
-        story.append(Paragraph("ANÁLISE INTELIGENTE", self.styles['SectionHeader']))
-        
-        ai_analysis_text = ai_summary.get("detailed_analysis", "Análise em processamento...")
-        story.append(Paragraph(ai_analysis_text, self.styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Network analysis (if available)
-        if network_data:
-            story.append(Paragraph("ANÁLISE DE REDE CRIMINAL", self.styles['SectionHeader']))
-            
-            network_summary = [
-                ["Nome da Rede:", network_data.get("name", "N/A")],
-                ["Tipo:", network_data.get("network_type", "N/A")],
-                ["Status:", network_data.get("status", "N/A")],
-                ["Membros:", str(len(network_data.get("members", [])))],
-                ["Criada em:", network_data.get("created_at", "N/A")[:10] if network_data.get("created_at") else "N/A"]
-            ]
-            
-            network_table = Table(network_summary, colWidths=[2*inch, 4*inch])
-            network_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightcoral),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(network_table)
-            story.append(Spacer(1, 20))
-
-        # Timeline
-        story.append(Paragraph("CRONOLOGIA DE EVENTOS", self.styles['SectionHeader']))
         timeline_text = await self.generate_timeline(case_data, evidence_data)
-        story.append(Paragraph(timeline_text, self.styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Recommendations
-        story.append(Paragraph("RECOMENDAÇÕES", self.styles['SectionHeader']))
-        recommendations = ai_summary.get("recommendations", ["Continuar investigação", "Analisar evidências adicionais"])
-        
-        for i, rec in enumerate(recommendations, 1):
-            story.append(Paragraph(f"{i}. {rec}", self.styles['Normal']))
-        
-        story.append(Spacer(1, 20))
-
-        # Conclusion
-        story.append(Paragraph("CONCLUSÃO", self.styles['SectionHeader']))
-        conclusion = ai_summary.get("conclusion", "Investigação em andamento com evidências significativas coletadas.")
-        story.append(Paragraph(conclusion, self.styles['Normal']))
         
-        # Footer
-        story.append(Spacer(1, 50))
-        story.append(Paragraph(f"Relatório gerado automaticamente em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-                              self.styles['Normal']))
-        story.append(Paragraph("Sistema AP Elite - Athena Intelligence", self.styles['Normal']))
-
-        # Build PDF
-        doc.build(story)
-        
-        return str(output_file)
+        # Montagem do PDF (CPU) no pool de renderização
+        return await report_rendering.run_render(
+            report_rendering.build_investigation_pdf,
+            str(output_file), case_data, evidence_data, network_data, ai_summary, timeline_text
+        )
 
     async def generate_ai_summary(self, case_data: Dict, evidence_data: List[Dict], 
                                 network_data: Dict = None) -> Dict:
@@ -380,159 +203,64 @@ class ReportGenerator:
         report_id = str(uuid.uuid4())
         output_file = OUTPUT_PATH / f"forensic_report_{report_id}.pdf"
         
-        doc = SimpleDocTemplate(str(output_file), pagesize=A4)
-        story = []
-        
-        # Title
-        story.append(Paragraph("LAUDO PERICIAL DIGITAL", self.styles['CustomTitle']))
-        story.append(Spacer(1, 30))
-        
-        # Evidence information
-        evidence_info = [
-            ["Número da Evidência:", evidence_data.get("evidence_number", "N/A")],
-            ["Nome do Arquivo:", evidence_data.get("name", "N/A")],
-            ["Tipo:", evidence_data.get("type", "N/A")],
-            ["Tamanho:", f"{evidence_data.get('size', 0)} bytes"],
-            ["Hash MD5:", analysis_results.get("metadata", {}).get("hashes", {}).get("md5", "N/A")],
-            ["Hash SHA256:", analysis_results.get("metadata", {}).get("hashes", {}).get("sha256", "N/A")],
-            ["Data da Coleta:", evidence_data.get("created_at", "N/A")[:19] if evidence_data.get("created_at") else "N/A"]
-        ]
-        
-        evidence_table = Table(evidence_info, colWidths=[2.5*inch, 3.5*inch])
-        evidence_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(evidence_table)
-        story.append(Spacer(1, 30))
-
-        # Methodology
-        story.append(Paragraph("METODOLOGIA APLICADA", self.styles['SectionHeader']))
-        methodology = """
-        A análise foi realizada utilizando ferramentas forenses digitais avançadas,
-        incluindo análise de metadados, extração de texto por OCR, reconhecimento facial
-        e análise inteligente por IA. Todas as evidências foram processadas mantendo
-        a cadeia de custódia e integridade dos dados.
-        """
-        story.append(Paragraph(methodology, self.styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Results
-        story.append(Paragraph("RESULTADOS DA ANÁLISE", self.styles['SectionHeader']))
-        
-        # Add analysis results
-        if analysis_results.get("image_analysis"):
-            img_analysis = analysis_results["image_analysis"]["results"]
-            story.append(Paragraph("Análise de Imagem:", self.styles['SubHeader']))
-            story.append(Paragraph(f"Faces detectadas: {img_analysis.get('faces_detected', 0)}", self.styles['Normal']))
-            if img_analysis.get("extracted_text"):
-                story.append(Paragraph(f"Texto extraído: {img_analysis['extracted_text'][:200]}...", self.styles['Normal']))
-        
-        if analysis_results.get("document_analysis"):
-            doc_analysis = analysis_results["document_analysis"]["ai_summary"]
-            story.append(Paragraph("Análise de Documento:", self.styles['SubHeader']))
-            story.append(Paragraph(json.dumps(doc_analysis, indent=2)[:500] + "...", self.styles['Normal']))
-
-        story.append(Spacer(1, 30))
-
-        # Technical details
-        story.append(Paragraph("DETALHES TÉCNICOS", self.styles['SectionHeader']))
-        tech_details = f"""
-        Arquivo analisado em ambiente controlado com ferramentas certificadas.
-        Integridade verificada através de hashes criptográficos.
-        Análise realizada em: {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
-        Sistema utilizado: AP Elite Athena v2.0
-        """
-        story.append(Paragraph(tech_details, self.styles['Normal']))
-        
-        # Build PDF
-        doc.build(story)
-        
-        return str(output_file)
+        return await report_rendering.run_render(
+            report_rendering.build_forensic_pdf,
+            str(output_file), evidence_data, analysis_results
+        )
 
     async def generate_charts(self, data: Dict, chart_type: str = "summary") -> str:
-        """Gerar gráficos para relatórios"""
-        
-        chart_id = str(uuid.uuid4())
-        chart_file = CHARTS_PATH / f"chart_{chart_id}.png"
-        
-        plt.figure(figsize=(12, 8))
-        plt.style.use('seaborn-v0_8')
-        
-        if chart_type == "evidence_timeline":
-            # Evidence collection timeline
-            dates = []
-            counts = []
-            
-            # Sample data - would be replaced with real data
-            for i in range(7):
-                date = (datetime.now() - timedelta(days=i)).strftime("%d/%m")
-                dates.append(date)
-                counts.append(np.random.randint(1, 10))
-            
-            plt.subplot(2, 2, 1)
-            plt.plot(dates, counts, marker='o', linewidth=2, markersize=8)
-            plt.title("Cronologia de Coleta de Evidências")
-            plt.xlabel("Data")
-            plt.ylabel("Quantidade")
-            plt.xticks(rotation=45)
-
-        elif chart_type == "evidence_types":
-            # Evidence types distribution
-            types = data.get("evidence_types", {"Documento": 5, "Imagem": 8, "Comunicação": 3, "Vídeo": 2})
-            
-            plt.subplot(2, 2, 2)
-            plt.pie(types.values(), labels=types.keys(), autopct='%1.1f%%', startangle=90)
-            plt.title("Distribuição por Tipo de Evidência")
-
-        elif chart_type == "risk_levels":
-            # Risk levels
-            risks = data.get("risk_levels", {"Baixo": 3, "Médio": 7, "Alto": 4, "Crítico": 2})
-            
-            plt.subplot(2, 2, 3)
-            colors_list = ['green', 'yellow', 'orange', 'red']
-            plt.bar(risks.keys(), risks.values(), color=colors_list)
-            plt.title("Níveis de Risco Identificados")
-            plt.xlabel("Nível de Risco")
-            plt.ylabel("Quantidade")
-
-        elif chart_type == "network_centrality":
-            # Network centrality (if network data available)
-            centrality_data = data.get("centrality", {})
-            
-            plt.subplot(2, 2, 4)
-            if centrality_data:
-                persons = list(centrality_data.keys())[:10]  # Top 10
-                scores = [centrality_data[p] for p in persons]
-                plt.barh(persons, scores)
-                plt.title("Centralidade na Rede")
-                plt.xlabel("Score de Centralidade")
-            else:
-                plt.text(0.5, 0.5, 'Dados de rede não disponíveis', 
-                        horizontalalignment='center', verticalalignment='center')
-                plt.title("Análise de Rede")
-
-        plt.tight_layout()
-        plt.savefig(chart_file, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        return str(chart_file)
+        """Gerar gráficos para relatórios (cacheados pelo hash dos dados)"""
+        chart = await report_rendering.render_chart(CHARTS_PATH, data, chart_type)
+        return chart["file"]
 
 # ==================== API ENDPOINTS ====================
 
+_reports_collection_ready = False
+
+async def ensure_reports_collection():
+    """Cria índices e importa metadados legados (report_*.json) uma única vez"""
+    global _reports_collection_ready
+    if _reports_collection_ready:
+        return
+    await db.generated_reports.create_index([("request_id", ASCENDING)], unique=True)
+    await db.generated_reports.create_index([("case_id", ASCENDING), ("generated_at", DESCENDING)])
+    await db.generated_reports.create_index([("status", ASCENDING), ("requested_at", DESCENDING)])
+    await db.generated_reports.create_index([("generated_at", DESCENDING)])
+    
+    for legacy_file in REPORTS_DATA_PATH.glob("report_*.json"):
+        try:
+            async with aiofiles.open(legacy_file, 'r') as f:
+                legacy = json.loads(await f.read())
+            legacy.setdefault("status", "completed")
+            await db.generated_reports.update_one(
+                {"request_id": legacy["request_id"]},
+                {"$setOnInsert": legacy},
+                upsert=True
+            )
+            legacy_file.rename(legacy_file.with_suffix(".json.migrated"))
+        except Exception as e:
+            print(f"Erro ao migrar metadados {legacy_file.name}: {str(e)}")
+    
+    _reports_collection_ready = True
+
 @reports_router.post("/generate")
 async def generate_report(report_request: ReportRequest, background_tasks: BackgroundTasks):
     """Gerar relatório automatizado"""
+    await ensure_reports_collection()
     
     request_id = str(uuid.uuid4())
     
-    # Schedule background report generation
+    await db.generated_reports.insert_one({
+        "request_id": request_id,
+        "case_id": report_request.case_id,
+        "title": report_request.title,
+        "template_id": report_request.template_id,
+        "format": report_request.format,
+        "status": "processing",
+        "requested_at": datetime.now(timezone.utc).isoformat()
+    })
+    
+    # Coleta de dados/IA no event loop; PDF e gráficos no pool de renderização
     background_tasks.add_task(
         generate_report_background,
         request_id,
@@ -619,67 +347,61 @@ async def generate_report_background(request_id: str, request_data: Dict):
             ai_summary={"status": "generated", "chart_file": chart_file}
         )
         
-        # Save report record
-        report_meta_file = REPORTS_DATA_PATH / f"report_{request_id}.json"
-        async with aiofiles.open(report_meta_file, 'w') as f:
-            await f.write(report_record.json())
+        await db.generated_reports.update_one(
+            {"request_id": request_id},
+            {"$set": {**report_record.dict(), "status": "completed"}}
+        )
 
     except Exception as e:
         print(f"Erro na geração de relatório {request_id}: {str(e)}")
+        await db.generated_reports.update_one(
+            {"request_id": request_id},
+            {"$set": {"status": "failed", "error": str(e), "failed_at": datetime.now(timezone.utc).isoformat()}}
+        )
 
 @reports_router.get("/status/{request_id}")
 async def get_report_status(request_id: str):
     """Verificar status do relatório"""
+    await ensure_reports_collection()
     
-    report_meta_file = REPORTS_DATA_PATH / f"report_{request_id}.json"
+    report_data = await db.generated_reports.find_one({"request_id": request_id}, {"_id": 0})
     
-    if not report_meta_file.exists():
+    if not report_data or report_data.get("status") == "processing":
         return {"status": "processing", "message": "Relatório sendo gerado..."}
     
-    try:
-        async with aiofiles.open(report_meta_file, 'r') as f:
-            report_data = json.loads(await f.read())
-        
-        return {
-            "status": "completed",
-            "report": report_data,
-            "download_url": f"/api/reports/download/{request_id}"
-        }
+    if report_data.get("status") == "failed":
+        return {"status": "failed", "error": report_data.get("error"), "report": report_data}
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": "completed",
+        "report": report_data,
+        "download_url": f"/api/reports/download/{request_id}"
+    }
 
 @reports_router.get("/download/{request_id}")
-async def download_report(request_id: str):
-    """Download do relatório gerado"""
+async def download_report(request_id: str, request: Request):
+    """Download do relatório gerado (streaming, com suporte a Range)"""
+    await ensure_reports_collection()
     
-    report_meta_file = REPORTS_DATA_PATH / f"report_{request_id}.json"
+    report_data = await db.generated_reports.find_one(
+        {"request_id": request_id, "status": "completed"},
+        {"_id": 0, "file_path": 1}
+    )
     
-    if not report_meta_file.exists():
+    if not report_data:
         raise HTTPException(status_code=404, detail="Relatório não encontrado")
     
-    try:
-        async with aiofiles.open(report_meta_file, 'r') as f:
-            report_data = json.loads(await f.read())
-        
-        report_file = Path(report_data["file_path"])
-        
-        if not report_file.exists():
-            raise HTTPException(status_code=404, detail="Arquivo do relatório não encontrado")
-        
-        async with aiofiles.open(report_file, 'rb') as f:
-            content = await f.read()
-        
-        return Response(
-            content=content,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=relatorio_{request_id}.pdf"
-            }
-        )
+    report_file = Path(report_data["file_path"])
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not report_file.exists():
+        raise HTTPException(status_code=404, detail="Arquivo do relatório não encontrado")
+    
+    return range_file_response(
+        request,
+        report_file,
+        media_type="application/pdf",
+        filename=f"relatorio_{request_id}.pdf"
+    )
 
 @reports_router.get("/templates")
 async def list_report_templates():
@@ -719,20 +441,26 @@ async def list_report_templates():
     return {"templates": templates}
 
 @reports_router.get("/list")
-async def list_generated_reports():
+async def list_generated_reports(
+    case_id: Optional[str] = None,
+    status: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+):
     """Listar relatórios gerados"""
     
     try:
-        report_files = list(REPORTS_DATA_PATH.glob("report_*.json"))
-        reports = []
+        await ensure_reports_collection()
         
-        for report_file in report_files:
-            async with aiofiles.open(report_file, 'r') as f:
-                report_data = json.loads(await f.read())
-                reports.append(report_data)
+        query = {}
+        if case_id:
+            query["case_id"] = case_id
+        if status:
+            query["status"] = status
         
-        # Sort by generation date
-        reports.sort(key=lambda x: x.get("generated_at", ""), reverse=True)
+        reports = await db.generated_reports.find(query, {"_id": 0}).sort(
+            "generated_at", DESCENDING
+        ).skip(skip).limit(min(limit, 1000)).to_list(None)
         
         return {"reports": reports}
     
@@ -8,7 +8,7 @@ from pydantic import BaseModel
 from typing import Optional, Dict
 from datetime import datetime, timezone
 import uuid
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import os
 
 # Router
@@ -16,7 +16,7 @@ reports_complete_router = APIRouter(prefix="/api/reports", tags=["Automated Repo
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # Templates
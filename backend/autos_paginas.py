@@ -0,0 +1,423 @@
+"""
+Ingestão dos Autos por Página - Texto, OCR e Busca
+Cada volume em PDF anexado a uma análise processual é lido em streaming
+(PdfReader sobre o arquivo aberto, sem carregá-lo inteiro) e dividido em
+intervalos de páginas processados num pool de processos. De cada página
+guardam-se o texto da camada de texto, o SHA-256 do conteúdo e do texto e os
+termos normalizados (mesma tokenização da biblioteca: sem acentos, sem
+stopwords, radicalizados) para a busca por página.
+
+Páginas sem camada de texto (digitalizadas) vão para o backend de OCR
+configurado em AUTOS_OCR_BACKEND:
+- auto (padrão): tesseract se pytesseract e o binário estiverem disponíveis,
+  senão nenhum (a página fica "sem_texto" até haver OCR)
+- tesseract, stub (determinístico, para testes), none
+- "modulo:funcao" para um backend próprio (recebe a lista de imagens em bytes)
+
+A reindexação é incremental: volumes com o mesmo SHA-256 e páginas com o
+mesmo hash de conteúdo não são reprocessados, de modo que anexar um novo
+volume a autos de milhares de páginas só processa as páginas novas. A
+numeração global (pagina) segue a ordem de upload dos volumes.
+
+Executado pela fila de jobs (job_type "processo.indexar_paginas"); um volume
+anexado enquanto o job roda faz o job ser executado de novo ao terminar
+(enqueue com rerun_if_running).
+"""
+
+import os
+import io
+import shutil
+import asyncio
+import hashlib
+import logging
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from mongo_registry import get_client
+from library_index import tokenize, highlight
+
+try:
+    import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "test_database")
+client = get_client(MONGO_URL)
+db = client[DB_NAME]
+
+AUTOS_DIR = os.environ.get("AUTOS_DIR", "/tmp/processos")
+OCR_BACKEND = os.environ.get("AUTOS_OCR_BACKEND", "auto")
+OCR_LANG = os.environ.get("AUTOS_OCR_LANG", "por")
+PAGE_WORKERS = int(os.environ.get("AUTOS_PAGE_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = 100
+# Abaixo disso a página é considerada sem camada de texto
+MIN_TEXT_CHARS = 20
+CHUNK_SIZE = 1024 * 1024
+
+
+# ==================== UPLOAD ====================
+
+async def salvar_upload(upload, destino: str) -> Dict[str, Any]:
+    """Grava o upload em blocos calculando SHA-256, SHA-512 e BLAKE3 (se instalado)"""
+    sha256, sha512 = hashlib.sha256(), hashlib.sha512()
+    b3 = _blake3.blake3() if _blake3 else None
+    tamanho = 0
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = destino + ".part"
+    try:
+        with open(temporario, "wb") as saida:
+            while True:
+                bloco = await upload.read(CHUNK_SIZE)
+                if not bloco:
+                    break
+                tamanho += len(bloco)
+                sha256.update(bloco)
+                sha512.update(bloco)
+                if b3:
+                    b3.update(bloco)
+                await asyncio.to_thread(saida.write, bloco)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    hashes = {"sha256": sha256.hexdigest(), "sha512": sha512.hexdigest()}
+    if b3:
+        hashes["blake3"] = b3.hexdigest()
+    return {"size": tamanho, "hashes": hashes}
+
+
+# ==================== OCR ====================
+
+def _ocr_tesseract(imagens: List[bytes]) -> str:
+    import pytesseract
+    from PIL import Image
+    return "\n".join(
+        pytesseract.image_to_string(Image.open(io.BytesIO(dados)), lang=OCR_LANG) for dados in imagens
+    )
+
+
+def _ocr_stub(imagens: List[bytes]) -> str:
+    """Texto determinístico derivado das imagens (testes sem tesseract)"""
+    return "\n".join(
+        f"ocr simulado imagem {i + 1} {hashlib.sha256(dados).hexdigest()[:16]}" for i, dados in enumerate(imagens)
+    )
+
+
+OCR_BACKENDS: Dict[str, Callable[[List[bytes]], str]] = {
+    "tesseract": _ocr_tesseract,
+    "stub": _ocr_stub,
+}
+
+
+def ocr_backend_name(nome: Optional[str] = None) -> str:
+    """Resolve "auto" para o backend disponível nesta máquina"""
+    nome = nome or OCR_BACKEND
+    if nome != "auto":
+        return nome
+    try:
+        import pytesseract  # noqa: F401
+    except ImportError:
+        return "none"
+    return "tesseract" if shutil.which("tesseract") else "none"
+
+
+def _resolve_ocr(nome: str) -> Optional[Callable[[List[bytes]], str]]:
+    if nome == "none":
+        return None
+    if nome in OCR_BACKENDS:
+        return OCR_BACKENDS[nome]
+    modulo, funcao = nome.split(":")
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+# ==================== EXTRAÇÃO (PROCESSOS) ====================
+
+def _hash_xobjects(recursos, hasher, vistos: set):
+    """Inclui no hash os dados dos XObjects (imagens e formulários aninhados)"""
+    xobjects = (recursos or {}).get("/XObject") or {}
+    for nome in sorted(xobjects):
+        referencia = xobjects[nome]
+        objeto = referencia.get_object()
+        chave = getattr(referencia, "idnum", None) or id(objeto)
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        hasher.update(nome.encode("latin-1"))
+        hasher.update(objeto.get_data())
+        if objeto.get("/Subtype") == "/Form":
+            _hash_xobjects(objeto.get("/Resources"), hasher, vistos)
+
+
+def _hash_conteudo(pagina) -> str:
+    """
+    SHA-256 do content stream e das imagens da página: páginas digitalizadas
+    têm o mesmo content stream ("desenhe /Im0") e só diferem pela imagem
+    """
+    hasher = hashlib.sha256()
+    conteudo = pagina.get_contents()
+    if conteudo is not None:
+        hasher.update(conteudo.get_data())
+    _hash_xobjects(pagina.get("/Resources"), hasher, set())
+    return hasher.hexdigest()
+
+
+def _imagens_pagina(pagina) -> List[bytes]:
+    try:
+        return [imagem.data for imagem in pagina.images]
+    except ImportError:
+        # Sem Pillow: imagens JPEG/JPEG2000 seguem como estão (o backend decodifica)
+        recursos = pagina.get("/Resources") or {}
+        xobjects = recursos.get("/XObject") or {}
+        imagens = []
+        for nome in xobjects:
+            objeto = xobjects[nome].get_object()
+            filtro = objeto.get("/Filter")
+            filtros = filtro if isinstance(filtro, list) else [filtro]
+            if objeto.get("/Subtype") == "/Image" and filtros[-1] in ("/DCTDecode", "/JPXDecode"):
+                imagens.append(objeto.get_data())
+        return imagens
+
+
+def _processar_intervalo(caminho: str, inicio: int, fim: int, conhecidas: Dict[int, str],
+                         ocr: str) -> List[Dict[str, Any]]:
+    """
+    Executado no pool: páginas [inicio, fim) do volume (base 0). Páginas cujo
+    hash de conteúdo está em `conhecidas` voltam apenas como inalteradas.
+    """
+    from PyPDF2 import PdfReader
+
+    backend = _resolve_ocr(ocr)
+    resultados = []
+    with open(caminho, "rb") as arquivo:
+        leitor = PdfReader(arquivo)
+        for indice in range(inicio, fim):
+            numero = indice + 1
+            hash_conteudo = None
+            try:
+                pagina = leitor.pages[indice]
+                hash_conteudo = _hash_conteudo(pagina)
+                if conhecidas.get(numero) == hash_conteudo:
+                    resultados.append({"pagina_volume": numero, "inalterada": True})
+                    continue
+                texto = pagina.extract_text() or ""
+                origem = "texto"
+                if len(texto.strip()) < MIN_TEXT_CHARS:
+                    imagens = _imagens_pagina(pagina)
+                    if imagens and backend:
+                        texto, origem = backend(imagens), "ocr"
+                    else:
+                        origem = "sem_texto"
+                erro = None
+            except Exception as e:
+                texto, origem, erro = "", "erro", f"{type(e).__name__}: {e}"
+            resultados.append({
+                "pagina_volume": numero,
+                "texto": texto,
+                "origem": origem,
+                "ocr_backend": ocr if origem == "ocr" else None,
+                "sha256_conteudo": hash_conteudo,
+                "sha256_texto": hashlib.sha256(texto.encode("utf-8")).hexdigest(),
+                "caracteres": len(texto),
+                "termos": sorted(set(tokenize(texto))),
+                "erro": erro
+            })
+    return resultados
+
+
+def contar_paginas(caminho: str) -> int:
+    from PyPDF2 import PdfReader
+    with open(caminho, "rb") as arquivo:
+        return len(PdfReader(arquivo).pages)
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=PAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ==================== INDEXAÇÃO ====================
+
+def _eh_pdf(documento: Dict[str, Any]) -> bool:
+    return documento.get("filename", "").lower().endswith(".pdf")
+
+
+def caminho_documento(analise_id: str, documento: Dict[str, Any]) -> str:
+    return documento.get("path") or os.path.join(AUTOS_DIR, analise_id, documento["filename"])
+
+
+async def _conhecidas(documento_id: str) -> Dict[int, str]:
+    """Hashes das páginas já indexadas com sucesso (páginas sem OCR são refeitas se houver backend)"""
+    filtro = {"documento_id": documento_id, "origem": {"$in": ["texto", "ocr"]}}
+    cursor = db.autos_paginas.find(filtro, {"_id": 0, "pagina_volume": 1, "sha256_conteudo": 1})
+    return {p["pagina_volume"]: p["sha256_conteudo"] async for p in cursor}
+
+
+async def _indexar_volume(analise_id: str, documento: Dict[str, Any], volume: int, pagina_inicial: int,
+                          ocr: str, progresso: Callable) -> Dict[str, Any]:
+    caminho = caminho_documento(analise_id, documento)
+    total = await asyncio.to_thread(contar_paginas, caminho)
+    conhecidas = await _conhecidas(documento["id"])
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    tarefas = [
+        loop.run_in_executor(
+            executor, _processar_intervalo, caminho, inicio, min(inicio + PAGES_PER_TASK, total),
+            {n: h for n, h in conhecidas.items() if inicio < n <= inicio + PAGES_PER_TASK}, ocr
+        )
+        for inicio in range(0, total, PAGES_PER_TASK)
+    ]
+
+    contagem = {"texto": 0, "ocr": 0, "sem_texto": 0, "erro": 0, "inalteradas": 0}
+    agora = datetime.now(timezone.utc).isoformat()
+    for tarefa in asyncio.as_completed(tarefas):
+        paginas = await tarefa
+        operacoes = []
+        for pagina in paginas:
+            numero = pagina["pagina_volume"]
+            if pagina.pop("inalterada", False):
+                contagem["inalteradas"] += 1
+                operacoes.append(UpdateOne(
+                    {"documento_id": documento["id"], "pagina_volume": numero},
+                    {"$set": {"pagina": pagina_inicial + numero - 1, "volume": volume}}
+                ))
+                continue
+            contagem[pagina["origem"]] += 1
+            operacoes.append(UpdateOne(
+                {"documento_id": documento["id"], "pagina_volume": numero},
+                {"$set": {
+                    **pagina,
+                    "analise_id": analise_id,
+                    "volume": volume,
+                    "filename": documento["filename"],
+                    "pagina": pagina_inicial + numero - 1,
+                    "indexado_em": agora
+                }},
+                upsert=True
+            ))
+        if operacoes:
+            await db.autos_paginas.bulk_write(operacoes, ordered=False)
+        await progresso(len(paginas))
+
+    # Volume substituído por outro menor: remove páginas que deixaram de existir
+    await db.autos_paginas.delete_many({"documento_id": documento["id"], "pagina_volume": {"$gt": total}})
+    return {"paginas": total, **contagem}
+
+
+async def indexar_analise(analise_id: str, job=None, ocr: Optional[str] = None) -> Dict[str, Any]:
+    """Indexa (ou atualiza) as páginas de todos os volumes em PDF da análise"""
+    analise = await db.analises_processuais.find_one({"id": analise_id}, {"_id": 0, "documentos": 1})
+    if analise is None:
+        raise ValueError(f"Análise não encontrada: {analise_id}")
+
+    ocr = ocr_backend_name(ocr)
+    volumes = [d for d in analise.get("documentos", []) if _eh_pdf(d)]
+    total_paginas = sum(d.get("paginas") or 0 for d in volumes) or 1
+    feitas = 0
+
+    async def progresso(quantidade: int):
+        nonlocal feitas
+        feitas += quantidade
+        if job:
+            await job.progress(min(99.0, 100 * feitas / total_paginas), f"{feitas} páginas processadas")
+
+    resumo = {"volumes": [], "ocr_backend": ocr}
+    pagina_inicial = 1
+    for volume, documento in enumerate(volumes, start=1):
+        indexacao = documento.get("indexacao") or {}
+        if (indexacao.get("sha256") == documento.get("sha256") and indexacao.get("status") == "concluida"
+                and indexacao.get("pagina_inicial") == pagina_inicial
+                and (indexacao.get("sem_texto", 0) == 0 or ocr == "none")):
+            resultado = {"paginas": documento["paginas"], "inalteradas": documento["paginas"], "volume_inalterado": True}
+            await progresso(documento["paginas"])
+        else:
+            try:
+                resultado = await _indexar_volume(analise_id, documento, volume, pagina_inicial, ocr, progresso)
+            except Exception as e:
+                logger.warning("Falha ao indexar %s: %s", documento.get("filename"), e)
+                resultado = {"paginas": documento.get("paginas") or 0, "erro": f"{type(e).__name__}: {e}"}
+            await db.analises_processuais.update_one(
+                {"id": analise_id, "documentos.id": documento["id"]},
+                {"$set": {
+                    "documentos.$.paginas": resultado["paginas"],
+                    "documentos.$.indexacao": {
+                        "status": "erro" if resultado.get("erro") else "concluida",
+                        "sha256": documento.get("sha256"),
+                        "pagina_inicial": pagina_inicial,
+                        "sem_texto": resultado.get("sem_texto", 0),
+                        "ocr_backend": ocr,
+                        "erro": resultado.get("erro"),
+                        "indexado_em": datetime.now(timezone.utc).isoformat()
+                    }
+                }}
+            )
+        resumo["volumes"].append({"documento_id": documento["id"], "filename": documento["filename"],
+                                  "volume": volume, "pagina_inicial": pagina_inicial, **resultado})
+        pagina_inicial += resultado["paginas"]
+
+    resumo["total_paginas"] = pagina_inicial - 1
+    await db.analises_processuais.update_one(
+        {"id": analise_id},
+        {"$set": {
+            "indexado": True,
+            "total_paginas": resumo["total_paginas"],
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+    return resumo
+
+
+# ==================== CONSULTA ====================
+
+async def buscar(analise_id: str, consulta: str, modo: str = "todos", limite: int = 20,
+                 pular: int = 0) -> Dict[str, Any]:
+    """Páginas que contêm todos (ou qualquer um) dos termos da consulta, em ordem de página"""
+    termos = sorted(set(tokenize(consulta)))
+    if not termos:
+        return {"termos": [], "total": 0, "paginas": []}
+    filtro = {"analise_id": analise_id, "termos": {"$all" if modo == "todos" else "$in": termos}}
+    total = await db.autos_paginas.count_documents(filtro)
+    paginas = await db.autos_paginas.find(
+        filtro, {"_id": 0, "pagina": 1, "pagina_volume": 1, "volume": 1, "filename": 1,
+                 "documento_id": 1, "origem": 1, "texto": 1, "sha256_conteudo": 1}
+    ).sort("pagina", 1).skip(pular).limit(limite).to_list(limite)
+    for pagina in paginas:
+        pagina["trecho"] = highlight(pagina.pop("texto"), termos)
+    return {"termos": termos, "total": total, "paginas": paginas}
+
+
+async def obter_pagina(analise_id: str, pagina: int) -> Optional[Dict[str, Any]]:
+    return await db.autos_paginas.find_one({"analise_id": analise_id, "pagina": pagina}, {"_id": 0, "termos": 0})
+
+
+async def resumo_paginas(analise_id: str) -> Dict[str, Any]:
+    linhas = await db.autos_paginas.aggregate([
+        {"$match": {"analise_id": analise_id}},
+        {"$group": {"_id": "$origem", "paginas": {"$sum": 1}}}
+    ]).to_list(None)
+    por_origem = {linha["_id"]: linha["paginas"] for linha in linhas}
+    return {"total": sum(por_origem.values()), "por_origem": por_origem, "ocr_backend": ocr_backend_name()}
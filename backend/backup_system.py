@@ -5,7 +5,7 @@ Automated database backups
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional
 import uuid
@@ -15,7 +15,7 @@ import json
 from pathlib import Path
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
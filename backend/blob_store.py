@@ -0,0 +1,248 @@
+"""
+Armazenamento de Blobs Endereçado por Conteúdo
+Cada arquivo é gravado uma única vez, com o SHA-256 do conteúdo como nome,
+em diretórios fragmentados (ab/cd/abcd...). O hash é calculado durante o
+streaming do upload; arquivos idênticos enviados para vários casos
+compartilham o mesmo blob. A coleção "blobs" guarda a contagem de
+referências, e a coleta de lixo remove blobs sem referência após um
+período de carência.
+
+Coleta concorrente com upload: o upload incrementa a referência antes de
+verificar o arquivo; a coleta renomeia o blob para .gc, remove o registro
+só se a contagem ainda for zero e, caso contrário, devolve o arquivo. A
+varredura de órfãos ignora os .gc recentes (podem ser de uma coleta em
+andamento em outro processo); só sobras de uma coleta interrompida, mais
+antigas que BLOB_GC_LEFTOVER_SECONDS, são devolvidas ou apagadas.
+"""
+
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiofiles
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from mongo_registry import get_client
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+client = get_client(MONGO_URL)
+db = client.ap_elite
+
+BLOB_DIR = Path(os.environ.get("BLOB_STORE_DIR", "/app/backend/uploads/blobs"))
+CHUNK_SIZE = 1024 * 1024
+GC_GRACE_SECONDS = int(os.environ.get("BLOB_GC_GRACE_SECONDS", 3600))
+GC_INTERVAL_SECONDS = int(os.environ.get("BLOB_GC_INTERVAL_SECONDS", 3600))
+# Independente da carência pedida: a coleta de outro processo pode estar entre o rename e o delete
+GC_LEFTOVER_SECONDS = int(os.environ.get("BLOB_GC_LEFTOVER_SECONDS", 3600))
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    size: int
+    path: Path
+    deduplicated: bool
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOB_DIR / sha256[:2] / sha256[2:4] / sha256
+
+
+def _tmp_dir() -> Path:
+    path = BLOB_DIR / "tmp"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# ==================== GRAVAÇÃO ====================
+
+async def put_stream(upload, max_size: Optional[int] = None, mime_type: Optional[str] = None) -> StoredBlob:
+    """
+    Grava um UploadFile (ou qualquer objeto com read() assíncrono) calculando o
+    SHA-256 em streaming; conteúdo já existente só ganha mais uma referência.
+    """
+    temp = _tmp_dir() / f"{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise HTTPException(status_code=413, detail="Arquivo excede o tamanho máximo permitido")
+                # hashlib libera o GIL em blocos grandes
+                await asyncio.gather(asyncio.to_thread(hasher.update, chunk), out.write(chunk))
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+    sha256 = hasher.hexdigest()
+    now = datetime.now(timezone.utc)
+    await db.blobs.update_one(
+        {"_id": sha256},
+        {
+            "$inc": {"refcount": 1},
+            "$set": {"last_referenced_at": now},
+            "$unset": {"released_at": ""},
+            "$setOnInsert": {"size": size, "mime_type": mime_type, "created_at": now}
+        },
+        upsert=True
+    )
+
+    target = blob_path(sha256)
+    deduplicated = target.exists()
+    if deduplicated:
+        temp.unlink(missing_ok=True)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp, target)
+    return StoredBlob(sha256=sha256, size=size, path=target, deduplicated=deduplicated)
+
+
+async def release(sha256: str) -> Optional[int]:
+    """Remove uma referência; com zero, o blob fica elegível para a coleta após a carência"""
+    blob = await db.blobs.find_one_and_update(
+        {"_id": sha256, "refcount": {"$gt": 0}},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None:
+        return None
+    if blob["refcount"] == 0:
+        await db.blobs.update_one(
+            {"_id": sha256, "refcount": 0},
+            {"$set": {"released_at": datetime.now(timezone.utc)}}
+        )
+    return blob["refcount"]
+
+
+# ==================== COLETA DE LIXO ====================
+
+async def collect_garbage(grace_seconds: Optional[int] = None) -> Dict[str, Any]:
+    """Remove blobs sem referência há mais que a carência, órfãos no disco e temporários antigos"""
+    grace = GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace)
+    removed, freed, restored = 0, 0, 0
+
+    candidates = await db.blobs.find(
+        {"refcount": {"$lte": 0}, "released_at": {"$lte": cutoff}},
+        {"_id": 1, "size": 1}
+    ).to_list(None)
+    for blob in candidates:
+        target = blob_path(blob["_id"])
+        doomed = target.with_name(target.name + ".gc")
+        moved = False
+        try:
+            os.replace(target, doomed)
+            moved = True
+        except FileNotFoundError:
+            pass
+        result = await db.blobs.delete_one({"_id": blob["_id"], "refcount": {"$lte": 0}})
+        if result.deleted_count:
+            removed += 1
+            freed += blob.get("size", 0)
+            if moved:
+                doomed.unlink(missing_ok=True)
+        elif moved:
+            # Referenciado de novo durante a coleta
+            if target.exists():
+                doomed.unlink(missing_ok=True)
+            else:
+                os.replace(doomed, target)
+            restored += 1
+
+    # Arquivos sem registro (upload interrompido entre a gravação e o banco)
+    orphans = 0
+    if BLOB_DIR.exists():
+        cutoff_ts = cutoff.timestamp()
+        leftover_ts = datetime.now(timezone.utc).timestamp() - GC_LEFTOVER_SECONDS
+        for path in BLOB_DIR.glob("??/??/*"):
+            try:
+                info = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.name.endswith(".gc"):
+                # O rename preserva o mtime; o ctime marca quando o arquivo virou .gc
+                if info.st_ctime > leftover_ts:
+                    continue
+                restored += await _settle_leftover(path)
+                continue
+            if info.st_mtime > cutoff_ts:
+                continue
+            if not await db.blobs.find_one({"_id": path.name}, {"_id": 1}):
+                freed += info.st_size
+                path.unlink(missing_ok=True)
+                orphans += 1
+        for path in _tmp_dir().glob("*.part"):
+            if path.stat().st_mtime <= cutoff_ts:
+                path.unlink(missing_ok=True)
+
+    if removed or orphans:
+        logger.info("🧹 Coleta de blobs: %s removidos, %s órfãos, %s bytes liberados", removed, orphans, freed)
+    return {"removed": removed, "orphans": orphans, "restored": restored, "freed_bytes": freed}
+
+
+async def _settle_leftover(doomed: Path) -> int:
+    """Sobra de coleta interrompida: devolve o blob ainda referenciado, senão apaga (1 se devolvido)"""
+    target = doomed.with_name(doomed.name[:-len(".gc")])
+    referenced = await db.blobs.find_one({"_id": target.name, "refcount": {"$gt": 0}}, {"_id": 1})
+    if referenced and not target.exists():
+        try:
+            os.replace(doomed, target)
+            return 1
+        except FileNotFoundError:
+            return 0
+    doomed.unlink(missing_ok=True)
+    return 0
+
+
+async def stats() -> Dict[str, Any]:
+    rows = await db.blobs.aggregate([
+        {"$group": {
+            "_id": None,
+            "blobs": {"$sum": 1},
+            "stored_bytes": {"$sum": "$size"},
+            "logical_bytes": {"$sum": {"$multiply": ["$size", {"$max": ["$refcount", 0]}]}},
+            "unreferenced": {"$sum": {"$cond": [{"$lte": ["$refcount", 0]}, 1, 0]}}
+        }}
+    ]).to_list(1)
+    row = rows[0] if rows else {"blobs": 0, "stored_bytes": 0, "logical_bytes": 0, "unreferenced": 0}
+    row.pop("_id", None)
+    row["saved_bytes"] = row["logical_bytes"] - row["stored_bytes"]
+    return row
+
+
+class _Collector:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(GC_INTERVAL_SECONDS)
+            try:
+                await collect_garbage()
+            except Exception as e:
+                logger.warning("Erro na coleta de blobs: %s", e)
+
+
+collector = _Collector()
+
+
+def ensure_gc_started():
+    collector.ensure_started()
@@ -8,14 +8,14 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import hashlib
 import json
 
 router = APIRouter(prefix="/api/blockchain", tags=["Blockchain Custody"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class EvidenceBlock(BaseModel):
@@ -0,0 +1,496 @@
+"""
+Parser de Artefatos de Navegadores
+Chrome/Edge (History, Cookies, Login Data) e Firefox (places.sqlite, cookies.sqlite)
+
+Cada banco é copiado para um diretório temporário junto com os arquivos
+-wal/-shm e a cópia é aberta somente leitura, preservando o original; as
+transações ainda não transferidas do WAL para o banco entram na leitura. As linhas são lidas em lotes, os
+timestamps convertidos (WebKit/PRTime) para UTC e gravados em uma coleção
+de linha do tempo indexada. Perfis distintos são processados em paralelo
+em processos separados.
+"""
+
+import os
+import sqlite3
+import tempfile
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from pymongo import MongoClient, InsertOne, ASCENDING
+
+BATCH_SIZE = 5000
+TIMELINE_COLLECTION = "browser_timeline"
+
+# Diferença entre 1601-01-01 (época WebKit/Windows) e 1970-01-01, em microssegundos
+WEBKIT_EPOCH_OFFSET_US = 11644473600 * 1_000_000
+
+# Parâmetros de busca conhecidos (para contagem de pesquisas)
+SEARCH_PARAMS = {"q", "query", "search_query", "p", "text", "wd"}
+
+CHROMIUM_ARTIFACTS = {
+    "History": ["visit", "download"],
+    "Cookies": ["cookie"],
+    "Login Data": ["login"],
+}
+
+FIREFOX_ARTIFACTS = {
+    "places.sqlite": ["visit", "download"],
+    "cookies.sqlite": ["cookie"],
+}
+
+TIMELINE_INDEXES = [
+    [("analysis_id", ASCENDING), ("timestamp", ASCENDING)],
+    [("analysis_id", ASCENDING), ("artifact", ASCENDING), ("timestamp", ASCENDING)],
+    [("analysis_id", ASCENDING), ("domain", ASCENDING)],
+]
+
+
+# ==================== CONVERSÃO DE TEMPO ====================
+
+def webkit_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Converte timestamp WebKit (µs desde 1601-01-01) para datetime UTC"""
+    if not value or value <= WEBKIT_EPOCH_OFFSET_US:
+        return None
+    try:
+        return datetime.fromtimestamp((value - WEBKIT_EPOCH_OFFSET_US) / 1_000_000, tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def prtime_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Converte PRTime do Firefox (µs desde 1970-01-01) para datetime UTC"""
+    if not value or value <= 0:
+        return None
+    try:
+        return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def unix_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Converte segundos Unix para datetime UTC"""
+    if not value or value <= 0:
+        return None
+    try:
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+# ==================== ACESSO AOS BANCOS ====================
+
+def detect_browser(profile_path: str) -> Optional[str]:
+    """Identifica a família do navegador pelo conteúdo do diretório de perfil"""
+    path = Path(profile_path)
+    if (path / "places.sqlite").exists():
+        return "firefox"
+    if (path / "History").exists() or (path / "Cookies").exists() or (path / "Network" / "Cookies").exists():
+        return "chromium"
+    return None
+
+
+def _locate(profile: Path, name: str) -> Optional[Path]:
+    """Localiza o arquivo do banco (Chrome >= 96 guarda Cookies em Network/)"""
+    for candidate in (profile / name, profile / "Network" / name):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _copy_hashed(source: Path, target: Path) -> Tuple[str, int]:
+    """Copia o arquivo em blocos e devolve (sha256, tamanho) do original"""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            sha256.update(chunk)
+            size += len(chunk)
+            dst.write(chunk)
+    return sha256.hexdigest(), size
+
+
+def open_snapshot_copy(source: Path, workdir: str) -> Tuple[sqlite3.Connection, Dict[str, Any]]:
+    """
+    Copia o banco e seus arquivos -wal/-shm para o diretório de trabalho e
+    abre a cópia somente leitura
+
+    Navegadores em execução (ou encerrados sem checkpoint) mantêm as
+    gravações recentes só no WAL; sem ele o histórico mais novo some.
+
+    Returns:
+        Conexão SQLite e metadados de integridade dos arquivos originais
+    """
+    target = Path(workdir) / f"{hashlib.md5(str(source).encode()).hexdigest()}_{source.name}"
+    sha256, size = _copy_hashed(source, target)
+    integrity: Dict[str, Any] = {"file": str(source), "sha256": sha256, "size_bytes": size}
+    for suffix in ("-wal", "-shm"):
+        companion = Path(f"{source}{suffix}")
+        if companion.is_file():
+            companion_sha256, companion_size = _copy_hashed(companion, Path(f"{target}{suffix}"))
+            integrity[suffix.lstrip("-")] = {"sha256": companion_sha256, "size_bytes": companion_size}
+    integrity["wal_replayed"] = integrity.get("wal", {}).get("size_bytes", 0) > 0
+
+    # Sem immutable=1: o SQLite precisa ler o WAL (e reconstruir o índice -shm na cópia)
+    conn = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+    conn.text_factory = lambda b: b.decode("utf-8", errors="replace")
+    return conn, integrity
+
+
+def stream_rows(conn: sqlite3.Connection, query: str, batch_size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Executa a consulta e devolve as linhas em lotes"""
+    cursor = conn.execute(query)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _domain(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if host and host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def _is_search(url: str) -> bool:
+    try:
+        return bool(SEARCH_PARAMS.intersection(parse_qs(urlsplit(url).query).keys()))
+    except ValueError:
+        return False
+
+
+# ==================== EXTRATORES ====================
+
+def _chromium_visits(conn):
+    query = """
+        SELECT visits.visit_time, urls.url, urls.title, visits.transition, urls.visit_count
+        FROM visits JOIN urls ON visits.url = urls.id
+        ORDER BY visits.visit_time
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "visit",
+                "timestamp": webkit_to_datetime(r[0]),
+                "url": r[1],
+                "title": r[2],
+                "domain": _domain(r[1]),
+                "details": {"transition": (r[3] or 0) & 0xFF, "visit_count": r[4]},
+            }
+            for r in rows
+        ]
+
+
+def _chromium_downloads(conn):
+    query = "SELECT start_time, end_time, target_path, tab_url, total_bytes, danger_type FROM downloads"
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "download",
+                "timestamp": webkit_to_datetime(r[0]),
+                "url": r[3],
+                "title": os.path.basename(r[2] or ""),
+                "domain": _domain(r[3]),
+                "details": {
+                    "target_path": r[2],
+                    "end_time": webkit_to_datetime(r[1]),
+                    "total_bytes": r[4],
+                    "danger_type": r[5],
+                },
+            }
+            for r in rows
+        ]
+
+
+def _chromium_cookies(conn):
+    query = """
+        SELECT creation_utc, host_key, name, path, expires_utc, last_access_utc,
+               is_secure, is_httponly, is_persistent
+        FROM cookies
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "cookie",
+                "timestamp": webkit_to_datetime(r[0]),
+                "url": None,
+                "title": r[2],
+                "domain": (r[1] or "").lstrip("."),
+                "details": {
+                    "path": r[3],
+                    "expires": webkit_to_datetime(r[4]),
+                    "last_access": webkit_to_datetime(r[5]),
+                    "secure": bool(r[6]),
+                    "httponly": bool(r[7]),
+                    "persistent": bool(r[8]),
+                },
+            }
+            for r in rows
+        ]
+
+
+def _chromium_logins(conn):
+    # A senha (password_value) é cifrada com DPAPI/Keychain e não é extraída
+    query = """
+        SELECT date_created, origin_url, username_value, date_last_used, times_used
+        FROM logins
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "login",
+                "timestamp": webkit_to_datetime(r[0]),
+                "url": r[1],
+                "title": r[2],
+                "domain": _domain(r[1]),
+                "details": {"last_used": webkit_to_datetime(r[3]), "times_used": r[4]},
+            }
+            for r in rows
+        ]
+
+
+def _firefox_visits(conn):
+    query = """
+        SELECT v.visit_date, p.url, p.title, v.visit_type, p.visit_count
+        FROM moz_historyvisits v JOIN moz_places p ON v.place_id = p.id
+        ORDER BY v.visit_date
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "visit",
+                "timestamp": prtime_to_datetime(r[0]),
+                "url": r[1],
+                "title": r[2],
+                "domain": _domain(r[1]),
+                "details": {"transition": r[3], "visit_count": r[4]},
+            }
+            for r in rows
+        ]
+
+
+def _firefox_downloads(conn):
+    # Firefox >= 26 guarda downloads como anotações em moz_annos
+    query = """
+        SELECT a.dateAdded, p.url, a.content
+        FROM moz_annos a
+        JOIN moz_anno_attributes n ON a.anno_attribute_id = n.id
+        JOIN moz_places p ON a.place_id = p.id
+        WHERE n.name = 'downloads/destinationFileURI'
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "download",
+                "timestamp": prtime_to_datetime(r[0]),
+                "url": r[1],
+                "title": os.path.basename(r[2] or ""),
+                "domain": _domain(r[1]),
+                "details": {"target_path": r[2]},
+            }
+            for r in rows
+        ]
+
+
+def _firefox_cookies(conn):
+    query = """
+        SELECT creationTime, host, name, path, expiry, lastAccessed, isSecure, isHttpOnly
+        FROM moz_cookies
+    """
+    for rows in stream_rows(conn, query):
+        yield [
+            {
+                "artifact": "cookie",
+                "timestamp": prtime_to_datetime(r[0]),
+                "url": None,
+                "title": r[2],
+                "domain": (r[1] or "").lstrip("."),
+                "details": {
+                    "path": r[3],
+                    # Firefox grava expiry em segundos (ms a partir da v. 115)
+                    "expires": unix_to_datetime(r[4] // 1000 if r[4] and r[4] > 10**11 else r[4]),
+                    "last_access": prtime_to_datetime(r[5]),
+                    "secure": bool(r[6]),
+                    "httponly": bool(r[7]),
+                    "persistent": bool(r[4]),
+                },
+            }
+            for r in rows
+        ]
+
+
+EXTRACTORS = {
+    ("chromium", "History"): [_chromium_visits, _chromium_downloads],
+    ("chromium", "Cookies"): [_chromium_cookies],
+    ("chromium", "Login Data"): [_chromium_logins],
+    ("firefox", "places.sqlite"): [_firefox_visits, _firefox_downloads],
+    ("firefox", "cookies.sqlite"): [_firefox_cookies],
+}
+
+
+# ==================== PROCESSAMENTO DE PERFIL ====================
+
+def _new_summary() -> Dict[str, Any]:
+    return {
+        "visits": 0,
+        "downloads": 0,
+        "cookies": 0,
+        "logins": 0,
+        "search_queries": 0,
+        "session_cookies": 0,
+        "persistent_cookies": 0,
+        "secure_cookies": 0,
+        "httponly_cookies": 0,
+        "first_event": None,
+        "last_event": None,
+    }
+
+
+def _accumulate(summary: Dict[str, Any], domains: Counter, events: List[Dict[str, Any]]):
+    for event in events:
+        artifact = event["artifact"]
+        summary[f"{artifact}s"] += 1
+        ts = event["timestamp"]
+        if ts:
+            if summary["first_event"] is None or ts < summary["first_event"]:
+                summary["first_event"] = ts
+            if summary["last_event"] is None or ts > summary["last_event"]:
+                summary["last_event"] = ts
+        if artifact == "visit":
+            if event["domain"]:
+                domains[event["domain"]] += 1
+            if event["url"] and _is_search(event["url"]):
+                summary["search_queries"] += 1
+        elif artifact == "cookie":
+            details = event["details"]
+            summary["persistent_cookies" if details["persistent"] else "session_cookies"] += 1
+            summary["secure_cookies"] += int(details["secure"])
+            summary["httponly_cookies"] += int(details["httponly"])
+
+
+def parse_profile(
+    profile_path: str,
+    analysis_id: str,
+    mongo_url: str,
+    db_name: str,
+    batch_size: int = BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Processa um perfil de navegador e grava os eventos na linha do tempo
+
+    Executado em processo separado: usa um cliente pymongo próprio e
+    insere os eventos lote a lote, sem manter o perfil inteiro em memória.
+
+    Returns:
+        Resumo do perfil (contagens, intervalo de datas, domínios, integridade)
+    """
+    started = datetime.now(timezone.utc)
+    profile = Path(profile_path)
+    browser = detect_browser(profile_path)
+    result: Dict[str, Any] = {"profile_path": profile_path, "browser": browser, "sources": [], "errors": []}
+    if browser is None:
+        result["errors"].append("Nenhum banco de navegador reconhecido no diretório")
+        return result
+
+    artifacts = CHROMIUM_ARTIFACTS if browser == "chromium" else FIREFOX_ARTIFACTS
+    summary = _new_summary()
+    domains: Counter = Counter()
+
+    client = MongoClient(mongo_url)
+    collection = client[db_name][TIMELINE_COLLECTION]
+    try:
+        with tempfile.TemporaryDirectory(prefix="browser_forensics_") as workdir:
+            for db_file in artifacts:
+                source = _locate(profile, db_file)
+                if source is None:
+                    continue
+                conn, integrity = open_snapshot_copy(source, workdir)
+                try:
+                    for extractor in EXTRACTORS[(browser, db_file)]:
+                        try:
+                            for events in extractor(conn):
+                                _accumulate(summary, domains, events)
+                                collection.bulk_write(
+                                    [
+                                        InsertOne({**e, "analysis_id": analysis_id, "profile": profile_path, "browser": browser})
+                                        for e in events
+                                    ],
+                                    ordered=False,
+                                )
+                        except sqlite3.DatabaseError as e:
+                            result["errors"].append(f"{db_file}/{extractor.__name__.lstrip('_')}: {e}")
+                finally:
+                    conn.close()
+                result["sources"].append(integrity)
+    finally:
+        client.close()
+
+    summary["unique_domains"] = len(domains)
+    summary["top_domains"] = [{"domain": d, "visits": c} for d, c in domains.most_common(10)]
+    for key in ("first_event", "last_event"):
+        if summary[key]:
+            summary[key] = summary[key].isoformat()
+    result["summary"] = summary
+    result["elapsed_seconds"] = round((datetime.now(timezone.utc) - started).total_seconds(), 3)
+    return result
+
+
+def parse_profiles(
+    profile_paths: List[str],
+    analysis_id: str,
+    mongo_url: str,
+    db_name: str,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Processa vários perfis em paralelo (um processo por perfil)
+
+    Função síncrona: chamar a partir do event loop via run_in_executor.
+    """
+    client = MongoClient(mongo_url)
+    try:
+        collection = client[db_name][TIMELINE_COLLECTION]
+        for keys in TIMELINE_INDEXES:
+            collection.create_index(keys)
+    finally:
+        client.close()
+
+    workers = max(1, min(len(profile_paths), max_workers or os.cpu_count() or 1))
+    profiles = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_profile, p, analysis_id, mongo_url, db_name) for p in profile_paths]
+        for path, future in zip(profile_paths, futures):
+            # Falha em um perfil (banco corrompido, processo encerrado) não descarta os demais
+            try:
+                profiles.append(future.result())
+            except Exception as e:
+                profiles.append({
+                    "profile_path": path,
+                    "browser": detect_browser(path),
+                    "sources": [],
+                    "errors": [f"{type(e).__name__}: {e}"],
+                })
+
+    totals = Counter()
+    for profile in profiles:
+        for key, value in profile.get("summary", {}).items():
+            if isinstance(value, int):
+                totals[key] += value
+
+    return {
+        "profiles": profiles,
+        "failed_profiles": [p["profile_path"] for p in profiles if "summary" not in p],
+        "totals": dict(totals),
+        "timeline_collection": TIMELINE_COLLECTION,
+    }
@@ -12,14 +12,17 @@ import os
 import uuid
 import jwt
 import random
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+from mongo_registry import get_client
+from browser_artifacts import parse_profiles, TIMELINE_COLLECTION
 
 router = APIRouter(prefix="/api/browser-database-forensics", tags=["browser_database_forensics"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client['ap_elite']
+DB_NAME = 'ap_elite'
+client = get_client(MONGO_URL)
+db = client[DB_NAME]
 
 # Authentication
 async def get_current_user(authorization: str = Header(None)):
@@ -45,6 +48,7 @@ class ForensicsAnalysisCreate(BaseModel):
     tipo_analise: str  # browser, database, network, combined
     target_type: str  # chrome, firefox, safari, mysql, postgresql, mongodb, network_traffic
     profundidade: str = "completa"
+    profile_paths: Optional[List[str]] = None  # diretórios de perfil (análise browser)
 
 @router.get("/stats")
 async def get_stats(authorization: str = Header(None)):
@@ -92,7 +96,15 @@ async def create_analysis(analysis: ForensicsAnalysisCreate, authorization: str
         
         # Gera dados baseados no tipo
         if analysis.tipo_analise == "browser":
-            results = generate_browser_forensics(analysis.target_type)
+            if not analysis.profile_paths:
+                raise HTTPException(status_code=400, detail="Informe profile_paths com os diretórios de perfil do navegador")
+            missing = [p for p in analysis.profile_paths if not os.path.isdir(p)]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Perfis não encontrados: {', '.join(missing)}")
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                None, parse_profiles, analysis.profile_paths, analysis_id, MONGO_URL, DB_NAME
+            )
         elif analysis.tipo_analise == "database":
             results = generate_database_forensics(analysis.target_type)
         elif analysis.tipo_analise == "network":
@@ -122,6 +134,8 @@ async def create_analysis(analysis: ForensicsAnalysisCreate, authorization: str
             "message": f"Análise {analysis.tipo_analise} concluída com sucesso",
             "data": analysis_doc
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -143,6 +157,39 @@ async def get_analysis(analysis_id: str, authorization: str = Header(None)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/analyses/{analysis_id}/timeline")
+async def get_analysis_timeline(
+    analysis_id: str,
+    artifact: Optional[str] = None,
+    domain: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 500,
+    authorization: str = Header(None)
+):
+    """Linha do tempo de artefatos de navegador (visitas, downloads, cookies, logins)"""
+    user = await get_current_user(authorization)
+    
+    try:
+        query: Dict[str, Any] = {"analysis_id": analysis_id}
+        if artifact:
+            query["artifact"] = artifact
+        if domain:
+            query["domain"] = domain
+        if start or end:
+            query["timestamp"] = {}
+            if start:
+                query["timestamp"]["$gte"] = start
+            if end:
+                query["timestamp"]["$lte"] = end
+        
+        limit = max(1, min(limit, 5000))
+        events = await db[TIMELINE_COLLECTION].find(query, {"_id": 0}).sort("timestamp", 1).skip(skip).to_list(limit)
+        return {"analysis_id": analysis_id, "events": events, "count": len(events), "skip": skip, "limit": limit}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/browsers-supported")
 async def get_browsers_supported(authorization: str = Header(None)):
     """Navegadores suportados"""
@@ -341,63 +388,6 @@ async def get_browser_artifacts(browser: str, authorization: str = Header(None))
     return {"browser": browser, "artifacts": artifacts}
 
 # Helper functions
-def generate_browser_forensics(browser: str) -> Dict:
-    """Gera dados forenses de navegador"""
-    
-    history_count = random.randint(500, 5000)
-    cookies_count = random.randint(100, 1000)
-    downloads_count = random.randint(10, 200)
-    
-    return {
-        "browser": browser,
-        "history": {
-            "total_entries": history_count,
-            "unique_domains": random.randint(100, 500),
-            "date_range": {
-                "first_visit": (datetime.now(timezone.utc) - timedelta(days=random.randint(30, 365))).isoformat(),
-                "last_visit": datetime.now(timezone.utc).isoformat()
-            },
-            "top_domains": generate_top_domains(),
-            "search_queries": random.randint(50, 500),
-            "incognito_indicators": random.randint(0, 50)
-        },
-        "cookies": {
-            "total_cookies": cookies_count,
-            "session_cookies": random.randint(50, 200),
-            "persistent_cookies": cookies_count - random.randint(50, 200),
-            "third_party_cookies": random.randint(100, 400),
-            "tracking_cookies": random.randint(20, 100),
-            "authentication_cookies": random.randint(10, 50)
-        },
-        "downloads": {
-            "total_downloads": downloads_count,
-            "file_types": {
-                "documents": random.randint(10, 50),
-                "images": random.randint(20, 100),
-                "executables": random.randint(5, 30),
-                "archives": random.randint(5, 20),
-                "videos": random.randint(0, 20)
-            }
-        },
-        "cache": {
-            "total_size_mb": random.randint(100, 2000),
-            "cached_files": random.randint(1000, 10000),
-            "media_files": random.randint(100, 1000)
-        },
-        "bookmarks": {
-            "total_bookmarks": random.randint(10, 200),
-            "folders": random.randint(3, 20)
-        },
-        "passwords": {
-            "total_saved": random.randint(10, 100),
-            "domains": random.randint(10, 80)
-        },
-        "extensions": {
-            "total_installed": random.randint(3, 30),
-            "enabled": random.randint(3, 25)
-        }
-    }
-
 def generate_database_forensics(database: str) -> Dict:
     """Gera dados forenses de banco de dados"""
     
@@ -474,15 +464,6 @@ def generate_network_forensics() -> Dict:
         }
     }
 
-def generate_top_domains() -> List[str]:
-    """Gera lista de domínios mais visitados"""
-    domains = [
-        "google.com", "facebook.com", "youtube.com", "amazon.com", 
-        "twitter.com", "linkedin.com", "instagram.com", "reddit.com",
-        "github.com", "stackoverflow.com", "wikipedia.org", "netflix.com"
-    ]
-    return random.sample(domains, min(10, len(domains)))
-
 def generate_browser_artifacts(browser: str) -> Dict:
     """Gera artefatos detalhados do navegador"""
     return {
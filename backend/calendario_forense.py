@@ -0,0 +1,417 @@
+"""
+Calendário Forense - Motor de Dias Úteis
+Calendários por tribunal/UF/comarca com feriados nacionais, estaduais,
+forenses (Lei 5.010/66), recesso (Res. CNJ 244/2016) e suspensão de prazos
+(CPC art. 220), pré-computados em somas de prefixo.
+
+Cada calendário cobre ANO_MIN..ANO_MAX em dois vetores cumulativos:
+- util: dias úteis (seg-sex, sem feriado e sem suspensão)
+- contavel: dias contáveis em prazos corridos (sem suspensão)
+
+Assim "dias úteis entre" é O(1) e "somar N dias úteis" é O(log n)
+(busca binária no vetor cumulativo), inclusive em lote com NumPy.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+ANO_MIN = 2000
+ANO_MAX = 2100
+_EPOCH = date(ANO_MIN, 1, 1)
+_TOTAL_DIAS = (date(ANO_MAX, 12, 31) - _EPOCH).days + 1
+
+# ==================== TABELAS DE FERIADOS ====================
+
+FERIADOS_NACIONAIS = {
+    (1, 1): "Confraternização Universal",
+    (4, 21): "Tiradentes",
+    (5, 1): "Dia do Trabalho",
+    (9, 7): "Independência do Brasil",
+    (10, 12): "Nossa Senhora Aparecida",
+    (11, 2): "Finados",
+    (11, 15): "Proclamação da República",
+    (12, 25): "Natal",
+}
+
+# Lei 14.759/2023 - feriado nacional a partir de 2024
+CONSCIENCIA_NEGRA = (11, 20)
+
+# Deslocamento em dias a partir do domingo de Páscoa
+FERIADOS_MOVEIS = {
+    -48: "Carnaval (segunda-feira)",
+    -47: "Carnaval (terça-feira)",
+    -2: "Sexta-feira da Paixão",
+    60: "Corpus Christi",
+}
+
+# Justiça da União - Lei 5.010/66, art. 62
+FERIADOS_UNIAO_FIXOS = {
+    (8, 11): "Dia do Advogado / Criação dos Cursos Jurídicos",
+    (11, 1): "Todos os Santos",
+    (12, 8): "Dia da Justiça",
+}
+FERIADOS_UNIAO_MOVEIS = {
+    -4: "Semana Santa (quarta-feira)",
+    -3: "Semana Santa (quinta-feira)",
+}
+
+FERIADOS_ESTADUAIS = {
+    "AC": {(1, 23): "Dia do Evangélico", (6, 15): "Aniversário do Acre", (9, 5): "Dia da Amazônia", (11, 17): "Tratado de Petrópolis"},
+    "AL": {(6, 24): "São João", (6, 29): "São Pedro", (9, 16): "Emancipação Política", (11, 30): "Dia do Evangélico"},
+    "AP": {(3, 19): "São José", (10, 5): "Criação do Estado"},
+    "AM": {(9, 5): "Elevação do Amazonas a Província"},
+    "BA": {(7, 2): "Independência da Bahia"},
+    "CE": {(3, 19): "São José", (3, 25): "Data Magna do Ceará"},
+    "DF": {(11, 30): "Dia do Evangélico"},
+    "MA": {(7, 28): "Adesão do Maranhão à Independência"},
+    "MS": {(10, 11): "Criação do Estado"},
+    "PA": {(8, 15): "Adesão do Pará à Independência"},
+    "PB": {(8, 5): "Fundação do Estado"},
+    "PE": {(3, 6): "Revolução Pernambucana"},
+    "PI": {(10, 19): "Dia do Piauí"},
+    "PR": {(12, 19): "Emancipação Política"},
+    "RJ": {(4, 23): "São Jorge"},
+    "RN": {(10, 3): "Mártires de Cunhaú e Uruaçu"},
+    "RO": {(1, 4): "Criação do Estado", (6, 18): "Dia do Evangélico"},
+    "RR": {(10, 5): "Criação do Estado"},
+    "RS": {(9, 20): "Revolução Farroupilha"},
+    "SE": {(7, 8): "Emancipação Política"},
+    "SP": {(7, 9): "Revolução Constitucionalista"},
+    "TO": {(3, 18): "Autonomia do Estado", (9, 8): "Nossa Senhora da Natividade", (10, 5): "Criação do Estado"},
+}
+
+# Recesso forense (Res. CNJ 244/2016): 20/12 a 06/01 - sem expediente
+RECESSO_INICIO = (12, 20)
+RECESSO_FIM = (1, 6)
+
+# Suspensão de prazos (CPC art. 220; CPP art. 798-A): 20/12 a 20/01
+SUSPENSAO_INICIO = (12, 20)
+SUSPENSAO_FIM = (1, 20)
+
+UFS = {
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+}
+
+PREFIXOS_UNIAO = ("STF", "STJ", "TST", "TSE", "STM", "TRF", "TRT", "TRE", "JF", "CNJ", "CJF")
+
+
+def pascoa(ano: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = ((h + l - 7 * m + 114) % 31) + 1
+    return date(ano, mes, dia)
+
+
+def _to_date(valor) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).replace("Z", "+00:00")
+    return datetime.fromisoformat(texto).date() if "T" in texto or " " in texto else date.fromisoformat(texto[:10])
+
+
+def classificar_tribunal(tribunal: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Retorna (segmento, uf inferida) a partir da sigla do tribunal (ex.: TJSP, TRF3)"""
+    sigla = (tribunal or "").upper().replace("-", "").replace(" ", "")
+    if sigla.startswith(PREFIXOS_UNIAO):
+        return "uniao", None
+    if sigla.startswith("TJ") and len(sigla) >= 4:
+        uf = sigla[2:4]
+        return "estadual", uf if uf in UFS else None
+    return "estadual", None
+
+
+# ==================== CALENDÁRIO ====================
+
+class Calendario:
+    """Calendário pré-computado de um tribunal/UF/comarca"""
+
+    def __init__(
+        self,
+        tribunal: Optional[str] = None,
+        uf: Optional[str] = None,
+        comarca: Optional[str] = None,
+        excecoes: Iterable[Dict[str, Any]] = (),
+    ):
+        segmento, uf_inferida = classificar_tribunal(tribunal)
+        self.tribunal = (tribunal or "").upper() or None
+        self.uf = (uf or uf_inferida or "").upper() or None
+        self.comarca = comarca
+        self.segmento = segmento
+        self.descricoes: Dict[int, str] = {}
+
+        feriado = np.zeros(_TOTAL_DIAS, dtype=bool)
+        suspenso = np.zeros(_TOTAL_DIAS, dtype=bool)
+
+        def marcar(vetor, inicio: date, fim: date, descricao: str):
+            i = max((inicio - _EPOCH).days, 0)
+            j = min((fim - _EPOCH).days, _TOTAL_DIAS - 1)
+            if i > j:
+                return
+            vetor[i:j + 1] = True
+            for k in range(i, j + 1):
+                self.descricoes.setdefault(k, descricao)
+
+        for ano in range(ANO_MIN - 1, ANO_MAX + 1):
+            if ano >= ANO_MIN:
+                fixos = dict(FERIADOS_NACIONAIS)
+                if ano >= 2024:
+                    fixos[CONSCIENCIA_NEGRA] = "Dia Nacional de Zumbi e da Consciência Negra"
+                if self.segmento == "uniao":
+                    fixos.update(FERIADOS_UNIAO_FIXOS)
+                if self.uf:
+                    fixos.update(FERIADOS_ESTADUAIS.get(self.uf, {}))
+                for (mes, dia), descricao in fixos.items():
+                    d = date(ano, mes, dia)
+                    marcar(feriado, d, d, descricao)
+
+                domingo_pascoa = pascoa(ano)
+                moveis = dict(FERIADOS_MOVEIS)
+                if self.segmento == "uniao":
+                    moveis.update(FERIADOS_UNIAO_MOVEIS)
+                for deslocamento, descricao in moveis.items():
+                    d = domingo_pascoa + timedelta(days=deslocamento)
+                    marcar(feriado, d, d, descricao)
+
+            marcar(feriado, date(ano, *RECESSO_INICIO), date(ano + 1, *RECESSO_FIM), "Recesso forense")
+            marcar(suspenso, date(ano, *SUSPENSAO_INICIO), date(ano + 1, *SUSPENSAO_FIM), "Suspensão de prazos (CPC art. 220)")
+
+        for excecao in excecoes:
+            if not self._aplica(excecao):
+                continue
+            vetor = suspenso if excecao.get("tipo") == "suspensao" else feriado
+            marcar(vetor, _to_date(excecao["data_inicio"]), _to_date(excecao.get("data_fim") or excecao["data_inicio"]),
+                   excecao.get("motivo") or excecao.get("tipo", "feriado"))
+
+        dias_semana = (np.arange(_TOTAL_DIAS) + _EPOCH.weekday()) % 7
+        self.util = (dias_semana < 5) & ~feriado & ~suspenso
+        self.contavel = ~suspenso
+        self.cum_util = np.cumsum(self.util, dtype=np.int32)
+        self.cum_contavel = np.cumsum(self.contavel, dtype=np.int32)
+
+    def _aplica(self, excecao: Dict[str, Any]) -> bool:
+        for campo, valor in (("tribunal", self.tribunal), ("uf", self.uf)):
+            alvo = excecao.get(campo)
+            if alvo and alvo.upper() != (valor or ""):
+                return False
+        alvo = excecao.get("comarca")
+        if alvo and alvo.strip().lower() != (self.comarca or "").strip().lower():
+            return False
+        return True
+
+    # ---------- índices ----------
+
+    @staticmethod
+    def indice(d) -> int:
+        i = (_to_date(d) - _EPOCH).days
+        if not 0 <= i < _TOTAL_DIAS:
+            raise ValueError(f"Data fora do calendário ({ANO_MIN}-{ANO_MAX}): {d}")
+        return i
+
+    @staticmethod
+    def data(i: int) -> date:
+        return _EPOCH + timedelta(days=int(i))
+
+    def _localizar(self, cum: np.ndarray, alvo: int) -> int:
+        if alvo > cum[-1]:
+            raise ValueError(f"Prazo ultrapassa o limite do calendário ({ANO_MAX})")
+        return int(np.searchsorted(cum, alvo, side="left"))
+
+    # ---------- consultas ----------
+
+    def eh_dia_util(self, d) -> bool:
+        return bool(self.util[self.indice(d)])
+
+    def motivo(self, d) -> Optional[str]:
+        i = self.indice(d)
+        if self.util[i]:
+            return None
+        return self.descricoes.get(i) or ("Sábado" if self.data(i).weekday() == 5 else "Domingo")
+
+    def proximo_dia_util(self, d, incluir_dia: bool = True) -> date:
+        """Primeiro dia útil a partir de `d` (ou após `d`, se incluir_dia=False)"""
+        i = self.indice(d)
+        base = self.cum_util[i - 1] if incluir_dia and i > 0 else (0 if incluir_dia else self.cum_util[i])
+        return self.data(self._localizar(self.cum_util, int(base) + 1))
+
+    def dias_uteis_entre(self, inicio, fim) -> int:
+        """Dias úteis no intervalo (inicio, fim] - O(1)"""
+        return int(self.cum_util[self.indice(fim)] - self.cum_util[self.indice(inicio)])
+
+    def somar_dias_uteis(self, inicio, n: int) -> date:
+        """
+        Soma N dias úteis excluindo o dia do começo (CPC arts. 219 e 224)
+        O resultado é sempre dia útil.
+        """
+        if n < 0:
+            return self.subtrair_dias_uteis(inicio, -n)
+        if n == 0:
+            return self.proximo_dia_util(inicio)
+        return self.data(self._localizar(self.cum_util, int(self.cum_util[self.indice(inicio)]) + n))
+
+    def subtrair_dias_uteis(self, fim, n: int) -> date:
+        """Dia útil situado N dias úteis antes de `fim` (alertas D-N)"""
+        i = self.indice(fim)
+        alvo = int(self.cum_util[i]) - n + (0 if self.util[i] else 1)
+        if alvo < 1:
+            raise ValueError(f"Data anterior ao início do calendário ({ANO_MIN})")
+        return self.data(self._localizar(self.cum_util, alvo))
+
+    def somar_dias_corridos(self, inicio, n: int) -> date:
+        """Soma N dias corridos sem contar dias suspensos, prorrogando o termo final para dia útil"""
+        fim = self._localizar(self.cum_contavel, int(self.cum_contavel[self.indice(inicio)]) + n)
+        return self.proximo_dia_util(self.data(fim))
+
+    def dias_nao_uteis(self, inicio, fim) -> List[Dict[str, str]]:
+        """Dias não úteis (exceto fins de semana) no intervalo (inicio, fim]"""
+        i, j = self.indice(inicio) + 1, self.indice(fim) + 1
+        resultado = []
+        for k in np.flatnonzero(~self.util[i:j]) + i:
+            d = self.data(k)
+            if d.weekday() < 5:
+                resultado.append({"data": d.isoformat(), "motivo": self.descricoes.get(int(k), "Suspensão")})
+        return resultado
+
+    # ---------- lote ----------
+
+    def somar_lote(self, inicios: np.ndarray, prazos: np.ndarray, tipo: str = "util") -> np.ndarray:
+        """
+        Vetorizado: recebe índices de início e prazos (int) e retorna
+        índices dos termos finais
+        """
+        if tipo == "util":
+            alvos = self.cum_util[inicios] + prazos
+            if alvos.size and alvos.max() > self.cum_util[-1]:
+                raise ValueError(f"Prazo ultrapassa o limite do calendário ({ANO_MAX})")
+            return np.searchsorted(self.cum_util, alvos, side="left")
+        alvos = self.cum_contavel[inicios] + prazos
+        if alvos.size and alvos.max() > self.cum_contavel[-1]:
+            raise ValueError(f"Prazo ultrapassa o limite do calendário ({ANO_MAX})")
+        fins = np.searchsorted(self.cum_contavel, alvos, side="left")
+        # Prorroga para o primeiro dia útil a partir do termo
+        base = np.where(fins > 0, self.cum_util[np.maximum(fins - 1, 0)], 0)
+        return np.searchsorted(self.cum_util, base + 1, side="left")
+
+
+# ==================== REGISTRO / CACHE ====================
+
+_CALENDARIOS: Dict[Tuple, Calendario] = {}
+_EXCECOES: List[Dict[str, Any]] = []
+_SINCRONIZADO_EM = 0.0
+SINCRONIZACAO_SEGUNDOS = 60
+
+
+def obter_calendario(tribunal: Optional[str] = None, uf: Optional[str] = None, comarca: Optional[str] = None) -> Calendario:
+    """Calendário em cache por (tribunal, uf, comarca)"""
+    chave = ((tribunal or "").upper(), (uf or "").upper(), (comarca or "").strip().lower())
+    calendario = _CALENDARIOS.get(chave)
+    if calendario is None:
+        calendario = Calendario(tribunal, uf, comarca, _EXCECOES)
+        _CALENDARIOS[chave] = calendario
+    return calendario
+
+
+def definir_excecoes(excecoes: List[Dict[str, Any]]):
+    """Substitui feriados locais/suspensões cadastrados e invalida o cache"""
+    global _EXCECOES
+    _EXCECOES = list(excecoes)
+    _CALENDARIOS.clear()
+
+
+async def sincronizar(db, forcar: bool = False):
+    """Recarrega exceções da coleção `calendario_excecoes` (no máximo a cada 60s)"""
+    global _SINCRONIZADO_EM
+    if not forcar and time.monotonic() - _SINCRONIZADO_EM < SINCRONIZACAO_SEGUNDOS:
+        return
+    excecoes = await db.calendario_excecoes.find({}, {"_id": 0}).to_list(10000)
+    _SINCRONIZADO_EM = time.monotonic()
+    if excecoes != _EXCECOES:
+        definir_excecoes(excecoes)
+
+
+# ==================== API DE ALTO NÍVEL ====================
+
+def calcular_prazo(
+    data_inicial,
+    prazo_dias: int,
+    tipo: str = "util",
+    tribunal: Optional[str] = None,
+    uf: Optional[str] = None,
+    comarca: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Calcula o termo final de um prazo em dias úteis ou corridos"""
+    calendario = obter_calendario(tribunal, uf, comarca)
+    inicio = _to_date(data_inicial)
+    if tipo == "util":
+        final = calendario.somar_dias_uteis(inicio, prazo_dias)
+    else:
+        final = calendario.somar_dias_corridos(inicio, prazo_dias)
+    return {
+        "data_inicial": inicio.isoformat(),
+        "data_final": final.isoformat(),
+        "prazo_dias": prazo_dias,
+        "tipo": tipo,
+        "tribunal": calendario.tribunal,
+        "uf": calendario.uf,
+        "dias_corridos_total": (final - inicio).days,
+        "dias_nao_uteis": calendario.dias_nao_uteis(inicio, final),
+    }
+
+
+def calcular_prazos_lote(itens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Calcula milhares de prazos de uma vez, agrupando por calendário e tipo
+    e resolvendo cada grupo com uma única busca binária vetorizada
+    """
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    grupos: Dict[Tuple, List[int]] = {}
+    indices = np.zeros(len(itens), dtype=np.int64)
+    prazos = np.zeros(len(itens), dtype=np.int64)
+
+    for pos, item in enumerate(itens):
+        try:
+            indices[pos] = Calendario.indice(item["data_inicial"])
+            prazos[pos] = int(item["prazo_dias"])
+            if prazos[pos] < 1:
+                raise ValueError("prazo_dias deve ser maior que zero")
+        except (KeyError, ValueError, TypeError) as e:
+            resultados[pos] = {"id": item.get("id"), "erro": str(e)}
+            continue
+        tipo = "util" if item.get("tipo", "util") == "util" else "corrido"
+        chave = (item.get("tribunal"), item.get("uf"), item.get("comarca"), tipo)
+        grupos.setdefault(chave, []).append(pos)
+
+    for (tribunal, uf, comarca, tipo), posicoes in grupos.items():
+        calendario = obter_calendario(tribunal, uf, comarca)
+        sel = np.asarray(posicoes)
+        try:
+            fins = calendario.somar_lote(indices[sel], prazos[sel], tipo)
+        except ValueError as e:
+            for pos in posicoes:
+                resultados[pos] = {"id": itens[pos].get("id"), "erro": str(e)}
+            continue
+        for pos, fim in zip(posicoes, fins.tolist()):
+            resultados[pos] = {
+                "id": itens[pos].get("id"),
+                "data_inicial": Calendario.data(indices[pos]).isoformat(),
+                "data_final": Calendario.data(fim).isoformat(),
+                "prazo_dias": int(prazos[pos]),
+                "tipo": tipo,
+                "tribunal": calendario.tribunal,
+                "uf": calendario.uf,
+            }
+    return resultados
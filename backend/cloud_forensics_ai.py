@@ -11,13 +11,13 @@ from datetime import datetime, timezone
 import os
 import uuid
 import jwt
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 router = APIRouter(prefix="/api/cloud-forensics-ai", tags=["cloud_forensics_ai"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Authentication
@@ -5,16 +5,22 @@ Edição colaborativa, comentários, versionamento, aprovações
 
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 import os
+import asyncio
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 import json
 
+import text_delta
+from realtime_bus import get_bus
+
 router = APIRouter(prefix="/api/collaboration", tags=["Collaboration"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class Document(BaseModel):
@@ -35,8 +41,27 @@ class Approval(BaseModel):
     status: str  # approved, rejected, pending
     comments: Optional[str] = None
 
-# Gerenciar conexões WebSocket
+class DeltaEdit(BaseModel):
+    user_id: str
+    base_version: int
+    operations: List[Union[int, str]]
+
+# Snapshot completo a cada N versões; demais versões guardam apenas o delta
+SNAPSHOT_INTERVAL = int(os.environ.get("COLLAB_SNAPSHOT_INTERVAL", 50))
+MAX_EDIT_RETRIES = 5
+
+# Gerenciar conexões WebSocket (locais a este processo)
 active_connections: Dict[str, List[WebSocket]] = {}
+_subscriptions: Dict[str, Any] = {}
+_indexes_ready = False
+
+async def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    await db.document_deltas.create_index([('document_id', ASCENDING), ('version', ASCENDING)], unique=True)
+    await db.document_snapshots.create_index([('document_id', ASCENDING), ('version', DESCENDING)])
+    _indexes_ready = True
 
 @router.post("/documents/create")
 async def create_document(doc: Document):
@@ -54,8 +79,16 @@ async def create_document(doc: Document):
         'approval_required': False
     }
     
+    doc_data['snapshot_version'] = 1
     result = await db.collaborative_docs.insert_one(doc_data)
     
+    await db.document_snapshots.insert_one({
+        'document_id': str(result.inserted_id),
+        'version': 1,
+        'content': doc.content,
+        'created_at': doc_data['created_at']
+    })
+    
     return {
         'success': True,
         'document_id': str(result.inserted_id),
@@ -64,58 +97,211 @@ async def create_document(doc: Document):
         'edit_url': f'/collaboration/edit/{result.inserted_id}'
     }
 
-@router.post("/documents/{doc_id}/edit")
-async def edit_document(doc_id: str, content: str, user_id: str):
-    """Edita documento (cria nova versão)"""
-    
+def _object_id(doc_id: str):
     from bson import ObjectId
+    from bson.errors import InvalidId
     
     try:
-        doc = await db.collaborative_docs.find_one({'_id': ObjectId(doc_id)})
-        
+        return ObjectId(doc_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="ID de documento inválido")
+
+async def _roll_forward(doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    O delta é gravado antes do documento; se o processo caiu entre as duas
+    escritas, o log tem versões além de doc['version']. Reaplica-as no
+    documento (update condicional pela versão, idempotente entre workers).
+    """
+    pending = await db.document_deltas.find(
+        {'document_id': doc_id, 'version': {'$gt': doc['version']}},
+        {'_id': 0, 'version': 1, 'ops': 1, 'user_id': 1, 'created_at': 1}
+    ).sort('version', ASCENDING).to_list(None)
+    if not pending:
+        return doc
+    
+    content, version, last = doc['content'], doc['version'], None
+    for delta in pending:
+        if delta['version'] != version + 1:
+            break
+        content = text_delta.apply(content, delta['ops'])
+        version, last = delta['version'], delta
+    if last is None:
+        return doc
+    
+    update = {
+        'content': content,
+        'version': version,
+        'last_edited_by': last['user_id'],
+        'last_edited_at': last['created_at']
+    }
+    if not doc.get('snapshot_version'):
+        update['snapshot_version'] = doc['version']
+    await db.collaborative_docs.update_one({'_id': doc['_id'], 'version': doc['version']}, {'$set': update})
+    return {**doc, **update}
+
+async def apply_operations(doc_id: str, user_id: str, base_version: int, operations: List[Union[int, str]]) -> Dict[str, Any]:
+    """
+    Aplica um delta criado sobre `base_version`, transformando-o contra as edições
+    concorrentes já registradas. A inserção do delta com índice único
+    (document_id, version) serializa versões concorrentes; o log de deltas é a
+    fonte da verdade e o documento é adiantado a partir dele quando ficou para trás.
+    """
+    oid = _object_id(doc_id)
+    await ensure_indexes()
+    ops = text_delta.normalize(operations)
+    
+    for attempt in range(MAX_EDIT_RETRIES):
+        if attempt:
+            await asyncio.sleep(0.01 * attempt)
+        doc = await db.collaborative_docs.find_one(
+            {'_id': oid},
+            {'content': 1, 'version': 1, 'snapshot_version': 1}
+        )
         if not doc:
             raise HTTPException(status_code=404, detail="Documento não encontrado")
+        doc = await _roll_forward(doc_id, doc)
         
-        # Criar versão anterior
-        version_backup = {
-            'document_id': doc_id,
-            'version': doc['version'],
-            'content': doc['content'],
-            'saved_by': user_id,
-            'saved_at': datetime.now().isoformat()
-        }
+        version = doc['version']
+        if base_version > version:
+            raise HTTPException(status_code=400, detail="Versão base inexistente")
         
-        await db.document_versions.insert_one(version_backup)
+        transformed = ops
+        if base_version < version:
+            concurrent = await db.document_deltas.find(
+                {'document_id': doc_id, 'version': {'$gt': base_version, '$lte': version}},
+                {'_id': 0, 'ops': 1, 'length_before': 1}
+            ).sort('version', ASCENDING).to_list(None)
+            if len(concurrent) != version - base_version:
+                raise HTTPException(status_code=409, detail="Histórico insuficiente; sincronize o documento")
+            for delta in concurrent:
+                transformed, _ = text_delta.transform(transformed, delta['ops'], delta['length_before'])
         
-        # Atualizar documento
-        new_version = doc['version'] + 1
+        content = doc['content']
+        new_content = text_delta.apply(content, transformed)
+        new_version = version + 1
+        now = datetime.now().isoformat()
         
-        await db.collaborative_docs.update_one(
-            {'_id': ObjectId(doc_id)},
-            {'$set': {
-                'content': content,
+        # Documentos anteriores ao log de deltas: snapshot da versão atual como base
+        if not doc.get('snapshot_version'):
+            await db.document_snapshots.insert_one({
+                'document_id': doc_id, 'version': version, 'content': content, 'created_at': now
+            })
+        
+        try:
+            await db.document_deltas.insert_one({
+                'document_id': doc_id,
                 'version': new_version,
-                'last_edited_by': user_id,
-                'last_edited_at': datetime.now().isoformat()
-            }}
-        )
+                'ops': transformed,
+                'length_before': len(content),
+                'user_id': user_id,
+                'created_at': now
+            })
+        except DuplicateKeyError:
+            continue
+        
+        update = {
+            'content': new_content,
+            'version': new_version,
+            'last_edited_by': user_id,
+            'last_edited_at': now
+        }
+        if new_version % SNAPSHOT_INTERVAL == 0:
+            await db.document_snapshots.insert_one({
+                'document_id': doc_id, 'version': new_version, 'content': new_content, 'created_at': now
+            })
+            update['snapshot_version'] = new_version
+        elif not doc.get('snapshot_version'):
+            update['snapshot_version'] = version
+        
+        await db.collaborative_docs.update_one({'_id': oid, 'version': version}, {'$set': update})
         
-        # Notificar colaboradores conectados
+        # Notificar colaboradores (apenas o delta)
         await broadcast_update(doc_id, {
-            'type': 'document_updated',
+            'type': 'document_delta',
+            'base_version': version,
             'version': new_version,
+            'operations': transformed,
             'user_id': user_id
         })
         
+        return {'version': new_version, 'operations': transformed}
+    
+    raise HTTPException(status_code=409, detail="Conflito de edição; tente novamente")
+
+async def rebuild_version(doc_id: str, version: int) -> Optional[str]:
+    """Reconstrói o conteúdo de uma versão a partir do snapshot anterior + deltas"""
+    snapshot = await db.document_snapshots.find_one(
+        {'document_id': doc_id, 'version': {'$lte': version}},
+        sort=[('version', DESCENDING)]
+    )
+    
+    if not snapshot:
+        # Versões gravadas antes do log de deltas
+        legacy = await db.document_versions.find_one({'document_id': doc_id, 'version': version})
+        return legacy['content'] if legacy else None
+    
+    content = snapshot['content']
+    async for delta in db.document_deltas.find(
+        {'document_id': doc_id, 'version': {'$gt': snapshot['version'], '$lte': version}},
+        {'_id': 0, 'ops': 1}
+    ).sort('version', ASCENDING):
+        content = text_delta.apply(content, delta['ops'])
+    return content
+
+@router.post("/documents/{doc_id}/edit")
+async def edit_document(doc_id: str, content: str, user_id: str):
+    """Edita documento (registra o delta em relação à versão atual)"""
+    
+    from bson import ObjectId
+    
+    try:
+        doc = await db.collaborative_docs.find_one({'_id': ObjectId(doc_id)}, {'content': 1, 'version': 1})
+        
+        if not doc:
+            raise HTTPException(status_code=404, detail="Documento não encontrado")
+        
+        result = await apply_operations(
+            doc_id, user_id, doc['version'], text_delta.diff(doc['content'], content)
+        )
+        
         return {
             'success': True,
             'document_id': doc_id,
-            'version': new_version,
+            'version': result['version'],
             'message': 'Documento atualizado'
         }
-    except:
+    except HTTPException:
+        raise
+    except Exception:
         raise HTTPException(status_code=400, detail="Erro ao editar documento")
 
+@router.post("/documents/{doc_id}/operations")
+async def submit_operations(doc_id: str, edit: DeltaEdit):
+    """Aplica delta (OT) criado sobre base_version; retorna o delta transformado"""
+    try:
+        result = await apply_operations(doc_id, edit.user_id, edit.base_version, edit.operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        'success': True,
+        'document_id': doc_id,
+        **result
+    }
+
+@router.get("/documents/{doc_id}/versions/{version}")
+async def get_version_content(doc_id: str, version: int):
+    """Conteúdo de uma versão específica (reconstruído a partir dos deltas)"""
+    content = await rebuild_version(doc_id, version)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Versão não encontrada")
+    
+    return {
+        'document_id': doc_id,
+        'version': version,
+        'content': content
+    }
+
 @router.post("/comments/add")
 async def add_comment(comment: Comment):
     """Adiciona comentário ao documento"""
@@ -244,11 +430,25 @@ async def respond_approval(approval: Approval):
 async def get_versions(doc_id: str):
     """Lista versões do documento"""
     
-    cursor = db.document_versions.find({'document_id': doc_id}).sort('version', -1)
-    versions = await cursor.to_list(length=50)
+    cursor = db.document_deltas.find(
+        {'document_id': doc_id},
+        {'_id': 0, 'version': 1, 'user_id': 1, 'created_at': 1, 'length_before': 1}
+    ).sort('version', -1)
+    versions = [
+        {
+            'version': delta['version'],
+            'saved_by': delta['user_id'],
+            'saved_at': delta['created_at']
+        }
+        for delta in await cursor.to_list(length=50)
+    ]
     
-    for version in versions:
-        version['id'] = str(version.pop('_id'))
+    # Versões completas gravadas antes do log de deltas
+    if len(versions) < 50:
+        legacy = db.document_versions.find({'document_id': doc_id}, {'content': 0}).sort('version', -1)
+        for version in await legacy.to_list(length=50 - len(versions)):
+            version['id'] = str(version.pop('_id'))
+            versions.append(version)
     
     return {
         'document_id': doc_id,
@@ -256,36 +456,85 @@ async def get_versions(doc_id: str):
         'total': len(versions)
     }
 
+async def _deliver_local(doc_id: str, message: Dict[str, Any]):
+    """Entrega mensagem do barramento às conexões deste processo"""
+    connections = list(active_connections.get(doc_id, ()))
+    if not connections:
+        return
+    results = await asyncio.gather(
+        *(asyncio.wait_for(connection.send_json(message), timeout=5) for connection in connections),
+        return_exceptions=True
+    )
+    for connection, result in zip(connections, results):
+        if isinstance(result, Exception) and connection in active_connections.get(doc_id, []):
+            active_connections[doc_id].remove(connection)
+
 async def broadcast_update(doc_id: str, message: Dict[str, Any]):
-    """Envia atualização para todos os conectados"""
-    if doc_id in active_connections:
-        for connection in active_connections[doc_id]:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+    """Envia atualização para todos os conectados (em qualquer worker)"""
+    await get_bus().publish(f"collab:{doc_id}", message)
+
+async def _register_connection(doc_id: str, websocket: WebSocket):
+    active_connections.setdefault(doc_id, []).append(websocket)
+    if doc_id not in _subscriptions:
+        async def handler(message: Dict[str, Any]):
+            await _deliver_local(doc_id, message)
+        _subscriptions[doc_id] = handler
+        await get_bus().subscribe(f"collab:{doc_id}", handler)
+
+async def _unregister_connection(doc_id: str, websocket: WebSocket):
+    connections = active_connections.get(doc_id, [])
+    if websocket in connections:
+        connections.remove(websocket)
+    if not connections:
+        active_connections.pop(doc_id, None)
+        handler = _subscriptions.pop(doc_id, None)
+        if handler:
+            await get_bus().unsubscribe(f"collab:{doc_id}", handler)
 
 @router.websocket("/ws/{doc_id}")
 async def websocket_endpoint(websocket: WebSocket, doc_id: str):
-    """WebSocket para colaboração em tempo real"""
+    """
+    WebSocket para colaboração em tempo real.
+    Mensagens {"type": "operations", "base_version", "operations", "user_id"} são
+    aplicadas como delta; demais mensagens são repassadas como movimento de cursor.
+    """
     
     await websocket.accept()
-    
-    if doc_id not in active_connections:
-        active_connections[doc_id] = []
-    
-    active_connections[doc_id].append(websocket)
+    await _register_connection(doc_id, websocket)
     
     try:
         while True:
             data = await websocket.receive_text()
+            
+            try:
+                payload = json.loads(data)
+            except ValueError:
+                payload = None
+            
+            if isinstance(payload, dict) and payload.get('type') == 'operations':
+                try:
+                    result = await apply_operations(
+                        doc_id,
+                        payload.get('user_id', ''),
+                        int(payload['base_version']),
+                        payload['operations']
+                    )
+                    await websocket.send_json({'type': 'ack', **result})
+                except HTTPException as e:
+                    await websocket.send_json({'type': 'error', 'status': e.status_code, 'detail': e.detail})
+                except (KeyError, ValueError) as e:
+                    await websocket.send_json({'type': 'error', 'status': 400, 'detail': str(e)})
+                continue
+            
             # Broadcast para outros usuários
             await broadcast_update(doc_id, {
                 'type': 'cursor_move',
                 'data': data
             })
     except WebSocketDisconnect:
-        active_connections[doc_id].remove(websocket)
+        pass
+    finally:
+        await _unregister_connection(doc_id, websocket)
 
 @router.get("/statistics")
 async def collaboration_statistics():
@@ -300,6 +549,7 @@ async def collaboration_statistics():
         'total_comments': total_comments,
         'pending_approvals': pending_approvals,
         'active_connections': sum(len(conns) for conns in active_connections.values()),
+        'realtime_bus': get_bus().name,
         'features': [
             'Real-time editing',
             'Version control',
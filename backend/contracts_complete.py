@@ -8,7 +8,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime, timezone
 import uuid
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import os
 
 # Router
@@ -16,7 +16,7 @@ contracts_router = APIRouter(prefix="/api/athena/contracts", tags=["Contracts"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # Models
@@ -0,0 +1,390 @@
+"""
+Motor de Correção Monetária
+Séries históricas mensais (IPCA, INPC, SELIC, TR) carregadas de arquivo local
+em vetores NumPy com tabela de produto acumulado.
+
+O fator de correção entre dois meses é a razão F[fim] / F[inicio] - O(1) -
+e a correção de milhares de parcelas é feita de uma vez por indexação vetorizada.
+
+Fonte dos dados: SGS/Banco Central (atualização via `python correcao_monetaria.py`
+ou POST /api/calculus/indices/atualizar). As séries baixadas/importadas são gravadas
+em INDICES_ECONOMICOS_PATH (fora do código); o arquivo em data/ é apenas a semente
+inicial. Cada worker relê o arquivo quando o mtime muda, então uma atualização feita
+em um processo vale para todos.
+
+Por padrão (exigir_serie=True) o cálculo é recusado quando o período não está
+inteiramente coberto pela série histórica. Só com exigir_serie=False os meses sem
+dado usam a taxa de referência fixa do índice (estimativa); o resultado traz
+"cobertura" ("completa", "parcial" ou "nenhuma").
+"""
+
+import os
+import json
+import asyncio
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Semente versionada (somente leitura) e arquivo gravável com as séries atualizadas
+DATA_PATH = Path(__file__).parent / "data" / "indices_economicos.json"
+SERIES_PATH = Path(os.environ.get("INDICES_ECONOMICOS_PATH", "/app/backend/uploads/indices/indices_economicos.json"))
+
+# Códigos das séries mensais no SGS/BCB
+SERIES_SGS = {
+    "IPCA": 433,
+    "INPC": 188,
+    "SELIC": 4390,
+    "TR": 7811,
+}
+
+# Taxas mensais de referência para meses sem série carregada
+TAXAS_REFERENCIA = {
+    "IPCA": 0.004,
+    "INPC": 0.004,
+    "SELIC": 0.0091,
+    "TR": 0.0,
+}
+
+# Tabela cobre de jul/1994 (Plano Real) a dez/2100
+MES_BASE = 1994 * 12 + 6
+MES_LIMITE = 2100 * 12 + 11
+TOTAL_MESES = MES_LIMITE - MES_BASE + 1
+
+SGS_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados?formato=json&dataInicial=01/07/1994"
+
+
+def indice_mes(valor) -> int:
+    """Converte data/ISO/"AAAA-MM" no índice do mês na tabela"""
+    if isinstance(valor, (datetime, date)):
+        ano, mes = valor.year, valor.month
+    else:
+        texto = str(valor)
+        ano, mes = int(texto[0:4]), int(texto[5:7])
+    i = ano * 12 + (mes - 1) - MES_BASE
+    if not 0 <= i < TOTAL_MESES:
+        raise ValueError(f"Data fora da tabela de índices (07/1994 a 12/2100): {valor}")
+    return i
+
+
+def mes_iso(i: int) -> str:
+    ano, mes = divmod(MES_BASE + int(i), 12)
+    return f"{ano:04d}-{mes + 1:02d}"
+
+
+class SerieIndice:
+    """Série mensal de um índice com produto acumulado pré-computado"""
+
+    def __init__(self, nome: str, inicio: Optional[str], valores: List[float]):
+        self.nome = nome
+        taxas = np.full(TOTAL_MESES, TAXAS_REFERENCIA.get(nome, 0.0), dtype=np.float64)
+        coberto = np.zeros(TOTAL_MESES, dtype=bool)
+        if inicio and valores:
+            i = indice_mes(inicio)
+            n = min(len(valores), TOTAL_MESES - i)
+            taxas[i:i + n] = np.asarray(valores[:n], dtype=np.float64) / 100.0
+            coberto[i:i + n] = True
+        self.inicio = mes_iso(int(np.argmax(coberto))) if coberto.any() else None
+        self.fim = mes_iso(TOTAL_MESES - 1 - int(np.argmax(coberto[::-1]))) if coberto.any() else None
+        self.taxas = taxas
+        # F[k] = produto de (1 + taxa) dos meses anteriores a k
+        self.fator = np.concatenate(([1.0], np.cumprod(1.0 + taxas)))
+        # Contagem acumulada de meses cobertos pela série (verificação O(1))
+        self.cobertura = np.concatenate(([0], np.cumsum(coberto, dtype=np.int64)))
+
+    def fator_periodo(self, inicio: int, fim: int) -> float:
+        return float(self.fator[fim] / self.fator[inicio])
+
+    def meses_cobertos(self, inicio: int, fim: int) -> int:
+        return int(self.cobertura[fim] - self.cobertura[inicio])
+
+    def fonte(self, inicio: int, fim: int) -> str:
+        meses = fim - inicio
+        cobertos = self.meses_cobertos(inicio, fim)
+        if meses <= 0 or cobertos == meses:
+            return "serie_historica"
+        return "taxa_referencia" if cobertos == 0 else "mista"
+
+    def exigir_cobertura(self, inicio: int, fim: int):
+        """Recusa períodos que dependam da taxa de referência"""
+        if self.meses_cobertos(inicio, fim) < fim - inicio:
+            faixa = f"{self.inicio} a {self.fim}" if self.inicio else "nenhum mês carregado"
+            raise ValueError(
+                f"Série {self.nome} não cobre o período {mes_iso(inicio)} a {mes_iso(fim)} "
+                f"(série carregada: {faixa}). Atualize via /api/calculus/indices/atualizar"
+            )
+
+
+def cobertura(meses: int, cobertos: int) -> str:
+    if cobertos >= meses:
+        return "completa"
+    return "nenhuma" if cobertos == 0 else "parcial"
+
+
+_SERIES: Dict[str, SerieIndice] = {}
+_ATUALIZADO_EM: Optional[str] = None
+_ORIGEM: Optional[Tuple[str, int]] = None
+_LOCK = threading.Lock()
+
+
+def _arquivo_series() -> Tuple[Path, int]:
+    """Arquivo vigente (atualizado, se existir, senão a semente) e seu mtime"""
+    for caminho in (SERIES_PATH, DATA_PATH):
+        try:
+            return caminho, caminho.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+    return DATA_PATH, 0
+
+
+def _ler_arquivo(caminho: Path) -> Dict[str, Any]:
+    if not caminho.exists():
+        return {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def carregar_series(caminho: Optional[Path] = None):
+    """(Re)carrega as séries do arquivo vigente e limpa a memoização"""
+    global _SERIES, _ATUALIZADO_EM, _ORIGEM
+    if caminho is None:
+        caminho, mtime = _arquivo_series()
+    else:
+        mtime = caminho.stat().st_mtime_ns if caminho.exists() else 0
+    dados = _ler_arquivo(caminho)
+    series = {}
+    for nome in SERIES_SGS:
+        serie = dados.get("series", {}).get(nome, {})
+        series[nome] = SerieIndice(nome, serie.get("inicio"), serie.get("valores", []))
+    with _LOCK:
+        _SERIES = series
+        _ATUALIZADO_EM = dados.get("atualizado_em")
+        _ORIGEM = (str(caminho), mtime)
+        fator_correcao.cache_clear()
+
+
+def _verificar_atualizacao():
+    """Recarrega se outro processo gravou o arquivo desde a última leitura"""
+    caminho, mtime = _arquivo_series()
+    if not _SERIES or _ORIGEM != (str(caminho), mtime):
+        carregar_series(caminho)
+
+
+def obter_serie(indice: str) -> SerieIndice:
+    _verificar_atualizacao()
+    serie = _SERIES.get((indice or "").upper())
+    if serie is None:
+        raise ValueError(f"Índice não suportado: {indice}. Disponíveis: {', '.join(SERIES_SGS)}")
+    return serie
+
+
+@lru_cache(maxsize=65536)
+def fator_correcao(indice: str, mes_inicio: int, mes_fim: int) -> Tuple[float, str]:
+    """
+    Fator de correção e fonte, memoizados por (índice, início, fim).
+    A memoização é limpa em carregar_series; chame obter_serie antes
+    para que uma atualização feita por outro worker seja percebida.
+    """
+    serie = _SERIES[indice]
+    return serie.fator_periodo(mes_inicio, mes_fim), serie.fonte(mes_inicio, mes_fim)
+
+
+def salvar_serie(indice: str, pontos: List[Dict[str, Any]], caminho: Optional[Path] = None):
+    """
+    Grava/mescla pontos mensais ({"mes": "AAAA-MM", "valor": percentual})
+    no arquivo de séries e recarrega a tabela
+    """
+    indice = indice.upper()
+    if indice not in SERIES_SGS:
+        raise ValueError(f"Índice não suportado: {indice}")
+    caminho = caminho or SERIES_PATH
+    # Na primeira gravação parte da semente versionada
+    dados = _ler_arquivo(caminho if caminho.exists() else _arquivo_series()[0])
+    series = dados.setdefault("series", {})
+    atual = series.get(indice, {})
+    mapa = {}
+    if atual.get("inicio"):
+        base = indice_mes(atual["inicio"])
+        mapa = {base + k: v for k, v in enumerate(atual.get("valores", []))}
+    for ponto in pontos:
+        mapa[indice_mes(ponto["mes"])] = float(ponto["valor"])
+    if mapa:
+        inicio, fim = min(mapa), max(mapa)
+        faltantes = [mes_iso(k) for k in range(inicio, fim + 1) if k not in mapa]
+        if faltantes:
+            raise ValueError(f"Série {indice} com meses faltantes: {', '.join(faltantes[:12])}")
+        series[indice] = {
+            "sgs": SERIES_SGS[indice],
+            "inicio": mes_iso(inicio),
+            "valores": [mapa[k] for k in range(inicio, fim + 1)],
+        }
+    dados["atualizado_em"] = datetime.now().isoformat()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    # Escrita atômica: os demais workers nunca leem um arquivo pela metade
+    temporario = caminho.with_name(f".{caminho.name}.{os.getpid()}.tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    carregar_series(caminho)
+
+
+async def atualizar_series(indices: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Baixa as séries do SGS/BCB e atualiza o arquivo local"""
+    import httpx
+
+    resumo = {}
+    async with httpx.AsyncClient(timeout=60) as http:
+        for nome in indices or list(SERIES_SGS):
+            resposta = await http.get(SGS_URL.format(codigo=SERIES_SGS[nome]))
+            resposta.raise_for_status()
+            pontos = []
+            for item in resposta.json():
+                dia, mes, ano = item["data"].split("/")
+                pontos.append({"mes": f"{ano}-{mes}", "valor": float(item["valor"])})
+            await asyncio.to_thread(salvar_serie, nome, pontos)
+            resumo[nome] = len(pontos)
+    return resumo
+
+
+def status_series() -> Dict[str, Any]:
+    _verificar_atualizacao()
+    return {
+        "atualizado_em": _ATUALIZADO_EM,
+        "arquivo": _ORIGEM[0] if _ORIGEM else None,
+        "series": {
+            nome: {"sgs": SERIES_SGS[nome], "inicio": s.inicio, "fim": s.fim, "taxa_referencia": TAXAS_REFERENCIA[nome]}
+            for nome, s in _SERIES.items()
+        },
+        "memoizacao": fator_correcao.cache_info()._asdict(),
+    }
+
+
+# ==================== CÁLCULOS ====================
+
+def corrigir_valor(
+    valor: float,
+    indice: str,
+    data_inicial,
+    data_final,
+    juros_mensal: float = 0.0,
+    exigir_serie: bool = True,
+) -> Dict[str, Any]:
+    """Correção de um valor entre duas datas + juros simples sobre o valor corrigido"""
+    inicio, fim = indice_mes(data_inicial), indice_mes(data_final)
+    if fim < inicio:
+        raise ValueError("Data final anterior à data inicial")
+    serie = obter_serie(indice)
+    if exigir_serie:
+        serie.exigir_cobertura(inicio, fim)
+    fator, fonte = fator_correcao(serie.nome, inicio, fim)
+    meses = fim - inicio
+    cobertos = serie.meses_cobertos(inicio, fim)
+    valor_corrigido = valor * fator
+    juros = valor_corrigido * juros_mensal * meses
+    return {
+        "indice": indice.upper(),
+        "meses": meses,
+        "fator": round(fator, 8),
+        "valor_corrigido": round(valor_corrigido, 2),
+        "juros": round(juros, 2),
+        "valor_total": round(valor_corrigido + juros, 2),
+        "fonte_indice": fonte,
+        "cobertura": cobertura(meses, cobertos),
+        "meses_serie_historica": cobertos,
+    }
+
+
+def corrigir_parcelas(
+    parcelas: List[Dict[str, Any]],
+    indice: str,
+    data_final,
+    juros_mensal: float = 0.0,
+    multa_percentual: float = 0.0,
+    exigir_serie: bool = True,
+) -> Dict[str, Any]:
+    """
+    Corrige lote de parcelas ({"valor", "vencimento"}) até data_final
+    com uma única operação vetorizada sobre a tabela de fatores
+    """
+    serie = obter_serie(indice)
+    fim = indice_mes(data_final)
+    valores = np.array([float(p["valor"]) for p in parcelas], dtype=np.float64)
+    inicios = np.array([indice_mes(p["vencimento"]) for p in parcelas], dtype=np.int64)
+    if inicios.size and inicios.max() > fim:
+        raise ValueError("Há parcelas com vencimento posterior à data final")
+    if exigir_serie and inicios.size:
+        serie.exigir_cobertura(int(inicios.min()), fim)
+
+    fatores = serie.fator[fim] / serie.fator[inicios]
+    meses = fim - inicios
+    corrigidos = valores * fatores
+    juros = corrigidos * juros_mensal * meses
+    multas = np.where(meses > 0, corrigidos * multa_percentual / 100.0, 0.0)
+    totais = corrigidos + juros + multas
+    cobertos = serie.cobertura[fim] - serie.cobertura[inicios]
+
+    itens = []
+    for k, parcela in enumerate(parcelas):
+        fonte = "serie_historica" if cobertos[k] == meses[k] else ("taxa_referencia" if cobertos[k] == 0 else "mista")
+        itens.append({
+            "id": parcela.get("id"),
+            "vencimento": str(parcela["vencimento"]),
+            "valor_original": round(float(valores[k]), 2),
+            "meses": int(meses[k]),
+            "fator": round(float(fatores[k]), 8),
+            "valor_corrigido": round(float(corrigidos[k]), 2),
+            "juros": round(float(juros[k]), 2),
+            "multa": round(float(multas[k]), 2),
+            "valor_total": round(float(totais[k]), 2),
+            "fonte_indice": fonte,
+            "cobertura": cobertura(int(meses[k]), int(cobertos[k])),
+        })
+
+    return {
+        "indice": serie.nome,
+        "data_final": str(data_final),
+        "total_parcelas": len(itens),
+        "soma_original": round(float(valores.sum()), 2),
+        "soma_corrigida": round(float(corrigidos.sum()), 2),
+        "soma_juros": round(float(juros.sum()), 2),
+        "soma_multas": round(float(multas.sum()), 2),
+        "soma_total": round(float(totais.sum()), 2),
+        "cobertura": cobertura(int(meses.sum()), int(cobertos.sum())),
+        "parcelas": itens,
+    }
+
+
+def saldo_depositos_mensais(
+    deposito: float,
+    inicio,
+    fim,
+    indice: str = "TR",
+    juros_mensal: float = 0.0,
+    exigir_serie: bool = True,
+) -> Dict[str, Any]:
+    """
+    Saldo de depósitos mensais iguais corrigidos até `fim`
+    (ex.: FGTS = TR + 3% a.a. capitalizados mensalmente)
+    """
+    serie = obter_serie(indice)
+    i, j = indice_mes(inicio), indice_mes(fim)
+    if j < i:
+        raise ValueError("Data final anterior à data inicial")
+    if exigir_serie:
+        serie.exigir_cobertura(i, j)
+    meses = np.arange(i, j + 1)
+    fatores = (serie.fator[j] / serie.fator[meses]) * (1.0 + juros_mensal) ** (j - meses)
+    return {
+        "depositos": int(meses.size),
+        "total_depositado": round(deposito * meses.size, 2),
+        "saldo_corrigido": round(float(deposito * fatores.sum()), 2),
+        "fonte_indice": serie.fonte(i, j),
+        "cobertura": cobertura(j - i, serie.meses_cobertos(i, j)),
+    }
+
+
+if __name__ == "__main__":
+    print(asyncio.run(atualizar_series()))
@@ -1,6 +1,6 @@
 import asyncio
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 import uuid
 from dotenv import load_dotenv
@@ -12,7 +12,7 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 async def create_default_users():
@@ -0,0 +1,449 @@
+"""
+Rollups do Dashboard Executivo
+Contadores pré-agregados por dia (e por mês, somando os dias) na coleção
+dashboard_rollups, mais um documento de totais correntes (gauges). Qualquer
+período e sua comparação saem da soma de poucas dezenas de buckets:
+dias soltos nas pontas + meses inteiros no meio.
+
+Atualização incremental: cada escrita marca os dias afetados da coleção
+(notify_write, change streams quando o MongoDB é replica set, e as mudanças
+de prazos já publicadas pelo alert_scheduler) e o bucket do dia é
+recalculado a partir da coleção de origem — idempotente, sem contagem dupla.
+Uma reconciliação periódica recalcula hoje/ontem e os totais; a
+reconstrução completa roda uma vez por dia.
+"""
+
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, date, timezone, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from mongo_registry import get_client
+
+import alert_scheduler
+from realtime_bus import get_bus
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "test_database")
+client = get_client(MONGO_URL)
+db = client[DB_NAME]
+
+ROLLUPS_COLLECTION = "dashboard_rollups"
+CHANGES_CHANNEL = "dashboard:rollups"
+RECONCILE_SECONDS = int(os.environ.get("DASHBOARD_ROLLUP_RECONCILE_SECONDS", 300))
+FULL_REBUILD_SECONDS = int(os.environ.get("DASHBOARD_ROLLUP_FULL_REBUILD_SECONDS", 86400))
+FLUSH_DELAY = 0.5
+
+PERIOD_DAYS = {"week": 7, "month": 30, "quarter": 90, "year": 365}
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    collection: str
+    date_field: str
+    match: Dict[str, Any] = field(default_factory=dict)
+    sum_field: Optional[str] = None  # None: contagem
+
+
+METRICS: List[Metric] = [
+    Metric("revenue", "financial_records", "date", {"type": "income"}, "amount"),
+    Metric("expenses", "financial_records", "date", {"type": "expense"}, "amount"),
+    Metric("cases_new", "cases", "created_at"),
+    Metric("cases_completed", "cases", "updated_at", {"status": "completed"}),
+    Metric("clients_new", "clients", "created_at"),
+    Metric("deadlines_completed", "deadlines", "updated_at", {"completed": True}),
+    Metric("deadlines_open", "deadlines", "deadline", {"completed": False}),
+    Metric("documents_received", "documents", "created_at", {"status": "received"}),
+    Metric("documents_sent", "documents", "created_at", {"status": "sent"}),
+    Metric("payments_received", "payments", "created_at", {"status": "received"}, "amount"),
+    Metric("payments_pending", "payments", "created_at", {"status": "pending"}, "amount"),
+    Metric("payments_overdue", "payments", "created_at", {"status": "overdue"}, "amount"),
+    Metric("interceptions_new", "phone_interceptions", "created_at"),
+    Metric("evidence_new", "evidence", "created_at"),
+]
+
+# Totais correntes, recalculados quando a coleção muda (não por leitura)
+GAUGES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "cases_total": ("cases", {}),
+    "cases_active": ("cases", {"status": "active"}),
+    "clients_total": ("clients", {}),
+    "clients_active": ("clients", {"status": "active"}),
+    "deadlines_open_total": ("deadlines", {"completed": False}),
+    "documents_pending": ("documents", {"status": "pending"}),
+    "interceptions_total": ("phone_interceptions", {}),
+    "interceptions_critical": ("phone_interceptions", {"relevance": "critical"}),
+    "interceptions_analyzed": ("phone_interceptions", {"transcription": {"$nin": [None, ""]}}),
+    "evidence_total": ("evidence", {}),
+}
+
+COLLECTIONS = sorted({m.collection for m in METRICS} | {c for c, _ in GAUGES.values()})
+
+# Coleções de origem gravadas fora de DB_NAME (athena_enhanced_apis usa ap_elite)
+SOURCE_DATABASES: Dict[str, str] = {
+    "phone_interceptions": "ap_elite",
+}
+
+
+def source(collection: str):
+    """Coleção de origem no banco em que ela é gravada"""
+    return client[SOURCE_DATABASES.get(collection, DB_NAME)][collection]
+
+
+# ==================== DATAS E BUCKETS ====================
+
+def day_of(value) -> Optional[str]:
+    """'YYYY-MM-DD' de um datetime ou string ISO"""
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc)
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        return value[:10]
+    return None
+
+
+def day_id(day: str) -> str:
+    return f"d:{day}"
+
+
+def month_id(month: str) -> str:
+    return f"m:{month}"
+
+
+def bucket_ids(start: date, end: date) -> List[str]:
+    """Buckets que cobrem [start, end]: dias nas pontas, meses inteiros no meio"""
+    ids = []
+    current = start
+    while current <= end:
+        first_of_next = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if current.day == 1 and first_of_next - timedelta(days=1) <= end:
+            ids.append(month_id(current.strftime("%Y-%m")))
+            current = first_of_next
+        else:
+            ids.append(day_id(current.isoformat()))
+            current += timedelta(days=1)
+    return ids
+
+
+def _day_expression(field_name: str) -> Dict[str, Any]:
+    # $toString de BSON date gera ISO em UTC; strings ISO passam inalteradas
+    return {"$substrCP": [{"$toString": {"$ifNull": [f"${field_name}", ""]}}, 0, 10]}
+
+
+def _range_filter(field_name: str, days: Iterable[str]) -> Dict[str, Any]:
+    """Filtro dos dias em faixas contíguas, para datas em string ISO ou BSON date"""
+    ordered = sorted(days)
+    ranges: List[List[date]] = []
+    for day in ordered:
+        current = date.fromisoformat(day)
+        if ranges and ranges[-1][1] + timedelta(days=1) == current:
+            ranges[-1][1] = current
+        else:
+            ranges.append([current, current])
+    clauses = []
+    for first, last in ranges:
+        after = last + timedelta(days=1)
+        clauses.append({field_name: {"$gte": first.isoformat(), "$lt": after.isoformat()}})
+        clauses.append({field_name: {
+            "$gte": datetime.combine(first, datetime.min.time(), timezone.utc),
+            "$lt": datetime.combine(after, datetime.min.time(), timezone.utc)
+        }})
+    return {"$or": clauses}
+
+
+def _metric_value(metric: Metric) -> Dict[str, Any]:
+    value: Any = {"$ifNull": [f"${metric.sum_field}", 0]} if metric.sum_field else 1
+    if not metric.match:
+        return {"$sum": value}
+    condition = {"$and": [{"$eq": [f"${k}", v]} for k, v in metric.match.items()]}
+    return {"$sum": {"$cond": [condition, value, 0]}}
+
+
+# ==================== MOTOR DE ROLLUPS ====================
+
+class RollupEngine:
+    def __init__(self):
+        self._dirty: Dict[str, Set[str]] = defaultdict(set)
+        self._dirty_gauges: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self.change_streams = False
+        self.built_at: Optional[datetime] = None
+        self.updated_at: Optional[datetime] = None
+
+    # ---------- Marcação ----------
+
+    def mark(self, collection: str, days: Iterable[str] = ()):
+        if collection not in COLLECTIONS:
+            return
+        self._dirty[collection].update(d for d in days if d)
+        self._dirty_gauges.add(collection)
+        self._wake.set()
+
+    def mark_document(self, collection: str, doc: Optional[Dict[str, Any]]):
+        days = []
+        if doc:
+            days = [day_of(doc.get(m.date_field)) for m in METRICS if m.collection == collection]
+        self.mark(collection, days)
+
+    # ---------- Recalculo ----------
+
+    async def _recompute(self, collection: str, days: Optional[Set[str]] = None):
+        """Recalcula os buckets diários da coleção (todos os dias se days=None)"""
+        by_field: Dict[str, List[Metric]] = defaultdict(list)
+        for metric in METRICS:
+            if metric.collection == collection:
+                by_field[metric.date_field].append(metric)
+        if not by_field:
+            return set()
+
+        rollups = db[ROLLUPS_COLLECTION]
+        values: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        names = [m.name for metrics in by_field.values() for m in metrics]
+        for field_name, metrics in by_field.items():
+            pipeline: List[Dict[str, Any]] = []
+            if days is not None:
+                pipeline.append({"$match": _range_filter(field_name, days)})
+            pipeline.append({"$group": {
+                "_id": _day_expression(field_name),
+                **{m.name: _metric_value(m) for m in metrics}
+            }})
+            async for row in source(collection).aggregate(pipeline):
+                day = row.pop("_id")
+                if day and day_of(day) == day:
+                    values[day].update(row)
+
+        if days is None:
+            # Reconstrução: zera os dias que não aparecem mais na origem
+            await rollups.update_many(
+                {"granularity": "day", "day": {"$nin": list(values)}},
+                {"$set": {name: 0 for name in names}}
+            )
+        touched = set(values) | set(days or ())
+        now = datetime.now(timezone.utc)
+        for day in touched:
+            counters = {name: values.get(day, {}).get(name, 0) for name in names}
+            await rollups.update_one(
+                {"_id": day_id(day)},
+                {"$set": {**counters, "granularity": "day", "day": day, "updated_at": now}},
+                upsert=True
+            )
+        return {day[:7] for day in touched}
+
+    async def _recompute_months(self, months: Iterable[str]):
+        rollups = db[ROLLUPS_COLLECTION]
+        names = [m.name for m in METRICS]
+        now = datetime.now(timezone.utc)
+        for month in months:
+            totals = dict.fromkeys(names, 0)
+            cursor = rollups.find({"_id": {"$gte": day_id(f"{month}-01"), "$lte": day_id(f"{month}-31")}})
+            async for doc in cursor:
+                for name in names:
+                    totals[name] += doc.get(name, 0) or 0
+            await rollups.update_one(
+                {"_id": month_id(month)},
+                {"$set": {**totals, "granularity": "month", "month": month, "updated_at": now}},
+                upsert=True
+            )
+
+    async def _recompute_gauges(self, collections: Iterable[str]):
+        collections = set(collections)
+        values = {}
+        for name, (collection, query) in GAUGES.items():
+            if collection in collections:
+                values[name] = await source(collection).count_documents(query)
+        if values:
+            await db[ROLLUPS_COLLECTION].update_one(
+                {"_id": "gauges"},
+                {"$set": {**values, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+    async def flush(self):
+        """Aplica as marcações pendentes"""
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, defaultdict(set)
+            gauges, self._dirty_gauges = self._dirty_gauges, set()
+            months: Set[str] = set()
+            for collection, days in dirty.items():
+                if days:
+                    months |= await self._recompute(collection, days)
+            await self._recompute_months(months)
+            await self._recompute_gauges(gauges)
+            if dirty or gauges:
+                self.updated_at = datetime.now(timezone.utc)
+
+    async def rebuild(self, collections: Optional[Iterable[str]] = None):
+        """Reconstrução completa a partir das coleções de origem (uma agregação por campo de data)"""
+        async with self._flush_lock:
+            collections = list(collections or COLLECTIONS)
+            months: Set[str] = set()
+            for collection in collections:
+                months |= await self._recompute(collection)
+            async for doc in db[ROLLUPS_COLLECTION].find({"granularity": "day"}, {"day": 1}):
+                months.add(doc["day"][:7])
+            await self._recompute_months(months)
+            await self._recompute_gauges(collections)
+            self.built_at = self.updated_at = datetime.now(timezone.utc)
+            await db[ROLLUPS_COLLECTION].update_one(
+                {"_id": "meta"}, {"$set": {"built_at": self.built_at}}, upsert=True
+            )
+        logger.info("📊 Rollups do dashboard reconstruídos (%s coleções, %s meses)", len(collections), len(months))
+
+    # ---------- Ciclo de vida ----------
+
+    async def ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        async with self._start_lock:
+            if self._task is not None and not self._task.done():
+                return
+            await db[ROLLUPS_COLLECTION].create_index([("granularity", 1), ("day", 1)])
+            meta = await db[ROLLUPS_COLLECTION].find_one({"_id": "meta"})
+            if meta and meta.get("built_at"):
+                self.built_at = meta["built_at"]
+                self.mark_recent()
+                await self.flush()
+            else:
+                await self.rebuild()
+            bus = get_bus()
+            await bus.subscribe(CHANGES_CHANNEL, self._on_change)
+            await bus.subscribe(alert_scheduler.CHANGES_CHANNEL, self._on_alert_change)
+            self._watch_task = asyncio.create_task(self._watch())
+            self._task = asyncio.create_task(self._run())
+
+    def mark_recent(self):
+        today = datetime.now(timezone.utc).date()
+        days = [today.isoformat(), (today - timedelta(days=1)).isoformat()]
+        for collection in COLLECTIONS:
+            self.mark(collection, days)
+
+    async def _on_change(self, message: Dict[str, Any]):
+        self.mark(message.get("collection", ""), message.get("days") or [])
+
+    async def _on_alert_change(self, message: Dict[str, Any]):
+        # Prazos do deadline_manager já publicam suas escritas para o agendador de alertas
+        if message.get("source") == "deadlines":
+            doc = await source("deadlines").find_one({"id": message.get("ref_id")}, {"_id": 0})
+            self.mark_document("deadlines", doc)
+
+    async def _watch(self):
+        """Change streams (replica set); em servidor standalone fica só a reconciliação periódica"""
+        por_banco: Dict[str, List[str]] = defaultdict(list)
+        for collection in COLLECTIONS:
+            por_banco[SOURCE_DATABASES.get(collection, DB_NAME)].append(collection)
+        pipeline = [{"$match": {"$or": [
+            {"ns.db": banco, "ns.coll": {"$in": colecoes}} for banco, colecoes in por_banco.items()
+        ]}}]
+        try:
+            async with client.watch(pipeline, full_document="updateLookup") as stream:
+                self.change_streams = True
+                async for change in stream:
+                    collection = change["ns"]["coll"]
+                    self.mark_document(collection, change.get("fullDocument"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("Change streams indisponíveis para rollups (%s); usando reconciliação periódica", e)
+        finally:
+            self.change_streams = False
+
+    async def _run(self):
+        last_reconcile = last_rebuild = datetime.now(timezone.utc)
+        while True:
+            try:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=RECONCILE_SECONDS)
+                    await asyncio.sleep(FLUSH_DELAY)  # agrupa rajadas de escrita
+                except asyncio.TimeoutError:
+                    pass
+                now = datetime.now(timezone.utc)
+                if (now - last_rebuild).total_seconds() >= FULL_REBUILD_SECONDS:
+                    await self.rebuild()
+                    last_rebuild = last_reconcile = now
+                    continue
+                if (now - last_reconcile).total_seconds() >= RECONCILE_SECONDS:
+                    self.mark_recent()
+                    last_reconcile = now
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Erro nos rollups do dashboard: %s", e)
+                await asyncio.sleep(5)
+
+    # ---------- Consultas ----------
+
+    async def totals(self, windows: List[Tuple[date, date]]) -> Tuple[List[Dict[str, float]], Dict[str, Any]]:
+        """Somas das métricas em cada janela [início, fim] e os totais correntes (uma consulta)"""
+        per_window = [bucket_ids(start, end) for start, end in windows]
+        wanted = {bucket for ids in per_window for bucket in ids} | {"gauges"}
+        docs = {doc["_id"]: doc async for doc in db[ROLLUPS_COLLECTION].find({"_id": {"$in": list(wanted)}})}
+        results = []
+        for ids in per_window:
+            sums = {m.name: 0 for m in METRICS}
+            for bucket in ids:
+                doc = docs.get(bucket)
+                if doc:
+                    for name in sums:
+                        sums[name] += doc.get(name, 0) or 0
+            results.append(sums)
+        return results, docs.get("gauges") or {}
+
+    async def deadline_split(self, today: date) -> Tuple[int, int]:
+        """(vencidos, a vencer) dos prazos em aberto: meses inteiros + dias do mês corrente"""
+        month = today.strftime("%Y-%m")
+        next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        query = {"$or": [
+            {"granularity": "month", "month": {"$ne": month}},
+            {"_id": {"$gte": day_id(f"{month}-01"), "$lt": day_id(next_month.isoformat())}}
+        ]}
+        overdue = upcoming = 0
+        async for doc in db[ROLLUPS_COLLECTION].find(query, {"deadlines_open": 1, "month": 1, "day": 1}):
+            value = doc.get("deadlines_open", 0) or 0
+            if doc.get("month"):
+                past = doc["month"] < month
+            else:
+                past = doc.get("day", "") < today.isoformat()
+            if past:
+                overdue += value
+            else:
+                upcoming += value
+        return overdue, upcoming
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "change_streams": self.change_streams,
+            "built_at": self.built_at.isoformat() if isinstance(self.built_at, datetime) else self.built_at,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "pending": {c: sorted(d) for c, d in self._dirty.items() if d},
+            "collections": COLLECTIONS
+        }
+
+
+engine = RollupEngine()
+
+
+async def notify_write(collection: str, doc: Optional[Dict[str, Any]] = None):
+    """Chamado após escritas nas coleções do dashboard; propaga para todos os workers"""
+    days = []
+    if doc:
+        days = [day_of(doc.get(m.date_field)) for m in METRICS if m.collection == collection]
+    await get_bus().publish(CHANGES_CHANNEL, {"collection": collection, "days": [d for d in days if d]})
+
+
+async def ensure_started():
+    await engine.ensure_started()
@@ -9,13 +9,13 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 import os
 import uuid
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 router = APIRouter(prefix="/api/data-extraction", tags=["data_extraction_enhanced"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Models
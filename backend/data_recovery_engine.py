@@ -0,0 +1,840 @@
+"""
+Motor de Recuperação de Dados em Imagens Brutas
+Análise de FAT32/exFAT/ext4 (entradas e inodes excluídos) e carving por
+assinatura sobre clusters não alocados.
+
+A varredura roda em um processo separado que lê a imagem sequencialmente em
+blocos grandes e publica eventos (partições, arquivos, progresso) em uma fila
+limitada. O processo da API consome a fila, grava os arquivos encontrados e o
+checkpoint (setor) para permitir a retomada.
+"""
+
+import os
+import struct
+import asyncio
+import multiprocessing
+import queue as queue_module
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+SECTOR_SIZE = 512
+READ_SIZE = 8 * 1024 * 1024
+QUEUE_MAXSIZE = 2000
+FOOTER_WINDOW = 1024 * 1024
+
+CATEGORIES = ["documentos", "imagens", "videos", "audios", "emails", "bancos_dados", "arquivos_sistema", "outros"]
+
+# tipos_arquivo da API -> categoria
+TYPE_FILTERS = {
+    "documents": "documentos",
+    "images": "imagens",
+    "videos": "videos",
+    "audios": "audios",
+    "emails": "emails",
+    "databases": "bancos_dados",
+}
+
+EXTENSION_CATEGORIES = {
+    "documentos": {"doc", "docx", "xls", "xlsx", "ppt", "pptx", "pdf", "txt", "rtf", "odt", "ods", "odp"},
+    "imagens": {"jpg", "jpeg", "png", "gif", "bmp", "tif", "tiff", "psd", "heic", "cr2", "nef", "dng"},
+    "videos": {"mp4", "avi", "mov", "wmv", "flv", "mkv", "mpeg", "mpg", "3gp", "m4v"},
+    "audios": {"mp3", "wav", "flac", "aac", "ogg", "wma", "m4a", "aiff"},
+    "emails": {"pst", "ost", "eml", "msg", "mbox", "dbx"},
+    "bancos_dados": {"mdb", "accdb", "db", "sqlite", "sql", "dbf"},
+    "arquivos_sistema": {"sys", "dll", "exe", "ini", "log", "tmp", "lnk"},
+}
+
+
+def category_for(name: str) -> str:
+    """Categoria pelo sufixo do nome do arquivo"""
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    for category, extensions in EXTENSION_CATEGORIES.items():
+        if ext in extensions:
+            return category
+    return "outros"
+
+
+# ==================== ASSINATURAS (CARVING) ====================
+
+def _riff_size(fd: int, offset: int, max_size: int) -> Optional[int]:
+    header = os.pread(fd, 12, offset)
+    return struct.unpack("<I", header[4:8])[0] + 8 if len(header) == 12 else None
+
+
+def _sqlite_size(fd: int, offset: int, max_size: int) -> Optional[int]:
+    header = os.pread(fd, 32, offset)
+    if len(header) < 32:
+        return None
+    page_size = struct.unpack(">H", header[16:18])[0]
+    page_size = 65536 if page_size == 1 else page_size
+    pages = struct.unpack(">I", header[28:32])[0]
+    return page_size * pages or None
+
+
+def _mp4_size(fd: int, offset: int, max_size: int) -> Optional[int]:
+    # Percorre os átomos de nível superior até encontrar um inválido
+    position = offset
+    known = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"uuid", b"meta", b"pdin", b"moof", b"mfra"}
+    while position - offset < max_size:
+        atom = os.pread(fd, 16, position)
+        if len(atom) < 8 or atom[4:8] not in known:
+            break
+        size = struct.unpack(">I", atom[:4])[0]
+        if size == 1 and len(atom) == 16:
+            size = struct.unpack(">Q", atom[8:16])[0]
+        if size < 8:
+            break
+        position += size
+    return position - offset if position > offset else None
+
+
+# (extensão, cabeçalho, deslocamento do cabeçalho, rodapé, bytes após rodapé, tamanho máximo, categoria, função de tamanho)
+SIGNATURES = [
+    ("jpg", b"\xff\xd8\xff", 0, b"\xff\xd9", 0, 20 * 1024 * 1024, "imagens", None),
+    ("png", b"\x89PNG\r\n\x1a\n", 0, b"IEND\xaeB`\x82", 0, 20 * 1024 * 1024, "imagens", None),
+    ("gif", b"GIF89a", 0, b"\x00\x3b", 0, 10 * 1024 * 1024, "imagens", None),
+    ("gif", b"GIF87a", 0, b"\x00\x3b", 0, 10 * 1024 * 1024, "imagens", None),
+    ("pdf", b"%PDF-", 0, b"%%EOF", 0, 200 * 1024 * 1024, "documentos", None),
+    ("zip", b"PK\x03\x04", 0, b"PK\x05\x06", 18, 200 * 1024 * 1024, "outros", None),
+    ("sqlite", b"SQLite format 3\x00", 0, None, 0, 2 * 1024 ** 3, "bancos_dados", _sqlite_size),
+    ("wav", b"RIFF", 0, None, 0, 2 * 1024 ** 3, "audios", _riff_size),
+    ("mp4", b"ftyp", 4, None, 0, 4 * 1024 ** 3, "videos", _mp4_size),
+]
+
+
+# ==================== SISTEMAS DE ARQUIVOS ====================
+
+def _u16(buf: bytes, pos: int) -> int:
+    return struct.unpack_from("<H", buf, pos)[0]
+
+
+def _u32(buf: bytes, pos: int) -> int:
+    return struct.unpack_from("<I", buf, pos)[0]
+
+
+def _u64(buf: bytes, pos: int) -> int:
+    return struct.unpack_from("<Q", buf, pos)[0]
+
+
+def _bit(bitmap: bytearray, index: int) -> bool:
+    return bool(bitmap[index >> 3] & (1 << (index & 7))) if 0 <= index >> 3 < len(bitmap) else True
+
+
+class Volume:
+    """Base: geometria de clusters e bitmap de alocação de um volume"""
+
+    kind = "raw"
+
+    def __init__(self, fd: int, offset: int, size: int):
+        self.fd = fd
+        self.offset = offset
+        self.size = size
+        self.cluster_size = SECTOR_SIZE
+        self.data_offset = offset
+        self.cluster_count = 0
+        self.bitmap = bytearray()
+
+    def read(self, position: int, length: int) -> bytes:
+        return os.pread(self.fd, length, self.offset + position)
+
+    def is_allocated(self, absolute_offset: int) -> bool:
+        if absolute_offset < self.data_offset:
+            return True
+        if not self.bitmap:
+            # Sem sistema de arquivos reconhecido: tudo é candidato ao carving
+            return False
+        index = (absolute_offset - self.data_offset) // self.cluster_size
+        if index >= self.cluster_count:
+            return False
+        return _bit(self.bitmap, index)
+
+    def extent_free(self, start: int, length: int) -> bool:
+        """True se todos os clusters do intervalo absoluto estão livres"""
+        position = start
+        while position < start + max(length, 1):
+            if self.is_allocated(position):
+                return False
+            position += self.cluster_size
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        used = int.from_bytes(self.bitmap, "little").bit_count() if self.bitmap else 0
+        return {
+            "filesystem": self.kind,
+            "offset": self.offset,
+            "size_bytes": self.size,
+            "cluster_size": self.cluster_size,
+            "total_clusters": self.cluster_count,
+            "used_clusters": used,
+            "free_clusters": max(self.cluster_count - used, 0),
+        }
+
+    def deleted_files(self):
+        return iter(())
+
+
+class Fat32Volume(Volume):
+    kind = "FAT32"
+
+    def __init__(self, fd: int, offset: int, size: int, boot: bytes):
+        super().__init__(fd, offset, size)
+        bps = _u16(boot, 11)
+        spc = boot[13]
+        reserved = _u16(boot, 14)
+        nfats = boot[16]
+        fat_size = _u32(boot, 36)
+        total_sectors = _u16(boot, 19) or _u32(boot, 32)
+        self.cluster_size = bps * spc
+        self.fat_offset = reserved * bps
+        self.data_offset = offset + (reserved + nfats * fat_size) * bps
+        self.cluster_count = (total_sectors - reserved - nfats * fat_size) // spc
+        self.root_cluster = _u32(boot, 44)
+        self._load_bitmap()
+
+    def _load_bitmap(self):
+        # Cluster alocado <=> entrada da FAT diferente de zero (lida em blocos grandes)
+        parts = []
+        entries_per_read = READ_SIZE // 4
+        for first in range(0, self.cluster_count, entries_per_read):
+            count = min(entries_per_read, self.cluster_count - first)
+            raw = self.read(self.fat_offset + (first + 2) * 4, count * 4)
+            entries = np.frombuffer(raw[: len(raw) // 4 * 4], dtype="<u4")
+            parts.append((entries & 0x0FFFFFFF) != 0)
+        used = np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+        self.bitmap = bytearray(np.packbits(used, bitorder="little").tobytes())
+
+    def _cluster_offset(self, cluster: int) -> int:
+        return self.data_offset + (cluster - 2) * self.cluster_size
+
+    def _chain(self, cluster: int, limit: int = 65536) -> List[int]:
+        chain = []
+        while 2 <= cluster < 0x0FFFFFF7 and len(chain) < limit and cluster not in chain:
+            chain.append(cluster)
+            cluster = _u32(self.read(self.fat_offset + cluster * 4, 4), 0) & 0x0FFFFFFF
+        return chain
+
+    def deleted_files(self):
+        pending = [(self.root_cluster, "", False)]
+        visited = set()
+        while pending:
+            cluster, path, deleted_dir = pending.pop()
+            if cluster in visited or not 2 <= cluster < self.cluster_count + 2:
+                continue
+            visited.add(cluster)
+            # Diretórios excluídos têm a cadeia zerada na FAT: lê só o primeiro cluster
+            clusters = [cluster] if deleted_dir else self._chain(cluster)
+            lfn: List[str] = []
+            for c in clusters:
+                data = os.pread(self.fd, self.cluster_size, self._cluster_offset(c))
+                for pos in range(0, len(data) - 31, 32):
+                    entry = data[pos:pos + 32]
+                    first = entry[0]
+                    if first == 0x00:
+                        break
+                    attr = entry[11]
+                    if attr == 0x0F:
+                        chars = entry[1:11] + entry[14:26] + entry[28:32]
+                        lfn.insert(0, chars.decode("utf-16-le", errors="ignore").split("\x00")[0].rstrip("￿"))
+                        continue
+                    long_name, lfn = "".join(lfn), []
+                    if attr & 0x08 or entry[0:2] in (b". ", b".."):
+                        continue
+                    deleted = first == 0xE5
+                    base = (b"_" + entry[1:8] if deleted else entry[0:8]).decode("latin-1").rstrip()
+                    ext = entry[8:11].decode("latin-1").rstrip()
+                    name = long_name or (f"{base}.{ext}" if ext else base)
+                    start = (_u16(entry, 20) << 16) | _u16(entry, 26)
+                    size = _u32(entry, 28)
+                    if attr & 0x10:
+                        pending.append((start, f"{path}/{name}", deleted or deleted_dir))
+                        continue
+                    if not (deleted or deleted_dir) or start < 2:
+                        continue
+                    offset = self._cluster_offset(start)
+                    yield {
+                        "key": f"fat32:{self.offset}:{c}:{pos}",
+                        "name": name,
+                        "path": f"{path}/{name}",
+                        "size": size,
+                        "extents": [[offset, size]],
+                        "modified": _fat_datetime(_u16(entry, 24), _u16(entry, 22)),
+                        "recoverable": self.extent_free(offset, size),
+                    }
+
+
+def _fat_datetime(date: int, time: int) -> Optional[str]:
+    try:
+        return datetime(1980 + (date >> 9), (date >> 5) & 0xF, date & 0x1F,
+                        time >> 11, (time >> 5) & 0x3F, (time & 0x1F) * 2).isoformat()
+    except ValueError:
+        return None
+
+
+class ExFatVolume(Volume):
+    kind = "exFAT"
+
+    def __init__(self, fd: int, offset: int, size: int, boot: bytes):
+        super().__init__(fd, offset, size)
+        bps = 1 << boot[108]
+        self.cluster_size = bps << boot[109]
+        self.fat_offset = _u32(boot, 80) * bps
+        self.data_offset = offset + _u32(boot, 88) * bps
+        self.cluster_count = _u32(boot, 92)
+        self.root_cluster = _u32(boot, 96)
+        self._load_bitmap()
+
+    def _cluster_offset(self, cluster: int) -> int:
+        return self.data_offset + (cluster - 2) * self.cluster_size
+
+    def _chain(self, cluster: int, length: Optional[int] = None, contiguous: bool = False) -> List[int]:
+        if contiguous:
+            count = max(1, -(-(length or self.cluster_size) // self.cluster_size))
+            return list(range(cluster, cluster + count))
+        chain = []
+        while 2 <= cluster < 0xFFFFFFF7 and len(chain) < 65536 and cluster not in chain:
+            chain.append(cluster)
+            cluster = _u32(self.read(self.fat_offset + cluster * 4, 4), 0)
+        return chain
+
+    def _load_bitmap(self):
+        for c in self._chain(self.root_cluster):
+            data = os.pread(self.fd, self.cluster_size, self._cluster_offset(c))
+            for pos in range(0, len(data), 32):
+                if data[pos] == 0x81:
+                    first, length = _u32(data, pos + 20), _u64(data, pos + 24)
+                    raw = b"".join(
+                        os.pread(self.fd, self.cluster_size, self._cluster_offset(x))
+                        for x in self._chain(first, length, contiguous=True)
+                    )
+                    self.bitmap = bytearray(raw[:length])
+                    return
+
+    def deleted_files(self):
+        pending = [(self.root_cluster, None, False, "", False)]
+        visited = set()
+        while pending:
+            cluster, length, contiguous, path, deleted_dir = pending.pop()
+            if cluster in visited or not 2 <= cluster < self.cluster_count + 2:
+                continue
+            visited.add(cluster)
+            data = b"".join(
+                os.pread(self.fd, self.cluster_size, self._cluster_offset(c))
+                for c in self._chain(cluster, length, contiguous or deleted_dir)
+            )
+            pos = 0
+            while pos + 32 <= len(data):
+                etype = data[pos]
+                if etype == 0x00:
+                    break
+                if etype & 0x7F != 0x05:
+                    pos += 32
+                    continue
+                deleted = not etype & 0x80
+                secondary = data[pos + 1]
+                attrs = _u16(data, pos + 4)
+                modified = _u32(data, pos + 12)
+                entries = [data[pos + 32 * i: pos + 32 * (i + 1)] for i in range(1, secondary + 1)]
+                pos += 32 * (secondary + 1)
+                if not entries or entries[0][0] & 0x7F != 0x40:
+                    continue
+                stream = entries[0]
+                no_fat_chain = bool(stream[1] & 0x02)
+                name_length = stream[3]
+                first, size = _u32(stream, 20), _u64(stream, 24)
+                name = b"".join(e[2:32] for e in entries[1:] if e and e[0] & 0x7F == 0x41)
+                name = name.decode("utf-16-le", errors="ignore")[:name_length]
+                if attrs & 0x10:
+                    pending.append((first, size, no_fat_chain, f"{path}/{name}", deleted or deleted_dir))
+                    continue
+                if not (deleted or deleted_dir) or first < 2:
+                    continue
+                offset = self._cluster_offset(first)
+                yield {
+                    "key": f"exfat:{self.offset}:{cluster}:{pos}",
+                    "name": name,
+                    "path": f"{path}/{name}",
+                    "size": size,
+                    "extents": [[offset, size]],
+                    "modified": _exfat_datetime(modified),
+                    "recoverable": self.extent_free(offset, size),
+                }
+
+
+def _exfat_datetime(value: int) -> Optional[str]:
+    try:
+        return datetime(1980 + (value >> 25), (value >> 21) & 0xF, (value >> 16) & 0x1F,
+                        (value >> 11) & 0x1F, (value >> 5) & 0x3F, (value & 0x1F) * 2).isoformat()
+    except ValueError:
+        return None
+
+
+class Ext4Volume(Volume):
+    kind = "ext4"
+
+    def __init__(self, fd: int, offset: int, size: int, sb: bytes):
+        super().__init__(fd, offset, size)
+        self.block_size = 1024 << _u32(sb, 24)
+        self.cluster_size = self.block_size
+        self.first_data_block = _u32(sb, 20)
+        self.blocks_per_group = _u32(sb, 32)
+        self.inodes_per_group = _u32(sb, 40)
+        self.inode_size = _u16(sb, 88) if _u32(sb, 76) >= 1 else 128
+        incompat = _u32(sb, 96)
+        self.is_64bit = bool(incompat & 0x80)
+        blocks = _u32(sb, 4) | ((_u32(sb, 0x150) << 32) if self.is_64bit else 0)
+        self.desc_size = _u16(sb, 0xFE) if self.is_64bit else 32
+        self.cluster_count = blocks - self.first_data_block
+        self.data_offset = offset + self.first_data_block * self.block_size
+        self.group_count = -(-self.cluster_count // self.blocks_per_group)
+        self.groups = self._read_descriptors()
+        self._load_bitmap()
+
+    def _read_descriptors(self) -> List[Dict[str, int]]:
+        table = self.read((self.first_data_block + 1) * self.block_size, self.group_count * self.desc_size)
+        groups = []
+        for g in range(self.group_count):
+            d = table[g * self.desc_size:(g + 1) * self.desc_size]
+            hi = self.is_64bit and self.desc_size >= 64
+            groups.append({
+                "block_bitmap": _u32(d, 0) | ((_u32(d, 0x20) << 32) if hi else 0),
+                "inode_table": _u32(d, 8) | ((_u32(d, 0x28) << 32) if hi else 0),
+                "flags": _u16(d, 0x12),
+            })
+        return groups
+
+    def _load_bitmap(self):
+        chunk = self.blocks_per_group // 8
+        parts = []
+        for group in self.groups:
+            if group["flags"] & 0x2:  # BLOCK_UNINIT
+                parts.append(bytes(chunk))
+            else:
+                parts.append(self.read(group["block_bitmap"] * self.block_size, chunk))
+        self.bitmap = bytearray(b"".join(parts))
+
+    def _extents(self, i_block: bytes, flags: int) -> List[Tuple[int, int]]:
+        if not flags & 0x80000:
+            # Mapeamento indireto (ext2/3): apenas ponteiros diretos
+            return [(b, 1) for b in struct.unpack("<12I", i_block[:48]) if b]
+        magic, entries, maximum, depth = struct.unpack_from("<HHHH", i_block, 0)
+        if magic != 0xF30A or depth != 0:
+            return []
+        extents = []
+        # Na exclusão o ext4 zera eh_entries, mas as folhas costumam permanecer
+        for i in range(max(entries, min(maximum, 4))):
+            ee_block, ee_len, start_hi, start_lo = struct.unpack_from("<IHHI", i_block, 12 + 12 * i)
+            ee_len = ee_len - 32768 if ee_len > 32768 else ee_len
+            start = (start_hi << 32) | start_lo
+            if ee_len and 0 < start < self.cluster_count + self.first_data_block:
+                extents.append((start, ee_len))
+        return extents
+
+    def deleted_files(self):
+        for g, group in enumerate(self.groups):
+            if group["flags"] & 0x1:  # INODE_UNINIT
+                continue
+            table = self.read(group["inode_table"] * self.block_size, self.inodes_per_group * self.inode_size)
+            for i in range(len(table) // self.inode_size):
+                inode = table[i * self.inode_size:(i + 1) * self.inode_size]
+                mode, size_lo = _u16(inode, 0), _u32(inode, 4)
+                dtime, links = _u32(inode, 20), _u16(inode, 26)
+                if not dtime or links or (mode & 0xF000) != 0x8000:
+                    continue
+                size = size_lo | (_u32(inode, 108) << 32)
+                number = g * self.inodes_per_group + i + 1
+                extents, remaining = [], size
+                for start, count in self._extents(inode[40:100], _u32(inode, 32)):
+                    length = min(count * self.block_size, remaining) if remaining else count * self.block_size
+                    extents.append([self.offset + start * self.block_size, length])
+                    remaining = max(remaining - length, 0)
+                yield {
+                    "key": f"ext4:{self.offset}:{number}",
+                    "name": f"inode_{number}",
+                    "path": f"<inode {number}>",
+                    "size": size,
+                    "extents": extents,
+                    "modified": datetime.fromtimestamp(_u32(inode, 16), tz=timezone.utc).isoformat(),
+                    "deleted_at": datetime.fromtimestamp(dtime, tz=timezone.utc).isoformat(),
+                    "recoverable": bool(extents) and all(self.extent_free(o, l) for o, l in extents),
+                }
+
+
+def open_volume(fd: int, offset: int, size: int) -> Volume:
+    """Identifica o sistema de arquivos a partir do setor de boot / superbloco"""
+    boot = os.pread(fd, 512, offset)
+    if len(boot) == 512 and boot[3:11] == b"EXFAT   ":
+        return ExFatVolume(fd, offset, size, boot)
+    if len(boot) == 512 and boot[82:90] == b"FAT32   ":
+        return Fat32Volume(fd, offset, size, boot)
+    sb = os.pread(fd, 1024, offset + 1024)
+    if len(sb) == 1024 and _u16(sb, 56) == 0xEF53:
+        return Ext4Volume(fd, offset, size, sb)
+    return Volume(fd, offset, size)
+
+
+def find_partitions(fd: int, image_size: int) -> List[Tuple[int, int]]:
+    """Lista (offset, tamanho) das partições via MBR/GPT; volume único se não houver tabela"""
+    mbr = os.pread(fd, 512, 0)
+    if len(mbr) < 512 or mbr[510:512] != b"\x55\xaa" or mbr[3:11] in (b"EXFAT   ", b"MSDOS5.0") or mbr[82:90] == b"FAT32   ":
+        return [(0, image_size)]
+    entries = [mbr[446 + 16 * i: 462 + 16 * i] for i in range(4)]
+    if any(e[4] == 0xEE for e in entries):
+        header = os.pread(fd, 92, SECTOR_SIZE)
+        if header[:8] == b"EFI PART":
+            first_lba, count, entry_size = _u64(header, 72), _u32(header, 80), _u32(header, 84)
+            table = os.pread(fd, count * entry_size, first_lba * SECTOR_SIZE)
+            parts = []
+            for i in range(count):
+                e = table[i * entry_size:(i + 1) * entry_size]
+                if len(e) < 48 or e[:16] == bytes(16):
+                    continue
+                start, end = _u64(e, 32), _u64(e, 40)
+                parts.append((start * SECTOR_SIZE, (end - start + 1) * SECTOR_SIZE))
+            return parts or [(0, image_size)]
+    parts = [(_u32(e, 8) * SECTOR_SIZE, _u32(e, 12) * SECTOR_SIZE) for e in entries if e[4] and _u32(e, 12)]
+    return parts or [(0, image_size)]
+
+
+# ==================== PROCESSO DE VARREDURA ====================
+
+def _emit(out, stop_event, message):
+    # put bloqueante com timeout: aplica backpressure sem travar a parada
+    while not stop_event.is_set():
+        try:
+            out.put(message, timeout=0.5)
+            return True
+        except queue_module.Full:
+            continue
+    return False
+
+
+def _sniff(fd: int, found: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Identifica (extensão, categoria) pelo cabeçalho do primeiro extent"""
+    if not found["extents"]:
+        return None
+    head = os.pread(fd, 16, found["extents"][0][0])
+    for ext, header, header_pos, *_rest, category, _size_fn in SIGNATURES:
+        if head[header_pos:header_pos + len(header)] == header:
+            return ext, category
+    return None
+
+
+def _carve_length(fd: int, offset: int, signature, image_size: int) -> Optional[int]:
+    ext, header, header_pos, footer, trailer, max_size, category, size_fn = signature
+    if size_fn:
+        length = size_fn(fd, offset, max_size)
+        return min(length, image_size - offset) if length and length <= max_size else None
+    position = offset + len(header)
+    tail = b""
+    while position - offset < max_size and position < image_size:
+        window = os.pread(fd, FOOTER_WINDOW, position)
+        if not window:
+            break
+        found = (tail + window).find(footer)
+        if found >= 0:
+            end = position - len(tail) + found + len(footer) + trailer
+            if ext == "zip":
+                comment = os.pread(fd, 2, end - 2)
+                end += _u16(comment, 0) if len(comment) == 2 else 0
+            return end - offset
+        tail = window[-(len(footer) - 1):] if len(footer) > 1 else b""
+        position += len(window)
+    return None
+
+
+def scan_image(
+    image_path: str,
+    options: Dict[str, Any],
+    start_offset: int,
+    metadata_done: bool,
+    out,
+    stop_event,
+):
+    """
+    Ponto de entrada do processo de varredura
+
+    Fase 1: partições e arquivos excluídos pelos metadados do sistema de arquivos.
+    Fase 2: carving por assinatura, lendo a imagem sequencialmente a partir de start_offset.
+    """
+    categories = options.get("categories")
+    carve_allocated = options.get("carve_allocated", False)
+    fd = os.open(image_path, os.O_RDONLY)
+    try:
+        image_size = os.fstat(fd).st_size
+        if image_size == 0:
+            image_size = os.lseek(fd, 0, os.SEEK_END)
+        volumes = [open_volume(fd, offset, size) for offset, size in find_partitions(fd, image_size)]
+        for number, volume in enumerate(volumes, 1):
+            _emit(out, stop_event, ("partition", {"partition_number": number, **volume.summary()}))
+
+        if not metadata_done:
+            for volume in volumes:
+                for found in volume.deleted_files():
+                    if stop_event.is_set():
+                        return
+                    found.update({"source": volume.kind, "category": category_for(found["name"])})
+                    if found["category"] == "outros":
+                        sniffed = _sniff(fd, found)
+                        if sniffed:
+                            found["detected_type"], found["category"] = sniffed
+                    if categories and found["category"] not in categories:
+                        continue
+                    _emit(out, stop_event, ("file", found))
+            _emit(out, stop_event, ("metadata_done", None))
+
+        if not options.get("carving", True):
+            _emit(out, stop_event, ("done", {"bytes_read": 0}))
+            return
+
+        def allocated(position: int) -> bool:
+            for volume in volumes:
+                if volume.offset <= position < volume.offset + volume.size:
+                    return volume.is_allocated(position)
+            return False
+
+        signatures = [s for s in SIGNATURES if not categories or s[6] in categories]
+        started = datetime.now(timezone.utc)
+        offset = start_offset - start_offset % SECTOR_SIZE
+        bytes_read = 0
+        skip_until = offset
+        carry = b""
+        while offset < image_size and not stop_event.is_set():
+            chunk = os.pread(fd, READ_SIZE, offset)
+            if not chunk:
+                break
+            buffer = carry + chunk
+            base = offset - len(carry)
+            hits = []
+            for signature in signatures:
+                header, header_pos = signature[1], signature[2]
+                found = buffer.find(header)
+                while found >= 0:
+                    start = base + found - header_pos
+                    # Cabeçalhos contidos só no "carry" já foram vistos no bloco anterior
+                    if found + len(header) > len(carry) and start >= 0 and start % SECTOR_SIZE == 0:
+                        hits.append((start, signature))
+                    found = buffer.find(header, found + 1)
+            for start, signature in sorted(hits, key=lambda h: h[0]):
+                if start < skip_until or (not carve_allocated and allocated(start)):
+                    continue
+                length = _carve_length(fd, start, signature, image_size)
+                if not length:
+                    continue
+                skip_until = start + length
+                ext = signature[0]
+                _emit(out, stop_event, ("file", {
+                    "key": f"carve:{start}",
+                    "name": f"carved_{start:012x}.{ext}",
+                    "path": None,
+                    "size": length,
+                    "extents": [[start, length]],
+                    "source": "carving",
+                    "category": signature[6],
+                    "recoverable": True,
+                }))
+            offset += len(chunk)
+            bytes_read += len(chunk)
+            carry = chunk[-32:]
+            elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+            _emit(out, stop_event, ("progress", {
+                "offset": offset,
+                "image_size": image_size,
+                "bytes_read": bytes_read,
+                "elapsed": elapsed,
+            }))
+        _emit(out, stop_event, ("done", {"bytes_read": bytes_read}))
+    except Exception as e:
+        _emit(out, stop_event, ("error", str(e)))
+    finally:
+        os.close(fd)
+
+
+# ==================== ORQUESTRAÇÃO (PROCESSO DA API) ====================
+
+_jobs: Dict[str, Any] = {}
+
+
+def is_running(recovery_id: str) -> bool:
+    """Há processo de varredura ativo para a recuperação?"""
+    return recovery_id in _jobs
+
+
+def stop(recovery_id: str) -> bool:
+    """Sinaliza parada do processo de varredura"""
+    job = _jobs.get(recovery_id)
+    if not job:
+        return False
+    job["stop_event"].set()
+    return True
+
+
+def export_files(image_path: str, files: List[Dict[str, Any]], export_path: str) -> Dict[str, int]:
+    """Copia os extents de cada arquivo encontrado para o diretório de exportação"""
+    os.makedirs(export_path, exist_ok=True)
+    exported = 0
+    total_bytes = 0
+    with open(image_path, "rb") as image:
+        for item in files:
+            target = os.path.join(export_path, f"{item['key'].replace(':', '_')}_{os.path.basename(item['name'])}")
+            with open(target, "wb") as out:
+                for offset, length in item.get("extents", []):
+                    image.seek(offset)
+                    remaining = length
+                    while remaining > 0:
+                        data = image.read(min(READ_SIZE, remaining))
+                        if not data:
+                            break
+                        out.write(data)
+                        remaining -= len(data)
+                        total_bytes += len(data)
+            exported += 1
+    return {"files_exported": exported, "bytes_exported": total_bytes}
+
+
+async def run_recovery_job(recovery_id: str, image_path: str, options: Dict[str, Any], collection, files_collection):
+    """
+    Inicia (ou retoma) a varredura em processo separado e persiste os eventos
+
+    O checkpoint gravado é o deslocamento (em setores) já varrido pelo carving;
+    arquivos são gravados com upsert por chave estável, então a retomada não duplica.
+    """
+    doc = await collection.find_one({"recovery_id": recovery_id}, {"checkpoint": 1}) or {}
+    checkpoint = doc.get("checkpoint") or {}
+    start_offset = checkpoint.get("sector", 0) * SECTOR_SIZE
+    metadata_done = checkpoint.get("metadata_done", False)
+
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue(maxsize=QUEUE_MAXSIZE)
+    stop_event = ctx.Event()
+    process = ctx.Process(
+        target=scan_image,
+        args=(image_path, options, start_offset, metadata_done, out, stop_event),
+        daemon=True,
+    )
+    process.start()
+    _jobs[recovery_id] = {"process": process, "stop_event": stop_event}
+
+    counts = {c: 0 for c in CATEGORIES}
+    async for row in files_collection.aggregate([
+        {"$match": {"recovery_id": recovery_id}},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+    ]):
+        counts[row["_id"]] = row["count"]
+
+    loop = asyncio.get_running_loop()
+    partitions: List[Dict[str, Any]] = []
+    writes: List[UpdateOne] = []
+    # Categoria de cada escrita pendente: só conta o que o upsert inseriu
+    # (na retomada a varredura reemite arquivos já gravados e contados acima)
+    write_categories: List[str] = []
+    status = "scanning"
+    error = None
+
+    def drain() -> List[Any]:
+        # Bloqueia até a primeira mensagem e esvazia o restante disponível
+        try:
+            messages = [out.get(timeout=1.0)]
+        except queue_module.Empty:
+            return []
+        while len(messages) < 500:
+            try:
+                messages.append(out.get_nowait())
+            except queue_module.Empty:
+                break
+        return messages
+
+    async def flush():
+        if writes:
+            result = await files_collection.bulk_write(writes, ordered=False)
+            for index in result.upserted_ids:
+                category = write_categories[index]
+                counts[category] = counts.get(category, 0) + 1
+            writes.clear()
+            write_categories.clear()
+
+    try:
+        finished = False
+        while not finished:
+            messages = await loop.run_in_executor(None, drain)
+            if not messages and not process.is_alive():
+                if stop_event.is_set():
+                    status = "stopped"
+                else:
+                    status, error = "failed", "Processo de varredura encerrado inesperadamente"
+                break
+            update: Dict[str, Any] = {}
+            for kind, payload in messages:
+                if kind == "partition":
+                    partitions.append(payload)
+                    update["particoes_encontradas"] = partitions
+                    update["filesystem_analysis"] = {**partitions[0], "filesystem_type": partitions[0]["filesystem"]}
+                elif kind == "file":
+                    write_categories.append(payload["category"])
+                    writes.append(UpdateOne(
+                        {"recovery_id": recovery_id, "key": payload["key"]},
+                        {"$set": {**payload, "recovery_id": recovery_id}},
+                        upsert=True,
+                    ))
+                elif kind == "metadata_done":
+                    update["checkpoint.metadata_done"] = True
+                elif kind == "progress":
+                    mb_s = payload["bytes_read"] / 1048576 / payload["elapsed"] if payload["elapsed"] else 0.0
+                    elapsed = int(payload["elapsed"])
+                    update.update({
+                        "progresso": round(payload["offset"] / payload["image_size"] * 100, 2),
+                        "checkpoint.sector": payload["offset"] // SECTOR_SIZE,
+                        "scan_info.setores_escaneados": payload["offset"] // SECTOR_SIZE,
+                        "scan_info.setores_totais": payload["image_size"] // SECTOR_SIZE,
+                        "scan_info.velocidade_scan": f"{mb_s:.1f} MB/s",
+                        "scan_info.mb_per_second": round(mb_s, 2),
+                        "scan_info.tempo_decorrido": f"{elapsed // 3600:02d}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}",
+                    })
+                elif kind == "done":
+                    status = "stopped" if stop_event.is_set() else "completed"
+                    finished = True
+                elif kind == "error":
+                    status, error, finished = "failed", payload, True
+            # Arquivos antes do checkpoint: a ordem da fila garante consistência na retomada
+            await flush()
+            if update:
+                update["arquivos_encontrados"] = counts
+                update["updated_at"] = datetime.now(timezone.utc).isoformat()
+                await collection.update_one({"recovery_id": recovery_id}, {"$set": update})
+    finally:
+        await flush()
+        process.join(timeout=5)
+        _jobs.pop(recovery_id, None)
+
+    summary = await files_collection.aggregate([
+        {"$match": {"recovery_id": recovery_id}},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "bytes": {"$sum": "$size"},
+            "recoverable": {"$sum": {"$cond": ["$recoverable", 1, 0]}},
+        }},
+    ]).to_list(1)
+    summary = summary[0] if summary else {"total": 0, "bytes": 0, "recoverable": 0}
+    final = {
+        "status": status,
+        "arquivos_encontrados": counts,
+        "dados_recuperados": {
+            "tamanho_total_gb": round(summary["bytes"] / 1024 ** 3, 4),
+            "arquivos_totais": summary["total"],
+            "arquivos_recuperaveis": summary["recoverable"],
+            "arquivos_danificados": summary["total"] - summary["recoverable"],
+        },
+        "deleted_files_analysis": {
+            "recoverable_percentage": round(summary["recoverable"] / summary["total"] * 100, 1) if summary["total"] else 0,
+            "overwritten": summary["total"] - summary["recoverable"],
+        },
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if status == "completed":
+        final["progresso"] = 100
+    if error:
+        final["error"] = error
+    await collection.update_one({"recovery_id": recovery_id}, {"$set": final})
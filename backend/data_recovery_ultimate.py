@@ -12,13 +12,14 @@ import os
 import uuid
 import jwt
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+import data_recovery_engine as engine
 
 router = APIRouter(prefix="/api/data-recovery-ultimate", tags=["data_recovery_ultimate"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Authentication
@@ -50,6 +51,19 @@ class DataRecoveryCreate(BaseModel):
     scan_profundidade: str = "profunda"  # rapida, normal, profunda, extrema
     tipos_arquivo: List[str] = ["all"]  # all, documents, images, videos, emails, databases
     prioridade: str = "media"
+    imagem_path: Optional[str] = None  # imagem bruta (dd/raw) ou dispositivo somente leitura
+
+def build_scan_options(recovery: DataRecoveryCreate) -> Dict[str, Any]:
+    """Converte profundidade e tipos de arquivo em opções do motor"""
+    categories = None
+    if "all" not in recovery.tipos_arquivo:
+        categories = [engine.TYPE_FILTERS[t] for t in recovery.tipos_arquivo if t in engine.TYPE_FILTERS]
+    return {
+        "categories": categories,
+        # rapida: apenas metadados; extrema: carving também sobre áreas alocadas
+        "carving": recovery.scan_profundidade != "rapida",
+        "carve_allocated": recovery.scan_profundidade == "extrema"
+    }
 
 @router.get("/stats")
 async def get_stats(authorization: str = Header(None)):
@@ -105,8 +119,11 @@ async def create_recovery(recovery: DataRecoveryCreate, background_tasks: Backgr
     try:
         recovery_id = str(uuid.uuid4())
         
-        # Estima tempo baseado no tamanho e profundidade
-        estimated_time = estimate_scan_time(recovery.capacidade_gb, recovery.scan_profundidade)
+        if not recovery.imagem_path or not os.path.exists(recovery.imagem_path):
+            raise HTTPException(status_code=400, detail="imagem_path inválido ou inexistente")
+        with open(recovery.imagem_path, "rb") as image:
+            image_size = image.seek(0, os.SEEK_END)
+        options = build_scan_options(recovery)
         
         recovery_doc = {
             "recovery_id": recovery_id,
@@ -121,10 +138,12 @@ async def create_recovery(recovery: DataRecoveryCreate, background_tasks: Backgr
             "prioridade": recovery.prioridade,
             "status": "scanning",
             "progresso": 0,
-            "estimated_time_hours": estimated_time,
+            "imagem_path": recovery.imagem_path,
+            "scan_options": options,
+            "checkpoint": {"sector": 0, "metadata_done": False},
             "scan_info": {
                 "setores_escaneados": 0,
-                "setores_totais": calculate_sectors(recovery.capacidade_gb),
+                "setores_totais": image_size // engine.SECTOR_SIZE,
                 "velocidade_scan": "0 MB/s",
                 "tempo_decorrido": "00:00:00"
             },
@@ -166,13 +185,19 @@ async def create_recovery(recovery: DataRecoveryCreate, background_tasks: Backgr
         await db.data_recovery.insert_one(recovery_doc)
         recovery_doc.pop("_id", None)
         
+        background_tasks.add_task(
+            engine.run_recovery_job, recovery_id, recovery.imagem_path, options,
+            db.data_recovery, db.data_recovery_files
+        )
+        
         return {
             "success": True,
             "recovery_id": recovery_id,
             "message": f"Scan de recuperação iniciado - Profundidade: {recovery.scan_profundidade}",
-            "estimated_time_hours": estimated_time,
             "data": recovery_doc
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,92 +221,89 @@ async def get_recovery(recovery_id: str, authorization: str = Header(None)):
 
 @router.post("/recoveries/{recovery_id}/simulate-progress")
 async def simulate_recovery_progress(recovery_id: str, authorization: str = Header(None)):
-    """Simular progresso de recuperação (para demo)"""
+    """Progresso medido pela varredura (mantido com o nome antigo para o frontend)"""
     user = await get_current_user(authorization)
     
     try:
-        import random
-        
         recovery = await db.data_recovery.find_one({"recovery_id": recovery_id})
         if not recovery:
             raise HTTPException(status_code=404, detail="Recuperação não encontrada")
         
-        # Simula progresso
-        progresso = random.randint(10, 100)
-        setores_escaneados = int(recovery["scan_info"]["setores_totais"] * progresso / 100)
-        velocidade = random.randint(50, 200)  # MB/s
-        
-        # Simula arquivos encontrados
-        arquivos_encontrados = {
-            "documentos": random.randint(100, 5000),
-            "imagens": random.randint(500, 10000),
-            "videos": random.randint(50, 1000),
-            "audios": random.randint(100, 2000),
-            "emails": random.randint(200, 5000),
-            "bancos_dados": random.randint(5, 50),
-            "arquivos_sistema": random.randint(1000, 5000),
-            "outros": random.randint(500, 3000)
-        }
-        
-        arquivos_totais = sum(arquivos_encontrados.values())
-        tamanho_gb = round(random.uniform(10, recovery["capacidade_gb"] * 0.8), 2)
-        
-        # Simula dados recuperados
-        dados_recuperados = {
-            "tamanho_total_gb": tamanho_gb,
-            "arquivos_totais": arquivos_totais,
-            "arquivos_recuperaveis": int(arquivos_totais * random.uniform(0.7, 0.95)),
-            "arquivos_danificados": int(arquivos_totais * random.uniform(0.05, 0.3))
-        }
-        
-        # Simula partições
-        particoes = []
-        num_particoes = random.randint(1, 4)
-        for i in range(num_particoes):
-            particoes.append({
-                "partition_number": i + 1,
-                "filesystem": random.choice(["NTFS", "FAT32", "ext4", "HFS+"]),
-                "size_gb": round(recovery["capacidade_gb"] / num_particoes, 2),
-                "label": f"Partition{i+1}",
-                "status": "healthy" if random.random() > 0.3 else "damaged"
-            })
-        
-        tempo_decorrido = f"{random.randint(0, 5):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
-        
-        # Atualiza recuperação
-        update_data = {
-            "progresso": progresso,
-            "status": "completed" if progresso >= 100 else "scanning",
-            "scan_info": {
-                "setores_escaneados": setores_escaneados,
-                "setores_totais": recovery["scan_info"]["setores_totais"],
-                "velocidade_scan": f"{velocidade} MB/s",
-                "tempo_decorrido": tempo_decorrido
-            },
-            "arquivos_encontrados": arquivos_encontrados,
-            "dados_recuperados": dados_recuperados,
-            "particoes_encontradas": particoes,
-            "deleted_files_analysis": {
-                "recently_deleted": int(arquivos_totais * 0.4),
-                "old_deleted": int(arquivos_totais * 0.3),
-                "overwritten": int(arquivos_totais * 0.1),
-                "recoverable_percentage": random.randint(70, 95)
-            },
-            "updated_at": datetime.now(timezone.utc).isoformat()
+        dados = recovery.get("dados_recuperados", {})
+        return {
+            "success": True,
+            "message": "Progresso atualizado",
+            "status": recovery.get("status"),
+            "progresso": recovery.get("progresso", 0),
+            "velocidade": recovery.get("scan_info", {}).get("velocidade_scan"),
+            "checkpoint": recovery.get("checkpoint"),
+            "arquivos_encontrados": sum(recovery.get("arquivos_encontrados", {}).values()),
+            "tamanho_gb": dados.get("tamanho_total_gb", 0)
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/recoveries/{recovery_id}/stop")
+async def stop_recovery(recovery_id: str, authorization: str = Header(None)):
+    """Parar varredura (o checkpoint permite retomar depois)"""
+    user = await get_current_user(authorization)
+    
+    if not engine.stop(recovery_id):
+        raise HTTPException(status_code=404, detail="Nenhuma varredura ativa para esta recuperação")
+    return {"success": True, "message": "Parada solicitada"}
+
+@router.post("/recoveries/{recovery_id}/resume")
+async def resume_recovery(recovery_id: str, background_tasks: BackgroundTasks, authorization: str = Header(None)):
+    """Retomar varredura a partir do último setor gravado"""
+    user = await get_current_user(authorization)
+    
+    try:
+        recovery = await db.data_recovery.find_one({"recovery_id": recovery_id})
+        if not recovery:
+            raise HTTPException(status_code=404, detail="Recuperação não encontrada")
+        if not recovery.get("imagem_path"):
+            raise HTTPException(status_code=400, detail="Recuperação criada sem imagem")
+        if engine.is_running(recovery_id) or recovery.get("status") == "completed":
+            raise HTTPException(status_code=409, detail=f"Recuperação com status {recovery.get('status')}")
         
         await db.data_recovery.update_one(
             {"recovery_id": recovery_id},
-            {"$set": update_data}
+            {"$set": {"status": "scanning", "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
-        
-        return {
-            "success": True,
-            "message": "Progresso atualizado",
-            "progresso": progresso,
-            "arquivos_encontrados": arquivos_totais,
-            "tamanho_gb": tamanho_gb
-        }
+        background_tasks.add_task(
+            engine.run_recovery_job, recovery_id, recovery["imagem_path"], recovery.get("scan_options", {}),
+            db.data_recovery, db.data_recovery_files
+        )
+        return {"success": True, "message": "Varredura retomada", "checkpoint": recovery.get("checkpoint")}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/recoveries/{recovery_id}/files")
+async def list_recovered_files(
+    recovery_id: str,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 200,
+    authorization: str = Header(None)
+):
+    """Arquivos encontrados (entradas excluídas e carving)"""
+    user = await get_current_user(authorization)
+    
+    try:
+        query: Dict[str, Any] = {"recovery_id": recovery_id}
+        if category:
+            query["category"] = category
+        if source:
+            query["source"] = source
+        limit = max(1, min(limit, 1000))
+        files = await db.data_recovery_files.find(query, {"_id": 0}).skip(skip).to_list(limit)
+        total = await db.data_recovery_files.count_documents(query)
+        return {"files": files, "count": len(files), "total": total}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -440,37 +462,28 @@ async def export_recovered_files(recovery_id: str, export_path: str, authorizati
         
         if recovery["status"] != "completed":
             raise HTTPException(status_code=400, detail="Recuperação ainda não foi concluída")
+        if not recovery.get("imagem_path"):
+            raise HTTPException(status_code=400, detail="Recuperação sem imagem associada")
         
-        # Simula export
         export_id = str(uuid.uuid4())
+        files = await db.data_recovery_files.find(
+            {"recovery_id": recovery_id, "recoverable": True}, {"_id": 0}
+        ).to_list(None)
+        
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None, engine.export_files, recovery["imagem_path"], files, os.path.join(export_path, export_id)
+        )
         
         return {
             "success": True,
             "export_id": export_id,
             "message": "Arquivos recuperados exportados com sucesso",
-            "export_path": export_path,
-            "files_exported": recovery["dados_recuperados"]["arquivos_recuperaveis"],
-            "size_gb": recovery["dados_recuperados"]["tamanho_total_gb"]
+            "export_path": os.path.join(export_path, export_id),
+            "files_exported": result["files_exported"],
+            "size_gb": round(result["bytes_exported"] / 1024 ** 3, 4)
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-# Helper functions
-def estimate_scan_time(capacity_gb: float, depth: str) -> float:
-    """Estima tempo de scan em horas"""
-    base_rate_gb_per_hour = {
-        "rapida": 100,
-        "normal": 50,
-        "profunda": 20,
-        "extrema": 10
-    }
-    
-    rate = base_rate_gb_per_hour.get(depth, 50)
-    return round(capacity_gb / rate, 2)
-
-def calculate_sectors(capacity_gb: float) -> int:
-    """Calcula número de setores (assumindo 512 bytes por setor)"""
-    bytes_total = capacity_gb * 1024 * 1024 * 1024
-    return int(bytes_total / 512)
@@ -9,14 +9,17 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional
 import os
 import uuid
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import calendario_forense
+import alert_scheduler
 
 router = APIRouter(prefix="/api/athena/deadlines", tags=["Deadline Manager"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[DB_NAME]
 
 # Security
@@ -74,9 +77,15 @@ async def list_deadlines(
         else:
             query['completed'] = False
     
-    deadlines = await db.deadlines.find(query, {"_id": 0}).sort("deadline", 1).to_list(500)
+    if query.get('completed') is False:
+        # Pending deadlines come from the in-memory scheduler, already sorted by due date
+        await alert_scheduler.ensure_started()
+        deadlines = [dict(e.data) for e in alert_scheduler.scheduler.upcoming("deadlines", limit=500)]
+    else:
+        deadlines = await db.deadlines.find(query, {"_id": 0}).sort("deadline", 1).to_list(500)
     
     # Calculate status for each deadline
+    now = datetime.now(timezone.utc)
     for deadline in deadlines:
         deadline['status'] = calculate_deadline_status(
             deadline.get('deadline'),
@@ -86,8 +95,9 @@ async def list_deadlines(
         # Calculate days until
         try:
             deadline_date = datetime.fromisoformat(deadline.get('deadline').replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
             deadline['daysUntil'] = (deadline_date - now).days
+            calendar = calendario_forense.obter_calendario(deadline.get('court'), deadline.get('uf'))
+            deadline['businessDaysUntil'] = calendar.dias_uteis_entre(now.date(), deadline_date.date())
         except:
             deadline['daysUntil'] = 0
     
@@ -104,6 +114,23 @@ async def create_deadline(
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
+    # Compute deadline from start date + term (business days) when not given
+    if "deadline" not in deadline_data and "startDate" in deadline_data and "termDays" in deadline_data:
+        await calendario_forense.sincronizar(db)
+        try:
+            term = calendario_forense.calcular_prazo(
+                deadline_data["startDate"],
+                int(deadline_data["termDays"]),
+                tipo=deadline_data.get("termType", "util"),
+                tribunal=deadline_data.get("court"),
+                uf=deadline_data.get("uf")
+            )
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid term: {e}")
+        # End of the last business day as ISO datetime (as calculate_deadline_status expects)
+        deadline_data["deadline"] = f"{term['data_final']}T23:59:59+00:00"
+        deadline_data.setdefault("nonBusinessDays", term["dias_nao_uteis"])
+    
     # Validate required fields
     required_fields = ["processNumber", "processTitle", "client", "court", "type", "deadline", "description"]
     for field in required_fields:
@@ -130,6 +157,10 @@ async def create_deadline(
             "d1": deadline_data.get("alertD1", True)
         },
         "notes": deadline_data.get("notes", ""),
+        "uf": deadline_data.get("uf"),
+        "startDate": deadline_data.get("startDate"),
+        "termDays": deadline_data.get("termDays"),
+        "nonBusinessDays": deadline_data.get("nonBusinessDays", []),
         "completed": False,
         "created_by": current_user["id"],
         "created_at": datetime.now(timezone.utc).isoformat(),
@@ -140,6 +171,7 @@ async def create_deadline(
     deadline['status'] = calculate_deadline_status(deadline['deadline'], False)
     
     await db.deadlines.insert_one(deadline)
+    await alert_scheduler.notify_change("deadlines", deadline_id)
     
     return {
         "message": "Deadline created successfully",
@@ -174,6 +206,8 @@ async def complete_deadline(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Deadline not found")
     
+    await alert_scheduler.notify_change("deadlines", deadline_id)
+    
     return {"message": "Deadline marked as completed"}
 
 @router.get("/{deadline_id}")
@@ -233,6 +267,8 @@ async def update_deadline(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Deadline not found")
     
+    await alert_scheduler.notify_change("deadlines", deadline_id)
+    
     return {"message": "Deadline updated successfully"}
 
 @router.delete("/{deadline_id}")
@@ -251,6 +287,8 @@ async def delete_deadline(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Deadline not found")
     
+    await alert_scheduler.notify_change("deadlines", deadline_id)
+    
     return {"message": "Deadline deleted successfully"}
 
 @router.get("/alerts/upcoming")
@@ -263,32 +301,33 @@ async def get_upcoming_alerts(
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
+    # Served from the in-memory alert scheduler (loaded once, updated on writes)
+    await alert_scheduler.ensure_started()
+    
     now = datetime.now(timezone.utc)
-    d3_date = now + timedelta(days=3)
-    d1_date = now + timedelta(days=1)
-    
-    # Get D-3 deadlines
-    d3_deadlines = await db.deadlines.find({
-        "deadline": {
-            "$gte": now.isoformat(),
-            "$lte": d3_date.isoformat()
-        },
-        "completed": False,
-        "alerts.d3": True
-    }, {"_id": 0}).to_list(100)
-    
-    # Get D-1 deadlines
-    d1_deadlines = await db.deadlines.find({
-        "deadline": {
-            "$gte": now.isoformat(),
-            "$lte": d1_date.isoformat()
-        },
-        "completed": False,
-        "alerts.d1": True
-    }, {"_id": 0}).to_list(100)
+    pending = alert_scheduler.scheduler.upcoming("deadlines", since=now, until=now + timedelta(days=3))
+    
+    d3_deadlines = [e.data for e in pending if (e.data.get("alerts") or {}).get("d3", True)][:100]
+    d1_deadlines = [
+        e.data for e in pending
+        if e.due <= now + timedelta(days=1) and (e.data.get("alerts") or {}).get("d1", True)
+    ][:100]
     
     return {
         "d3_alerts": d3_deadlines,
         "d1_alerts": d1_deadlines,
         "total_alerts": len(d3_deadlines) + len(d1_deadlines)
     }
+
+@router.get("/alerts/scheduler")
+async def get_scheduler_status(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Alert scheduler status (pending deadlines per source, next alert)
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    await alert_scheduler.ensure_started()
+    return alert_scheduler.scheduler.stats()
@@ -0,0 +1,562 @@
+"""
+Sincronização de Diários Oficiais e Portal OAB
+Pool HTTP assíncrono compartilhado (httpx) com limite de concorrência por
+fonte e requisições condicionais (ETag / If-Modified-Since); os validadores
+só são gravados depois que a edição foi processada com sucesso, para que uma
+falha no processamento não transforme as próximas capturas em 304. Edições são
+gravadas comprimidas e endereçadas pelo SHA-256 do conteúdo; cada edição nova
+é casada com todos os identificadores monitorados em uma única passada
+(identificadores.MatcherMultiplo). Um laço em segundo plano repete a captura
+das fontes configuradas e renova o cache do Portal OAB.
+"""
+
+import os
+import gzip
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from mongo_registry import get_client
+
+import identificadores as ident
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "test_database")
+client = get_client(MONGO_URL)
+db = client[DB_NAME]
+
+DIARIOS_DIR = Path(os.environ.get("DIARIOS_DIR", "/app/backend/diarios"))
+SYNC_INTERVAL_SECONDS = int(os.environ.get("DIARIO_SYNC_INTERVAL", 3600))
+# "0" desliga o laço de sincronização iniciado no startup da API
+AUTOSTART = os.environ.get("DIARIO_SYNC_AUTOSTART", "1") not in ("0", "false", "no")
+MAX_CONNECTIONS = int(os.environ.get("CRAWLER_MAX_CONNECTIONS", 20))
+PER_SOURCE_CONCURRENCY = int(os.environ.get("CRAWLER_PER_SOURCE_CONCURRENCY", 2))
+REQUEST_TIMEOUT = float(os.environ.get("CRAWLER_TIMEOUT", 30))
+USER_AGENT = os.environ.get("CRAWLER_USER_AGENT", "AP-Elite-Athena/1.0 (+sincronizacao de diarios)")
+# Ex.: https://portal.oab.example/api/advogados/{uf}/{oab}; vazio = sem portal real
+OAB_PORTAL_URL = os.environ.get("OAB_PORTAL_URL", "")
+OAB_CACHE_TTL_SECONDS = int(os.environ.get("OAB_CACHE_TTL", 24 * 3600))
+REPROCESS_MAX_EDITIONS = int(os.environ.get("DIARIO_REPROCESS_MAX_EDITIONS", 90))
+SNIPPET_CHARS = 160
+
+# Chaves curtas geram falsos positivos em texto corrido
+MIN_DIGITOS = 8
+MIN_PALAVRAS_NOME = 2
+
+
+# ==================== POOL HTTP ====================
+
+@dataclass
+class Resposta:
+    status: int
+    conteudo: bytes = b""
+    content_type: str = ""
+    nao_modificado: bool = False
+    url: str = ""
+    fonte: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class HttpPool:
+    """Cliente HTTP único (keep-alive) com semáforo por fonte e cabeçalhos condicionais"""
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, per_source: int = PER_SOURCE_CONCURRENCY,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.max_connections = max_connections
+        self.per_source = per_source
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+
+    def _cliente(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT}
+            )
+        return self._client
+
+    def _semaforo(self, fonte: str) -> asyncio.Semaphore:
+        if fonte not in self._semaforos:
+            self._semaforos[fonte] = asyncio.Semaphore(self.per_source)
+        return self._semaforos[fonte]
+
+    async def get(self, url: str, fonte: Optional[str] = None, condicional: bool = True) -> Resposta:
+        """
+        GET limitado por fonte (padrão: host da URL); 304 quando nada mudou desde
+        a última captura confirmada. Os validadores da resposta só passam a valer
+        após confirmar(resposta).
+        """
+        fonte = fonte or urlsplit(url).netloc
+        estado = await db.crawler_estado.find_one({"url": url}, {"_id": 0}) if condicional else None
+        headers = {}
+        if estado:
+            if estado.get("etag"):
+                headers["If-None-Match"] = estado["etag"]
+            if estado.get("last_modified"):
+                headers["If-Modified-Since"] = estado["last_modified"]
+
+        async with self._semaforo(fonte):
+            response = await self._cliente().get(url, headers=headers)
+
+        agora = datetime.now(timezone.utc)
+        if response.status_code == 304:
+            await db.crawler_estado.update_one({"url": url}, {"$set": {"verificado_em": agora}})
+            return Resposta(status=304, nao_modificado=True)
+        response.raise_for_status()
+        return Resposta(status=response.status_code, conteudo=response.content,
+                        content_type=response.headers.get("content-type", ""),
+                        url=url, fonte=fonte,
+                        etag=response.headers.get("etag"),
+                        last_modified=response.headers.get("last-modified"))
+
+    async def confirmar(self, resposta: Resposta):
+        """Grava ETag/Last-Modified depois que o conteúdo foi processado com sucesso"""
+        if resposta.nao_modificado or not resposta.url:
+            return
+        agora = datetime.now(timezone.utc)
+        await db.crawler_estado.update_one(
+            {"url": resposta.url},
+            {"$set": {
+                "url": resposta.url,
+                "fonte": resposta.fonte,
+                "etag": resposta.etag,
+                "last_modified": resposta.last_modified,
+                "verificado_em": agora,
+                "alterado_em": agora
+            }},
+            upsert=True
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+pool = HttpPool()
+
+
+# ==================== ARMAZENAMENTO ====================
+
+_indices_prontos = False
+
+
+async def _garantir_indices():
+    global _indices_prontos
+    if _indices_prontos:
+        return
+    await db.crawler_estado.create_index("url", unique=True)
+    await db.diarios_edicoes.create_index("hash", unique=True)
+    await db.diarios_edicoes.create_index([("uf", 1), ("data_referencia", -1)])
+    await db.diarios_ocorrencias.create_index([("edicao_hash", 1), ("chave", 1), ("posicao", 1)], unique=True)
+    await db.diarios_ocorrencias.create_index([("chave", 1), ("data_referencia", -1)])
+    await db.diarios_monitorados.create_index("chave", unique=True)
+    _indices_prontos = True
+
+
+def _caminho(hash_hex: str, extensao: str) -> Path:
+    return DIARIOS_DIR / hash_hex[:2] / f"{hash_hex}.{extensao}.gz"
+
+
+def _gravar_comprimido(caminho: Path, dados: bytes):
+    if caminho.exists():
+        return
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(caminho.suffix + ".tmp")
+    with gzip.open(temporario, "wb", compresslevel=6) as destino:
+        destino.write(dados)
+    temporario.replace(caminho)
+
+
+def _ler_comprimido(caminho: Path) -> bytes:
+    with gzip.open(caminho, "rb") as origem:
+        return origem.read()
+
+
+async def armazenar_edicao(conteudo: bytes, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Grava a edição pelo hash do conteúdo (deduplicada) e registra os metadados"""
+    await _garantir_indices()
+    hash_hex = hashlib.sha256(conteudo).hexdigest()
+    caminho = _caminho(hash_hex, "bruto")
+    await asyncio.to_thread(_gravar_comprimido, caminho, conteudo)
+    existente = await db.diarios_edicoes.find_one({"hash": hash_hex}, {"_id": 0})
+    if existente:
+        return {**existente, "nova": False}
+    edicao = {
+        **meta,
+        "hash": hash_hex,
+        "tamanho": len(conteudo),
+        "tamanho_comprimido": caminho.stat().st_size,
+        "capturado_em": datetime.now(timezone.utc),
+        "processado_em": None
+    }
+    await db.diarios_edicoes.update_one({"hash": hash_hex}, {"$setOnInsert": edicao}, upsert=True)
+    return {**edicao, "nova": True}
+
+
+# ==================== TEXTO ====================
+
+class _ExtratorHtml(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.partes: List[str] = []
+        self._ignorar = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._ignorar += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._ignorar:
+            self._ignorar -= 1
+
+    def handle_data(self, data):
+        if not self._ignorar:
+            self.partes.append(data)
+
+
+def extrair_texto(conteudo: bytes, tipo: str) -> str:
+    """Texto da edição conforme parser_type / content-type (html, pdf ou texto)"""
+    tipo = (tipo or "").lower()
+    if "pdf" in tipo or conteudo[:5] == b"%PDF-":
+        try:
+            from PyPDF2 import PdfReader
+        except ImportError:
+            raise RuntimeError("PyPDF2 não instalado: edições em PDF não podem ser lidas")
+        import io
+        leitor = PdfReader(io.BytesIO(conteudo))
+        return "\n".join(pagina.extract_text() or "" for pagina in leitor.pages)
+    for codificacao in ("utf-8", "latin-1"):
+        try:
+            texto = conteudo.decode(codificacao)
+            break
+        except UnicodeDecodeError:
+            continue
+    if "html" in tipo or texto.lstrip()[:1] == "<":
+        extrator = _ExtratorHtml()
+        extrator.feed(texto)
+        return " ".join(extrator.partes)
+    return texto
+
+
+def _texto_normalizado(hash_hex: str, tipo: str) -> str:
+    """Texto normalizado da edição, extraído uma vez e guardado ao lado do bruto"""
+    caminho_texto = _caminho(hash_hex, "txt")
+    if caminho_texto.exists():
+        return _ler_comprimido(caminho_texto).decode("utf-8")
+    texto = ident.normalizar_texto_busca(extrair_texto(_ler_comprimido(_caminho(hash_hex, "bruto")), tipo))
+    _gravar_comprimido(caminho_texto, texto.encode("utf-8"))
+    return texto
+
+
+# ==================== IDENTIFICADORES MONITORADOS ====================
+
+def _monitoravel(chave: str) -> bool:
+    tipo, _, valor = chave.partition(":")
+    if tipo == "num":
+        return len(valor) >= MIN_DIGITOS
+    if tipo == "nome":
+        return len(valor.split()) >= MIN_PALAVRAS_NOME
+    return tipo in ("oab", "email")
+
+
+async def carregar_monitorados() -> Dict[str, Set[str]]:
+    """Chave -> ids de processos vinculados (vazio para chaves só monitoradas)"""
+    monitorados: Dict[str, Set[str]] = {}
+    async for processo in db.tribunais_processos.find(
+        {"identificadores_chaves": {"$exists": True, "$ne": []}}, {"_id": 0, "id": 1, "identificadores_chaves": 1}
+    ):
+        for chave in processo["identificadores_chaves"]:
+            if _monitoravel(chave):
+                monitorados.setdefault(chave, set()).add(processo["id"])
+    async for config in db.alertas_configs.find({"habilitado": True}, {"_id": 0, "identificadores": 1}):
+        for chave in ident.chaves_identificadores(config.get("identificadores", [])):
+            if _monitoravel(chave):
+                monitorados.setdefault(chave, set())
+    async for item in db.diarios_monitorados.find({}, {"_id": 0, "chave": 1}):
+        if _monitoravel(item["chave"]):
+            monitorados.setdefault(item["chave"], set())
+    return monitorados
+
+
+async def monitorar(identificadores_brutos: Iterable[str], origem: str) -> List[str]:
+    """Registra identificadores avulsos para varredura; retorna as chaves novas"""
+    await _garantir_indices()
+    novas = []
+    for valor in identificadores_brutos:
+        chave = ident.chave_identificador(valor)
+        if not chave or not _monitoravel(chave):
+            continue
+        result = await db.diarios_monitorados.update_one(
+            {"chave": chave},
+            {"$setOnInsert": {"chave": chave, "identificador": valor, "origem": origem,
+                              "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        if getattr(result, "upserted_id", None) is not None:
+            novas.append(chave)
+    return novas
+
+
+def construir_matcher(chaves: Iterable[str]) -> ident.MatcherMultiplo:
+    matcher = ident.MatcherMultiplo()
+    for chave in chaves:
+        for padrao in ident.padroes_da_chave(chave):
+            matcher.adicionar(padrao, chave)
+    return matcher.construir()
+
+
+def _casar(texto: str, matcher: ident.MatcherMultiplo) -> List[Dict[str, Any]]:
+    ocorrencias = []
+    vistos = set()
+    for inicio, fim, chave in matcher.buscar(texto):
+        # Variantes da mesma chave podem se sobrepor (ex.: "oab/sp 123" e "sp 123")
+        if (chave, fim) in vistos:
+            continue
+        vistos.add((chave, fim))
+        ocorrencias.append({
+            "chave": chave,
+            "posicao": inicio,
+            "trecho": texto[max(0, inicio - SNIPPET_CHARS):fim + SNIPPET_CHARS]
+        })
+    return ocorrencias
+
+
+# ==================== PROCESSAMENTO ====================
+
+async def processar_edicao(edicao: Dict[str, Any], monitorados: Optional[Dict[str, Set[str]]] = None,
+                           matcher: Optional[ident.MatcherMultiplo] = None) -> int:
+    """Casa a edição com os identificadores monitorados; grava ocorrências (idempotente)"""
+    from pymongo import UpdateOne
+
+    if monitorados is None:
+        monitorados = await carregar_monitorados()
+    if not monitorados:
+        return 0
+    matcher = matcher or construir_matcher(monitorados)
+
+    def trabalho():
+        texto = _texto_normalizado(edicao["hash"], edicao.get("tipo", ""))
+        return _casar(texto, matcher)
+
+    ocorrencias = await asyncio.to_thread(trabalho)
+    agora = datetime.now(timezone.utc)
+    operacoes = [
+        UpdateOne(
+            {"edicao_hash": edicao["hash"], "chave": o["chave"], "posicao": o["posicao"]},
+            {"$setOnInsert": {
+                **o,
+                "edicao_hash": edicao["hash"],
+                "uf": edicao.get("uf"),
+                "fonte_id": edicao.get("fonte_id"),
+                "data_referencia": edicao.get("data_referencia"),
+                "processo_ids": sorted(monitorados.get(o["chave"], ())),
+                "created_at": agora
+            }},
+            upsert=True
+        )
+        for o in ocorrencias
+    ]
+    if operacoes:
+        await db.diarios_ocorrencias.bulk_write(operacoes, ordered=False)
+    await db.diarios_edicoes.update_one(
+        {"hash": edicao["hash"]},
+        {"$set": {"processado_em": agora, "total_ocorrencias": len(ocorrencias)}}
+    )
+    return len(ocorrencias)
+
+
+def _url_da_edicao(url_modelo: str, data: datetime) -> str:
+    """URL configurada aceita {data} (AAAA-MM-DD) e {data_compacta} (AAAAMMDD)"""
+    return url_modelo.format(data=data.strftime("%Y-%m-%d"), data_compacta=data.strftime("%Y%m%d"))
+
+
+async def sincronizar_fonte(config: Dict[str, Any], monitorados: Dict[str, Set[str]],
+                            matcher: ident.MatcherMultiplo, data: Optional[datetime] = None) -> Dict[str, Any]:
+    """Captura e processa a edição de uma fonte; qualquer falha fica restrita a ela"""
+    data = data or datetime.now(timezone.utc)
+    url = _url_da_edicao(config.get("url_diario", ""), data)
+    resultado = {"fonte_id": config.get("id"), "uf": config.get("uf"), "url": url}
+    try:
+        return {**resultado, **await _capturar_edicao(config, monitorados, matcher, data, url)}
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning("Falha ao sincronizar diário %s: %s", url, e)
+        await db.diarios_oficiais_configs.update_one({"id": config.get("id")}, {"$set": {"ultimo_erro": str(e)}})
+        return {**resultado, "status": "erro", "erro": str(e)}
+
+
+async def _capturar_edicao(config: Dict[str, Any], monitorados: Dict[str, Set[str]],
+                           matcher: ident.MatcherMultiplo, data: datetime, url: str) -> Dict[str, Any]:
+    resposta = await pool.get(url, fonte=f"diario:{config['uf']}")
+    if resposta.nao_modificado:
+        return {"status": "nao_modificado"}
+
+    edicao = await armazenar_edicao(resposta.conteudo, {
+        "fonte_id": config["id"],
+        "uf": config["uf"],
+        "url": url,
+        "tipo": config.get("parser_type") or resposta.content_type,
+        "data_referencia": data.strftime("%Y-%m-%d")
+    })
+    ocorrencias = 0
+    if edicao["nova"] or edicao.get("processado_em") is None:
+        ocorrencias = await processar_edicao(edicao, monitorados, matcher)
+    await pool.confirmar(resposta)
+    await db.diarios_oficiais_configs.update_one(
+        {"id": config["id"]},
+        {"$set": {"ultima_captura": datetime.now(timezone.utc).isoformat(), "ultimo_erro": None},
+         "$inc": {"total_publicacoes_capturadas": ocorrencias}}
+    )
+    return {"status": "nova" if edicao["nova"] else "duplicada",
+            "hash": edicao["hash"], "ocorrencias": ocorrencias}
+
+
+async def sincronizar_diarios(data: Optional[datetime] = None) -> Dict[str, Any]:
+    """Captura todas as fontes habilitadas em paralelo (limitadas pelo pool)"""
+    await _garantir_indices()
+    configs = await db.diarios_oficiais_configs.find({"habilitado": True}, {"_id": 0}).to_list(None)
+    monitorados = await carregar_monitorados()
+    matcher = construir_matcher(monitorados)
+    brutos = await asyncio.gather(*[
+        sincronizar_fonte(config, monitorados, matcher, data) for config in configs
+    ], return_exceptions=True)
+    resultados = [
+        {"fonte_id": config.get("id"), "uf": config.get("uf"), "status": "erro", "erro": str(r)}
+        if isinstance(r, Exception) else r
+        for config, r in zip(configs, brutos)
+    ]
+    resumo = {
+        "executado_em": datetime.now(timezone.utc).isoformat(),
+        "fontes": len(configs),
+        "identificadores_monitorados": len(monitorados),
+        "novas": sum(1 for r in resultados if r["status"] == "nova"),
+        "nao_modificadas": sum(1 for r in resultados if r["status"] == "nao_modificado"),
+        "erros": sum(1 for r in resultados if r["status"] == "erro"),
+        "ocorrencias": sum(r.get("ocorrencias", 0) for r in resultados),
+        "resultados": resultados
+    }
+    agendador.ultimo_resumo = resumo
+    logger.info("📰 Diários sincronizados: %s novas, %s ocorrências", resumo["novas"], resumo["ocorrencias"])
+    return resumo
+
+
+async def reprocessar(chaves: List[str], limite: int = REPROCESS_MAX_EDITIONS) -> int:
+    """Varre edições já armazenadas em busca de chaves recém-monitoradas"""
+    chaves = [c for c in chaves if _monitoravel(c)]
+    if not chaves:
+        return 0
+    monitorados = await carregar_monitorados()
+    alvo = {chave: monitorados.get(chave, set()) for chave in chaves}
+    matcher = construir_matcher(alvo)
+    total = 0
+    async for edicao in db.diarios_edicoes.find({}, {"_id": 0}).sort("data_referencia", -1).limit(limite):
+        try:
+            total += await processar_edicao(edicao, alvo, matcher)
+        except (OSError, RuntimeError) as e:
+            logger.warning("Falha ao reprocessar edição %s: %s", edicao["hash"], e)
+    return total
+
+
+# ==================== PORTAL OAB ====================
+
+async def consultar_portal_oab(oab: str, uf: str) -> Optional[Dict[str, Any]]:
+    """
+    Dados do advogado no portal configurado (OAB_PORTAL_URL, resposta JSON).
+    None quando não há portal configurado ou o registro não mudou (304).
+    """
+    if not OAB_PORTAL_URL:
+        return None
+    resposta = await pool.get(OAB_PORTAL_URL.format(oab=oab, uf=uf), fonte="oab")
+    if resposta.nao_modificado:
+        return None
+    import json
+    dados = json.loads(resposta.conteudo)
+    await pool.confirmar(resposta)
+    return dados
+
+
+async def renovar_cache_oab() -> int:
+    """Renova entradas do cache OAB mais antigas que OAB_CACHE_TTL"""
+    if not OAB_PORTAL_URL:
+        return 0
+    limite = (datetime.now(timezone.utc) - timedelta(seconds=OAB_CACHE_TTL_SECONDS)).isoformat()
+    antigos = await db.oab_cache.find(
+        {"sincronizado_em": {"$lt": limite}}, {"_id": 0, "oab": 1, "uf": 1}
+    ).to_list(None)
+
+    async def renovar(item):
+        try:
+            dados = await consultar_portal_oab(item["oab"], item["uf"])
+        except (httpx.HTTPError, OSError, ValueError) as e:
+            logger.warning("Falha ao renovar OAB %s/%s: %s", item["oab"], item["uf"], e)
+            return False
+        atualizacao = {"sincronizado_em": datetime.now(timezone.utc).isoformat()}
+        if dados:
+            atualizacao.update(dados)
+        await db.oab_cache.update_one({"oab": item["oab"], "uf": item["uf"]}, {"$set": atualizacao})
+        return True
+
+    return sum(await asyncio.gather(*[renovar(item) for item in antigos]))
+
+
+# ==================== AGENDADOR ====================
+
+class Agendador:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.ultimo_resumo: Optional[Dict[str, Any]] = None
+
+    async def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await pool.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await sincronizar_diarios()
+                await renovar_cache_oab()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Erro na sincronização de diários: %s", e)
+            await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ativo": self._task is not None and not self._task.done(),
+            "intervalo_segundos": SYNC_INTERVAL_SECONDS,
+            "ultimo_resumo": self.ultimo_resumo
+        }
+
+
+agendador = Agendador()
+
+
+async def ensure_started():
+    await agendador.ensure_started()
@@ -11,14 +11,16 @@ import os
 import jwt
 import hashlib
 from jwt.exceptions import InvalidTokenError
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import job_queue
 
 # Router
 forensics_router = APIRouter(prefix="/api/forensics/digital", tags=["Digital Forensics"])
 
 # MongoDB
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # JWT Secret
@@ -183,8 +185,13 @@ async def create_forensic(
         
         # Start async AI processing if enabled
         if forensic["aiAnalysis"]:
-            import asyncio
-            asyncio.create_task(process_forensic_ai(forensic_id))
+            job = await job_queue.enqueue(
+                "digital_forensics.process_forensic_ai",
+                {"forensic_id": forensic_id},
+                dedupe_key=f"digital_forensics:{forensic_id}"
+            )
+            forensic["job_id"] = job["job_id"]
+            await db.digital_forensics.update_one({"id": forensic_id}, {"$set": {"job_id": job["job_id"]}})
         
         return {
             "success": True,
@@ -239,14 +246,13 @@ async def delete_forensic(forensic_id: str, current_user: dict = Depends(get_cur
         print(f"[ERROR] Error deleting forensic: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_forensic_ai(forensic_id: str):
-    """Process forensic with AI analysis (async)"""
+async def process_forensic_ai(forensic_id: str, job=None):
+    """Process forensic with AI analysis (executado pelos workers da fila de jobs)"""
     try:
         print(f"[AI] Starting AI forensic analysis for: {forensic_id}")
         
-        # Simulate AI processing delay
-        import asyncio
-        await asyncio.sleep(5)
+        if job is not None:
+            await job.progress(10, "ai_analysis")
         
         # Simulated findings (in production, this would call actual AI)
         findings = [
@@ -315,6 +321,8 @@ async def process_forensic_ai(forensic_id: str):
             )
         except:
             pass
+        # Propaga para a fila aplicar retentativa com backoff
+        raise
 
 @forensics_router.get("/stats/overview")
 async def get_forensic_stats(current_user: dict = Depends(get_current_user)):
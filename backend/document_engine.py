@@ -0,0 +1,250 @@
+"""
+Motor de Documentos Jurídicos
+Templates compilados uma única vez (segmentos de texto e esqueleto DOCX),
+preenchimento sem re-parse, cache de sugestões de IA por hash da entrada
+e geração em lote com ZIP transmitido em streaming.
+"""
+
+import os
+import io
+import re
+import json
+import time
+import asyncio
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Any, Optional, Iterable, Tuple
+from xml.sax.saxutils import escape
+
+from ai_orchestrator import ResponseCache
+
+# Threads de renderização do lote (compressão zlib libera o GIL)
+BATCH_WORKERS = int(os.environ.get("DOCUMENT_BATCH_WORKERS", min(8, (os.cpu_count() or 1) * 2)))
+BATCH_CHUNK = 32
+MAX_BATCH_SIZE = int(os.environ.get("DOCUMENT_BATCH_MAX", 2000))
+
+MESES = [
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"
+]
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="doc-batch")
+    return _executor
+
+
+def data_extenso(data: Optional[datetime] = None) -> str:
+    data = data or datetime.now()
+    return f"{data.day} de {MESES[data.month - 1]} de {data.year}"
+
+
+# ==================== TEMPLATES DE TEXTO ====================
+
+_CAMPO_RE = re.compile(r"\{(\w+)\}|\[(Local|Data)\]")
+
+
+class TemplateTexto:
+    """
+    Template de texto pré-compilado em segmentos literais e campos.
+    Campos ausentes permanecem como "{campo}", como na substituição original.
+    """
+
+    def __init__(self, texto: str):
+        self.segmentos: List[Tuple[str, Optional[str]]] = []
+        pos = 0
+        for match in _CAMPO_RE.finditer(texto):
+            campo = match.group(1) or f"[{match.group(2)}]"
+            self.segmentos.append((texto[pos:match.start()], campo))
+            pos = match.end()
+        self.segmentos.append((texto[pos:], None))
+        self.campos = {campo for _, campo in self.segmentos if campo and not campo.startswith("[")}
+
+    def render(self, campos: Dict[str, Any], local: str = "São Paulo/SP", data: Optional[str] = None) -> str:
+        especiais = {"[Local]": local, "[Data]": data or data_extenso()}
+        partes = []
+        for literal, campo in self.segmentos:
+            partes.append(literal)
+            if campo is None:
+                continue
+            if campo in especiais:
+                partes.append(especiais[campo])
+            elif campo in campos:
+                partes.append(str(campos[campo]))
+            else:
+                partes.append(f"{{{campo}}}")
+        return "".join(partes)
+
+
+@lru_cache(maxsize=256)
+def compilar_texto(texto: str) -> TemplateTexto:
+    return TemplateTexto(texto)
+
+
+# ==================== ESQUELETO DOCX ====================
+
+_MARCA_CORPO = "__ATHENA_CORPO__"
+_MARCA_RODAPE = "__ATHENA_RODAPE__"
+
+
+class EsqueletoDocx:
+    """
+    DOCX montado uma vez com python-docx (título, estilos, rodapé) e guardado
+    como partes do pacote. O preenchimento só concatena XML nos pontos marcados.
+    """
+
+    def __init__(self, titulo: str, secoes: Optional[List[str]] = None):
+        from docx import Document
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+        doc = Document()
+        heading = doc.add_heading(titulo, level=0)
+        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        for secao in secoes or []:
+            doc.add_heading(secao, level=1)
+        doc.add_paragraph(_MARCA_CORPO)
+        footer_para = doc.sections[0].footer.paragraphs[0]
+        footer_para.text = _MARCA_RODAPE
+        footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+
+        self.partes: List[Tuple[zipfile.ZipInfo, bytes]] = []
+        self.corpo: Tuple[str, str] = ("", "")
+        self.corpo_nome = "word/document.xml"
+        self.rodape: Dict[str, Tuple[str, str]] = {}
+        with zipfile.ZipFile(buffer) as pacote:
+            for info in pacote.infolist():
+                conteudo = pacote.read(info.filename)
+                texto = None
+                if info.filename.startswith("word/") and info.filename.endswith(".xml"):
+                    texto = conteudo.decode("utf-8")
+                if texto and _MARCA_CORPO in texto:
+                    marca = texto.index(_MARCA_CORPO)
+                    inicio = max(texto.rfind("<w:p>", 0, marca), texto.rfind("<w:p ", 0, marca))
+                    fim = texto.index("</w:p>", marca) + len("</w:p>")
+                    self.corpo = (texto[:inicio], texto[fim:])
+                    self.corpo_nome = info.filename
+                elif texto and _MARCA_RODAPE in texto:
+                    self.rodape[info.filename] = tuple(texto.split(_MARCA_RODAPE, 1))
+                self.partes.append((info, conteudo))
+
+    @staticmethod
+    def _paragrafo(linha: str) -> str:
+        if not linha.strip():
+            return "<w:p/>"
+        return f'<w:p><w:r><w:t xml:space="preserve">{escape(linha)}</w:t></w:r></w:p>'
+
+    def render(self, conteudo: str, rodape: str) -> bytes:
+        corpo_xml = "".join(self._paragrafo(linha) for linha in conteudo.strip("\n").split("\n"))
+        saida = io.BytesIO()
+        with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as pacote:
+            for info, dados in self.partes:
+                if info.filename == self.corpo_nome:
+                    dados = (self.corpo[0] + corpo_xml + self.corpo[1]).encode("utf-8")
+                elif info.filename in self.rodape:
+                    prefixo, sufixo = self.rodape[info.filename]
+                    dados = (prefixo + escape(rodape) + sufixo).encode("utf-8")
+                pacote.writestr(info.filename, dados, compress_type=zipfile.ZIP_DEFLATED)
+        return saida.getvalue()
+
+
+@lru_cache(maxsize=64)
+def obter_esqueleto(titulo: str, secoes: Tuple[str, ...] = ()) -> EsqueletoDocx:
+    return EsqueletoDocx(titulo, list(secoes))
+
+
+def rodape_padrao() -> str:
+    return f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} | AP Elite - Sistema ATHENA"
+
+
+# ==================== SUGESTÕES DE IA ====================
+
+suggestion_cache = ResponseCache(
+    max_entries=int(os.environ.get("DOCUMENT_SUGGESTION_CACHE_ENTRIES", 2000)),
+    ttl_seconds=int(os.environ.get("DOCUMENT_SUGGESTION_CACHE_TTL", 7 * 24 * 3600))
+)
+
+
+def chave_sugestao(template_id: str, dados: Dict[str, Any], campos_faltantes: Iterable[str], provider: str) -> str:
+    raw = json.dumps(
+        {"template": template_id, "dados": dados, "faltantes": sorted(campos_faltantes), "provider": provider},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def obter_sugestao(chave: str) -> Optional[Dict[str, Any]]:
+    entry = await suggestion_cache.get(chave)
+    return entry["sugestoes"] if entry else None
+
+
+async def salvar_sugestao(chave: str, sugestoes: Dict[str, Any]):
+    await suggestion_cache.set(chave, {"sugestoes": sugestoes, "created_at": time.time()})
+
+
+# ==================== GERAÇÃO EM LOTE ====================
+
+class _ZipSink:
+    """Destino não-pesquisável: o ZipFile usa data descriptors e os bytes são drenados a cada lote"""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, dados: bytes) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def nome_arquivo_seguro(nome: str) -> str:
+    nome = re.sub(r"[^\w\-. ]", "", nome, flags=re.UNICODE).strip().replace(" ", "_")
+    return nome[:80] or "documento"
+
+
+async def stream_zip(itens: List[Dict[str, Any]], renderizar) -> AsyncIterator[bytes]:
+    """
+    Gera um ZIP em streaming. `renderizar(item) -> (nome_arquivo, bytes)` roda
+    em paralelo no pool de threads, em blocos de BATCH_CHUNK itens.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    sink = _ZipSink()
+    nomes_usados = set()
+
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as pacote:
+        for inicio in range(0, len(itens), BATCH_CHUNK):
+            bloco = itens[inicio:inicio + BATCH_CHUNK]
+            resultados = await asyncio.gather(*[
+                loop.run_in_executor(executor, renderizar, item) for item in bloco
+            ])
+            for nome, dados in resultados:
+                base, ext = os.path.splitext(nome)
+                sequencia = 1
+                while nome in nomes_usados:
+                    sequencia += 1
+                    nome = f"{base}_{sequencia}{ext}"
+                nomes_usados.add(nome)
+                # DOCX já é comprimido internamente
+                compressao = zipfile.ZIP_STORED if ext == ".docx" else zipfile.ZIP_DEFLATED
+                pacote.writestr(nome, dados, compress_type=compressao)
+            yield sink.drenar()
+    yield sink.drenar()
@@ -8,14 +8,14 @@ from typing import Optional
 from datetime import datetime, timezone
 import uuid
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 # Router
 library_complete_router = APIRouter(prefix="/api/library", tags=["Document Library"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # Categories
@@ -9,16 +9,20 @@ from typing import List, Optional, Dict, Any
 import os
 import json
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from pydantic import BaseModel
 from ai_orchestrator import ai_orchestrator
 import hashlib
+import logging
+import library_index
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/library", tags=["Document Library"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 # Diretório para biblioteca de documentos
@@ -71,6 +75,32 @@ def calculate_file_hash(file_path: str) -> str:
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
+MEDIA_TYPES = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.txt': 'text/plain'
+}
+
+def _index_record(doc: dict) -> dict:
+    return {"doc_id": str(doc['_id']), "file_path": doc['file_path'], "file_hash": doc.get('file_hash')}
+
+async def _apply_index_results(result: dict):
+    """Marca no banco os documentos com texto completo indexado"""
+    from bson import ObjectId
+    
+    now = datetime.now().isoformat()
+    for item in result["indexed"]:
+        await db.document_library.update_one(
+            {"_id": ObjectId(item["doc_id"])},
+            {"$set": {"text_indexed": True, "text_indexed_at": now,
+                      "text_terms": item["terms"], "text_error": None}}
+        )
+    for item in result["errors"]:
+        await db.document_library.update_one(
+            {"_id": ObjectId(item["doc_id"])},
+            {"$set": {"text_indexed": False, "text_error": item["error"]}}
+        )
+
 @router.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -80,8 +110,9 @@ async def upload_document(
 ):
     """Upload de documento para a biblioteca"""
     
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Apenas arquivos PDF são aceitos")
+    extension = os.path.splitext(file.filename)[1].lower()
+    if extension not in library_index.SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Apenas arquivos PDF, DOCX e TXT são aceitos")
     
     if category not in DOCUMENT_CATEGORIES:
         raise HTTPException(status_code=400, detail=f"Categoria inválida. Use: {list(DOCUMENT_CATEGORIES.keys())}")
@@ -118,7 +149,18 @@ async def upload_document(
     }
     
     result = await db.document_library.insert_one(document)
-    document['id'] = str(result.inserted_id)
+    document['id'] = str(document.pop('_id'))
+    
+    # Indexação do texto completo (falha não impede o upload)
+    try:
+        index_result = await library_index.index_documents([
+            {"doc_id": document['id'], "file_path": file_path, "file_hash": file_hash}
+        ])
+        await _apply_index_results(index_result)
+        document['text_indexed'] = bool(index_result["indexed"])
+    except Exception as e:
+        logger.warning(f"Falha ao indexar {file.filename}: {e}")
+        document['text_indexed'] = False
     
     return {
         "success": True,
@@ -201,7 +243,7 @@ async def download_document(document_id: str):
     
     return FileResponse(
         doc['file_path'],
-        media_type='application/pdf',
+        media_type=MEDIA_TYPES.get(os.path.splitext(doc['file_path'])[1].lower(), 'application/octet-stream'),
         filename=doc['filename']
     )
 
@@ -220,20 +262,23 @@ async def analyze_document(document_id: str, request: AnalysisRequest):
     if not doc:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
-    # Extrair texto do PDF (primeiras 5 páginas para análise)
+    # Extrair texto do PDF (primeiras 5 páginas para análise); DOCX/TXT por inteiro
     try:
-        with open(doc['file_path'], 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            text_content = ""
-            max_pages = min(5, len(pdf_reader.pages))
-            
-            for page_num in range(max_pages):
-                page = pdf_reader.pages[page_num]
-                text_content += page.extract_text()
-            
-            if not text_content.strip():
-                raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF")
-    
+        if doc['file_path'].lower().endswith('.pdf'):
+            with open(doc['file_path'], 'rb') as f:
+                pdf_reader = PyPDF2.PdfReader(f)
+                text_content = ""
+                max_pages = min(5, len(pdf_reader.pages))
+
+                for page_num in range(max_pages):
+                    page = pdf_reader.pages[page_num]
+                    text_content += page.extract_text()
+        else:
+            text_content = library_index.extract_text(doc['file_path'])
+
+        if not text_content.strip():
+            raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF")
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar PDF: {str(e)}")
     
@@ -292,16 +337,38 @@ async def search_documents(query: SearchQuery):
     if query.tags:
         db_query['tags'] = {'$in': query.tags}
     
-    # Busca por texto no nome e descrição
-    if query.query:
-        db_query['$or'] = [
-            {'filename': {'$regex': query.query, '$options': 'i'}},
-            {'description': {'$regex': query.query, '$options': 'i'}},
-            {'key_topics': {'$regex': query.query, '$options': 'i'}}
-        ]
+    documents = []
     
-    cursor = db.document_library.find(db_query).limit(query.limit)
-    documents = await cursor.to_list(length=query.limit)
+    # Texto completo: ranqueamento BM25 no índice invertido, filtros aplicados no banco
+    if query.query:
+        from bson import ObjectId
+        
+        ranked = await library_index.search(query.query)
+        if ranked:
+            scores = {r["doc_id"]: r["score"] for r in ranked}
+            candidates = await db.document_library.find(
+                {**db_query, "_id": {"$in": [ObjectId(r["doc_id"]) for r in ranked]}}
+            ).to_list(length=None)
+            candidates.sort(key=lambda d: scores[str(d['_id'])], reverse=True)
+            documents = candidates[:query.limit]
+            snippets = await library_index.snippets([str(d['_id']) for d in documents], query.query)
+            for doc in documents:
+                doc['score'] = scores[str(doc['_id'])]
+                doc['snippet'] = snippets.get(str(doc['_id']))
+    
+    # Busca por texto no nome e descrição (documentos ainda sem texto indexado)
+    if len(documents) < query.limit:
+        if query.query:
+            db_query['$or'] = [
+                {'filename': {'$regex': query.query, '$options': 'i'}},
+                {'description': {'$regex': query.query, '$options': 'i'}},
+                {'key_topics': {'$regex': query.query, '$options': 'i'}}
+            ]
+        found = {d['_id'] for d in documents}
+        if found:
+            db_query['_id'] = {'$nin': list(found)}
+        remaining = query.limit - len(documents)
+        documents += await db.document_library.find(db_query).limit(remaining).to_list(length=remaining)
     
     for doc in documents:
         doc['id'] = str(doc.pop('_id'))
@@ -339,6 +406,7 @@ async def get_library_statistics():
     
     total_docs = await db.document_library.count_documents({})
     indexed_docs = await db.document_library.count_documents({"indexed": True})
+    text_indexed_docs = await db.document_library.count_documents({"text_indexed": True})
     
     # Documentos por categoria
     pipeline = [
@@ -361,6 +429,8 @@ async def get_library_statistics():
     return {
         "total_documents": total_docs,
         "indexed_documents": indexed_docs,
+        "text_indexed_documents": text_indexed_docs,
+        "full_text_index": await library_index.stats(),
         "by_category": by_category,
         "total_analyses": total_analyses,
         "categories_available": DOCUMENT_CATEGORIES
@@ -390,49 +460,47 @@ async def delete_document(document_id: str):
     # Remover análises associadas
     await db.document_analyses.delete_many({"document_id": document_id})
     
+    await library_index.remove(document_id)
+    
     return {
         "success": True,
         "message": "Documento removido da biblioteca"
     }
 
 @router.post("/batch-index")
-async def batch_index_documents(category: Optional[str] = None):
-    """Indexa documentos em lote usando IA"""
+async def batch_index_documents(category: Optional[str] = None, force: bool = False):
+    """Indexa o texto completo de todos os documentos em paralelo (um processo por núcleo)"""
     
-    query = {"indexed": False}
+    query = {}
     if category:
         query['category'] = category
     
-    cursor = db.document_library.find(query).limit(10)
-    documents = await cursor.to_list(length=10)
-    
-    results = []
-    
-    for doc in documents:
-        try:
-            # Analisar documento
-            analysis_result = await analyze_document(
-                str(doc['_id']),
-                AnalysisRequest(
-                    document_id=str(doc['_id']),
-                    analysis_type='comprehensive'
-                )
-            )
-            
-            results.append({
-                "document_id": str(doc['_id']),
-                "filename": doc['filename'],
-                "success": True
-            })
-        except Exception as e:
-            results.append({
-                "document_id": str(doc['_id']),
-                "filename": doc['filename'],
-                "success": False,
-                "error": str(e)
-            })
+    documents = await db.document_library.find(
+        query, {"_id": 1, "filename": 1, "file_path": 1, "file_hash": 1}
+    ).to_list(length=None)
+    filenames = {str(doc['_id']): doc['filename'] for doc in documents}
+    
+    index_result = await library_index.index_documents([_index_record(doc) for doc in documents], force=force)
+    await _apply_index_results(index_result)
+    
+    results = [
+        {"document_id": item["doc_id"], "filename": filenames.get(item["doc_id"]), "success": True,
+         "terms": item["terms"]}
+        for item in index_result["indexed"]
+    ] + [
+        {"document_id": item["doc_id"], "filename": filenames.get(item["doc_id"]), "success": False,
+         "error": item["error"]}
+        for item in index_result["errors"]
+    ]
     
     return {
         "processed": len(results),
+        "skipped": index_result["skipped"],
         "results": results
     }
+
+@router.get("/index/status")
+async def get_index_status():
+    """Estado do índice invertido (documentos, termos distintos, tamanho em disco)"""
+    
+    return await library_index.stats()
@@ -5,19 +5,23 @@ Backend completo para geração de documentos profissionais
 
 from fastapi import APIRouter, Depends, HTTPException, Body
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional, List
 import os
 import uuid
 import json
 
+from fastapi.responses import StreamingResponse
+
+import document_engine
+
 router = APIRouter(prefix="/api/documentos", tags=["Documentos Jurídicos"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[DB_NAME]
 
 security = HTTPBearer(auto_error=False)
@@ -514,15 +518,13 @@ async def gerar_documento(
                 detail=f"Campo obrigatório não preenchido: {campo['label']}"
             )
     
-    # Gerar documento
-    conteudo = template["template"]
-    for key, value in campos.items():
-        conteudo = conteudo.replace(f"{{{key}}}", str(value))
-    
-    # Adicionar data e local padrão
+    # Gerar documento (template pré-compilado, com data e local padrão)
     now = datetime.now()
-    conteudo = conteudo.replace("[Local]", campos.get("local", "São Paulo/SP"))
-    conteudo = conteudo.replace("[Data]", now.strftime("%d de %B de %Y"))
+    conteudo = document_engine.compilar_texto(template["template"]).render(
+        campos,
+        local=campos.get("local", "São Paulo/SP"),
+        data=now.strftime("%d de %B de %Y")
+    )
     
     # Salvar no banco
     documento_id = str(uuid.uuid4())
@@ -545,6 +547,111 @@ async def gerar_documento(
         "conteudo": conteudo
     }
 
+def _campos_faltantes(template: dict, campos: dict) -> List[str]:
+    return [
+        campo["label"] for campo in template["campos"]
+        if campo["obrigatorio"] and not campos.get(campo["nome"])
+    ]
+
+@router.post("/gerar/lote")
+async def gerar_documentos_lote(
+    data: dict = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Gera documentos em lote (ex.: procurações/contratos para uma lista de clientes)
+    e retorna um ZIP transmitido em streaming.
+    
+    Body: template_id, clientes (lista de campos por cliente),
+    campos_comuns (opcional), formato "docx" ou "txt", salvar (bool)
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Autenticação necessária")
+    
+    template_id = data.get("template_id")
+    clientes = data.get("clientes") or []
+    campos_comuns = data.get("campos_comuns") or {}
+    formato = data.get("formato", "docx")
+    
+    if template_id not in TEMPLATES_DOCUMENTOS:
+        raise HTTPException(status_code=404, detail="Template não encontrado")
+    if formato not in ("docx", "txt"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Use docx ou txt")
+    if not clientes:
+        raise HTTPException(status_code=400, detail="Lista de clientes vazia")
+    if len(clientes) > document_engine.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lote excede o limite de {document_engine.MAX_BATCH_SIZE} documentos"
+        )
+    
+    template = TEMPLATES_DOCUMENTOS[template_id]
+    
+    # Validar todos os clientes antes de iniciar o streaming
+    itens = []
+    erros = []
+    for indice, cliente in enumerate(clientes):
+        campos = {**campos_comuns, **cliente}
+        faltantes = _campos_faltantes(template, campos)
+        if faltantes:
+            erros.append({"indice": indice, "campos_faltantes": faltantes})
+        itens.append({"indice": indice, "campos": campos})
+    
+    if erros:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Campos obrigatórios não preenchidos", "erros": erros[:50], "total_erros": len(erros)}
+        )
+    
+    # Compilação única do template e do esqueleto DOCX para todo o lote
+    compilado = document_engine.compilar_texto(template["template"])
+    esqueleto = document_engine.obter_esqueleto(template["nome"]) if formato == "docx" else None
+    campo_nome = next((c["nome"] for c in template["campos"] if c["tipo"] == "text"), None)
+    now = datetime.now()
+    data_documento = now.strftime("%d de %B de %Y")
+    rodape = document_engine.rodape_padrao()
+    
+    for item in itens:
+        item["conteudo"] = compilado.render(
+            item["campos"],
+            local=item["campos"].get("local", "São Paulo/SP"),
+            data=data_documento
+        )
+    
+    def renderizar(item: dict):
+        nome = document_engine.nome_arquivo_seguro(str(item["campos"].get(campo_nome, "")))
+        nome_arquivo = f"{template_id}_{item['indice'] + 1:04d}_{nome}.{formato}"
+        if esqueleto:
+            return nome_arquivo, esqueleto.render(item["conteudo"], rodape)
+        return nome_arquivo, item["conteudo"].encode("utf-8")
+    
+    lote_id = str(uuid.uuid4())
+    if data.get("salvar", True):
+        await db.documentos_gerados.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "lote_id": lote_id,
+                "template_id": template_id,
+                "template_nome": template["nome"],
+                "conteudo": item["conteudo"],
+                "campos": item["campos"],
+                "criado_por": current_user.get("email", ""),
+                "criado_em": now.isoformat(),
+                "atualizado_em": now.isoformat()
+            }
+            for item in itens
+        ], ordered=False)
+    
+    return StreamingResponse(
+        document_engine.stream_zip(itens, renderizar),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{template_id}_lote_{now.strftime("%Y%m%d_%H%M%S")}.zip"',
+            "X-Lote-Id": lote_id,
+            "X-Total-Documentos": str(len(itens))
+        }
+    )
+
 @router.get("/documentos")
 async def listar_documentos(
     template_id: Optional[str] = None,
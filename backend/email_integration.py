@@ -5,19 +5,16 @@ SMTP Generic + SendGrid Support
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional, List
 import uuid
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+import mail_outbox
+from mail_outbox import get_smtp_config, is_configured
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
@@ -35,45 +32,25 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 email_router = APIRouter(prefix="/api/email")
 
-def get_smtp_config():
-    """Get SMTP configuration from environment or database"""
-    return {
-        "host": os.environ.get("SMTP_HOST", "smtp.gmail.com"),
-        "port": int(os.environ.get("SMTP_PORT", "587")),
-        "username": os.environ.get("SMTP_USERNAME", ""),
-        "password": os.environ.get("SMTP_PASSWORD", ""),
-        "use_tls": os.environ.get("SMTP_USE_TLS", "true").lower() == "true"
-    }
-
-async def send_smtp_email(to_email: str, subject: str, body: str, html_body: str = None):
-    """Send email via SMTP"""
-    config = get_smtp_config()
-    
-    if not config["username"] or not config["password"]:
+async def queue_email(to_email: str, subject: str, body: str, html_body: str = None,
+                      sent_by: str = None, template: str = None):
+    """Enfileira o e-mail na caixa de saída; o log acompanha o estado de entrega"""
+    if not is_configured():
         raise HTTPException(status_code=400, detail="SMTP not configured. Please set SMTP credentials in .env")
     
-    msg = MIMEMultipart('alternative')
-    msg['From'] = config["username"]
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    
-    # Add plain text
-    msg.attach(MIMEText(body, 'plain'))
-    
-    # Add HTML if provided
-    if html_body:
-        msg.attach(MIMEText(html_body, 'html'))
-    
-    try:
-        server = smtplib.SMTP(config["host"], config["port"])
-        if config["use_tls"]:
-            server.starttls()
-        server.login(config["username"], config["password"])
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    # O log é gravado antes para que o worker sempre encontre o registro a atualizar
+    email_log = {
+        "id": str(uuid.uuid4()),
+        "to": to_email,
+        "subject": subject,
+        **({"template": template} if template else {"body": body}),
+        "sent_by": sent_by,
+        "sent_at": datetime.now(timezone.utc).isoformat(),
+        "status": "queued"
+    }
+    await db.email_logs.insert_one(email_log)
+    await mail_outbox.enqueue(to_email, subject, body, html_body, id=email_log["id"], sent_by=sent_by)
+    return email_log
 
 @email_router.post("/send")
 async def send_email(email_data: dict, current_user: dict = Depends(get_current_user)):
@@ -89,23 +66,41 @@ async def send_email(email_data: dict, current_user: dict = Depends(get_current_
     if not to_email or not subject or not body:
         raise HTTPException(status_code=400, detail="Missing required fields: to, subject, body")
     
-    # Send email
-    success = await send_smtp_email(to_email, subject, body, html_body)
+    email_log = await queue_email(to_email, subject, body, html_body, sent_by=current_user.get("email"))
     
-    # Log email
-    email_log = {
-        "id": str(uuid.uuid4()),
-        "to": to_email,
-        "subject": subject,
-        "body": body,
-        "sent_by": current_user.get("email"),
-        "sent_at": datetime.now(timezone.utc).isoformat(),
-        "status": "sent" if success else "failed"
-    }
+    return {"message": "Email queued for delivery", "email_id": email_log["id"], "status": "queued"}
+
+@email_router.post("/send-bulk")
+async def send_bulk_email(bulk_data: dict, current_user: dict = Depends(get_current_user)):
+    """Enfileira vários e-mails de uma vez (entregues em lotes pelo pool SMTP)"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
     
-    await db.email_logs.insert_one(email_log)
+    if not is_configured():
+        raise HTTPException(status_code=400, detail="SMTP not configured. Please set SMTP credentials in .env")
     
-    return {"message": "Email sent successfully", "email_id": email_log["id"]}
+    messages = bulk_data.get("messages", [])
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    for message in messages:
+        if not message.get("to") or not message.get("subject") or not message.get("body"):
+            raise HTTPException(status_code=400, detail="Missing required fields: to, subject, body")
+    
+    sent_by = current_user.get("email")
+    now = datetime.now(timezone.utc).isoformat()
+    logs = [
+        {"id": str(uuid.uuid4()), "to": m["to"], "subject": m["subject"], "body": m["body"],
+         "sent_by": sent_by, "sent_at": now, "status": "queued"}
+        for m in messages
+    ]
+    await db.email_logs.insert_many(logs)
+    queued = await mail_outbox.enqueue_many([
+        {"id": log["id"], "to": m["to"], "subject": m["subject"], "body": m["body"],
+         "html_body": m.get("html_body"), "sent_by": sent_by}
+        for log, m in zip(logs, messages)
+    ])
+    
+    return {"message": f"{len(queued)} emails queued for delivery", "email_ids": [q["id"] for q in queued]}
 
 @email_router.post("/send-template")
 async def send_template_email(template_data: dict, current_user: dict = Depends(get_current_user)):
@@ -134,23 +129,32 @@ async def send_template_email(template_data: dict, current_user: dict = Depends(
         if html_body:
             html_body = html_body.replace(f"{{{{{key}}}}}", str(value))
     
-    # Send email
-    success = await send_smtp_email(to_email, subject, body, html_body if html_body else None)
+    email_log = await queue_email(
+        to_email, subject, body, html_body if html_body else None,
+        template=template_name, sent_by=current_user.get("email")
+    )
     
-    # Log email
-    email_log = {
-        "id": str(uuid.uuid4()),
-        "to": to_email,
-        "template": template_name,
-        "subject": subject,
-        "sent_by": current_user.get("email"),
-        "sent_at": datetime.now(timezone.utc).isoformat(),
-        "status": "sent" if success else "failed"
-    }
+    return {"message": "Email queued for delivery", "email_id": email_log["id"], "status": "queued"}
+
+@email_router.get("/outbox/stats")
+async def get_outbox_stats(current_user: dict = Depends(get_current_user)):
+    """Contagem da caixa de saída por estado e uso do pool SMTP"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
     
-    await db.email_logs.insert_one(email_log)
+    return await mail_outbox.stats()
+
+@email_router.get("/outbox/{email_id}")
+async def get_outbox_message(email_id: str, current_user: dict = Depends(get_current_user)):
+    """Estado de entrega de uma mensagem (tentativas, próximo envio, último erro)"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    message = await mail_outbox.get_message(email_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Email not found")
     
-    return {"message": "Email sent successfully", "email_id": email_log["id"]}
+    return message
 
 @email_router.get("/logs")
 async def get_email_logs(limit: int = 50, current_user: dict = Depends(get_current_user)):
@@ -201,12 +205,14 @@ async def check_email_config(current_user: dict = Depends(get_current_user)):
     
     config = get_smtp_config()
     
-    is_configured = bool(config["username"] and config["password"])
+    configured = is_configured(config)
     
     return {
-        "configured": is_configured,
+        "configured": configured,
         "host": config["host"],
         "port": config["port"],
-        "username": config["username"] if is_configured else "Not set",
-        "use_tls": config["use_tls"]
+        "username": config["username"] if configured and config["username"] else "Not set",
+        "use_tls": config["use_tls"],
+        "pool_size": mail_outbox.POOL_SIZE,
+        "max_attempts": mail_outbox.MAX_ATTEMPTS
     }
\ No newline at end of file
@@ -2,7 +2,10 @@ from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import PlainTextResponse
+from mongo_registry import get_client
+from router_loader import LazyRouterLoader, RouterSpec
+import dashboard_rollups
 import os
 import logging
 from pathlib import Path
@@ -19,7 +22,7 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Security
@@ -172,6 +175,7 @@ async def create_case(case_data: CaseCreate, current_user: dict = Depends(get_cu
         doc['estimated_completion'] = doc['estimated_completion'].isoformat()
     
     await db.cases.insert_one(doc)
+    await dashboard_rollups.notify_write("cases", doc)
     return case_obj
 
 @api_router.get("/cases")
@@ -265,6 +269,7 @@ async def create_evidence(evidence_data: EvidenceCreate, current_user: dict = De
     doc['updated_at'] = doc['updated_at'].isoformat()
     
     await db.evidence.insert_one(doc)
+    await dashboard_rollups.notify_write("evidence", doc)
     
     # Update case evidence count
     await db.cases.update_one(
@@ -303,6 +308,7 @@ async def create_financial_record(record_data: FinancialRecordCreate, current_us
     doc['updated_at'] = doc['updated_at'].isoformat()
     
     await db.financial_records.insert_one(doc)
+    await dashboard_rollups.notify_write("financial_records", doc)
     return record_obj
 
 @api_router.get("/financial", response_model=List[FinancialRecord])
@@ -673,125 +679,82 @@ async def get_admin_stats(current_user: dict = Depends(get_current_user)):
             "monthly_revenue": 0.0
         }
 
-# Import advanced features
-from advanced_features import advanced_router
-from advanced_integrations import integrations_router
-
-# Import Super ERP (18 modules)
 import sys
 sys.path.append('/app/backend')
-from super_erp import super_router
-# Import super_erp_part3 to register additional endpoints including financial
-import super_erp_part3
-from user_management import user_router
-from athena_enhanced_apis import enhanced_router
-from notifications_system import notifications_router
-from reports_generator import reports_router as reports_gen_router
-from email_integration import email_router
-from storage_integration import storage_router
-from ai_document_analysis import ai_router
-from security_features import security_router
-from backup_system import backup_router
-from hybrid_sync_system import hybrid_router
-from advanced_investigation_ai import investigation_router
-from relationship_mapping import relationships_router
-from automated_reports import reports_router as automated_reports_router
-from document_library_system import router as library_router
-from osint_enhanced import router as osint_enhanced_router
-from template_generator import router as template_router
-from rag_system import router as rag_router
-from ocr_advanced import router as ocr_router
-from media_analysis import router as media_router
-from blockchain_custody import router as blockchain_router
-from compliance_lgpd import router as compliance_router
-from workflow_automation import router as workflow_router
-from predictive_analytics import router as predictive_router
-from smart_fees import router as fees_router
-from ai_chatbot import router as chatbot_router
-from social_listening import router as social_router
-from collaboration_realtime import router as collaboration_router
-from global_search import router as search_router
-from executive_dashboard import router as executive_dashboard_router
-from deadline_manager import router as deadline_router
-from phone_interceptions_pro import router as phone_interceptions_router
-from juridico_completo import router as juridico_router
-from documentos_juridicos import router as documentos_router
-from process_analysis_complete import process_analysis_router
-from contracts_complete import contracts_router
-from document_library_complete import library_complete_router
-from automated_reports_complete import reports_complete_router
-from advanced_investigation_complete import investigation_complete_router
-from digital_forensics_complete import forensics_router
-from forensics_enhanced import forensics_enhanced_router
-from data_extraction_enhanced import router as data_extraction_router
-from evidence_processing_enhanced import router as evidence_processing_router
-from pericia_digital_pro import router as pericia_digital_router
-from interceptacoes_telematicas_pro import router as interceptacoes_telematicas_router
-from cloud_forensics_ai import router as cloud_forensics_router
-from ultra_extraction_pro import router as ultra_extraction_router
-from password_recovery_elite import router as password_recovery_router
-from data_recovery_ultimate import router as data_recovery_router
-from usb_forensics_pro import router as usb_forensics_router
-from browser_database_forensics import router as browser_db_forensics_router
-from interceptacao_elite_pro import router as interceptacao_elite_router
-from extracao_dados_elite import router as extracao_dados_elite_router
 
 # Add all routes to main app
 app.include_router(api_router)
-app.include_router(advanced_router)
-app.include_router(integrations_router)
-app.include_router(super_router)
-app.include_router(user_router)
-app.include_router(enhanced_router)
-app.include_router(notifications_router)
-app.include_router(reports_gen_router)
-app.include_router(email_router)
-app.include_router(storage_router)
-app.include_router(ai_router)
-app.include_router(security_router)
-app.include_router(backup_router)
-app.include_router(hybrid_router)
-app.include_router(investigation_router)
-app.include_router(relationships_router)
-app.include_router(automated_reports_router)
-app.include_router(library_router)
-app.include_router(osint_enhanced_router)
-app.include_router(template_router)
-app.include_router(rag_router)
-app.include_router(ocr_router)
-app.include_router(media_router)
-app.include_router(blockchain_router)
-app.include_router(compliance_router)
-app.include_router(workflow_router)
-app.include_router(predictive_router)
-app.include_router(fees_router)
-app.include_router(chatbot_router)
-app.include_router(social_router)
-app.include_router(collaboration_router)
-app.include_router(search_router)
-app.include_router(executive_dashboard_router)
-app.include_router(deadline_router)
-app.include_router(phone_interceptions_router)
-app.include_router(juridico_router)
-app.include_router(documentos_router)
-app.include_router(process_analysis_router)
-app.include_router(contracts_router)
-app.include_router(library_complete_router)
-app.include_router(reports_complete_router)
-app.include_router(investigation_complete_router)
-app.include_router(forensics_router)
-app.include_router(forensics_enhanced_router)
-app.include_router(data_extraction_router)
-app.include_router(evidence_processing_router)
-app.include_router(pericia_digital_router)
-app.include_router(interceptacoes_telematicas_router)
-app.include_router(cloud_forensics_router)
-app.include_router(ultra_extraction_router)
-app.include_router(password_recovery_router)
-app.include_router(data_recovery_router)
-app.include_router(usb_forensics_router)
-app.include_router(browser_db_forensics_router)
-app.include_router(interceptacao_elite_router)
+
+# Routers dos módulos: importados sob demanda (router_loader), na ordem abaixo
+ROUTER_SPECS = [
+    RouterSpec("advanced_features", "advanced_router", ["/api/advanced"]),
+    RouterSpec("advanced_integrations", "integrations_router", ["/api/integrations"]),
+
+    # Super ERP (18 modules); super_erp_part3 registers additional endpoints including financial
+    RouterSpec("super_erp", "super_router", ["/api/athena"], extras=["super_erp_part3"]),
+    RouterSpec("user_management", "user_router", ["/api/users"]),
+    RouterSpec("athena_enhanced_apis", "enhanced_router", ["/api/athena"]),
+    RouterSpec("notifications_system", "notifications_router", ["/api/notifications"]),
+    RouterSpec("reports_generator", "reports_router", ["/api/reports"]),
+    RouterSpec("email_integration", "email_router", ["/api/email"]),
+    RouterSpec("storage_integration", "storage_router", ["/api/storage"]),
+    RouterSpec("ai_document_analysis", "ai_router", ["/api/ai"]),
+    RouterSpec("security_features", "security_router", ["/api/security"]),
+    RouterSpec("backup_system", "backup_router", ["/api/backup"]),
+    RouterSpec("hybrid_sync_system", "hybrid_router", ["/api/hybrid"], loop_import=True),
+    RouterSpec("advanced_investigation_ai", "investigation_router", ["/api/investigation"], loop_import=True),
+    RouterSpec("relationship_mapping", "relationships_router", ["/api/relationships"], loop_import=True),
+    RouterSpec("automated_reports", "reports_router", ["/api/reports"], loop_import=True),
+    RouterSpec("document_library_system", prefixes=["/api/library"]),
+    RouterSpec("osint_enhanced", prefixes=["/api/osint"]),
+    RouterSpec("template_generator", prefixes=["/api/templates"]),
+    RouterSpec("rag_system", prefixes=["/api/rag"]),
+    RouterSpec("ocr_advanced", prefixes=["/api/ocr"]),
+    RouterSpec("media_analysis", prefixes=["/api/media"]),
+    RouterSpec("blockchain_custody", prefixes=["/api/blockchain"]),
+    RouterSpec("compliance_lgpd", prefixes=["/api/compliance"]),
+    RouterSpec("workflow_automation", prefixes=["/api/workflows"]),
+    RouterSpec("predictive_analytics", prefixes=["/api/predictive"]),
+    RouterSpec("smart_fees", prefixes=["/api/fees"]),
+    RouterSpec("ai_chatbot", prefixes=["/api/chatbot"]),
+    RouterSpec("social_listening", prefixes=["/api/social-listening"]),
+    RouterSpec("collaboration_realtime", prefixes=["/api/collaboration"]),
+    RouterSpec("global_search", prefixes=["/api/search"]),
+    RouterSpec("executive_dashboard", prefixes=["/api/athena/dashboard"]),
+    RouterSpec("deadline_manager", prefixes=["/api/athena/deadlines"]),
+    RouterSpec("phone_interceptions_pro", prefixes=["/api/athena/interceptions"]),
+    RouterSpec("juridico_completo", prefixes=["/api/juridico"]),
+    RouterSpec("documentos_juridicos", prefixes=["/api/documentos"]),
+    RouterSpec("process_analysis_complete", "process_analysis_router", ["/api/athena/process-analysis"]),
+    RouterSpec("contracts_complete", "contracts_router", ["/api/athena/contracts"]),
+    RouterSpec("document_library_complete", "library_complete_router", ["/api/library"]),
+    RouterSpec("automated_reports_complete", "reports_complete_router", ["/api/reports"]),
+    RouterSpec("advanced_investigation_complete", "investigation_complete_router", ["/api/investigation/advanced"]),
+    RouterSpec("digital_forensics_complete", "forensics_router", ["/api/forensics/digital"]),
+    RouterSpec("forensics_enhanced", "forensics_enhanced_router", ["/api/forensics/enhanced"]),
+    RouterSpec("data_extraction_enhanced", prefixes=["/api/data-extraction"]),
+    RouterSpec("evidence_processing_enhanced", prefixes=["/api/evidence"]),
+    RouterSpec("pericia_digital_pro", prefixes=["/api/pericia-digital-pro"]),
+    RouterSpec("interceptacoes_telematicas_pro", prefixes=["/api/interceptacoes-pro"]),
+    RouterSpec("cloud_forensics_ai", prefixes=["/api/cloud-forensics-ai"]),
+    RouterSpec("ultra_extraction_pro", prefixes=["/api/ultra-extraction-pro"]),
+    RouterSpec("password_recovery_elite", prefixes=["/api/password-recovery-elite"]),
+    RouterSpec("data_recovery_ultimate", prefixes=["/api/data-recovery-ultimate"]),
+    RouterSpec("usb_forensics_pro", prefixes=["/api/usb-forensics-pro"]),
+    RouterSpec("browser_database_forensics", prefixes=["/api/browser-database-forensics"]),
+    RouterSpec("interceptacao_elite_pro", prefixes=["/api/interceptacao-elite-pro"]),
+]
+
+lazy_routers = LazyRouterLoader(app, ROUTER_SPECS)
+
+@app.get("/api/admin/startup-profile")
+async def get_startup_profile(formato: str = "json", current_user: dict = Depends(get_current_user)):
+    """Tempo de importação, variação de memória e falhas de cada módulo de router"""
+    if not current_user or current_user.get("role") != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if formato in ("csv", "tsv"):
+        return PlainTextResponse(lazy_routers.profile_csv(delimiter="," if formato == "csv" else "\t"))
+    return lazy_routers.profile()
 
 # Health check
 @app.get("/")
@@ -10,13 +10,13 @@ from datetime import datetime, timezone
 import os
 import uuid
 import hashlib
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 router = APIRouter(prefix="/api/evidence", tags=["evidence_processing_enhanced"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Models
@@ -8,14 +8,16 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import dashboard_rollups
 
 router = APIRouter(prefix="/api/athena/dashboard", tags=["Executive Dashboard"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[DB_NAME]
 
 # Security
@@ -46,142 +48,61 @@ async def get_executive_dashboard(
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    # Calculate date range
-    now = datetime.now(timezone.utc)
-    
-    if period == "week":
-        start_date = now - timedelta(days=7)
-    elif period == "month":
-        start_date = now - timedelta(days=30)
-    elif period == "quarter":
-        start_date = now - timedelta(days=90)
-    elif period == "year":
-        start_date = now - timedelta(days=365)
-    else:
-        start_date = now - timedelta(days=30)
+    await dashboard_rollups.ensure_started()
     
-    # Get financial data
-    financial_pipeline = [
-        {
-            "$match": {
-                "date": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": now.isoformat()
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": "$type",
-                "total": {"$sum": "$amount"}
-            }
-        }
+    # Janelas em dias UTC: período atual (até hoje) e os três anteriores
+    today = datetime.now(timezone.utc).date()
+    days = dashboard_rollups.PERIOD_DAYS.get(period, 30)
+    windows = [
+        (today - timedelta(days=days * (k + 1) - 1), today - timedelta(days=days * k))
+        for k in range(4)
     ]
+    sums, gauges = await dashboard_rollups.engine.totals(windows)
+    current, previous = sums[0], sums[1]
     
-    financial_results = await db.financial_records.aggregate(financial_pipeline).to_list(100)
-    
-    revenue = 0
-    expenses = 0
-    for result in financial_results:
-        if result["_id"] == "income":
-            revenue = result["total"]
-        elif result["_id"] == "expense":
-            expenses = result["total"]
-    
-    # Previous period for comparison
-    prev_start = start_date - (now - start_date)
-    prev_financial = await db.financial_records.aggregate([
-        {"$match": {"date": {"$gte": prev_start.isoformat(), "$lt": start_date.isoformat()}}},
-        {"$group": {"_id": "$type", "total": {"$sum": "$amount"}}}
-    ]).to_list(100)
-    
-    prev_revenue = 0
-    for result in prev_financial:
-        if result["_id"] == "income":
-            prev_revenue = result["total"]
+    # Get financial data
+    revenue = current["revenue"]
+    expenses = current["expenses"]
+    prev_revenue = previous["revenue"]
     
     # Get cases data
-    total_cases = await db.cases.count_documents({})
-    active_cases = await db.cases.count_documents({"status": "active"})
-    new_cases = await db.cases.count_documents({
-        "created_at": {"$gte": start_date.isoformat()}
-    })
-    completed_cases = await db.cases.count_documents({
-        "status": "completed",
-        "updated_at": {"$gte": start_date.isoformat()}
-    })
+    total_cases = gauges.get("cases_total", 0)
+    active_cases = gauges.get("cases_active", 0)
+    new_cases = current["cases_new"]
+    completed_cases = current["cases_completed"]
     
     # Get clients data
-    total_clients = await db.clients.count_documents({})
-    new_clients = await db.clients.count_documents({
-        "created_at": {"$gte": start_date.isoformat()}
-    })
-    active_clients = await db.clients.count_documents({"status": "active"})
+    total_clients = gauges.get("clients_total", 0)
+    new_clients = current["clients_new"]
+    active_clients = gauges.get("clients_active", 0)
     
     # Get deadlines data
-    upcoming_deadlines = await db.deadlines.count_documents({
-        "deadline": {"$gte": now.isoformat()},
-        "completed": False
-    })
-    overdue_deadlines = await db.deadlines.count_documents({
-        "deadline": {"$lt": now.isoformat()},
-        "completed": False
-    })
-    completed_deadlines = await db.deadlines.count_documents({
-        "completed": True,
-        "updated_at": {"$gte": start_date.isoformat()}
-    })
+    overdue_deadlines, upcoming_deadlines = await dashboard_rollups.engine.deadline_split(today)
+    completed_deadlines = current["deadlines_completed"]
     
     # Get interceptions data
-    total_interceptions = await db.phone_interceptions.count_documents({})
-    critical_interceptions = await db.phone_interceptions.count_documents({
-        "relevance": "critical"
-    })
-    analyzed_interceptions = await db.phone_interceptions.count_documents({
-        "transcription": {"$ne": None, "$ne": ""}
-    })
+    total_interceptions = gauges.get("interceptions_total", 0)
+    critical_interceptions = gauges.get("interceptions_critical", 0)
+    analyzed_interceptions = gauges.get("interceptions_analyzed", 0)
     
     # Get documents data
-    received_docs = await db.documents.count_documents({
-        "status": "received",
-        "created_at": {"$gte": start_date.isoformat()}
-    })
-    pending_docs = await db.documents.count_documents({
-        "status": "pending"
-    })
-    sent_docs = await db.documents.count_documents({
-        "status": "sent",
-        "created_at": {"$gte": start_date.isoformat()}
-    })
+    received_docs = current["documents_received"]
+    pending_docs = gauges.get("documents_pending", 0)
+    sent_docs = current["documents_sent"]
     
     # Get payments data
-    payments_pipeline = [
-        {
-            "$match": {
-                "created_at": {"$gte": start_date.isoformat()}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$status",
-                "total": {"$sum": "$amount"}
-            }
-        }
-    ]
-    
-    payments_results = await db.payments.aggregate(payments_pipeline).to_list(100)
-    
-    received_payments = 0
-    pending_payments = 0
-    overdue_payments = 0
-    
-    for result in payments_results:
-        if result["_id"] == "received":
-            received_payments = result["total"]
-        elif result["_id"] == "pending":
-            pending_payments = result["total"]
-        elif result["_id"] == "overdue":
-            overdue_payments = result["total"]
+    received_payments = current["payments_received"]
+    pending_payments = current["payments_pending"]
+    overdue_payments = current["payments_overdue"]
+    
+    # Trends: receita por período e totais ao fim de cada período (do mais antigo ao atual)
+    later_cases = later_clients = 0
+    cases_trend, clients_trend = [], []
+    for window in sums:
+        cases_trend.append(total_cases - later_cases)
+        clients_trend.append(total_clients - later_clients)
+        later_cases += window["cases_new"]
+        later_clients += window["clients_new"]
     
     # Calculate team metrics (mock for now)
     team_utilization = 87
@@ -277,14 +198,31 @@ async def get_executive_dashboard(
             }
         },
         "trends": {
-            "revenue": [180000, 210000, 245000, revenue],
-            "cases": [total_cases - 10, total_cases - 7, total_cases - 3, total_cases],
-            "clients": [total_clients - 15, total_clients - 10, total_clients - 5, total_clients]
+            "revenue": [window["revenue"] for window in reversed(sums)],
+            "cases": cases_trend[::-1],
+            "clients": clients_trend[::-1]
         },
         "alerts": alerts,
         "recentActivity": recent_activity[:4]
     }
 
+@router.get("/rollups/status")
+async def get_rollups_status(current_user: dict = Depends(get_current_user)):
+    """Estado dos rollups do dashboard (última reconstrução, dias pendentes, change streams)"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    await dashboard_rollups.ensure_started()
+    return dashboard_rollups.engine.status()
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(current_user: dict = Depends(get_current_user)):
+    """Reconstrói todos os rollups a partir das coleções de origem"""
+    if not current_user or current_user.get("role") != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    await dashboard_rollups.ensure_started()
+    await dashboard_rollups.engine.rebuild()
+    return dashboard_rollups.engine.status()
+
 def _format_time_ago(date_str):
     """Format datetime string to relative time"""
     if not date_str:
@@ -13,13 +13,13 @@ import uuid
 import jwt
 import random
 import hashlib
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 router = APIRouter(prefix="/api/extracao-dados-elite", tags=["extracao_dados_elite"])
 
 # MongoDB
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Auth
@@ -0,0 +1,137 @@
+"""
+Streaming de Arquivos com suporte a HTTP Range
+Respostas de download sem carregar o arquivo inteiro em memória,
+com retomada/parcial via cabeçalho Range (RFC 9110, intervalo único)
+e revalidação condicional via If-None-Match (304).
+
+Range malformado ou com vários intervalos é ignorado (200 com o corpo inteiro);
+só um intervalo bem formado que começa além do fim do arquivo recebe 416.
+"""
+
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class IntervaloNaoSatisfazivel(ValueError):
+    """Range bem formado, mas fora do tamanho do arquivo (416)"""
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Converte "bytes=inicio-fim" em (inicio, fim) inclusivo.
+    None se malformado/múltiplo (o cabeçalho deve ser ignorado);
+    IntervaloNaoSatisfazivel se bem formado mas fora do arquivo.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    inicio, fim = match.groups()
+    if inicio == "" and fim == "":
+        return None
+    if inicio == "":
+        # Sufixo: últimos N bytes
+        tamanho = int(fim)
+        if tamanho == 0 or size == 0:
+            raise IntervaloNaoSatisfazivel(header)
+        return max(size - tamanho, 0), size - 1
+    inicio = int(inicio)
+    if fim and int(fim) < inicio:
+        return None
+    if inicio >= size:
+        raise IntervaloNaoSatisfazivel(header)
+    fim = int(fim) if fim else size - 1
+    return inicio, min(fim, size - 1)
+
+
+async def _iter_file(path: Path, inicio: int, tamanho: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(inicio)
+        restante = tamanho
+        while restante > 0:
+            bloco = await f.read(min(CHUNK_SIZE, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match: lista de ETags (comparação fraca) ou *"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaco = etag[2:] if etag.startswith("W/") else etag
+    for candidato in header.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == opaco:
+            return True
+    return False
+
+
+def range_file_response(
+    request: Request,
+    path,
+    media_type: str = "application/octet-stream",
+    filename: Optional[str] = None,
+    extra_headers: Optional[dict] = None,
+    etag: Optional[str] = None,
+):
+    """
+    FileResponse completo, 206 Partial Content quando há cabeçalho Range ou
+    304 quando If-None-Match casa com o ETag. Sem etag explícito (ex.: hash
+    do conteúdo), usa mtime e tamanho do arquivo.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+
+    stat = path.stat()
+    size = stat.st_size
+    etag = f'"{etag}"' if etag and not etag.startswith(("\"", "W/")) else etag
+    etag = etag or f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, **(extra_headers or {})}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not range_header or (if_range and if_range != etag):
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+    try:
+        intervalo = parse_range(range_header, size)
+    except IntervaloNaoSatisfazivel:
+        raise HTTPException(
+            status_code=416,
+            detail="Intervalo solicitado inválido",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    if intervalo is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+    inicio, fim = intervalo
+    tamanho = fim - inicio + 1
+    headers.update({
+        "Content-Range": f"bytes {inicio}-{fim}/{size}",
+        "Content-Length": str(tamanho),
+    })
+    return StreamingResponse(
+        _iter_file(path, inicio, tamanho),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -11,14 +11,16 @@ import os
 import jwt
 import hashlib
 from jwt.exceptions import InvalidTokenError
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import job_queue
 
 # Router
 forensics_enhanced_router = APIRouter(prefix="/api/forensics/enhanced", tags=["Forensics Enhanced"])
 
 # MongoDB
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # JWT Secret
@@ -189,10 +191,16 @@ async def create_examination(
         if '_id' in examination:
             del examination['_id']
         
-        # Start async processing
+        # Enfileira o processamento para os workers (fora do event loop da API)
         if examination["aiEnabled"] or examination["mlAnalysis"]:
-            import asyncio
-            asyncio.create_task(process_examination(exam_id))
+            job = await job_queue.enqueue(
+                "forensics_enhanced.process_examination",
+                {"exam_id": exam_id},
+                priority=job_queue.priority_from_level(priority),
+                dedupe_key=f"forensics_enhanced:{exam_id}"
+            )
+            examination["job_id"] = job["job_id"]
+            await db.forensics_enhanced.update_one({"id": exam_id}, {"$set": {"job_id": job["job_id"]}})
         
         return {
             "success": True,
@@ -528,29 +536,32 @@ async def delete_examination(exam_id: str, current_user: dict = Depends(get_curr
         print(f"[ERROR] Error deleting examination: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_examination(exam_id: str):
-    """Process examination with AI and ML (async)"""
+async def report_stage(job, percent: float, message: str):
+    """Reporta progresso ao job da fila (quando executado por um worker)"""
+    if job is not None:
+        await job.progress(percent, message)
+
+async def process_examination(exam_id: str, job=None):
+    """Process examination with AI and ML (executado pelos workers da fila de jobs)"""
     try:
         print(f"[AI/ML] Starting enhanced analysis for: {exam_id}")
         
-        import asyncio
-        
         # Stage 1: Imaging (20%)
-        await asyncio.sleep(2)
+        await report_stage(job, 20, "imaging")
         await db.forensics_enhanced.update_one(
             {"id": exam_id},
             {"$set": {"status": "imaging", "progress": 20}}
         )
         
         # Stage 2: Analysis (50%)
-        await asyncio.sleep(2)
+        await report_stage(job, 50, "analyzing")
         await db.forensics_enhanced.update_one(
             {"id": exam_id},
             {"$set": {"status": "analyzing", "progress": 50}}
         )
         
         # Stage 3: ML Processing (75%)
-        await asyncio.sleep(2)
+        await report_stage(job, 75, "ml_processing")
         ml_insights = [
             {
                 "type": "pattern_detection",
@@ -579,7 +590,7 @@ async def process_examination(exam_id: str):
         )
         
         # Stage 4: AI Analysis (100%)
-        await asyncio.sleep(1)
+        await report_stage(job, 90, "ai_analysis")
         ai_analysis = [
             {
                 "type": "file_recovery",
@@ -655,6 +666,8 @@ async def process_examination(exam_id: str):
             )
         except:
             pass
+        # Propaga para a fila aplicar retentativa com backoff
+        raise
 
 @forensics_enhanced_router.get("/stats/overview")
 async def get_examination_stats(current_user: dict = Depends(get_current_user)):
@@ -8,13 +8,13 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import asyncio
 
 router = APIRouter(prefix="/api/search", tags=["Global Search"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class GlobalSearchQuery(BaseModel):
@@ -17,7 +17,7 @@ import aiosqlite
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 from typing import Dict, List, Any, Optional
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 import psutil
 import platform
@@ -57,7 +57,7 @@ class HybridSyncManager:
             # Configurar MongoDB (nuvem)
             mongo_url = os.environ.get('MONGO_URL')
             if mongo_url:
-                self.mongo_client = AsyncIOMotorClient(mongo_url)
+                self.mongo_client = get_client(mongo_url)
                 self.mongo_db = self.mongo_client[os.environ.get('DB_NAME', 'ap_elite')]
                 self.is_online = await self.check_connection()
             
@@ -0,0 +1,194 @@
+"""
+Identificadores Normalizados - Chaves de Busca Exata e N-gramas de Nomes
+Converte CPF, CNPJ, OAB, e-mails e nomes em chaves canônicas tipadas,
+indexáveis por igualdade (índice multikey, busca O(log n)):
+- num:<dígitos>    CPF, CNPJ, número CNJ, RG e telefone sem pontuação
+- oab:<UF><número> OAB em qualquer grafia ("123.456/SP", "OAB/SP nº 123456", "SP123456")
+- email:<endereço> e-mail em minúsculas
+- nome:<texto>     nome sem acentos, minúsculo, espaços colapsados
+
+Nomes também geram trigramas para busca aproximada (modo explícito),
+ranqueada pela fração de trigramas da consulta presentes no nome.
+Cada chave também gera suas grafias em texto corrido para o casamento
+multi-padrão (Aho-Corasick) usado na varredura de Diários Oficiais.
+"""
+
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Set
+
+UFS = {
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"
+}
+
+# Similaridade mínima padrão na busca aproximada de nomes
+LIMIAR_SIMILARIDADE = 0.6
+
+# "nº", "n." ou "no" antes do número ("OAB/SP nº 123.456"); "º" vira "o" em dobrar_texto
+_OAB_NUMERO_ORDINAL = r"(?:n[o.]?\W*)?"
+_OAB_UF_NUMERO = re.compile(rf"^(?:oab)?\W*([a-z]{{2}})\W*{_OAB_NUMERO_ORDINAL}(\d[\d.]{{2,8}})([a-z]?)$")
+_OAB_NUMERO_UF = re.compile(rf"^(?:oab)?\W*{_OAB_NUMERO_ORDINAL}(\d[\d.]{{2,8}})([a-z]?)\W*([a-z]{{2}})$")
+_SO_PONTUACAO_E_DIGITOS = re.compile(r"^[\d\s.\-/()+]+$")
+_NOME = re.compile(r"^[a-z][a-z\s.'\-]*$")
+
+
+def dobrar_texto(texto: str) -> str:
+    """Remove acentos, converte para minúsculas e colapsa espaços"""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
+
+
+def _chave_oab(texto: str) -> Optional[str]:
+    match = _OAB_UF_NUMERO.match(texto)
+    if match:
+        uf, numero, sufixo = match.groups()
+    else:
+        match = _OAB_NUMERO_UF.match(texto)
+        if not match:
+            return None
+        numero, sufixo, uf = match.groups()
+    uf = uf.upper()
+    if uf not in UFS:
+        return None
+    return f"oab:{uf}{numero.replace('.', '')}{sufixo.upper()}"
+
+
+def chave_identificador(valor) -> Optional[str]:
+    """Chave canônica tipada do identificador (None se vazio)"""
+    if valor is None:
+        return None
+    texto = dobrar_texto(valor)
+    if not texto:
+        return None
+    if "@" in texto:
+        return f"email:{texto.replace(' ', '')}"
+    if _SO_PONTUACAO_E_DIGITOS.match(texto):
+        digitos = re.sub(r"\D", "", texto)
+        return f"num:{digitos}" if digitos else None
+    oab = _chave_oab(texto)
+    if oab:
+        return oab
+    if _NOME.match(texto):
+        return f"nome:{re.sub(r'[^a-z ]', '', texto).strip()}"
+    # Documentos alfanuméricos (ex.: RG com dígito X)
+    return f"doc:{re.sub(r'[^a-z0-9]', '', texto)}"
+
+
+def chaves_identificadores(valores: Iterable) -> List[str]:
+    """Chaves únicas, na ordem de entrada"""
+    chaves = []
+    vistas: Set[str] = set()
+    for valor in valores:
+        chave = chave_identificador(valor)
+        if chave and chave not in vistas:
+            vistas.add(chave)
+            chaves.append(chave)
+    return chaves
+
+
+def ngramas_nome(nome: str) -> List[str]:
+    """Trigramas das palavras do nome (com bordas), sem acentos"""
+    gramas: Set[str] = set()
+    for palavra in re.sub(r"[^a-z ]", " ", dobrar_texto(nome)).split():
+        marcada = f" {palavra} "
+        for i in range(len(marcada) - 2):
+            gramas.add(marcada[i:i + 3])
+    return sorted(gramas)
+
+
+def ngramas_de_chaves(chaves: Iterable[str]) -> List[str]:
+    """Trigramas de todas as chaves de nome"""
+    gramas: Set[str] = set()
+    for chave in chaves:
+        if chave.startswith("nome:"):
+            gramas.update(ngramas_nome(chave[5:]))
+    return sorted(gramas)
+
+
+def similaridade_nome(consulta: str, nome: str) -> float:
+    """Fração dos trigramas da consulta presentes no nome (0..1)"""
+    gramas_consulta = set(ngramas_nome(consulta))
+    if not gramas_consulta:
+        return 0.0
+    return len(gramas_consulta & set(ngramas_nome(nome))) / len(gramas_consulta)
+
+
+# ==================== CASAMENTO EM TEXTO ====================
+
+_PONTUACAO_ENTRE_DIGITOS = re.compile(r"(?<=\d)[.\-/](?=\d)")
+
+
+def normalizar_texto_busca(texto: str) -> str:
+    """Texto dobrado com pontuação entre dígitos removida (CPF/CNPJ/OAB viram dígitos contíguos)"""
+    return _PONTUACAO_ENTRE_DIGITOS.sub("", dobrar_texto(texto))
+
+
+def padroes_da_chave(chave: str) -> List[str]:
+    """Grafias da chave no texto normalizado por normalizar_texto_busca"""
+    tipo, _, valor = chave.partition(":")
+    if tipo == "oab":
+        uf, numero = valor[:2].lower(), valor[2:].lower()
+        return [
+            f"{numero}/{uf}", f"{numero}-{uf}", f"{numero} {uf}",
+            f"oab/{uf} {numero}", f"oab {uf} {numero}", f"oab/{uf} no {numero}",
+            f"oab/{uf} n. {numero}", f"oab/{uf} n {numero}", f"oab/{uf}-{numero}"
+        ]
+    return [valor] if valor else []
+
+
+class MatcherMultiplo:
+    """
+    Autômato de Aho-Corasick: encontra todas as ocorrências de muitos padrões
+    em uma única passada pelo texto (O(n + ocorrências)), com bordas de palavra.
+    """
+
+    def __init__(self):
+        self._goto: List[dict] = [{}]
+        self._falha: List[int] = [0]
+        self._saida: List[list] = [[]]
+        self.total_padroes = 0
+
+    def adicionar(self, padrao: str, valor):
+        no = 0
+        for caractere in padrao:
+            proximo = self._goto[no].get(caractere)
+            if proximo is None:
+                proximo = len(self._goto)
+                self._goto[no][caractere] = proximo
+                self._goto.append({})
+                self._falha.append(0)
+                self._saida.append([])
+            no = proximo
+        self._saida[no].append((len(padrao), valor))
+        self.total_padroes += 1
+
+    def construir(self) -> "MatcherMultiplo":
+        fila = list(self._goto[0].values())
+        for no in fila:
+            for caractere, filho in self._goto[no].items():
+                fila.append(filho)
+                falha = self._falha[no]
+                while falha and caractere not in self._goto[falha]:
+                    falha = self._falha[falha]
+                self._falha[filho] = self._goto[falha].get(caractere, 0)
+                self._saida[filho] = self._saida[filho] + self._saida[self._falha[filho]]
+        return self
+
+    def buscar(self, texto: str):
+        """Gera (inicio, fim, valor) para cada ocorrência delimitada por não-alfanuméricos"""
+        goto, falha, saida = self._goto, self._falha, self._saida
+        no = 0
+        tamanho = len(texto)
+        for i, caractere in enumerate(texto):
+            while no and caractere not in goto[no]:
+                no = falha[no]
+            no = goto[no].get(caractere, 0)
+            for comprimento, valor in saida[no]:
+                inicio = i - comprimento + 1
+                if inicio > 0 and texto[inicio - 1].isalnum():
+                    continue
+                if i + 1 < tamanho and texto[i + 1].isalnum():
+                    continue
+                yield inicio, i + 1, valor
@@ -12,13 +12,13 @@ import os
 import uuid
 import jwt
 import random
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 
 router = APIRouter(prefix="/api/interceptacao-elite-pro", tags=["interceptacao_elite_pro"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Authentication
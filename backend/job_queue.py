@@ -0,0 +1,512 @@
+"""
+Fila Durável de Jobs - Processamento Forense em Background
+Fila persistente no MongoDB com prioridades (P0-P3), leases, retentativas
+com backoff exponencial e progresso por job.
+
+Os jobs são executados por processos worker separados da API:
+
+    python job_queue.py --workers 8
+
+assim análises pesadas não disputam o processo e o event loop da API. Para
+desenvolvimento, JOB_QUEUE_INPROCESS=1 liga um laço worker no startup da
+própria API (desligado por padrão).
+
+Cada worker reivindica atomicamente o job mais prioritário (find_one_and_update),
+renova o lease enquanto executa e, em caso de falha, reagenda com backoff.
+Leases expirados (worker morto) voltam a ser reivindicados por outro worker.
+
+Com dedupe_key e rerun_if_running=True, um enqueue que encontra o job já em
+execução marca rerun_requested; ao concluir, o job volta para "queued" em vez
+de "completed" e roda de novo com os dados gravados durante a execução.
+"""
+
+import os
+import sys
+import signal
+import random
+import asyncio
+import inspect
+import logging
+import argparse
+import importlib
+import multiprocessing
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, Callable
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, ASCENDING
+
+from mongo_registry import get_client
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+JOBS_DB_NAME = os.environ.get("JOBS_DB_NAME", os.environ.get("DB_NAME", "ap_elite"))
+
+PRIORITIES = {"P0": 0, "P1": 1, "P2": 2, "P3": 3}
+LEVEL_PRIORITIES = {"critical": "P0", "high": "P1", "medium": "P2", "low": "P3"}
+LEASE_SECONDS = 60
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 900
+POLL_MIN_SECONDS = 0.2
+POLL_MAX_SECONDS = 2.0
+INPROCESS_WORKERS = os.environ.get("JOB_QUEUE_INPROCESS", "0").lower() not in ("0", "false", "no")
+INPROCESS_CONCURRENCY = int(os.environ.get("JOB_QUEUE_INPROCESS_CONCURRENCY", 2))
+INPROCESS_RESTART_SECONDS = 5
+
+logger = logging.getLogger(__name__)
+
+# job_type -> handler "modulo:funcao" (importado sob demanda no worker)
+# e nome do parâmetro que recebe o identificador da entidade processada
+HANDLERS: Dict[str, Dict[str, str]] = {
+    "forensics_enhanced.process_examination": {
+        "target": "forensics_enhanced:process_examination", "id_param": "exam_id"},
+    "digital_forensics.process_forensic_ai": {
+        "target": "digital_forensics_complete:process_forensic_ai", "id_param": "forensic_id"},
+    "relationships.analyze_network": {
+        "target": "relationship_mapping:analyze_network_background", "id_param": "network_id"},
+    "processo.indexar_paginas": {
+        "target": "autos_paginas:indexar_analise", "id_param": "analise_id"},
+}
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def register_handler(job_type: str, target: str, id_param: str = "evidence_id"):
+    """Registra um handler no formato "modulo:funcao" """
+    HANDLERS[job_type] = {"target": target, "id_param": id_param}
+
+
+def priority_from_level(level: Optional[str]) -> str:
+    """Converte prioridade textual (critical/high/medium/low) para P0-P3"""
+    return LEVEL_PRIORITIES.get((level or "").lower(), "P2")
+
+
+def get_collection():
+    """Coleção de jobs (cliente criado sob demanda no event loop atual)"""
+    global _client
+    if _client is None:
+        _client = get_client(MONGO_URL)
+    return _client[JOBS_DB_NAME].jobs
+
+
+async def ensure_indexes():
+    """Índices usados na reivindicação e nas listagens"""
+    jobs = get_collection()
+    await jobs.create_index([("job_id", ASCENDING)], unique=True)
+    await jobs.create_index([("status", ASCENDING), ("priority_rank", ASCENDING), ("run_after", ASCENDING)])
+    await jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+    await jobs.create_index([("dedupe_key", ASCENDING)], sparse=True)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _serialize(job: Dict[str, Any]) -> Dict[str, Any]:
+    job.pop("_id", None)
+    for key in ("created_at", "updated_at", "run_after", "lease_expires_at", "started_at", "completed_at"):
+        if isinstance(job.get(key), datetime):
+            job[key] = job[key].isoformat()
+    return job
+
+
+async def enqueue(
+    job_type: str,
+    payload: Dict[str, Any],
+    priority: str = "P2",
+    max_attempts: int = 3,
+    dedupe_key: Optional[str] = None,
+    delay_seconds: float = 0,
+    rerun_if_running: bool = False,
+) -> Dict[str, Any]:
+    """
+    Enfileira um job
+
+    Args:
+        job_type: Tipo registrado em HANDLERS
+        payload: Argumentos nomeados do handler
+        priority: P0 (mais urgente) a P3
+        dedupe_key: Se informado, não cria outro job ativo com a mesma chave
+        rerun_if_running: Se o job da chave já estiver rodando, executa-o de novo ao terminar
+    """
+    if job_type not in HANDLERS:
+        raise ValueError(f"Tipo de job não registrado: {job_type}")
+    if priority not in PRIORITIES:
+        raise ValueError(f"Prioridade inválida: {priority}")
+
+    jobs = get_collection()
+    if dedupe_key:
+        existing = await jobs.find_one({"dedupe_key": dedupe_key, "status": {"$in": ["queued", "running"]}})
+        if existing and rerun_if_running and existing["status"] == "running":
+            marked = await jobs.update_one(
+                {"job_id": existing["job_id"], "status": "running"},
+                {"$set": {"rerun_requested": True, "updated_at": _now()}}
+            )
+            if marked.matched_count:
+                existing["rerun_requested"] = True
+                return _serialize(existing)
+            # Terminou entre a consulta e a marcação: cria um novo job
+        elif existing:
+            return _serialize(existing)
+
+    now = _now()
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "job_type": job_type,
+        "payload": payload,
+        "priority": priority,
+        "priority_rank": PRIORITIES[priority],
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_after": now + timedelta(seconds=delay_seconds),
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "progress": 0,
+        "progress_message": None,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    if dedupe_key:
+        job["dedupe_key"] = dedupe_key
+    await jobs.insert_one(job)
+    return _serialize(job)
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = await get_collection().find_one({"job_id": job_id})
+    return _serialize(job) if job else None
+
+
+async def list_jobs(
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    job_type: Optional[str] = None,
+    limit: int = 100,
+) -> list:
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status
+    if priority:
+        query["priority"] = priority
+    if job_type:
+        query["job_type"] = job_type
+    jobs = await get_collection().find(query).sort("created_at", -1).to_list(limit)
+    return [_serialize(j) for j in jobs]
+
+
+async def retry(job_id: str) -> Optional[Dict[str, Any]]:
+    """Recoloca na fila um job falho ou cancelado, zerando as tentativas"""
+    job = await get_collection().find_one_and_update(
+        {"job_id": job_id, "status": {"$in": ["failed", "cancelled"]}},
+        {"$set": {
+            "status": "queued",
+            "attempts": 0,
+            "run_after": _now(),
+            "error": None,
+            "progress": 0,
+            "updated_at": _now(),
+        }},
+        return_document=ReturnDocument.AFTER,
+    )
+    return _serialize(job) if job else None
+
+
+async def cancel(job_id: str) -> Optional[Dict[str, Any]]:
+    """Cancela um job ainda não iniciado"""
+    job = await get_collection().find_one_and_update(
+        {"job_id": job_id, "status": "queued"},
+        {"$set": {"status": "cancelled", "updated_at": _now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return _serialize(job) if job else None
+
+
+async def stats() -> Dict[str, Any]:
+    by_status = {s: 0 for s in ("queued", "running", "completed", "failed", "cancelled")}
+    by_priority: Dict[str, int] = {}
+    async for row in get_collection().aggregate([
+        {"$group": {"_id": {"status": "$status", "priority": "$priority"}, "count": {"$sum": 1}}}
+    ]):
+        by_status[row["_id"]["status"]] = by_status.get(row["_id"]["status"], 0) + row["count"]
+        if row["_id"]["status"] == "queued":
+            by_priority[row["_id"]["priority"]] = row["count"]
+    return {"total_jobs": sum(by_status.values()), **by_status, "queued_by_priority": by_priority,
+            "inprocess_worker": inprocess_worker.status()}
+
+
+# ==================== WORKER ====================
+
+class JobContext:
+    """Passado ao handler (parâmetro `job`) para reportar progresso"""
+
+    def __init__(self, job: Dict[str, Any], worker_id: str):
+        self.job_id = job["job_id"]
+        self.attempt = job["attempts"]
+        self.payload = job["payload"]
+        self.worker_id = worker_id
+
+    async def progress(self, percent: float, message: Optional[str] = None):
+        """Atualiza o progresso e renova o lease"""
+        await get_collection().update_one(
+            {"job_id": self.job_id, "lease_owner": self.worker_id},
+            {"$set": {
+                "progress": round(percent, 2),
+                "progress_message": message,
+                "lease_expires_at": _now() + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": _now(),
+            }},
+        )
+
+
+async def claim(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Reivindica atomicamente o próximo job (prioridade, depois ordem de chegada)"""
+    now = _now()
+    return await get_collection().find_one_and_update(
+        {"$or": [
+            {"status": "queued", "run_after": {"$lte": now}},
+            {"status": "running", "lease_expires_at": {"$lt": now},
+             "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "started_at": now,
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority_rank", ASCENDING), ("run_after", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def reap_expired() -> int:
+    """Marca como falhos jobs cujo worker morreu na última tentativa permitida"""
+    now = _now()
+    result = await get_collection().update_many(
+        {"status": "running", "lease_expires_at": {"$lt": now},
+         "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+        {"$set": {
+            "status": "failed",
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "error": "Lease expirado: worker interrompido durante a execução",
+            "completed_at": now,
+            "updated_at": now,
+        }},
+    )
+    return result.modified_count
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Backoff exponencial com jitter: base * 2^(tentativa-1), limitado"""
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempt - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def resolve_handler(job_type: str) -> Callable:
+    module_name, function_name = HANDLERS[job_type]["target"].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+async def _heartbeat(job_id: str, worker_id: str):
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        await get_collection().update_one(
+            {"job_id": job_id, "lease_owner": worker_id},
+            {"$set": {"lease_expires_at": _now() + timedelta(seconds=LEASE_SECONDS)}},
+        )
+
+
+async def execute(job: Dict[str, Any], worker_id: str):
+    """Executa um job reivindicado e registra conclusão ou falha"""
+    jobs = get_collection()
+    owner = {"job_id": job["job_id"], "lease_owner": worker_id}
+    heartbeat = asyncio.create_task(_heartbeat(job["job_id"], worker_id))
+    try:
+        handler = resolve_handler(job["job_type"])
+        kwargs = dict(job["payload"])
+        if "job" in inspect.signature(handler).parameters:
+            kwargs["job"] = JobContext(job, worker_id)
+        if inspect.iscoroutinefunction(handler):
+            result = await handler(**kwargs)
+        else:
+            result = await asyncio.to_thread(handler, **kwargs)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if job["attempts"] < job["max_attempts"]:
+            await jobs.update_one(owner, {"$set": {
+                "status": "queued",
+                "rerun_requested": False,
+                "run_after": _now() + timedelta(seconds=backoff_seconds(job["attempts"])),
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "error": error,
+                "updated_at": _now(),
+            }})
+        else:
+            await jobs.update_one(owner, {"$set": {
+                "status": "failed",
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "error": error,
+                "completed_at": _now(),
+                "updated_at": _now(),
+            }})
+        return
+    finally:
+        heartbeat.cancel()
+
+    completed = await jobs.update_one({**owner, "rerun_requested": {"$ne": True}}, {"$set": {
+        "status": "completed",
+        "progress": 100,
+        "result": result if isinstance(result, (dict, list, str, int, float, bool)) else None,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "error": None,
+        "completed_at": _now(),
+        "updated_at": _now(),
+    }})
+    if not completed.matched_count:
+        # Reexecução pedida durante a execução (enqueue com rerun_if_running)
+        await jobs.update_one({**owner, "rerun_requested": True}, {"$set": {
+            "status": "queued",
+            "rerun_requested": False,
+            "attempts": 0,
+            "run_after": _now(),
+            "progress": 0,
+            "result": result if isinstance(result, (dict, list, str, int, float, bool)) else None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": _now(),
+        }})
+
+
+async def worker_loop(worker_id: str, concurrency: int = 1, stopping: Optional[asyncio.Event] = None):
+    """
+    Laço do worker: reivindica e executa até receber SIGTERM/SIGINT ou,
+    quando roda dentro da API, até `stopping` ser sinalizado
+    """
+    if stopping is None:
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    await ensure_indexes()
+    running: set = set()
+    idle = POLL_MIN_SECONDS
+    while not stopping.is_set():
+        if len(running) >= concurrency:
+            await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            running = {t for t in running if not t.done()}
+            continue
+        job = await claim(worker_id)
+        if job is None:
+            await reap_expired()
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=idle)
+            except asyncio.TimeoutError:
+                pass
+            idle = min(idle * 2, POLL_MAX_SECONDS)
+            continue
+        idle = POLL_MIN_SECONDS
+        running.add(asyncio.create_task(execute(job, worker_id)))
+    # Termina os jobs em andamento antes de sair
+    if running:
+        await asyncio.wait(running)
+
+
+class InProcessWorker:
+    """Laço worker dentro do processo da API (reiniciado se o laço cair)"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def ensure_started(self) -> bool:
+        if not INPROCESS_WORKERS:
+            return False
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    async def _run(self):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:api"
+        while not self._stopping.is_set():
+            try:
+                await worker_loop(worker_id, INPROCESS_CONCURRENCY, self._stopping)
+            except Exception as e:
+                logger.error("Erro no worker da fila de jobs: %s", e)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=INPROCESS_RESTART_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def stop(self, timeout: float = 30):
+        """Para de reivindicar jobs e aguarda os em andamento (o lease cobre o resto)"""
+        if self._task is None or self._task.done():
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": INPROCESS_WORKERS,
+            "running": self._task is not None and not self._task.done(),
+            "concurrency": INPROCESS_CONCURRENCY
+        }
+
+
+inprocess_worker = InProcessWorker()
+
+
+def ensure_started() -> bool:
+    """Inicia o worker embutido na API (se JOB_QUEUE_INPROCESS estiver ativo)"""
+    return inprocess_worker.ensure_started()
+
+
+def _worker_main(index: int, concurrency: int):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    asyncio.run(worker_loop(worker_id, concurrency))
+
+
+def run_workers(count: Optional[int] = None, concurrency: int = 1):
+    """Inicia `count` processos worker (padrão: um por núcleo)"""
+    count = count or os.cpu_count() or 1
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_worker_main, args=(i, concurrency)) for i in range(count)]
+    for p in processes:
+        p.start()
+
+    def forward(signum, frame):
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Workers da fila de jobs AP Elite")
+    parser.add_argument("--workers", type=int, default=None, help="Processos worker (padrão: núcleos da CPU)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs simultâneos por processo")
+    args = parser.parse_args()
+    run_workers(args.workers, args.concurrency)
@@ -4,7 +4,7 @@ Backend avançado para gestão jurídica profissional com JWT e RBAC
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Body, UploadFile, File, Header
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, validator
@@ -19,7 +19,7 @@ logger = logging.getLogger(__name__)
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[DB_NAME]
 
 # Security - Usar JWT do módulo security
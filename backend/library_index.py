@@ -0,0 +1,404 @@
+"""
+Índice Invertido da Biblioteca de Documentos (BM25)
+Extrai o texto completo de PDF, DOCX e TXT num pool de processos (um por
+núcleo), normaliza (minúsculas, sem acentos), remove stopwords e reduz cada
+palavra ao radical com um stemmer leve de português. As listas invertidas
+ficam em disco (SQLite em LIBRARY_INDEX_DIR/index.db, tabela postings
+term → doc_id, tf), e o texto extraído em text/<doc_id>.txt.gz para os
+trechos destacados dos resultados.
+
+Ranqueamento BM25 (k1=1.2, b=0.75). A reindexação pula documentos cujo
+hash não mudou desde a última indexação, salvo force=True; o hash gravado
+leva a versão do analisador (ANALYZER_VERSION), então uma mudança no stemmer
+faz a próxima reindexação refazer os documentos indexados com a regra antiga.
+"""
+
+import os
+import re
+import gzip
+import html
+import asyncio
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from math import log
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from identificadores import dobrar_texto
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(os.environ.get("LIBRARY_INDEX_DIR", "/app/backend/document_library/.index"))
+INDEX_WORKERS = int(os.environ.get("LIBRARY_INDEX_WORKERS", os.cpu_count() or 1))
+WRITE_BATCH = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_TOKENS = 30
+# Incrementar ao mudar normalização/stopwords/stemmer
+ANALYZER_VERSION = 3
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+STOPWORDS = set("""
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles
+depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes
+eu foi foram ha isso isto ja lhe lhes mais mas me mesmo meu meus minha minhas muito na nas nem
+no nos nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual quando que
+quem se sem ser seu seus si so sua suas tambem te tem tinha tu tua tuas um uma umas uns voce
+voces vos sao sobre the of and to in is for on
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+# ==================== NORMALIZAÇÃO ====================
+
+# Sufixos por etapa (RSLP simplificado): (sufixo, tamanho mínimo do radical, substituição)
+# Exceções como no RSLP (Orengo & Huyck), já sem acentos: palavras terminadas
+# em -s que não são plurais, e plurais que não seguem a regra -is -> -il
+_NAO_PLURAIS = frozenset("""
+alias pires lapis cais mais mas menos ferias fezes pesames crucis gas atras moises atraves
+conves pais apos ambas ambos messias depois pois dois onibus virus bonus tenis
+""".split())
+_EXCECOES_IS = frozenset("leis biquinis".split())
+_PLURAL = [("ns", 1, "m"), ("oes", 1, "ao"), ("aes", 1, "ao"), ("ais", 1, "al"), ("eis", 2, "el"),
+           ("ois", 1, "ol"), ("is", 3, "il", _EXCECOES_IS), ("les", 3, "l"), ("res", 3, "r"), ("s", 2, "")]
+_FEMININO = [("ona", 3, "ao"), ("ora", 3, "or"), ("ina", 3, "inho"), ("esa", 3, "es"),
+             ("osa", 3, "oso"), ("ica", 3, "ico"), ("ada", 2, "ado"), ("ida", 3, "ido"),
+             ("iva", 3, "ivo"), ("eira", 3, "eiro")]
+_NOMINAL = [("amentos", 3, ""), ("imentos", 3, ""), ("amento", 3, ""), ("imento", 3, ""),
+            ("acoes", 3, ""), ("icoes", 3, ""), ("acao", 3, ""), ("icao", 3, ""), ("mente", 4, ""),
+            ("idades", 4, ""), ("idade", 4, ""), ("ismos", 3, ""), ("ismo", 3, ""), ("istas", 3, ""),
+            ("ista", 3, ""), ("encia", 3, ""), ("ancia", 3, ""), ("avel", 2, ""), ("ivel", 3, ""),
+            ("ivos", 3, ""), ("ivo", 3, ""), ("ador", 3, ""), ("edor", 3, ""), ("idor", 4, ""),
+            ("izar", 5, ""), ("ado", 2, ""), ("ido", 3, ""), ("oso", 3, ""), ("ico", 3, ""),
+            ("ica", 3, ""), ("al", 4, "")]
+_VERBAL = [("aram", 2, ""), ("eram", 3, ""), ("iram", 3, ""), ("ando", 2, ""), ("endo", 3, ""),
+           ("indo", 3, ""), ("ava", 2, ""), ("ria", 3, ""), ("ar", 2, ""), ("er", 2, ""),
+           ("ir", 3, ""), ("ou", 3, ""), ("am", 2, ""), ("em", 2, "")]
+_VOGAL = [("a", 3, ""), ("e", 3, ""), ("o", 3, "")]
+
+
+def _strip(word: str, rules: List[Tuple]) -> Tuple[str, bool]:
+    """Regras (sufixo, radical mínimo, substituição[, exceções])"""
+    for suffix, min_stem, replacement, *exceptions in rules:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            if exceptions and word in exceptions[0]:
+                continue
+            return word[:-len(suffix)] + replacement, True
+    return word, False
+
+
+def stem(word: str) -> str:
+    """Radical de uma palavra já sem acentos e em minúsculas"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word not in _NAO_PLURAIS:
+        word, _ = _strip(word, _PLURAL)
+    word, _ = _strip(word, _FEMININO)
+    word, changed = _strip(word, _NOMINAL)
+    if not changed:
+        word, changed = _strip(word, _VERBAL)
+    if not changed:
+        word, _ = _strip(word, _VOGAL)
+    return word
+
+
+@lru_cache(maxsize=200_000)
+def normalize_token(word: str) -> Optional[str]:
+    if len(word) < 2 or word in STOPWORDS:
+        return None
+    return stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    """Termos indexáveis do texto (sem acento, sem stopwords, radicalizados)"""
+    terms = []
+    for word in _TOKEN.findall(dobrar_texto(text)):
+        term = normalize_token(word)
+        if term:
+            terms.append(term)
+    return terms
+
+
+# ==================== EXTRAÇÃO (PROCESSOS) ====================
+
+def extract_text(file_path: str) -> str:
+    extension = Path(file_path).suffix.lower()
+    if extension == ".pdf":
+        import PyPDF2
+        with open(file_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if extension == ".docx":
+        import docx
+        document = docx.Document(file_path)
+        parts = [p.text for p in document.paragraphs]
+        for table in document.tables:
+            for row in table.rows:
+                parts.append(" ".join(cell.text for cell in row.cells))
+        return "\n".join(parts)
+    if extension == ".txt":
+        raw = Path(file_path).read_bytes()
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return raw.decode("latin-1")
+    raise ValueError(f"Formato não suportado para indexação: {extension}")
+
+
+def text_path(doc_id: str) -> Path:
+    return INDEX_DIR / "text" / f"{doc_id}.txt.gz"
+
+
+def _extract_worker(doc_id: str, file_path: str) -> Dict[str, Any]:
+    """Executado no pool: extrai, grava o texto e devolve as frequências dos termos"""
+    try:
+        text = extract_text(file_path)
+        target = text_path(doc_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_suffix(".tmp")
+        with gzip.open(temp, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp, target)
+        terms = tokenize(text)
+        return {"doc_id": doc_id, "tf": dict(Counter(terms)), "length": len(terms),
+                "characters": len(text), "error": None}
+    except Exception as e:
+        return {"doc_id": doc_id, "tf": {}, "length": 0, "characters": 0, "error": f"{type(e).__name__}: {e}"}
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=INDEX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ==================== ARMAZENAMENTO ====================
+
+class InvertedIndex:
+    """Listas invertidas em SQLite; um escritor por vez, leituras concorrentes (WAL)"""
+
+    def __init__(self, directory: Path = INDEX_DIR):
+        self.directory = directory
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.directory / "index.db", check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL,
+                    file_hash TEXT, indexed_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def write(self, entries: List[Dict[str, Any]]):
+        """Substitui as listas dos documentos informados numa única transação"""
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                for entry in entries:
+                    conn.execute("DELETE FROM postings WHERE doc_id = ?", (entry["doc_id"],))
+                    conn.executemany(
+                        "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                        ((term, entry["doc_id"], tf) for term, tf in entry["tf"].items())
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO docs (doc_id, length, file_hash, indexed_at) VALUES (?, ?, ?, ?)",
+                        (entry["doc_id"], entry["length"], entry.get("file_hash"), datetime.now().isoformat())
+                    )
+
+    def remove(self, doc_id: str):
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+        text_path(doc_id).unlink(missing_ok=True)
+
+    def indexed_hashes(self) -> Dict[str, Optional[str]]:
+        return dict(self._connect().execute("SELECT doc_id, file_hash FROM docs"))
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        documents, average = conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+        terms = conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+        db_file = self.directory / "index.db"
+        return {
+            "documents": documents,
+            "average_length": round(average or 0, 1),
+            "distinct_terms": terms,
+            "size_bytes": db_file.stat().st_size if db_file.exists() else 0
+        }
+
+    def score(self, terms: List[str]) -> Dict[str, float]:
+        """Pontuação BM25 de todos os documentos que contêm algum dos termos"""
+        terms = list(dict.fromkeys(terms))
+        if not terms:
+            return {}
+        conn = self._connect()
+        total, average = conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+        if not total:
+            return {}
+        placeholders = ",".join("?" * len(terms))
+        df = dict(conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ))
+        scores: Dict[str, float] = {}
+        rows = conn.execute(
+            f"SELECT p.term, p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id "
+            f"WHERE p.term IN ({placeholders})", terms
+        )
+        for term, doc_id, tf, length in rows:
+            idf = log(1 + (total - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (average or 1)))
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        return scores
+
+
+index = InvertedIndex()
+
+
+# ==================== TRECHOS ====================
+
+def highlight(text: str, terms: Iterable[str], width: int = SNIPPET_TOKENS) -> Optional[str]:
+    """Janela do texto com mais termos distintos da consulta, destacados com <mark>"""
+    wanted = set(terms)
+    words = list(_WORD.finditer(text))
+    hits = [i for i, m in enumerate(words) if normalize_token(dobrar_texto(m.group())) in wanted]
+    if not words:
+        return None
+    if not hits:
+        start = 0
+    else:
+        best, start = -1, hits[0]
+        for i in hits:
+            window = {normalize_token(dobrar_texto(words[j].group())) for j in hits if i <= j < i + width}
+            if len(window) > best:
+                best, start = len(window), i
+        start = max(0, start - width // 4)
+    end = min(len(words), start + width)
+    hit_set = set(hits)
+    pieces, cursor = [], words[start].start()
+    for i in range(start, end):
+        match = words[i]
+        pieces.append(html.escape(text[cursor:match.start()]))
+        word = html.escape(match.group())
+        pieces.append(f"<mark>{word}</mark>" if i in hit_set else word)
+        cursor = match.end()
+    result = " ".join("".join(pieces).split())
+    return ("… " if start > 0 else "") + result + (" …" if end < len(words) else "")
+
+
+def snippet(doc_id: str, terms: Iterable[str], width: int = SNIPPET_TOKENS) -> Optional[str]:
+    path = text_path(doc_id)
+    if not path.exists():
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return highlight(f.read(), terms, width)
+
+
+# ==================== OPERAÇÕES ====================
+
+def _index_hash(file_hash: Optional[str]) -> Optional[str]:
+    return f"v{ANALYZER_VERSION}:{file_hash}" if file_hash else None
+
+
+async def index_documents(documents: List[Dict[str, Any]], force: bool = False) -> Dict[str, Any]:
+    """
+    documents: registros com doc_id, file_path e file_hash. Extração em paralelo
+    (um processo por núcleo) e gravação em lotes conforme os resultados chegam.
+    """
+    loop = asyncio.get_running_loop()
+    known = {} if force else await asyncio.to_thread(index.indexed_hashes)
+    pending = [
+        d for d in documents
+        if force or d["doc_id"] not in known or known[d["doc_id"]] != _index_hash(d.get("file_hash"))
+    ]
+    skipped = len(documents) - len(pending)
+    executor = _get_executor()
+    hashes = {d["doc_id"]: _index_hash(d.get("file_hash")) for d in pending}
+    futures = [loop.run_in_executor(executor, _extract_worker, d["doc_id"], d["file_path"]) for d in pending]
+
+    indexed, errors, batch = [], [], []
+    for future in asyncio.as_completed(futures):
+        result = await future
+        if result["error"]:
+            errors.append({"doc_id": result["doc_id"], "error": result["error"]})
+            continue
+        result["file_hash"] = hashes[result["doc_id"]]
+        batch.append(result)
+        if len(batch) >= WRITE_BATCH:
+            await asyncio.to_thread(index.write, batch)
+            indexed.extend(batch)
+            batch = []
+    if batch:
+        await asyncio.to_thread(index.write, batch)
+        indexed.extend(batch)
+
+    if indexed or errors:
+        logger.info("📚 Biblioteca indexada: %s documentos, %s erros, %s inalterados",
+                    len(indexed), len(errors), skipped)
+    return {
+        "indexed": [{"doc_id": r["doc_id"], "terms": r["length"], "characters": r["characters"]} for r in indexed],
+        "errors": errors,
+        "skipped": skipped
+    }
+
+
+async def search(query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Documentos ordenados por BM25: [{doc_id, score}]"""
+    terms = tokenize(query)
+    scores = await asyncio.to_thread(index.score, terms)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if limit:
+        ranked = ranked[:limit]
+    return [{"doc_id": doc_id, "score": round(score, 4)} for doc_id, score in ranked]
+
+
+async def snippets(doc_ids: List[str], query: str) -> Dict[str, Optional[str]]:
+    terms = tokenize(query)
+    results = await asyncio.gather(*(asyncio.to_thread(snippet, doc_id, terms) for doc_id in doc_ids))
+    return dict(zip(doc_ids, results))
+
+
+async def remove(doc_id: str):
+    await asyncio.to_thread(index.remove, doc_id)
+
+
+async def stats() -> Dict[str, Any]:
+    return {**await asyncio.to_thread(index.stats), "workers": INDEX_WORKERS}
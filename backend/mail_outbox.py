@@ -0,0 +1,439 @@
+"""
+Caixa de Saída de E-mails - Fila Persistente com Pool SMTP
+As mensagens são gravadas em email_outbox e entregues por um worker
+assíncrono (aiosmtplib) que mantém um pool de sessões SMTP autenticadas,
+envia lotes de mensagens por conexão e reagenda falhas temporárias com
+backoff exponencial. Cada mensagem guarda seu estado de entrega
+(queued → sending → sent | retrying | failed), tentativas e último erro;
+o resultado final também é refletido em email_logs.
+
+O worker roda no próprio processo da API (iniciado no startup, para entregar
+mensagens que ficaram na fila antes de um restart; MAIL_OUTBOX_AUTOSTART=0
+desliga) ou isolado:
+
+    python mail_outbox.py
+
+Vários workers podem coexistir: cada mensagem é reivindicada atomicamente
+com lease (find_one_and_update), como na job_queue. O lease cobre algumas
+vezes o SMTP_TIMEOUT e é renovado antes de cada envio do lote, então um lote
+longo não expira no meio e é reivindicado (e enviado) por outro worker.
+Para testes locais, um sink aiosmtpd sem autenticação:
+
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_USE_TLS=false SMTP_AUTH=false
+"""
+
+import os
+import uuid
+import random
+import socket
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional
+
+import aiosmtplib
+from pymongo import ASCENDING, ReturnDocument
+
+from mongo_registry import get_client
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+client = get_client(MONGO_URL)
+db = client.ap_elite
+
+POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 4))
+BATCH_PER_CONNECTION = int(os.environ.get("SMTP_BATCH_PER_CONNECTION", 20))
+IDLE_SECONDS = int(os.environ.get("SMTP_IDLE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("SMTP_MAX_ATTEMPTS", 6))
+# Mínimo; o efetivo é max(LEASE_SECONDS, LEASE_TIMEOUTS * SMTP_TIMEOUT), renovado por mensagem
+LEASE_SECONDS = 120
+LEASE_TIMEOUTS = 4
+AUTOSTART = os.environ.get("MAIL_OUTBOX_AUTOSTART", "1") not in ("0", "false", "no")
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+POLL_MIN_SECONDS = 0.5
+POLL_MAX_SECONDS = 5.0
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def get_smtp_config():
+    """Get SMTP configuration from environment or database"""
+    username = os.environ.get("SMTP_USERNAME", "")
+    return {
+        "host": os.environ.get("SMTP_HOST", "smtp.gmail.com"),
+        "port": int(os.environ.get("SMTP_PORT", "587")),
+        "username": username,
+        "password": os.environ.get("SMTP_PASSWORD", ""),
+        "use_tls": os.environ.get("SMTP_USE_TLS", "true").lower() == "true",
+        "auth": os.environ.get("SMTP_AUTH", "true").lower() == "true",
+        "from": os.environ.get("SMTP_FROM", username or "noreply@localhost"),
+        "timeout": float(os.environ.get("SMTP_TIMEOUT", 30))
+    }
+
+
+def is_configured(config: Optional[Dict[str, Any]] = None) -> bool:
+    config = config or get_smtp_config()
+    return bool(config["username"] and config["password"]) or not config["auth"]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def lease_seconds(config: Dict[str, Any]) -> float:
+    """Tempo para conectar/autenticar e enviar uma mensagem, com folga"""
+    return max(LEASE_SECONDS, LEASE_TIMEOUTS * config["timeout"])
+
+
+def backoff_seconds(attempt: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempt - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ==================== ENFILEIRAMENTO ====================
+
+def build_message(doc: Dict[str, Any], sender: str) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['From'] = doc.get("from") or sender
+    msg['To'] = doc["to"]
+    msg['Subject'] = doc["subject"]
+    msg['Message-ID'] = f"<{doc['id']}@{sender.split('@')[-1] or 'localhost'}>"
+    msg.attach(MIMEText(doc["body"], 'plain'))
+    if doc.get("html_body"):
+        msg.attach(MIMEText(doc["html_body"], 'html'))
+    return msg
+
+
+def _new_message(to: str, subject: str, body: str, html_body: Optional[str] = None,
+                 id: Optional[str] = None, **meta) -> Dict[str, Any]:
+    now = _now()
+    return {
+        "id": id or str(uuid.uuid4()),
+        "to": to,
+        "subject": subject,
+        "body": body,
+        "html_body": html_body,
+        **meta,
+        "status": "queued",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "lease_until": None,
+        "worker_id": None,
+        "last_error": None,
+        "created_at": now,
+        "sent_at": None
+    }
+
+
+async def enqueue(to: str, subject: str, body: str, html_body: Optional[str] = None, **meta) -> Dict[str, Any]:
+    """Grava a mensagem na caixa de saída e acorda o worker; meta pode trazer o id (o mesmo do email_logs)"""
+    doc = _new_message(to, subject, body, html_body, **meta)
+    await db.email_outbox.insert_one(doc)
+    await ensure_started()
+    worker.wake()
+    doc.pop("_id", None)
+    return doc
+
+
+async def enqueue_many(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """messages: dicts com to, subject, body, html_body e metadados opcionais (inclusive id)"""
+    docs = [_new_message(**m) for m in messages]
+    if docs:
+        await db.email_outbox.insert_many(docs, ordered=False)
+        await ensure_started()
+        worker.wake()
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs
+
+
+async def get_message(message_id: str) -> Optional[Dict[str, Any]]:
+    return await db.email_outbox.find_one({"id": message_id}, {"_id": 0, "body": 0, "html_body": 0})
+
+
+async def stats() -> Dict[str, Any]:
+    rows = await db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None)
+    return {
+        "by_status": {row["_id"]: row["count"] for row in rows},
+        "pool": worker.pool.stats(),
+        "worker_id": WORKER_ID,
+        "running": worker.running
+    }
+
+
+# ==================== POOL SMTP ====================
+
+class SmtpPool:
+    """Sessões SMTP autenticadas reutilizadas entre lotes; ociosas são encerradas"""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._idle: List[Any] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.connects = 0
+
+    async def _connect(self, config: Dict[str, Any]):
+        smtp = aiosmtplib.SMTP(
+            hostname=config["host"],
+            port=config["port"],
+            start_tls=config["use_tls"],
+            timeout=config["timeout"]
+        )
+        await smtp.connect()
+        if config["auth"] and config["username"]:
+            await smtp.login(config["username"], config["password"])
+        smtp.last_used = _now()
+        self.connects += 1
+        return smtp
+
+    async def acquire(self, config: Dict[str, Any]):
+        await self._semaphore.acquire()
+        try:
+            while self._idle:
+                smtp = self._idle.pop()
+                if smtp.is_connected and (_now() - smtp.last_used).total_seconds() < IDLE_SECONDS:
+                    return smtp
+                await self._close(smtp)
+            return await self._connect(config)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def release(self, smtp, broken: bool = False):
+        if broken or not smtp.is_connected:
+            asyncio.ensure_future(self._close(smtp))
+        else:
+            smtp.last_used = _now()
+            self._idle.append(smtp)
+        self._semaphore.release()
+
+    async def _close(self, smtp):
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def close_idle(self, max_idle: float = IDLE_SECONDS):
+        keep = []
+        for smtp in self._idle:
+            if (_now() - smtp.last_used).total_seconds() >= max_idle:
+                await self._close(smtp)
+            else:
+                keep.append(smtp)
+        self._idle = keep
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "idle": len(self._idle), "connects": self.connects}
+
+
+# ==================== WORKER ====================
+
+class _Permanent(Exception):
+    pass
+
+
+def _classify(error: Exception) -> bool:
+    """True se a falha é permanente para a mensagem (5xx no envelope/dados)"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(getattr(r, "code", 0) >= 500 for r in error.recipients)
+    if isinstance(error, (aiosmtplib.SMTPAuthenticationError, aiosmtplib.SMTPServerDisconnected,
+                          aiosmtplib.SMTPConnectError)):
+        return False
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code >= 500
+    return False
+
+
+def _connection_error(error: Exception) -> bool:
+    return isinstance(error, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError,
+                              aiosmtplib.SMTPTimeoutError, ConnectionError, OSError))
+
+
+class OutboxWorker:
+    def __init__(self):
+        self.pool = SmtpPool()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._indexes_ready = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def wake(self):
+        self._wake.set()
+
+    async def ensure_started(self):
+        if self.running:
+            return
+        async with self._start_lock:
+            if self.running:
+                return
+            if not self._indexes_ready:
+                await db.email_outbox.create_index("id", unique=True)
+                await db.email_outbox.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+                self._indexes_ready = True
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.pool.close_idle(max_idle=0)
+
+    async def claim(self, lease: float = LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        now = _now()
+        doc = await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": {"$in": ["queued", "retrying"]}, "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {"status": "sending", "worker_id": WORKER_ID,
+                      "lease_until": now + timedelta(seconds=lease)},
+             "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+
+    async def claim_batch(self, limit: int, lease: float = LEASE_SECONDS) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            doc = await self.claim(lease)
+            if doc is None:
+                break
+            batch.append(doc)
+        return batch
+
+    async def _renew(self, docs: List[Dict[str, Any]], lease: float):
+        """Estende o lease das mensagens ainda pendentes do lote"""
+        await db.email_outbox.update_many(
+            {"id": {"$in": [doc["id"] for doc in docs]}, "worker_id": WORKER_ID, "status": "sending"},
+            {"$set": {"lease_until": _now() + timedelta(seconds=lease)}}
+        )
+
+    async def _finish(self, doc: Dict[str, Any], error: Optional[Exception] = None, response: Optional[str] = None):
+        now = _now()
+        if error is None:
+            update = {"status": "sent", "sent_at": now, "smtp_response": response, "last_error": None}
+        elif _classify(error) or doc["attempts"] >= MAX_ATTEMPTS:
+            update = {"status": "failed", "failed_at": now, "last_error": str(error)}
+        else:
+            update = {"status": "retrying", "last_error": str(error),
+                      "next_attempt_at": now + timedelta(seconds=backoff_seconds(doc["attempts"]))}
+        await db.email_outbox.update_one(
+            {"id": doc["id"], "worker_id": WORKER_ID},
+            {"$set": {**update, "lease_until": None}}
+        )
+        if update["status"] in ("sent", "failed"):
+            await db.email_logs.update_one(
+                {"id": doc["id"]},
+                {"$set": {"status": update["status"], "delivered_at": now.isoformat(),
+                          "error": update.get("last_error")}}
+            )
+
+    async def _send_batch(self, config: Dict[str, Any], batch: List[Dict[str, Any]]):
+        """Envia um lote numa mesma sessão; reconecta uma vez se a conexão cair no meio"""
+        pending = list(batch)
+        reconnects = 0
+        lease = lease_seconds(config)
+        while pending:
+            await self._renew(pending, lease)
+            try:
+                smtp = await self.pool.acquire(config)
+            except Exception as e:
+                for doc in pending:
+                    await self._finish(doc, e)
+                return
+            broken = False
+            try:
+                while pending:
+                    doc = pending[0]
+                    await self._renew(pending, lease)
+                    try:
+                        errors, response = await smtp.send_message(build_message(doc, config["from"]))
+                        if errors:
+                            raise aiosmtplib.SMTPRecipientsRefused(
+                                [aiosmtplib.SMTPRecipientRefused(code, message, rcpt)
+                                 for rcpt, (code, message) in errors.items()]
+                            )
+                        await self._finish(doc, response=response)
+                        pending.pop(0)
+                    except Exception as e:
+                        if _connection_error(e):
+                            broken = True
+                            raise
+                        await self._finish(doc, e)
+                        pending.pop(0)
+                        if smtp.is_connected:
+                            await smtp.rset()
+            except Exception as e:
+                reconnects += 1
+                if reconnects > 1:
+                    for doc in pending:
+                        await self._finish(doc, e)
+                    return
+            finally:
+                self.pool.release(smtp, broken=broken)
+
+    async def run_once(self) -> int:
+        """Reivindica e entrega um ciclo de mensagens; devolve quantas foram processadas"""
+        config = get_smtp_config()
+        batch = await self.claim_batch(self.pool.size * BATCH_PER_CONNECTION, lease_seconds(config))
+        if not batch:
+            return 0
+        per_connection = -(-len(batch) // self.pool.size)
+        groups = [batch[i:i + per_connection] for i in range(0, len(batch), per_connection)]
+        await asyncio.gather(*(self._send_batch(config, group) for group in groups))
+        return len(batch)
+
+    async def _run(self):
+        delay = POLL_MIN_SECONDS
+        while True:
+            try:
+                processed = await self.run_once()
+                if processed:
+                    delay = POLL_MIN_SECONDS
+                    continue
+                await self.pool.close_idle()
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                    delay = POLL_MIN_SECONDS
+                except asyncio.TimeoutError:
+                    delay = min(delay * 2, POLL_MAX_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Erro na caixa de saída de e-mails: %s", e)
+                await asyncio.sleep(POLL_MAX_SECONDS)
+
+
+worker = OutboxWorker()
+
+
+async def ensure_started():
+    await worker.ensure_started()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        await worker.ensure_started()
+        await worker._task
+
+    asyncio.run(_main())
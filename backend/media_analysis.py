@@ -9,13 +9,13 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
 
 router = APIRouter(prefix="/api/media", tags=["Media Analysis"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 MEDIA_DIR = "/app/backend/media_uploads"
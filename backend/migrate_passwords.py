@@ -3,7 +3,7 @@ Script de migração de senhas para hash bcrypt
 EXECUTAR UMA VEZ para migrar senhas de texto plano para hash
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import os
 import sys
 
@@ -19,7 +19,7 @@ async def migrate_passwords():
     MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
     DB_NAME = os.environ.get('DB_NAME', 'test_database')
     
-    client = AsyncIOMotorClient(MONGO_URL)
+    client = get_client(MONGO_URL)
     db = client[DB_NAME]
     
     print("🔐 Iniciando migração de senhas para hash bcrypt...")
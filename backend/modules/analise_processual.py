@@ -2,7 +2,7 @@
 Módulo: Análise Processual Profissional
 Sistema avançado de análise jurídica com IA - Jurisprudência, Riscos e Desfechos
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
@@ -14,6 +14,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 # MongoDB connection
 from server import db
+import autos_paginas
+import job_queue
 
 router = APIRouter(prefix="/api/processo", tags=["Análise Processual"])
 
@@ -195,31 +197,24 @@ async def upload_documento(
     if not analise:
         raise HTTPException(status_code=404, detail="Análise não encontrada")
     
-    # Criar diretório para documentos
-    doc_dir = f"/tmp/processos/{analise_id}"
-    os.makedirs(doc_dir, exist_ok=True)
-    
-    # Salvar arquivo
-    file_path = f"{doc_dir}/{file.filename}"
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
-    # Calcular hashes
-    sha256 = hashlib.sha256(content).hexdigest()
-    sha512 = hashlib.sha512(content).hexdigest()
-    
-    # Simular BLAKE3 (não está disponível por padrão)
-    blake3 = hashlib.sha256(content + b"blake3").hexdigest()
+    # Salvar arquivo em streaming, calculando os hashes durante a gravação.
+    # Cada volume fica na pasta do seu id: outro upload com o mesmo nome
+    # ("autos.pdf") não sobrescreve um volume já registrado
+    documento_id = str(uuid.uuid4())
+    file_path = os.path.join(autos_paginas.AUTOS_DIR, analise_id, documento_id, os.path.basename(file.filename))
+    gravado = await autos_paginas.salvar_upload(file, file_path)
+    hashes = gravado["hashes"]
+    sha256 = hashes["sha256"]
     
     documento = {
-        "id": str(uuid.uuid4()),
+        "id": documento_id,
         "filename": file.filename,
+        "path": file_path,
         "tipo": tipo,
-        "size": len(content),
-        "sha256": sha256,
-        "sha512": sha512,
-        "blake3": blake3,
+        "size": gravado["size"],
+        **hashes,
+        "paginas": None,
+        "indexacao": None,
         "uploaded_at": datetime.now(timezone.utc).isoformat()
     }
     
@@ -243,69 +238,95 @@ async def upload_documento(
         }
     )
     
+    # Novo volume em PDF: indexação incremental das páginas em background
+    # (se já houver uma em andamento, ela roda de novo ao terminar para incluir este volume)
+    job = None
+    if file.filename.lower().endswith(".pdf"):
+        job = await job_queue.enqueue(
+            "processo.indexar_paginas", {"analise_id": analise_id},
+            dedupe_key=f"processo.indexar_paginas:{analise_id}",
+            rerun_if_running=True
+        )
+    
     return {
         "message": "Documento enviado com sucesso",
         "documento_id": documento["id"],
-        "hashes": {
-            "sha256": sha256,
-            "sha512": sha512,
-            "blake3": blake3
-        }
+        "hashes": hashes,
+        "indexacao_job_id": job["job_id"] if job else None
     }
 
 @router.post("/analises/{analise_id}/indexar")
-async def indexar_processo(analise_id: str):
+async def indexar_processo(analise_id: str, aguardar: bool = False):
     """
-    Indexação e extração de timeline
-    OCR + extração de metadados + datas-marco
+    Indexação página a página dos autos
+    Camada de texto de cada página + OCR das páginas digitalizadas, incremental
+    (só volumes/páginas novos ou alterados). Por padrão roda na fila de jobs;
+    aguardar=true executa na própria requisição.
     """
     analise = await db.analises_processuais.find_one({"id": analise_id})
     if not analise:
         raise HTTPException(status_code=404, detail="Análise não encontrada")
     
-    # Simular extração de datas-marco
-    datas_marco = {
-        "fato": "2023-05-15",
-        "denuncia": "2023-06-10",
-        "recebimento": "2023-07-01",
-        "audiencia": "2023-09-20",
-        "sentenca": None,
-        "transito": None
-    }
+    if not aguardar:
+        job = await job_queue.enqueue(
+            "processo.indexar_paginas", {"analise_id": analise_id},
+            dedupe_key=f"processo.indexar_paginas:{analise_id}",
+            rerun_if_running=True
+        )
+        return {"message": "Indexação enfileirada", "job_id": job["job_id"], "status": job["status"]}
     
-    # Simular fases processuais
-    fases = [
-        {"fase": "Inquérito", "inicio": "2023-05-15", "fim": "2023-06-09"},
-        {"fase": "Denúncia", "inicio": "2023-06-10", "fim": "2023-07-01"},
-        {"fase": "Instrução", "inicio": "2023-07-02", "fim": None}
-    ]
+    resumo = await autos_paginas.indexar_analise(analise_id)
     
     timeline_event = {
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "evento": "Indexação concluída",
-        "detalhes": "OCR executado, metadados extraídos, timeline montada",
+        "detalhes": f"{resumo['total_paginas']} páginas em {len(resumo['volumes'])} volume(s), OCR: {resumo['ocr_backend']}",
         "responsavel": analise["responsavel"]
     }
     
     await db.analises_processuais.update_one(
         {"id": analise_id},
-        {
-            "$set": {
-                "datas_marco": datas_marco,
-                "fases": fases,
-                "indexado": True,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            },
-            "$push": {"timeline": timeline_event}
-        }
+        {"$push": {"timeline": timeline_event}}
     )
     
     return {
         "message": "Indexação concluída",
-        "datas_marco": datas_marco,
-        "fases": fases
+        **resumo
     }
 
+@router.get("/analises/{analise_id}/paginas")
+async def resumo_paginas(analise_id: str):
+    """Páginas indexadas por origem (texto, ocr, sem_texto, erro) e estado por volume"""
+    analise = await db.analises_processuais.find_one({"id": analise_id}, {"_id": 0, "documentos": 1})
+    if not analise:
+        raise HTTPException(status_code=404, detail="Análise não encontrada")
+    
+    volumes = [
+        {"documento_id": d["id"], "filename": d["filename"], "paginas": d.get("paginas"),
+         "indexacao": d.get("indexacao")}
+        for d in analise.get("documentos", []) if d.get("filename", "").lower().endswith(".pdf")
+    ]
+    return {**await autos_paginas.resumo_paginas(analise_id), "volumes": volumes}
+
+@router.get("/analises/{analise_id}/paginas/busca")
+async def buscar_paginas(
+    analise_id: str,
+    q: str,
+    modo: str = Query("todos", pattern="^(todos|qualquer)$"),
+    limit: int = 20,
+    skip: int = 0
+):
+    """Busca textual por página nos autos (trechos destacados)"""
+    return await autos_paginas.buscar(analise_id, q, modo=modo, limite=min(limit, 200), pular=skip)
+
+@router.get("/analises/{analise_id}/paginas/{pagina}")
+async def obter_pagina(analise_id: str, pagina: int):
+    """Texto e hashes de uma página (numeração global dos autos)"""
+    registro = await autos_paginas.obter_pagina(analise_id, pagina)
+    if not registro:
+        raise HTTPException(status_code=404, detail="Página não encontrada")
+    return registro
+
 @router.post("/analises/{analise_id}/ia/resumo")
 async def ia_resumo(analise_id: str):
     """
@@ -641,7 +662,8 @@ async def gerar_relatorio(analise_id: str, pades: bool = False):
                     "filename": doc["filename"],
                     "sha256": doc["sha256"],
                     "sha512": doc["sha512"],
-                    "blake3": doc["blake3"]
+                    "blake3": doc.get("blake3"),
+                    "paginas": doc.get("paginas")
                 } for doc in analise.get("documentos", [])
             ],
             "ia_resultados": {
@@ -27,10 +27,13 @@ import logging
 import hashlib
 import json
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 
 from server import db
+import calendario_forense
+import correcao_monetaria
+from security import require_role
 
 router = APIRouter(prefix="/api/calculus", tags=["Athena Calculus Universal"])
 logger = logging.getLogger(__name__)
@@ -179,40 +182,37 @@ class CalculoResponse(BaseModel):
 # ============================================================================
 
 def calcular_prazos_processuais(params: Dict) -> Dict:
-    """Calcula prazos processuais considerando dias úteis"""
+    """
+    Calcula prazos processuais considerando dias úteis, feriados
+    nacionais/estaduais/forenses, recesso e suspensões (CPC arts. 219, 220 e 224)
+    """
     data_inicial = datetime.fromisoformat(params["data_inicial"])
     prazo_dias = params["prazo_dias"]
     tipo = params.get("tipo", "util")  # util ou corrido
     
-    # TODO: Implementar calendário de feriados
-    # TODO: Considerar suspensões (recesso, pandemia)
-    
-    if tipo == "util":
-        # Contar apenas dias úteis
-        dias_contados = 0
-        data_atual = data_inicial
-        
-        while dias_contados < prazo_dias:
-            data_atual += timedelta(days=1)
-            # Pular sábados (5) e domingos (6)
-            if data_atual.weekday() < 5:
-                dias_contados += 1
-        
-        data_final = data_atual
-    else:
-        # Dias corridos
-        data_final = data_inicial + timedelta(days=prazo_dias)
+    resultado = calendario_forense.calcular_prazo(
+        data_inicial,
+        prazo_dias,
+        tipo=tipo,
+        tribunal=params.get("tribunal"),
+        uf=params.get("uf"),
+        comarca=params.get("comarca")
+    )
+    
+    # Preserva horário/fuso informados na data inicial
+    data_final = datetime.combine(
+        datetime.fromisoformat(resultado["data_final"]).date(),
+        data_inicial.timetz()
+    )
     
     return {
+        **resultado,
         "data_inicial": data_inicial.isoformat(),
-        "data_final": data_final.isoformat(),
-        "prazo_dias": prazo_dias,
-        "tipo": tipo,
-        "dias_corridos_total": (data_final - data_inicial).days
+        "data_final": data_final.isoformat()
     }
 
 def calcular_juros_correcao_monetaria(params: Dict) -> Dict:
-    """Calcula juros e correção monetária"""
+    """Calcula juros e correção monetária pela série histórica do índice"""
     valor_principal = params["valor_principal"]
     data_inicial = datetime.fromisoformat(params["data_inicial"])
     data_final = params.get("data_final")
@@ -222,38 +222,45 @@ def calcular_juros_correcao_monetaria(params: Dict) -> Dict:
     else:
         data_final = datetime.now(timezone.utc)
     
-    meses = ((data_final.year - data_inicial.year) * 12 + 
-             (data_final.month - data_inicial.month))
-    
-    # Índices simulados (em produção, usar API do BACEN/IBGE)
     indice = params.get("indice", "IPCA")
-    taxa_mensal = 0.005  # 0.5% ao mês (exemplo)
-    
-    if indice == "SELIC":
-        taxa_mensal = 0.0091  # ~11% ao ano
-    elif indice == "IPCA":
-        taxa_mensal = 0.004  # ~5% ao ano
-    
-    # Correção monetária
-    valor_corrigido = valor_principal * ((1 + taxa_mensal) ** meses)
     
-    # Juros de mora (1% ao mês)
-    juros_mora = valor_principal * 0.01 * meses
-    
-    valor_total = valor_corrigido + juros_mora
+    # Correção pelo produto acumulado do índice + juros de mora (1% a.m. sobre o valor atualizado)
+    correcao = correcao_monetaria.corrigir_valor(
+        valor_principal,
+        indice,
+        data_inicial,
+        data_final,
+        juros_mensal=params.get("juros_mora_mensal", 0.01),
+        exigir_serie=params.get("exigir_serie_historica", True)
+    )
     
     return {
         "valor_principal": valor_principal,
         "data_inicial": data_inicial.isoformat(),
         "data_final": data_final.isoformat(),
-        "meses_decorridos": meses,
-        "indice": indice,
-        "valor_corrigido": round(valor_corrigido, 2),
-        "juros_mora": round(juros_mora, 2),
-        "valor_total": round(valor_total, 2),
-        "percentual_atualizacao": round(((valor_total / valor_principal) - 1) * 100, 2)
+        "meses_decorridos": correcao["meses"],
+        "indice": correcao["indice"],
+        "fator_correcao": correcao["fator"],
+        "fonte_indice": correcao["fonte_indice"],
+        "cobertura_indice": correcao["cobertura"],
+        "valor_corrigido": correcao["valor_corrigido"],
+        "juros_mora": correcao["juros"],
+        "valor_total": correcao["valor_total"],
+        "percentual_atualizacao": round(((correcao["valor_total"] / valor_principal) - 1) * 100, 2)
     }
 
+def calcular_liquidacao_parcelas(params: Dict) -> Dict:
+    """Liquidação de sentença: corrige lote de parcelas até a data do cálculo"""
+    data_final = params.get("data_final") or datetime.now(timezone.utc).date().isoformat()
+    return correcao_monetaria.corrigir_parcelas(
+        params["parcelas"],
+        params.get("indice", "IPCA"),
+        data_final,
+        juros_mensal=params.get("juros_mora_mensal", 0.01),
+        multa_percentual=params.get("multa_percentual", 0.0),
+        exigir_serie=params.get("exigir_serie_historica", True)
+    )
+
 def calcular_tempo_contribuicao_previdenciaria(params: Dict) -> Dict:
     """Calcula tempo de contribuição para aposentadoria"""
     periodos = params["periodos"]  # Lista de {inicio, fim, tipo}
@@ -291,6 +298,9 @@ def calcular_tempo_contribuicao_previdenciaria(params: Dict) -> Dict:
         }
     }
 
+# 3% a.a. capitalizados mensalmente
+FGTS_JUROS_MENSAL = 1.03 ** (1 / 12) - 1
+
 def calcular_rescisao_trabalhista(params: Dict) -> Dict:
     """Calcula verbas rescisórias trabalhistas"""
     salario = params["salario"]
@@ -309,8 +319,20 @@ def calcular_rescisao_trabalhista(params: Dict) -> Dict:
     # Aviso prévio (30 dias base)
     aviso_previo = salario if tipo_rescisao == "sem_justa_causa" else 0
     
-    # FGTS (8%)
+    # FGTS (8%) - com datas, saldo corrigido pela TR + 3% a.a. (Lei 8.036/90, art. 13)
     fgts_depositado = salario * meses_trabalhados * 0.08
+    fgts_cobertura = None
+    if params.get("data_admissao") and params.get("data_rescisao"):
+        fgts = correcao_monetaria.saldo_depositos_mensais(
+            salario * 0.08,
+            params["data_admissao"],
+            params["data_rescisao"],
+            indice="TR",
+            juros_mensal=FGTS_JUROS_MENSAL,
+            exigir_serie=params.get("exigir_serie_historica", True)
+        )
+        fgts_depositado = fgts["saldo_corrigido"]
+        fgts_cobertura = fgts["cobertura"]
     
     # Multa 40% FGTS
     multa_fgts = fgts_depositado * 0.40 if tipo_rescisao == "sem_justa_causa" else 0
@@ -329,6 +351,7 @@ def calcular_rescisao_trabalhista(params: Dict) -> Dict:
             "fgts_depositado": round(fgts_depositado, 2),
             "multa_40_fgts": round(multa_fgts, 2)
         },
+        "cobertura_indice_fgts": fgts_cobertura,
         "total_bruto": round(total, 2)
     }
 
@@ -353,19 +376,36 @@ async def calcular_universal(request: CalculoRequest):
     fundamentacao = []
     
     if request.tipo_calculo == "prazos_processuais":
-        resultado = calcular_prazos_processuais(request.parametros)
-        fundamentacao = ["CPC Art. 219", "CPC Art. 224", "Res. CNJ 297/2019"]
+        await calendario_forense.sincronizar(db)
+        try:
+            resultado = calcular_prazos_processuais(request.parametros)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        fundamentacao = ["CPC Art. 219", "CPC Art. 220", "CPC Art. 224", "Res. CNJ 244/2016", "Lei 5.010/66 Art. 62"]
     
     elif request.tipo_calculo == "juros_correcao":
-        resultado = calcular_juros_correcao_monetaria(request.parametros)
+        try:
+            resultado = calcular_juros_correcao_monetaria(request.parametros)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         fundamentacao = ["CC Art. 406", "Lei 9.430/96", "STJ Súmula 54"]
     
+    elif request.tipo_calculo == "liquidacao_sentenca":
+        try:
+            resultado = calcular_liquidacao_parcelas(request.parametros)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        fundamentacao = ["CPC Art. 509", "CPC Art. 524", "CC Art. 389", "CC Art. 406", "STJ Súmula 43"]
+    
     elif request.tipo_calculo == "tempo_contribuicao":
         resultado = calcular_tempo_contribuicao_previdenciaria(request.parametros)
         fundamentacao = ["Lei 8.213/91", "EC 103/2019", "IN INSS 128/2022"]
     
     elif request.tipo_calculo == "rescisao_trabalhista":
-        resultado = calcular_rescisao_trabalhista(request.parametros)
+        try:
+            resultado = calcular_rescisao_trabalhista(request.parametros)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         fundamentacao = ["CLT Art. 477", "CLT Art. 487", "Súmula TST 330"]
     
     else:
@@ -408,6 +448,176 @@ async def calcular_universal(request: CalculoRequest):
         "timestamp": documento["timestamp"]
     }
 
+class PrazoLoteItem(BaseModel):
+    """Item de cálculo de prazo em lote"""
+    id: Optional[str] = None
+    data_inicial: str
+    prazo_dias: int
+    tipo: str = "util"
+    tribunal: Optional[str] = None
+    uf: Optional[str] = None
+    comarca: Optional[str] = None
+
+class PrazoLoteRequest(BaseModel):
+    """Lote de prazos (ex.: importação de publicações)"""
+    itens: List[PrazoLoteItem] = Field(..., max_length=100000)
+
+class CalendarioExcecao(BaseModel):
+    """Feriado local ou suspensão de prazos de um tribunal/UF/comarca"""
+    tipo: str = Field(default="feriado", description="feriado, suspensao")
+    data_inicio: str
+    data_fim: Optional[str] = None
+    motivo: str
+    tribunal: Optional[str] = None
+    uf: Optional[str] = None
+    comarca: Optional[str] = None
+
+@router.post("/prazos/lote")
+async def calcular_prazos_lote(request: PrazoLoteRequest):
+    """
+    Calcula milhares de prazos em uma única chamada
+    
+    Agrupa por calendário (tribunal/UF/comarca) e resolve cada grupo
+    por busca binária vetorizada nas somas de prefixo de dias úteis
+    """
+    await calendario_forense.sincronizar(db)
+    resultados = calendario_forense.calcular_prazos_lote([item.model_dump() for item in request.itens])
+    erros = sum(1 for r in resultados if "erro" in r)
+    
+    return {
+        "total": len(resultados),
+        "erros": erros,
+        "resultados": resultados
+    }
+
+class ParcelaCorrecao(BaseModel):
+    """Parcela para correção monetária"""
+    id: Optional[str] = None
+    valor: float
+    vencimento: str
+
+class CorrecaoLoteRequest(BaseModel):
+    """Lote de parcelas de planilha de liquidação"""
+    indice: str = "IPCA"
+    data_final: str
+    juros_mora_mensal: float = 0.01
+    multa_percentual: float = 0.0
+    exigir_serie_historica: bool = Field(
+        True, description="Recusa períodos sem série histórica carregada; False estima com a taxa de referência"
+    )
+    parcelas: List[ParcelaCorrecao] = Field(..., max_length=100000)
+
+class SerieIndiceImportacao(BaseModel):
+    """Pontos mensais de índice (percentual) para importação manual"""
+    pontos: List[Dict[str, Any]] = Field(..., description='[{"mes": "2024-01", "valor": 0.42}]')
+
+@router.post("/correcao/lote")
+async def corrigir_parcelas_lote(request: CorrecaoLoteRequest):
+    """
+    Corrige milhares de parcelas em uma chamada
+    
+    Fator de cada parcela = F[data_final] / F[vencimento] na tabela
+    de produto acumulado do índice
+    """
+    try:
+        return correcao_monetaria.corrigir_parcelas(
+            [p.model_dump() for p in request.parcelas],
+            request.indice,
+            request.data_final,
+            juros_mensal=request.juros_mora_mensal,
+            multa_percentual=request.multa_percentual,
+            exigir_serie=request.exigir_serie_historica
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/indices")
+async def status_indices():
+    """Cobertura das séries históricas carregadas"""
+    return correcao_monetaria.status_series()
+
+# Séries de referência valem para todos os cálculos: só administradores as alteram
+GESTORES_INDICES = ["super_admin", "administrator"]
+
+@router.post("/indices/atualizar", dependencies=[Depends(require_role(GESTORES_INDICES))])
+async def atualizar_indices(indices: Optional[List[str]] = None):
+    """Atualiza as séries a partir do SGS/Banco Central"""
+    try:
+        resumo = await correcao_monetaria.atualizar_series(indices)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Falha ao atualizar índices: {e}")
+    return {"atualizadas": resumo, **correcao_monetaria.status_series()}
+
+@router.post("/indices/{indice}/importar", dependencies=[Depends(require_role(GESTORES_INDICES))])
+async def importar_indice(indice: str, dados: SerieIndiceImportacao):
+    """Importa/mescla pontos mensais de um índice no arquivo de séries"""
+    try:
+        correcao_monetaria.salvar_serie(indice, dados.pontos)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return correcao_monetaria.status_series()
+
+@router.get("/calendario/dias-uteis")
+async def consultar_dias_uteis(
+    inicio: str,
+    fim: str,
+    tribunal: Optional[str] = None,
+    uf: Optional[str] = None,
+    comarca: Optional[str] = None
+):
+    """Dias úteis e dias não úteis no intervalo (inicio, fim]"""
+    await calendario_forense.sincronizar(db)
+    try:
+        calendario = calendario_forense.obter_calendario(tribunal, uf, comarca)
+        return {
+            "inicio": inicio,
+            "fim": fim,
+            "tribunal": calendario.tribunal,
+            "uf": calendario.uf,
+            "dias_uteis": calendario.dias_uteis_entre(inicio, fim),
+            "dias_nao_uteis": calendario.dias_nao_uteis(inicio, fim)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/calendario/excecoes")
+async def cadastrar_excecao_calendario(excecao: CalendarioExcecao):
+    """Cadastra feriado local ou suspensão de prazos"""
+    if excecao.tipo not in ("feriado", "suspensao"):
+        raise HTTPException(status_code=400, detail="Tipo deve ser 'feriado' ou 'suspensao'")
+    
+    documento = {
+        "id": str(uuid.uuid4()),
+        **excecao.model_dump(),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.calendario_excecoes.insert_one(documento)
+    documento.pop("_id", None)
+    await calendario_forense.sincronizar(db, forcar=True)
+    
+    return documento
+
+@router.get("/calendario/excecoes")
+async def listar_excecoes_calendario(tribunal: Optional[str] = None, uf: Optional[str] = None):
+    """Lista feriados locais e suspensões cadastrados"""
+    query = {}
+    if tribunal:
+        query["tribunal"] = tribunal
+    if uf:
+        query["uf"] = uf
+    
+    excecoes = await db.calendario_excecoes.find(query, {"_id": 0}).sort("data_inicio", 1).to_list(1000)
+    return {"total": len(excecoes), "excecoes": excecoes}
+
+@router.delete("/calendario/excecoes/{excecao_id}")
+async def remover_excecao_calendario(excecao_id: str):
+    """Remove feriado local ou suspensão"""
+    result = await db.calendario_excecoes.delete_one({"id": excecao_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Exceção não encontrada")
+    await calendario_forense.sincronizar(db, forcar=True)
+    return {"message": "Exceção removida"}
+
 @router.get("/categorias")
 async def listar_categorias():
     """Lista todas as categorias de cálculo disponíveis"""
@@ -20,8 +20,11 @@ Sistema avançado com IA para:
 from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, List, Optional
 import uuid
+import asyncio
 import logging
 
+import numpy as np
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field, validator
 
@@ -122,6 +125,21 @@ class DosimetriaCreate(BaseModel):
 # ============================ FUNÇÕES CÁLCULO ==============================
 # ============================================================================
 
+# Pontos do Art. 59 por circunstância: valor -> (pontos, fundamento); valores ausentes valem 0
+PONTOS_ART59 = {
+    "culpabilidade": {"grave": (2, "Culpabilidade elevada"), "leve": (-1, "Culpabilidade reduzida")},
+    "antecedentes": {"maus_antecedentes": (2, "Maus antecedentes")},
+    "conduta_social": {"desfavoravel": (1, "Conduta social desfavorável")},
+    "personalidade": {"desajustada": (1, "Personalidade desajustada")},
+    "motivos": {"torpes": (2, "Motivos torpes"), "nobres": (-1, "Motivos nobres")},
+    "circunstancias": {"desfavoraveis": (1, "Circunstâncias desfavoráveis")},
+    "consequencias": {"graves": (2, "Consequências graves")},
+    "comportamento_vitima": {"contribuiu": (-1, "Comportamento da vítima contribuiu")},
+}
+
+def _agora_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
 def _pena_em_meses(anos: int, meses: int) -> int:
     """Converte pena para meses"""
     return (anos * 12) + meses
@@ -145,43 +163,11 @@ def _calcular_pena_base(crime: CrimeBase, circunstancias: CircunstanciasArt59) -
     pontos = 0
     fundamentos = []
     
-    if circunstancias.culpabilidade == "grave":
-        pontos += 2
-        fundamentos.append("Culpabilidade elevada")
-    elif circunstancias.culpabilidade == "leve":
-        pontos -= 1
-        fundamentos.append("Culpabilidade reduzida")
-    
-    if circunstancias.antecedentes == "maus_antecedentes":
-        pontos += 2
-        fundamentos.append("Maus antecedentes")
-    
-    if circunstancias.conduta_social == "desfavoravel":
-        pontos += 1
-        fundamentos.append("Conduta social desfavorável")
-    
-    if circunstancias.personalidade == "desajustada":
-        pontos += 1
-        fundamentos.append("Personalidade desajustada")
-    
-    if circunstancias.motivos == "torpes":
-        pontos += 2
-        fundamentos.append("Motivos torpes")
-    elif circunstancias.motivos == "nobres":
-        pontos -= 1
-        fundamentos.append("Motivos nobres")
-    
-    if circunstancias.circunstancias == "desfavoraveis":
-        pontos += 1
-        fundamentos.append("Circunstâncias desfavoráveis")
-    
-    if circunstancias.consequencias == "graves":
-        pontos += 2
-        fundamentos.append("Consequências graves")
-    
-    if circunstancias.comportamento_vitima == "contribuiu":
-        pontos -= 1
-        fundamentos.append("Comportamento da vítima contribuiu")
+    for campo, valores in PONTOS_ART59.items():
+        peso = valores.get(getattr(circunstancias, campo))
+        if peso:
+            pontos += peso[0]
+            fundamentos.append(peso[1])
     
     # Calcular pena base
     # Cada ponto = ~5% da amplitude
@@ -334,6 +320,257 @@ def _calcular_prescricao(pena_meses: int) -> Dict[str, Any]:
         "reducao_maior_70": prazo_abstrato // 2   # Se maior de 70
     }
 
+# ============================================================================
+# ========================= SIMULAÇÃO EM LOTE ===============================
+# ============================================================================
+
+# Limite de cenários por simulação (produto das variações)
+MAX_CENARIOS = 2_000_000
+
+FRACOES_CONTINUIDADE = ((3, 1/6), (6, 1/3))
+
+class VariacaoDosimetria(BaseModel):
+    """Fatores a variar a partir do cenário base"""
+    art59: Dict[str, List[str]] = Field(default_factory=dict, description="Ex: {'culpabilidade': ['leve', 'normal', 'grave']}")
+    alternar_atenuantes: bool = True
+    alternar_agravantes: bool = True
+    alternar_causas: bool = True
+    reincidencia: Optional[List[bool]] = None
+    concursos: Optional[List[str]] = None
+
+    @validator("art59")
+    def validar_art59(cls, v):
+        invalidos = set(v) - set(CircunstanciasArt59.model_fields)
+        if invalidos:
+            raise ValueError(f"Circunstâncias inválidas: {sorted(invalidos)}")
+        return v
+
+class SimulacaoDosimetria(BaseModel):
+    """Request para simulação em lote (todas as combinações dos fatores variados)"""
+    base: DosimetriaCreate
+    variacoes: VariacaoDosimetria = Field(default_factory=VariacaoDosimetria)
+    data_referencia: Optional[str] = Field(default=None, description="Último marco interruptivo (prescrição pela pena aplicada)")
+    exemplos_por_regime: int = Field(default=5, ge=1, le=50)
+
+    @validator("data_referencia")
+    def validar_data_referencia(cls, v):
+        if v:
+            try:
+                datetime.fromisoformat(v.replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f"Data de referência inválida (use AAAA-MM-DD): {v}")
+        return v
+
+class _Fator:
+    def __init__(self, nome: str, valores: List[Any], base: Any):
+        self.nome = nome
+        self.valores = list(valores)
+        if base not in self.valores:
+            self.valores.insert(0, base)
+        self.base = self.valores.index(base)
+
+def _fracao(fracao: str, aumento: bool) -> tuple:
+    """(numerador, denominador) equivalente à fração textual usada na terceira fase"""
+    if "/" in fracao:
+        numerador, denominador = map(int, fracao.split("/"))
+        return (numerador, denominador)
+    if aumento and fracao == "dobro":
+        return (1, 1)
+    if aumento and fracao == "triplo":
+        return (2, 1)
+    return (0, 1)
+
+def _mapear(valores: np.ndarray, funcao) -> np.ndarray:
+    """Aplica uma função escalar só aos valores distintos (regime, prescrição)"""
+    unicos, inverso = np.unique(valores, return_inverse=True)
+    return np.array([funcao(int(v)) for v in unicos], dtype=object)[inverso]
+
+def _somar_anos(data: datetime, anos: int) -> datetime:
+    try:
+        return data.replace(year=data.year + anos)
+    except ValueError:  # 29 de fevereiro
+        return data.replace(year=data.year + anos, day=28)
+
+def simular_cenarios(sim: SimulacaoDosimetria) -> Dict[str, Any]:
+    """
+    Avalia todas as combinações dos fatores variados de uma vez (vetores NumPy),
+    com a mesma aritmética inteira das três fases de calcular_dosimetria.
+    """
+    dados, var = sim.base, sim.variacoes
+    fatores: List[_Fator] = []
+
+    for campo, valores in var.art59.items():
+        fatores.append(_Fator(f"art59.{campo}", valores, getattr(dados.circunstancias_art59, campo)))
+    if var.alternar_atenuantes:
+        fatores += [_Fator(f"atenuante: {a.descricao}", [False, True], a.aplicavel) for a in dados.atenuantes]
+    if var.alternar_agravantes:
+        fatores += [_Fator(f"agravante: {a.descricao}", [False, True], a.aplicavel) for a in dados.agravantes]
+    reincidente_base = bool(dados.reincidencia and dados.reincidencia.possui_reincidencia)
+    if var.reincidencia:
+        fatores.append(_Fator("reincidencia", var.reincidencia, reincidente_base))
+    if var.alternar_causas:
+        fatores += [_Fator(f"causa_aumento: {c.descricao} ({c.fracao})", [False, True], c.aplicavel) for c in dados.causas_aumento]
+        fatores += [_Fator(f"causa_diminuicao: {c.descricao} ({c.fracao})", [False, True], c.aplicavel) for c in dados.causas_diminuicao]
+    if var.concursos:
+        fatores.append(_Fator("concurso", var.concursos, dados.concurso))
+
+    forma = [len(f.valores) for f in fatores]
+    total = int(np.prod(forma, dtype=np.int64))
+    if total > MAX_CENARIOS:
+        raise HTTPException(status_code=400, detail=f"Combinações demais ({total}); limite de {MAX_CENARIOS}")
+    indices = np.indices(forma, dtype=np.int32).reshape(len(fatores), total)
+    por_nome = {f.nome: (f, indices[i]) for i, f in enumerate(fatores)}
+
+    def valor(nome: str, fixo):
+        """Vetor com o valor do fator em cada cenário (ou o valor fixo do cenário base)"""
+        if nome in por_nome:
+            fator, idx = por_nome[nome]
+            return np.array(fator.valores, dtype=object)[idx]
+        return np.full(total, fixo, dtype=object)
+
+    def ligado(nome: str, fixo: bool) -> np.ndarray:
+        if nome in por_nome:
+            fator, idx = por_nome[nome]
+            return np.array(fator.valores, dtype=bool)[idx]
+        return np.full(total, fixo, dtype=bool)
+
+    # Primeira fase: pontos do Art. 59
+    pontos = np.zeros(total, dtype=np.int64)
+    for campo, tabela in PONTOS_ART59.items():
+        nome = f"art59.{campo}"
+        if nome in por_nome:
+            fator, idx = por_nome[nome]
+            pesos = np.array([tabela.get(v, (0,))[0] for v in fator.valores], dtype=np.int64)
+            pontos += pesos[idx]
+        else:
+            pontos += tabela.get(getattr(dados.circunstancias_art59, campo), (0,))[0]
+
+    # Segunda fase: presença de atenuantes/agravantes (fração única de 1/6) e reincidência
+    atenuante = np.zeros(total, dtype=bool)
+    for a in dados.atenuantes:
+        atenuante |= ligado(f"atenuante: {a.descricao}", a.aplicavel)
+    agravante = np.zeros(total, dtype=bool)
+    for a in dados.agravantes:
+        agravante |= ligado(f"agravante: {a.descricao}", a.aplicavel)
+    reincidente = ligado("reincidencia", reincidente_base)
+
+    causas_aumento = [(ligado(f"causa_aumento: {c.descricao} ({c.fracao})", c.aplicavel), _fracao(c.fracao, True))
+                      for c in dados.causas_aumento]
+    causas_diminuicao = [(ligado(f"causa_diminuicao: {c.descricao} ({c.fracao})", c.aplicavel), _fracao(c.fracao, False))
+                         for c in dados.causas_diminuicao]
+
+    penas = []
+    for crime in dados.crimes:
+        minimo = _pena_em_meses(crime.pena_minima_anos, crime.pena_minima_meses)
+        maximo = _pena_em_meses(crime.pena_maxima_anos, crime.pena_maxima_meses)
+        incremento = max(1, (maximo - minimo) // 16)
+        pena = np.clip(minimo + pontos * incremento, minimo, maximo)
+        pena = pena - np.where(atenuante, pena // 6, 0)
+        pena = pena + np.where(agravante, pena // 6, 0)
+        pena = pena + np.where(reincidente, pena // 6, 0)
+        for ativo, (numerador, denominador) in causas_aumento:
+            pena = pena + np.where(ativo, pena * numerador // denominador, 0)
+        for ativo, (numerador, denominador) in causas_diminuicao:
+            pena = pena - np.where(ativo, pena * numerador // denominador, 0)
+        penas.append(pena)
+
+    # Concurso de crimes
+    matriz = np.vstack(penas)
+    mais_grave = matriz.max(axis=0)
+    fracao = next((f for limite, f in FRACOES_CONTINUIDADE if len(dados.crimes) <= limite), 1/2)
+    por_concurso = {
+        "unico": matriz[0],
+        "material": matriz.sum(axis=0),
+        "formal": mais_grave + mais_grave // 6,
+        "continuidade": mais_grave + (mais_grave * fracao).astype(np.int64),
+    }
+    concurso = valor("concurso", dados.concurso)
+    pena_total = np.empty(total, dtype=np.int64)
+    for nome, vetor in por_concurso.items():
+        mascara = concurso == nome
+        pena_total[mascara] = vetor[mascara]
+    # Concurso não reconhecido: pena do primeiro crime, como no cálculo individual
+    conhecido = np.isin(concurso, list(por_concurso))
+    pena_total[~conhecido] = matriz[0][~conhecido]
+
+    regime = _mapear(pena_total * 2 + reincidente, lambda k: _calcular_regime(k // 2, bool(k % 2)))
+    prazo = _mapear(pena_total // 12, lambda anos: _calcular_prescricao(anos * 12)["prazo_executoria_anos"])
+
+    # Cenário base e distribuição
+    base = int(np.ravel_multi_index([f.base for f in fatores], forma)) if fatores else 0
+    distancia = (indices != np.array([f.base for f in fatores], dtype=np.int32)[:, None]).sum(axis=0)
+
+    def descrever(i: int) -> Dict[str, Any]:
+        return {
+            "pena_meses": int(pena_total[i]),
+            "pena_formatada": f"{pena_total[i] // 12} anos e {pena_total[i] % 12} meses",
+            "regime": regime[i],
+            "prescricao_anos": int(prazo[i]),
+            "fatores": {f.nome: f.valores[indices[k][i]] for k, f in enumerate(fatores)},
+            "alteracoes": [
+                {"fator": f.nome, "de": f.valores[f.base], "para": f.valores[indices[k][i]]}
+                for k, f in enumerate(fatores) if indices[k][i] != f.base
+            ]
+        }
+
+    valores_pena, contagem_pena = np.unique(pena_total, return_counts=True)
+    regimes, contagem_regime = np.unique(regime.astype(str), return_counts=True)
+    prazos, contagem_prazo = np.unique(prazo.astype(np.int64), return_counts=True)
+
+    referencia = None
+    if sim.data_referencia:
+        referencia = datetime.fromisoformat(sim.data_referencia.replace('Z', '+00:00'))
+
+    # Menor conjunto de alterações que muda o regime do cenário base
+    mudancas = []
+    regime_texto = regime.astype(str)
+    for alvo in regimes:
+        if alvo == regime[base]:
+            continue
+        candidatos = np.flatnonzero(regime_texto == alvo)
+        menor = int(distancia[candidatos].min())
+        minimos = candidatos[distancia[candidatos] == menor]
+        minimos = minimos[np.argsort(pena_total[minimos], kind="stable")][:sim.exemplos_por_regime]
+        mudancas.append({
+            "regime": str(alvo),
+            "minimo_alteracoes": menor,
+            "cenarios_com_minimo": int((distancia[candidatos] == menor).sum()),
+            "exemplos": [descrever(int(i)) for i in minimos]
+        })
+
+    return {
+        "total_cenarios": total,
+        "fatores": [{"fator": f.nome, "valores": f.valores, "base": f.valores[f.base]} for f in fatores],
+        "cenario_base": descrever(base),
+        "pena": {
+            "minima_meses": int(pena_total.min()),
+            "maxima_meses": int(pena_total.max()),
+            "media_meses": round(float(pena_total.mean()), 2),
+            "mediana_meses": float(np.median(pena_total)),
+            "p10_meses": float(np.percentile(pena_total, 10)),
+            "p90_meses": float(np.percentile(pena_total, 90)),
+            "distribuicao": [
+                {"pena_meses": int(v), "pena_formatada": f"{v // 12} anos e {v % 12} meses",
+                 "cenarios": int(c), "proporcao": round(int(c) / total, 4)}
+                for v, c in zip(valores_pena, contagem_pena)
+            ]
+        },
+        "regimes": {str(r): {"cenarios": int(c), "proporcao": round(int(c) / total, 4)} for r, c in zip(regimes, contagem_regime)},
+        "prescricao": [
+            {"prazo_anos": int(p), "cenarios": int(c), "proporcao": round(int(c) / total, 4),
+             "data_prescricao": _somar_anos(referencia, int(p)).date().isoformat() if referencia else None}
+            for p, c in zip(prazos, contagem_prazo)
+        ],
+        "beneficios": {
+            "substituicao_possivel": round(float((pena_total <= 48).mean()), 4),
+            "sursis_possivel": round(float((pena_total <= 24).mean()), 4),
+            "livramento_condicional_possivel": round(float((pena_total >= 24).mean()), 4)
+        },
+        "melhor_cenario": descrever(int(np.lexsort((distancia, pena_total))[0])),
+        "pior_cenario": descrever(int(np.lexsort((distancia, -pena_total))[0])),
+        "mudancas_de_regime": mudancas
+    }
+
 # ============================================================================
 # ============================ ENDPOINTS ====================================
 # ============================================================================
@@ -500,6 +737,36 @@ async def calcular_dosimetria(dados: DosimetriaCreate):
     
     return documento
 
+@router.post("/simular")
+async def simular_dosimetria(sim: SimulacaoDosimetria):
+    """
+    Simulação "e se": todas as combinações de circunstâncias do Art. 59,
+    atenuantes/agravantes, reincidência, causas de aumento/diminuição e tipo
+    de concurso. Retorna a distribuição de penas, regimes e prazos/datas de
+    prescrição e o menor conjunto de alterações que muda o regime inicial.
+    """
+    if not sim.base.crimes:
+        raise HTTPException(status_code=400, detail="Informe ao menos um crime")
+    
+    resultado = await asyncio.to_thread(simular_cenarios, sim)
+    
+    documento = {
+        "id": str(uuid.uuid4()),
+        "processo_id": sim.base.processo_id,
+        "reu_nome": sim.base.reu_nome,
+        "responsavel": sim.base.responsavel,
+        "created_at": _agora_iso(),
+        "total_cenarios": resultado["total_cenarios"],
+        "fatores": resultado["fatores"],
+        "regimes": resultado["regimes"],
+        "cenario_base": resultado["cenario_base"]
+    }
+    await db.dosimetria_simulacoes.insert_one(documento)
+    
+    logger.info(f"⚖️ Simulação de dosimetria: {resultado['total_cenarios']} cenários para {sim.base.reu_nome}")
+    
+    return {"id": documento["id"], **resultado}
+
 @router.get("/calculos")
 async def listar_calculos(reu_nome: Optional[str] = None, limit: int = 50):
     """Lista cálculos de dosimetria realizados"""
@@ -581,6 +848,7 @@ async def health_dosimetria():
             "Substituição de penas (CP Art. 44)",
             "Sursis (CP Art. 77-82)",
             "Livramento condicional (CP Art. 83-90)",
-            "Tabelas de atenuantes e agravantes"
+            "Tabelas de atenuantes e agravantes",
+            "Simulação em lote de cenários (distribuição de penas, regimes e prescrição)"
         ]
     }
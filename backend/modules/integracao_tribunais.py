@@ -32,6 +32,10 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field, validator
 
 from server import db
+import calendario_forense
+import identificadores as ident
+import diario_sync
+import alert_scheduler
 
 router = APIRouter(prefix="/api/tribunais", tags=["Integração Tribunais"])
 logger = logging.getLogger(__name__)
@@ -269,6 +273,14 @@ def _normalizar_lista(valores: List[str]) -> List[str]:
             resultado.append(str(valor).strip())
     return resultado
 
+def _calendario_processo(processo: Dict[str, Any]) -> "calendario_forense.Calendario":
+    """Calendário forense do tribunal/UF/comarca do processo"""
+    return calendario_forense.obter_calendario(
+        processo.get("tribunal"),
+        processo.get("tribunal_uf"),
+        processo.get("comarca")
+    )
+
 def _extrair_identificadores(dados: ProcessoTribunalCreate) -> List[str]:
     """Extrai todos os identificadores do processo"""
     ids = []
@@ -298,6 +310,202 @@ def _extrair_identificadores(dados: ProcessoTribunalCreate) -> List[str]:
     
     return _normalizar_lista(ids)
 
+# ============================================================================
+# ======================== COLEÇÕES NORMALIZADAS ============================
+# ============================================================================
+
+# Subentidades do processo em coleções próprias (antes arrays embutidos em tribunais_processos)
+COLECOES_SUBENTIDADES = {
+    "prazos": "tribunais_prazos",
+    "publicacoes": "tribunais_publicacoes",
+    "sincronizacoes": "tribunais_sincronizacoes",
+    "agenda": "tribunais_agenda",
+}
+
+_colecoes_prontas = False
+
+def _data_utc(data_iso: Optional[str]) -> Optional[datetime]:
+    """Data ISO -> datetime UTC para consultas por intervalo (None se inválida)"""
+    if not data_iso:
+        return None
+    try:
+        data = _parse_iso(data_iso)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return data if data.tzinfo else data.replace(tzinfo=timezone.utc)
+
+def _campos_processo(processo: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos do processo replicados nas subentidades (evita $lookup nas consultas)"""
+    return {
+        "processo_id": processo["id"],
+        "numero_processo": processo.get("numero_processo"),
+        "tribunal": processo.get("tribunal", "Desconhecido"),
+        "tribunal_uf": processo.get("tribunal_uf"),
+        "comarca": processo.get("comarca"),
+        "sistema": processo.get("sistema", "Desconhecido"),
+    }
+
+def _doc_prazo(processo: Dict[str, Any], prazo: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **prazo,
+        **_campos_processo(processo),
+        "cumprido": prazo.get("cumprido", False),
+        "data_limite_dt": _data_utc(prazo.get("data_limite")),
+    }
+
+def _doc_publicacao(processo: Dict[str, Any], publicacao: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **publicacao,
+        **_campos_processo(processo),
+        "data_publicacao_dt": _data_utc(publicacao.get("data_publicacao")),
+    }
+
+def _doc_sincronizacao(processo: Dict[str, Any], sincronizacao: Dict[str, Any]) -> Dict[str, Any]:
+    return {**sincronizacao, **_campos_processo(processo)}
+
+def _doc_agenda(processo: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **item,
+        **_campos_processo(processo),
+        "data_dt": _data_utc(item.get("data")),
+        "identificadores_chaves": ident.chaves_identificadores(item.get("identificadores", [])),
+    }
+
+_CONVERSORES = {
+    "prazos": _doc_prazo,
+    "publicacoes": _doc_publicacao,
+    "sincronizacoes": _doc_sincronizacao,
+    "agenda": _doc_agenda,
+}
+
+# Campos internos removidos ao devolver subentidades no formato original
+_CAMPOS_INTERNOS = {
+    "_id": 0, "processo_id": 0, "numero_processo": 0, "tribunal": 0, "tribunal_uf": 0,
+    "comarca": 0, "sistema": 0, "data_limite_dt": 0, "data_publicacao_dt": 0,
+    "data_dt": 0, "identificadores_chaves": 0
+}
+
+# Campos de busca do processo omitidos nas respostas
+_CAMPOS_BUSCA = {"_id": 0, "identificadores_chaves": 0, "nome_ngrams": 0}
+
+def _campos_busca(identificadores: List[str]) -> Dict[str, List[str]]:
+    """Chaves exatas e trigramas de nomes (ver identificadores.py)"""
+    chaves = ident.chaves_identificadores(identificadores)
+    return {"identificadores_chaves": chaves, "nome_ngrams": ident.ngramas_de_chaves(chaves)}
+
+async def _migrar_arrays_embutidos():
+    """Move arrays embutidos de processos antigos para as coleções (idempotente)"""
+    from pymongo import UpdateOne
+    
+    legado = {"$or": [{campo: {"$exists": True}} for campo in COLECOES_SUBENTIDADES]}
+    migrados = 0
+    async for processo in db.tribunais_processos.find(legado, {"_id": 0, "historico": 0, "movimentacoes": 0}):
+        for campo, colecao in COLECOES_SUBENTIDADES.items():
+            operacoes = [
+                UpdateOne({"id": item["id"]}, {"$setOnInsert": _CONVERSORES[campo](processo, item)}, upsert=True)
+                for item in processo.get(campo, []) if item.get("id")
+            ]
+            if operacoes:
+                await db[colecao].bulk_write(operacoes, ordered=False)
+        await db.tribunais_processos.update_one(
+            {"id": processo["id"]},
+            {"$unset": {campo: "" for campo in COLECOES_SUBENTIDADES}}
+        )
+        migrados += 1
+    if migrados:
+        logger.info(f"📦 {migrados} processos migrados para coleções normalizadas")
+
+async def _indexar_identificadores():
+    """Preenche chaves de identificadores em processos e agenda anteriores ao índice"""
+    from pymongo import UpdateOne
+    
+    sem_chaves = {"identificadores_chaves": {"$exists": False}}
+    for colecao, campo in ((db.tribunais_processos, "identificadores_busca"), (db.tribunais_agenda, "identificadores")):
+        operacoes = []
+        async for doc in colecao.find(sem_chaves, {"_id": 0, "id": 1, campo: 1}):
+            chaves = _campos_busca(doc.get(campo, []))
+            if colecao is db.tribunais_agenda:
+                chaves.pop("nome_ngrams")
+            operacoes.append(UpdateOne({"id": doc["id"]}, {"$set": chaves}))
+            if len(operacoes) >= 500:
+                await colecao.bulk_write(operacoes, ordered=False)
+                operacoes = []
+        if operacoes:
+            await colecao.bulk_write(operacoes, ordered=False)
+
+async def _processos_por_nome(nome: str, filtro: Dict[str, Any], limiar: float, limite: int) -> List[Dict[str, Any]]:
+    """
+    Busca aproximada por nome: candidatos pelo índice de trigramas, ranqueados
+    pela fração de trigramas da consulta presentes em algum nome do processo
+    """
+    gramas = ident.ngramas_nome(nome)
+    if not gramas:
+        raise HTTPException(status_code=400, detail="Busca aproximada disponível apenas para nomes")
+    minimo = max(1, int(limiar * len(gramas)))
+    candidatos = await db.tribunais_processos.aggregate([
+        {"$match": {**filtro, "nome_ngrams": {"$in": gramas}}},
+        {"$addFields": {"_comuns": {"$size": {"$setIntersection": ["$nome_ngrams", gramas]}}}},
+        {"$match": {"_comuns": {"$gte": minimo}}},
+        {"$sort": {"_comuns": -1, "updated_at": -1}},
+        {"$limit": limite * 4},
+        {"$project": {**_CAMPOS_BUSCA, "_comuns": 0}}
+    ]).to_list(None)
+    
+    # Refinamento por nome individual (os trigramas do processo somam todos os nomes)
+    resultado = []
+    for processo in candidatos:
+        nomes = [c[5:] for c in ident.chaves_identificadores(processo.get("identificadores_busca", [])) if c.startswith("nome:")]
+        similares = {n: ident.similaridade_nome(nome, n) for n in nomes}
+        similares = {n: v for n, v in similares.items() if v >= limiar}
+        if similares:
+            processo["similaridade"] = round(max(similares.values()), 3)
+            processo["nomes_correspondentes"] = sorted(similares, key=similares.get, reverse=True)
+            resultado.append(processo)
+    resultado.sort(key=lambda p: p["similaridade"], reverse=True)
+    return resultado[:limite]
+
+async def _garantir_colecoes():
+    """Cria índices e migra dados legados uma vez por processo"""
+    global _colecoes_prontas
+    if _colecoes_prontas:
+        return
+    from pymongo import ASCENDING, DESCENDING
+    
+    await db.tribunais_processos.create_index("id", unique=True)
+    await db.tribunais_processos.create_index([("tribunal", ASCENDING), ("sistema", ASCENDING)])
+    await db.tribunais_processos.create_index([("updated_at", DESCENDING)])
+    await db.tribunais_processos.create_index("identificadores_chaves")
+    await db.tribunais_processos.create_index("nome_ngrams")
+    
+    for colecao in COLECOES_SUBENTIDADES.values():
+        await db[colecao].create_index("id", unique=True)
+        await db[colecao].create_index("processo_id")
+    await db.tribunais_prazos.create_index([("cumprido", ASCENDING), ("data_limite_dt", ASCENDING)])
+    await db.tribunais_prazos.create_index([("processo_id", ASCENDING), ("data_limite_dt", ASCENDING)])
+    await db.tribunais_publicacoes.create_index([("lida", ASCENDING), ("data_publicacao_dt", DESCENDING)])
+    await db.tribunais_sincronizacoes.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+    await db.tribunais_agenda.create_index([("identificadores_chaves", ASCENDING), ("data_dt", ASCENDING)])
+    
+    await _migrar_arrays_embutidos()
+    await _indexar_identificadores()
+    _colecoes_prontas = True
+
+async def _contar_por_processo(colecao, filtro: Dict[str, Any]) -> Dict[str, int]:
+    """Contagem agregada por processo_id"""
+    contagem = {}
+    async for grupo in colecao.aggregate([
+        {"$match": filtro},
+        {"$group": {"_id": "$processo_id", "total": {"$sum": 1}}}
+    ]):
+        contagem[grupo["_id"]] = grupo["total"]
+    return contagem
+
+async def _inserir_subentidades(processo: Dict[str, Any], campo: str, itens: List[Dict[str, Any]]):
+    if itens:
+        await db[COLECOES_SUBENTIDADES[campo]].insert_many(
+            [_CONVERSORES[campo](processo, item) for item in itens]
+        )
+
 # ============================================================================
 # ============================== CONFIGURAÇÕES ==============================
 # ============================================================================
@@ -436,13 +644,10 @@ async def cadastrar_processo(dados: ProcessoTribunalCreate, background_tasks: Ba
         # Status e Sincronização
         "status": "pendente_push" if dados.push_imediato else "cadastrado",
         "identificadores_busca": identificadores,
+        **_campos_busca(identificadores),
         
-        # Arrays de controle
-        "agenda": [],
-        "prazos": [],
-        "publicacoes": [],
+        # Arrays de controle (prazos, publicações, sincronizações e agenda ficam em coleções próprias)
         "movimentacoes": [],
-        "sincronizacoes": [],
         "historico": [
             {
                 "id": str(uuid.uuid4()),
@@ -459,25 +664,19 @@ async def cadastrar_processo(dados: ProcessoTribunalCreate, background_tasks: Ba
         ]
     }
     
+    await _garantir_colecoes()
     await db.tribunais_processos.insert_one(documento)
     
     # Se push imediato, agendar
     if dados.push_imediato:
-        await db.tribunais_processos.update_one(
-            {"id": processo_id},
-            {
-                "$push": {
-                    "sincronizacoes": {
-                        "id": str(uuid.uuid4()),
-                        "tipo": "push_inicial",
-                        "status": "pendente",
-                        "descricao": "Push inicial ao tribunal",
-                        "created_at": _agora_iso(),
-                        "responsavel": dados.responsavel
-                    }
-                }
-            }
-        )
+        await _inserir_subentidades(documento, "sincronizacoes", [{
+            "id": str(uuid.uuid4()),
+            "tipo": "push_inicial",
+            "status": "pendente",
+            "descricao": "Push inicial ao tribunal",
+            "created_at": _agora_iso(),
+            "responsavel": dados.responsavel
+        }])
         
         # TODO: Executar push em background
         # background_tasks.add_task(executar_push, processo_id)
@@ -499,12 +698,16 @@ async def listar_processos(
     status: Optional[str] = None,
     busca: Optional[str] = None,
     segredo_justica: Optional[bool] = None,
+    busca_aproximada: bool = False,
+    limiar: float = ident.LIMIAR_SIMILARIDADE,
     limit: int = 50
 ):
     """
     Lista processos integrados com filtros
     
-    Busca pode ser por: número do processo, CPF, CNPJ, OAB, nome
+    Busca exata (índice de chaves normalizadas) por: número do processo, CPF,
+    CNPJ, OAB, e-mail ou nome completo. Com busca_aproximada=True, `busca` é
+    tratada como nome e comparada por trigramas (similaridade ≥ limiar).
     """
     query = {}
     
@@ -514,35 +717,48 @@ async def listar_processos(
         query["sistema"] = {"$regex": sistema, "$options": "i"}
     if status:
         query["status"] = status
-    if busca:
-        query["identificadores_busca"] = {"$regex": busca, "$options": "i"}
     if segredo_justica is not None:
         query["segredo_justica"] = segredo_justica
     
-    processos = await db.tribunais_processos.find(query, {"_id": 0}).sort("updated_at", -1).to_list(limit)
-    
-    # Enrichment: adicionar contadores
+    await _garantir_colecoes()
+    if busca and busca_aproximada:
+        processos = await _processos_por_nome(busca, query, limiar, limit)
+    else:
+        if busca:
+            chave = ident.chave_identificador(busca)
+            if not chave:
+                raise HTTPException(status_code=400, detail="Identificador de busca inválido")
+            query["identificadores_chaves"] = chave
+        processos = await db.tribunais_processos.find(query, _CAMPOS_BUSCA).sort("updated_at", -1).to_list(limit)
+    ids = [processo["id"] for processo in processos]
+    
+    # Enrichment: contadores em três consultas indexadas para toda a página
     agora = datetime.now(timezone.utc)
+    prazos_por_processo: Dict[str, List[Dict[str, Any]]] = {}
+    async for prazo in db.tribunais_prazos.find(
+        {
+            "processo_id": {"$in": ids},
+            "data_limite_dt": {"$gte": agora - timedelta(days=5), "$lt": agora + timedelta(days=31)}
+        },
+        {"_id": 0, "processo_id": 1, "descricao": 1, "data_limite": 1, "data_limite_dt": 1}
+    ).sort("data_limite_dt", 1):
+        dias = (prazo["data_limite_dt"].replace(tzinfo=timezone.utc) - agora).days
+        if dias < -5 or dias > 30:
+            continue
+        prazos_por_processo.setdefault(prazo["processo_id"], []).append({
+            "descricao": prazo["descricao"],
+            "data_limite": prazo["data_limite"],
+            "dias_restantes": dias,
+            "alerta": "vencido" if dias < 0 else "critico" if dias <= 3 else "proximo"
+        })
+    
+    nao_lidas = await _contar_por_processo(db.tribunais_publicacoes, {"processo_id": {"$in": ids}, "lida": False})
+    pendentes = await _contar_por_processo(db.tribunais_sincronizacoes, {"processo_id": {"$in": ids}, "status": "pendente"})
+    
     for processo in processos:
-        # Prazos próximos
-        prazos_proximos = []
-        for prazo in processo.get("prazos", []):
-            try:
-                data_limite = _parse_iso(prazo["data_limite"])
-                dias = (data_limite - agora).days
-                if dias >= -5 and dias <= 30:
-                    prazos_proximos.append({
-                        "descricao": prazo["descricao"],
-                        "data_limite": prazo["data_limite"],
-                        "dias_restantes": dias,
-                        "alerta": "vencido" if dias < 0 else "critico" if dias <= 3 else "proximo"
-                    })
-            except:
-                pass
-        
-        processo["prazos_proximos"] = sorted(prazos_proximos, key=lambda x: x["data_limite"])
-        processo["total_publicacoes_nao_lidas"] = len([p for p in processo.get("publicacoes", []) if not p.get("lida")])
-        processo["total_sincronizacoes_pendentes"] = len([s for s in processo.get("sincronizacoes", []) if s.get("status") == "pendente"])
+        processo["prazos_proximos"] = prazos_por_processo.get(processo["id"], [])
+        processo["total_publicacoes_nao_lidas"] = nao_lidas.get(processo["id"], 0)
+        processo["total_sincronizacoes_pendentes"] = pendentes.get(processo["id"], 0)
     
     return {
         "processos": processos,
@@ -552,11 +768,19 @@ async def listar_processos(
 @router.get("/processos/{processo_id}")
 async def obter_processo(processo_id: str):
     """Obtém detalhes completos do processo"""
-    processo = await db.tribunais_processos.find_one({"id": processo_id}, {"_id": 0})
+    await _garantir_colecoes()
+    processo = await db.tribunais_processos.find_one({"id": processo_id}, _CAMPOS_BUSCA)
     
     if not processo:
         raise HTTPException(status_code=404, detail="Processo não encontrado")
     
+    # Remonta as subentidades no formato original da API
+    ordenacao = {"prazos": "data_limite_dt", "publicacoes": "created_at", "sincronizacoes": "created_at", "agenda": "data_dt"}
+    for campo, colecao in COLECOES_SUBENTIDADES.items():
+        processo[campo] = await db[colecao].find(
+            {"processo_id": processo_id}, _CAMPOS_INTERNOS
+        ).sort(ordenacao[campo], 1).to_list(None)
+    
     return processo
 
 @router.post("/processos/{processo_id}/push")
@@ -568,6 +792,7 @@ async def realizar_push(processo_id: str, payload: AtualizacaoPush):
     - Atualiza histórico
     - Marca status como sincronizado
     """
+    await _garantir_colecoes()
     processo = await db.tribunais_processos.find_one({"id": processo_id})
     
     if not processo:
@@ -587,11 +812,11 @@ async def realizar_push(processo_id: str, payload: AtualizacaoPush):
         "confirmado_em": None
     }
     
+    await _inserir_subentidades(processo, "sincronizacoes", [sincronizacao])
     await db.tribunais_processos.update_one(
         {"id": processo_id},
         {
             "$push": {
-                "sincronizacoes": sincronizacao,
                 "historico": {
                     "id": str(uuid.uuid4()),
                     "evento": "push_realizado",
@@ -628,6 +853,7 @@ async def registrar_publicacao(processo_id: str, dados: PublicacaoCreate):
     - Adiciona à timeline
     - Marca como não lida
     """
+    await _garantir_colecoes()
     processo = await db.tribunais_processos.find_one({"id": processo_id})
     
     if not processo:
@@ -662,10 +888,10 @@ async def registrar_publicacao(processo_id: str, dados: PublicacaoCreate):
         "status": "pendente"
     }
     
+    agenda = [agenda_item]
+    prazos = []
     updates = {
         "$push": {
-            "publicacoes": publicacao,
-            "agenda": agenda_item,
             "historico": {
                 "id": str(uuid.uuid4()),
                 "evento": "publicacao_capturada",
@@ -677,45 +903,53 @@ async def registrar_publicacao(processo_id: str, dados: PublicacaoCreate):
         "$set": {"updated_at": _agora_iso()}
     }
     
-    # Se tem prazo de resposta, criar prazo automático
+    # Se tem prazo de resposta, criar prazo automático (dias úteis - CPC art. 219)
     if dados.prazo_resposta_dias:
+        await calendario_forense.sincronizar(db)
         try:
+            calendario = _calendario_processo(processo)
             data_pub = _parse_iso(dados.data_publicacao)
-            data_limite = (data_pub + timedelta(days=dados.prazo_resposta_dias)).isoformat()
+            data_final = calendario.somar_dias_uteis(data_pub, dados.prazo_resposta_dias)
+            data_limite = data_final.isoformat()
             
             prazo = {
                 "id": str(uuid.uuid4()),
-                "descricao": f"Prazo de {dados.prazo_resposta_dias} dias - {dados.titulo}",
+                "descricao": f"Prazo de {dados.prazo_resposta_dias} dias úteis - {dados.titulo}",
                 "data_limite": data_limite,
                 "tipo": "processual",
                 "responsavel": processo.get("responsavel"),
                 "referencia_publicacao": pub_id,
                 "identificadores": ids,
                 "notificacoes": ["d-5", "d-3", "d-1"],
+                "cumprido": False,
                 "created_at": _agora_iso()
             }
             
-            updates["$push"]["prazos"] = prazo
-            
-            # Criar alertas D-5, D-3, D-1
+            # Criar alertas D-5, D-3, D-1 (dias úteis antes do termo final)
+            alertas = []
             for d in [5, 3, 1]:
-                data_alerta = (data_pub + timedelta(days=dados.prazo_resposta_dias - d)).isoformat()
-                updates["$push"]["agenda"] = {
-                    "$each": [{
-                        "id": str(uuid.uuid4()),
-                        "tipo": f"alerta_d{d}",
-                        "referencia_id": prazo["id"],
-                        "descricao": f"⚠️ D-{d}: {dados.titulo}",
-                        "data": data_alerta,
-                        "identificadores": ids,
-                        "responsavel": processo.get("responsavel"),
-                        "status": "pendente"
-                    }]
-                }
-        except:
-            pass
-    
+                data_alerta = calendario.subtrair_dias_uteis(data_final, d).isoformat()
+                alertas.append({
+                    "id": str(uuid.uuid4()),
+                    "tipo": f"alerta_d{d}",
+                    "referencia_id": prazo["id"],
+                    "descricao": f"⚠️ D-{d}: {dados.titulo}",
+                    "data": data_alerta,
+                    "identificadores": ids,
+                    "responsavel": processo.get("responsavel"),
+                    "status": "pendente"
+                })
+            prazos.append(prazo)
+            agenda.extend(alertas)
+        except Exception as exc:
+            logger.warning(f"Falha ao calcular prazo da publicação {pub_id}: {exc}")
+    
+    await _inserir_subentidades(processo, "publicacoes", [publicacao])
+    await _inserir_subentidades(processo, "prazos", prazos)
+    await _inserir_subentidades(processo, "agenda", agenda)
     await db.tribunais_processos.update_one({"id": processo_id}, updates)
+    if prazos:
+        await alert_scheduler.notify_change("tribunais", processo_id)
     
     logger.info(f"📰 Publicação registrada: {pub_id} - {dados.titulo}")
     
@@ -728,23 +962,17 @@ async def registrar_publicacao(processo_id: str, dados: PublicacaoCreate):
 @router.patch("/processos/{processo_id}/publicacoes/{publicacao_id}/marcar-lida")
 async def marcar_publicacao_lida(processo_id: str, publicacao_id: str):
     """Marca publicação como lida"""
-    result = await db.tribunais_processos.update_one(
-        {
-            "id": processo_id,
-            "publicacoes.id": publicacao_id
-        },
-        {
-            "$set": {
-                "publicacoes.$.lida": True,
-                "publicacoes.$.lida_em": _agora_iso(),
-                "updated_at": _agora_iso()
-            }
-        }
+    await _garantir_colecoes()
+    result = await db.tribunais_publicacoes.update_one(
+        {"id": publicacao_id, "processo_id": processo_id},
+        {"$set": {"lida": True, "lida_em": _agora_iso()}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Publicação não encontrada")
     
+    await db.tribunais_processos.update_one({"id": processo_id}, {"$set": {"updated_at": _agora_iso()}})
+    
     return {"message": "Publicação marcada como lida"}
 
 # ============================================================================
@@ -760,6 +988,7 @@ async def registrar_prazo(processo_id: str, dados: PrazoCreate):
     - Adiciona à agenda
     - Vincula identificadores
     """
+    await _garantir_colecoes()
     processo = await db.tribunais_processos.find_one({"id": processo_id})
     
     if not processo:
@@ -789,14 +1018,16 @@ async def registrar_prazo(processo_id: str, dados: PrazoCreate):
     
     # Criar itens de agenda
     agenda_items = []
+    await calendario_forense.sincronizar(db)
+    calendario = _calendario_processo(processo)
     
-    # Alertas D-5, D-3, D-1
+    # Alertas D-5, D-3, D-1 (dias úteis antes do termo final)
     for alerta_str in dados.alertas:
         if not alerta_str.startswith("d-"):
             continue
         try:
             dias = int(alerta_str.replace("d-", ""))
-            data_alerta = (data_limite - timedelta(days=dias)).isoformat()
+            data_alerta = calendario.subtrair_dias_uteis(data_limite, dias).isoformat()
             
             agenda_items.append({
                 "id": str(uuid.uuid4()),
@@ -823,12 +1054,12 @@ async def registrar_prazo(processo_id: str, dados: PrazoCreate):
         "status": "pendente"
     })
     
+    await _inserir_subentidades(processo, "prazos", [prazo])
+    await _inserir_subentidades(processo, "agenda", agenda_items)
     await db.tribunais_processos.update_one(
         {"id": processo_id},
         {
             "$push": {
-                "prazos": prazo,
-                "agenda": {"$each": agenda_items},
                 "historico": {
                     "id": str(uuid.uuid4()),
                     "evento": "prazo_cadastrado",
@@ -841,6 +1072,8 @@ async def registrar_prazo(processo_id: str, dados: PrazoCreate):
         }
     )
     
+    await alert_scheduler.notify_change("tribunais", processo_id)
+    
     logger.info(f"📅 Prazo registrado: {prazo_id} - {dados.descricao}")
     
     return {
@@ -860,7 +1093,9 @@ async def consultar_agenda(
     fim: Optional[str] = None,
     incluir_publicacoes: bool = True,
     incluir_prazos: bool = True,
-    incluir_alertas: bool = True
+    incluir_alertas: bool = True,
+    busca_aproximada: bool = False,
+    limiar: float = ident.LIMIAR_SIMILARIDADE
 ):
     """
     Consulta agenda por identificador (CPF, CNPJ, OAB, Nome, etc)
@@ -869,58 +1104,68 @@ async def consultar_agenda(
     - Publicações
     - Prazos
     - Alertas D-5, D-3, D-1
+    
+    A correspondência é exata sobre o identificador normalizado; com
+    busca_aproximada=True o identificador é tratado como nome (trigramas).
     """
     if not identificador:
         raise HTTPException(status_code=400, detail="Identificador é obrigatório")
     
-    # Buscar processos com este identificador
-    query = {"identificadores_busca": {"$regex": identificador, "$options": "i"}}
-    processos = await db.tribunais_processos.find(query, {"_id": 0}).to_list(200)
-    
-    inicio_dt = _parse_iso(inicio) if inicio else None
-    fim_dt = _parse_iso(fim) if fim else None
+    await _garantir_colecoes()
     
+    if busca_aproximada:
+        processos = await _processos_por_nome(identificador, {}, limiar, 200)
+        nomes = {f"nome:{n}" for proc in processos for n in proc["nomes_correspondentes"]}
+        query: Dict[str, Any] = {
+            "identificadores_chaves": {"$in": sorted(nomes)},
+            "processo_id": {"$in": [proc["id"] for proc in processos]}
+        }
+    else:
+        # Correspondência exata pela chave normalizada (índice identificadores_chaves + data_dt)
+        chave = ident.chave_identificador(identificador)
+        if not chave:
+            raise HTTPException(status_code=400, detail="Identificador inválido")
+        query = {"identificadores_chaves": chave}
+    intervalo = {}
+    for operador, valor in (("$gte", inicio), ("$lte", fim)):
+        if valor:
+            limite = _data_utc(valor)
+            if limite is None:
+                raise HTTPException(status_code=400, detail=f"Data inválida: {valor}")
+            intervalo[operador] = limite
+    query["data_dt"] = intervalo or {"$ne": None}
+    
+    # Filtros de tipo
+    excluir = []
+    if not incluir_publicacoes:
+        excluir.append("publicacao")
+    if not incluir_prazos:
+        excluir.append("prazo")
+    if excluir:
+        query["tipo"] = {"$nin": excluir}
+    if not incluir_alertas:
+        query.setdefault("tipo", {})["$not"] = {"$regex": "^alerta_"}
+    
+    itens = await db.tribunais_agenda.find(
+        query, {"_id": 0, "data_dt": 0, "identificadores_chaves": 0, "tribunal_uf": 0, "comarca": 0}
+    ).sort("data_dt", 1).to_list(None)
+    
+    # Enriquecer com dados do processo (classe e vara não são replicados)
+    processo_ids = list({item["processo_id"] for item in itens})
+    detalhes = {
+        proc["id"]: proc
+        async for proc in db.tribunais_processos.find(
+            {"id": {"$in": processo_ids}}, {"_id": 0, "id": 1, "classe_processual": 1, "vara": 1}
+        )
+    }
     agenda_completa = []
-    
-    for processo in processos:
-        for item in processo.get("agenda", []):
-            # Verificar se identificador está neste item
-            if identificador.lower() not in [id_.lower() for id_ in item.get("identificadores", [])]:
-                continue
-            
-            # Parse data
-            try:
-                data_item = _parse_iso(item["data"])
-            except:
-                continue
-            
-            # Filtros de data
-            if inicio_dt and data_item < inicio_dt:
-                continue
-            if fim_dt and data_item > fim_dt:
-                continue
-            
-            # Filtros de tipo
-            if item["tipo"] == "publicacao" and not incluir_publicacoes:
-                continue
-            if item["tipo"] == "prazo" and not incluir_prazos:
-                continue
-            if item["tipo"].startswith("alerta_") and not incluir_alertas:
-                continue
-            
-            # Enriquecer com dados do processo
-            agenda_completa.append({
-                **item,
-                "processo_id": processo["id"],
-                "numero_processo": processo["numero_processo"],
-                "tribunal": processo["tribunal"],
-                "sistema": processo["sistema"],
-                "classe": processo.get("classe_processual"),
-                "vara": processo.get("vara")
-            })
-    
-    # Ordenar por data
-    agenda_completa.sort(key=lambda x: x["data"])
+    for item in itens:
+        processo = detalhes.get(item["processo_id"], {})
+        agenda_completa.append({
+            **item,
+            "classe": processo.get("classe_processual"),
+            "vara": processo.get("vara")
+        })
     
     logger.info(f"📅 Agenda consultada: {identificador} - {len(agenda_completa)} itens")
     
@@ -935,7 +1180,7 @@ async def consultar_agenda(
 # ============================================================================
 
 @router.get("/monitoramento")
-async def painel_monitoramento():
+async def painel_monitoramento(limite: int = 500):
     """
     Dashboard de monitoramento da integração
     
@@ -944,77 +1189,60 @@ async def painel_monitoramento():
     - Prazos críticos (≤ 5 dias)
     - Publicações não lidas
     - Sincronizações pendentes
+    
+    `limite` restringe as listas de publicações e sincronizações.
     """
-    processos = await db.tribunais_processos.find({}, {"_id": 0}).to_list(300)
+    await _garantir_colecoes()
     agora = datetime.now(timezone.utc)
     
-    # Contadores
-    total_processos = len(processos)
-    por_tribunal = {}
-    por_sistema = {}
+    # Contadores por tribunal/sistema em uma agregação (índice tribunal + sistema)
+    resumo = await db.tribunais_processos.aggregate([
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "por_tribunal": [{"$group": {"_id": {"$ifNull": ["$tribunal", "Desconhecido"]}, "n": {"$sum": 1}}}],
+            "por_sistema": [{"$group": {"_id": {"$ifNull": ["$sistema", "Desconhecido"]}, "n": {"$sum": 1}}}]
+        }}
+    ]).to_list(1)
+    resumo = resumo[0] if resumo else {"total": [], "por_tribunal": [], "por_sistema": []}
+    
+    # Prazos críticos (≤ 5 dias) a partir do agendador de alertas em memória
+    await alert_scheduler.ensure_started()
     prazos_criticos = []
-    publicacoes_nao_lidas = []
-    sincronizacoes_pendentes = []
-    
-    for proc in processos:
-        # Contadores por tribunal/sistema
-        tribunal = proc.get("tribunal", "Desconhecido")
-        sistema = proc.get("sistema", "Desconhecido")
-        
-        por_tribunal[tribunal] = por_tribunal.get(tribunal, 0) + 1
-        por_sistema[sistema] = por_sistema.get(sistema, 0) + 1
-        
-        # Prazos críticos (≤ 5 dias)
-        for prazo in proc.get("prazos", []):
-            if prazo.get("cumprido"):
-                continue
-            try:
-                data_limite = _parse_iso(prazo["data_limite"])
-                dias = (data_limite - agora).days
-                
-                if dias <= 5:
-                    prazos_criticos.append({
-                        "processo_id": proc["id"],
-                        "numero_processo": proc["numero_processo"],
-                        "tribunal": tribunal,
-                        "descricao": prazo["descricao"],
-                        "data_limite": prazo["data_limite"],
-                        "dias_restantes": dias,
-                        "responsavel": prazo.get("responsavel"),
-                        "urgencia": "vencido" if dias < 0 else "hoje" if dias == 0 else "critico" if dias <= 1 else "proximo"
-                    })
-            except:
-                pass
-        
-        # Publicações não lidas
-        for pub in proc.get("publicacoes", []):
-            if not pub.get("lida"):
-                publicacoes_nao_lidas.append({
-                    "processo_id": proc["id"],
-                    "numero_processo": proc["numero_processo"],
-                    "tribunal": tribunal,
-                    "titulo": pub["titulo"],
-                    "data_publicacao": pub["data_publicacao"]
-                })
-        
-        # Sincronizações pendentes
-        for sync in proc.get("sincronizacoes", []):
-            if sync.get("status") == "pendente":
-                sincronizacoes_pendentes.append({
-                    "processo_id": proc["id"],
-                    "numero_processo": proc["numero_processo"],
-                    "tribunal": tribunal,
-                    "tipo": sync.get("tipo"),
-                    "descricao": sync.get("descricao"),
-                    "criado_em": sync.get("created_at")
-                })
+    for entry in alert_scheduler.scheduler.upcoming("tribunais", until=agora + timedelta(days=6)):
+        dias = (entry.due - agora).days
+        if dias > 5:
+            break
+        prazos_criticos.append({
+            **entry.data,
+            "dias_restantes": dias,
+            "urgencia": "vencido" if dias < 0 else "hoje" if dias == 0 else "critico" if dias <= 1 else "proximo"
+        })
+    
+    # Publicações não lidas (índice lida + data_publicacao_dt)
+    publicacoes_nao_lidas = await db.tribunais_publicacoes.find(
+        {"lida": False},
+        {"_id": 0, "processo_id": 1, "numero_processo": 1, "tribunal": 1, "titulo": 1, "data_publicacao": 1}
+    ).sort("data_publicacao_dt", -1).to_list(limite)
+    
+    # Sincronizações pendentes (índice status + created_at)
+    sincronizacoes_pendentes = [
+        {
+            "processo_id": sync["processo_id"],
+            "numero_processo": sync.get("numero_processo"),
+            "tribunal": sync.get("tribunal"),
+            "tipo": sync.get("tipo"),
+            "descricao": sync.get("descricao"),
+            "criado_em": sync.get("created_at")
+        }
+        async for sync in db.tribunais_sincronizacoes.find({"status": "pendente"}, {"_id": 0}).sort("created_at", 1).limit(limite)
+    ]
     
     return {
-        "total_processos": total_processos,
-        "por_tribunal": por_tribunal,
-        "por_sistema": por_sistema,
+        "total_processos": resumo["total"][0]["n"] if resumo["total"] else 0,
+        "por_tribunal": {grupo["_id"]: grupo["n"] for grupo in resumo["por_tribunal"]},
+        "por_sistema": {grupo["_id"]: grupo["n"] for grupo in resumo["por_sistema"]},
         "prazos_criticos": sorted(prazos_criticos, key=lambda x: x["data_limite"]),
-        "publicacoes_nao_lidas": sorted(publicacoes_nao_lidas, key=lambda x: x["data_publicacao"], reverse=True),
+        "publicacoes_nao_lidas": publicacoes_nao_lidas,
         "sincronizacoes_pendentes": sincronizacoes_pendentes,
         "atualizado_em": _agora_iso()
     }
@@ -1071,7 +1299,9 @@ async def configurar_diario_oficial(uf: str, url_diario: str, parser_type: str =
     """
     Configura captura automática de Diário Oficial do estado
     
-    Suporta todos os 27 estados + DOU (Diário Oficial da União)
+    Suporta todos os 27 estados + DOU (Diário Oficial da União).
+    url_diario aceita {data} (AAAA-MM-DD) e {data_compacta} (AAAAMMDD)
+    para a edição do dia; a captura roda em segundo plano (diario_sync).
     """
     if uf not in [e["sigla"] for e in ESTADOS_BRASIL] and uf != "DOU":
         raise HTTPException(status_code=400, detail="UF inválida")
@@ -1088,6 +1318,7 @@ async def configurar_diario_oficial(uf: str, url_diario: str, parser_type: str =
     }
     
     await db.diarios_oficiais_configs.insert_one(config)
+    await diario_sync.ensure_started()
     
     logger.info(f"📰 Diário Oficial configurado: {uf}")
     
@@ -1097,9 +1328,33 @@ async def configurar_diario_oficial(uf: str, url_diario: str, parser_type: str =
         "message": "Diário Oficial configurado com sucesso"
     }
 
+@router.post("/diarios/sincronizar")
+async def sincronizar_diarios(background_tasks: BackgroundTasks, aguardar: bool = False):
+    """
+    Dispara a captura das fontes configuradas fora do ciclo agendado
+    
+    Com aguardar=True retorna o resumo da execução.
+    """
+    await diario_sync.ensure_started()
+    if aguardar:
+        return await diario_sync.sincronizar_diarios()
+    background_tasks.add_task(diario_sync.sincronizar_diarios)
+    return {"message": "Sincronização de diários iniciada"}
+
+@router.get("/diarios/status")
+async def status_diarios():
+    """Situação do agendador, edições armazenadas e ocorrências encontradas"""
+    return {
+        **diario_sync.agendador.status(),
+        "edicoes_armazenadas": await db.diarios_edicoes.count_documents({}),
+        "ocorrencias": await db.diarios_ocorrencias.count_documents({}),
+        "identificadores_avulsos": await db.diarios_monitorados.count_documents({})
+    }
+
 @router.post("/diarios/pesquisar")
 async def pesquisar_diario_oficial(
     identificadores: List[str],
+    background_tasks: BackgroundTasks,
     estados: List[str] = None,
     data_inicio: Optional[str] = None,
     data_fim: Optional[str] = None
@@ -1109,27 +1364,44 @@ async def pesquisar_diario_oficial(
     
     Busca por: Nome, CPF, CNPJ, OAB, número de processo
     Em todos os estados configurados ou estados específicos
+    
+    As ocorrências vêm do índice gerado na captura das edições. Identificadores
+    ainda não monitorados passam a ser e as edições já armazenadas são
+    reprocessadas em segundo plano.
     """
     if not identificadores:
         raise HTTPException(status_code=400, detail="Informe ao menos um identificador")
     
-    # Simular busca em diários oficiais
-    # Em produção, fazer scraping real ou usar APIs dos DOs
+    chaves = {identificador: ident.chave_identificador(identificador) for identificador in identificadores}
+    novas = await diario_sync.monitorar(identificadores, origem="pesquisa")
+    if novas:
+        background_tasks.add_task(diario_sync.reprocessar, novas)
+    
+    filtro: Dict[str, Any] = {"chave": {"$in": [c for c in chaves.values() if c]}}
+    if estados:
+        filtro["uf"] = {"$in": estados}
+    if data_inicio or data_fim:
+        filtro["data_referencia"] = {}
+        if data_inicio:
+            filtro["data_referencia"]["$gte"] = data_inicio[:10]
+        if data_fim:
+            filtro["data_referencia"]["$lte"] = data_fim[:10]
+    
+    por_chave: Dict[str, List[Dict[str, Any]]] = {}
+    async for ocorrencia in db.diarios_ocorrencias.find(filtro, {"_id": 0}).sort("data_referencia", -1).limit(1000):
+        por_chave.setdefault(ocorrencia["chave"], []).append(ocorrencia)
     
     resultados = []
-    
-    for identificador in identificadores:
-        resultado = {
+    for identificador, chave in chaves.items():
+        publicacoes = por_chave.get(chave, []) if chave else []
+        resultados.append({
             "identificador": identificador,
-            "encontrado": False,
-            "publicacoes": [],
+            "chave": chave,
+            "encontrado": bool(publicacoes),
+            "publicacoes": publicacoes,
+            "reprocessando": chave in novas,
             "estados_pesquisados": estados or [e["sigla"] for e in ESTADOS_BRASIL]
-        }
-        
-        # TODO: Implementar busca real nos diários
-        # Por enquanto, retornar estrutura
-        
-        resultados.append(resultado)
+        })
     
     logger.info(f"🔍 Pesquisa em Diários: {len(identificadores)} identificadores")
     
@@ -1157,9 +1429,25 @@ async def sincronizar_oab(oab: str, uf: str):
     if uf not in [e["sigla"] for e in ESTADOS_BRASIL]:
         raise HTTPException(status_code=400, detail="UF inválida")
     
-    # Simular consulta ao portal OAB
-    # Em produção, usar API oficial da OAB ou scraping autorizado
+    try:
+        dados_portal = await diario_sync.consultar_portal_oab(oab, uf)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Falha ao consultar Portal OAB: {exc}")
+    
+    if diario_sync.OAB_PORTAL_URL:
+        # 304: registro inalterado, apenas renova a data de sincronização
+        dados_oab = {**(dados_portal or {}), "oab": oab, "uf": uf, "sincronizado_em": _agora_iso()}
+        await db.oab_cache.update_one({"oab": oab, "uf": uf}, {"$set": dados_oab}, upsert=True)
+        dados_oab = await db.oab_cache.find_one({"oab": oab, "uf": uf}, {"_id": 0})
+        await diario_sync.ensure_started()
+        logger.info(f"⚖️ OAB sincronizado: {oab}/{uf}")
+        return {
+            "success": True,
+            "dados": dados_oab,
+            "message": "Dados sincronizados com Portal OAB"
+        }
     
+    # Sem portal configurado (OAB_PORTAL_URL): dados simulados
     dados_oab = {
         "oab": oab,
         "uf": uf,
@@ -1190,7 +1478,7 @@ async def sincronizar_oab(oab: str, uf: str):
 
 @router.get("/oab/consultar")
 async def consultar_oab_cache(oab: str, uf: str):
-    """Consulta dados em cache do Portal OAB"""
+    """Consulta dados em cache do Portal OAB (renovado periodicamente pelo agendador)"""
     dados = await db.oab_cache.find_one(
         {"oab": oab, "uf": uf},
         {"_id": 0}
@@ -1202,8 +1490,12 @@ async def consultar_oab_cache(oab: str, uf: str):
             "message": "Execute sincronização primeiro"
         }
     
+    limite = datetime.now(timezone.utc) - timedelta(seconds=diario_sync.OAB_CACHE_TTL_SECONDS)
+    sincronizado = _data_utc(dados.get("sincronizado_em"))
+    
     return {
         "encontrado": True,
+        "desatualizado": sincronizado is None or sincronizado < limite,
         "dados": dados
     }
 
@@ -1,61 +1,64 @@
 """Módulo 14: Processamento Aprimorado (Orquestração de Jobs)"""
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
-import uuid
+from typing import Optional
 
-router = APIRouter(prefix="/api/processing/advanced", tags=["Processamento Aprimorado"])
-
-class Job(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    job_type: str
-    evidence_id: str
-    priority: str = "P2"  # P1, P2, P3
-    status: str = "queued"  # queued, running, completed, failed
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    completed_at: Optional[datetime] = None
-    error_message: Optional[str] = None
+import job_queue
 
-jobs_db = {}
+router = APIRouter(prefix="/api/processing/advanced", tags=["Processamento Aprimorado"])
 
 @router.get("/jobs")
-async def list_jobs(status: Optional[str] = None, priority: Optional[str] = None):
+async def list_jobs(status: Optional[str] = None, priority: Optional[str] = None, job_type: Optional[str] = None, limit: int = 100):
     """Lista jobs"""
-    jobs = list(jobs_db.values())
-    if status:
-        jobs = [j for j in jobs if j.status == status]
-    if priority:
-        jobs = [j for j in jobs if j.priority == priority]
+    jobs = await job_queue.list_jobs(status=status, priority=priority, job_type=job_type, limit=min(limit, 1000))
     return {"total": len(jobs), "jobs": jobs}
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status e progresso de um job"""
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
 @router.post("/jobs/{evidence_id}")
-async def create_job(evidence_id: str, job_type: str, priority: str = "P2"):
+async def create_job(evidence_id: str, job_type: str, priority: str = "P2", max_attempts: int = 3):
     """Cria novo job de processamento"""
-    job = Job(job_type=job_type, evidence_id=evidence_id, priority=priority)
-    jobs_db[job.id] = job
+    if job_type not in job_queue.HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Tipo de job inválido. Disponíveis: {', '.join(job_queue.HANDLERS)}")
+    if priority not in job_queue.PRIORITIES:
+        raise HTTPException(status_code=400, detail="Prioridade inválida. Use P0, P1, P2 ou P3")
+    id_param = job_queue.HANDLERS[job_type]["id_param"]
+    return await job_queue.enqueue(
+        job_type,
+        {id_param: evidence_id},
+        priority=priority,
+        max_attempts=max(1, max_attempts),
+        dedupe_key=f"{job_type}:{evidence_id}"
+    )
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancela job ainda na fila"""
+    job = await job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou já iniciado")
     return job
 
 @router.post("/retry/{job_id}")
 async def retry_job(job_id: str):
     """Reprocessa job que falhou"""
-    if job_id not in jobs_db:
-        raise HTTPException(status_code=404, detail="Job não encontrado")
-    
-    job = jobs_db[job_id]
-    job.status = "queued"
-    job.error_message = None
+    job = await job_queue.retry(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou não está em estado de falha")
     return job
 
+@router.get("/job-types")
+async def list_job_types():
+    return {"job_types": list(job_queue.HANDLERS), "priorities": list(job_queue.PRIORITIES)}
+
 @router.get("/stats")
 async def get_stats():
-    return {
-        "total_jobs": len(jobs_db),
-        "queued": len([j for j in jobs_db.values() if j.status == "queued"]),
-        "running": len([j for j in jobs_db.values() if j.status == "running"]),
-        "completed": len([j for j in jobs_db.values() if j.status == "completed"]),
-        "failed": len([j for j in jobs_db.values() if j.status == "failed"])
-    }
+    return await job_queue.stats()
 
 @router.get("/health")
 async def health_check():
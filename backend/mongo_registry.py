@@ -0,0 +1,239 @@
+"""
+Registro de Conexões MongoDB e Manifesto de Índices
+Um único AsyncIOMotorClient por URL, criado sob demanda e compartilhado por
+todos os módulos (um pool de conexões por processo em vez de um por arquivo).
+O manifesto declara os índices das consultas mais frequentes; ensure_indexes()
+os aplica de forma idempotente no startup e index_report() aponta índices
+ausentes e sem uso ($indexStats).
+
+Coleções com criação de índices própria (jobs, generated_reports,
+tribunais_*, diarios_*, dashboard_rollups, document_deltas, ws_presence...) não entram aqui.
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "test_database")
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+
+_clients: Dict[str, Any] = {}
+
+
+# ==================== CLIENTES ====================
+
+def get_client(url: Optional[str] = None):
+    """Cliente compartilhado para a URL (MONGO_URL por padrão), criado no primeiro uso"""
+    url = url or MONGO_URL
+    if url not in _clients:
+        _clients[url] = AsyncIOMotorClient(url, maxPoolSize=MAX_POOL_SIZE)
+    return _clients[url]
+
+
+def get_database(name: Optional[str] = None, url: Optional[str] = None):
+    return get_client(url)[name or DB_NAME]
+
+
+def set_client(client, url: Optional[str] = None):
+    """Registra um cliente externo (ex.: mongomock-motor em testes) para a URL"""
+    _clients[url or MONGO_URL] = client
+
+
+def close_all():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+
+
+# ==================== MANIFESTO DE ÍNDICES ====================
+
+Keys = Union[str, Sequence[Tuple[str, int]]]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Keys
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+    database: Optional[str] = None
+
+    @property
+    def key_pattern(self) -> List[Tuple[str, int]]:
+        return [(self.keys, 1)] if isinstance(self.keys, str) else [(k, d) for k, d in self.keys]
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{k}_{d}" for k, d in self.key_pattern)
+
+
+DESC = -1
+
+INDEX_MANIFEST: List[IndexSpec] = [
+    # Usuários e autenticação
+    IndexSpec("users", "id"),
+    IndexSpec("users", "email"),
+    IndexSpec("users", "token", sparse=True),
+    IndexSpec("users", "role"),
+
+    # Casos, clientes e processos
+    IndexSpec("cases", "id"),
+    IndexSpec("cases", [("status", 1), ("created_at", DESC)]),
+    IndexSpec("cases", [("created_at", DESC)]),
+    IndexSpec("cases", "client_id"),
+    IndexSpec("cases", "updated_at"),
+    IndexSpec("clients", "id"),
+    IndexSpec("clients", [("created_at", DESC)]),
+    IndexSpec("processes", "id"),
+    IndexSpec("processes", [("status", 1), ("created_at", DESC)]),
+    IndexSpec("processes", "client_id"),
+    IndexSpec("hearings", "date"),
+    IndexSpec("analises_processuais", "id"),
+    IndexSpec("analises_processuais", "status"),
+    IndexSpec("autos_paginas", [("documento_id", 1), ("pagina_volume", 1)], unique=True),
+    IndexSpec("autos_paginas", [("analise_id", 1), ("pagina", 1)]),
+    IndexSpec("autos_paginas", [("analise_id", 1), ("termos", 1)]),
+    IndexSpec("processos_juridicos", "id"),
+    IndexSpec("processos_juridicos", "ativo"),
+    IndexSpec("investigation_cases", "id"),
+    IndexSpec("investigation_cases", "created_by"),
+
+    # Evidências e perícia
+    IndexSpec("evidence", [("case_id", 1), ("created_at", DESC)]),
+    IndexSpec("evidence", "analysis_status"),
+    IndexSpec("evidence", "created_at"),
+    IndexSpec("phone_interceptions", [("created_at", DESC)], database="ap_elite"),
+    IndexSpec("phone_interceptions", "relevance", database="ap_elite"),
+    IndexSpec("interception_analysis", "id"),
+    IndexSpec("interception_analysis", "case_id"),
+    IndexSpec("forensics_exams", "id"),
+    IndexSpec("forensics_exams", "status"),
+    IndexSpec("custody_acts", [("evidence_id", 1), ("timestamp", 1)]),
+    IndexSpec("custody_acts", [("timestamp", DESC)]),
+
+    # Documentos, financeiro e auditoria
+    IndexSpec("documents", "client_id"),
+    IndexSpec("documents", [("status", 1), ("upload_date", DESC)]),
+    IndexSpec("financial_records", [("date", DESC)]),
+    IndexSpec("financial_records", "case_id", sparse=True),
+    IndexSpec("documents", "created_at"),
+    IndexSpec("payments", [("created_at", DESC)]),
+    IndexSpec("payments", [("status", 1), ("created_at", DESC)]),
+    # Login (server.py) grava em DB_NAME; security_features, em ap_elite
+    IndexSpec("audit_logs", [("timestamp", DESC)]),
+    IndexSpec("audit_logs", [("timestamp", DESC)], database="ap_elite"),
+    IndexSpec("search_history", [("timestamp", DESC)]),
+
+    # Comunicação e agenda
+    IndexSpec("messages", [("conversation_id", 1), ("created_at", 1)]),
+    IndexSpec("conversations", "participants"),
+    IndexSpec("notifications", [("user_id", 1), ("created_at", DESC)], database="ap_elite"),
+    IndexSpec("notifications", "id", database="ap_elite"),
+    IndexSpec("calendar_events", "start_time"),
+    IndexSpec("appointments", [("status", 1), ("datetime", 1)]),
+    IndexSpec("meetings", "start_time"),
+
+    # Prazos e tarefas
+    IndexSpec("deadlines", "id"),
+    IndexSpec("deadlines", [("completed", 1), ("deadline", 1)]),
+    IndexSpec("deadlines", "deadline"),
+    IndexSpec("deadlines", "updated_at"),
+    IndexSpec("workflow_tasks", [("status", 1), ("due_date", 1)]),
+]
+
+
+async def ensure_indexes(manifest: Optional[List[IndexSpec]] = None, client=None) -> Dict[str, Any]:
+    """
+    Cria os índices do manifesto. create_index é idempotente para a mesma
+    especificação; conflitos (opções divergentes, duplicatas em índice único)
+    são registrados e não interrompem o startup.
+    """
+    from pymongo.errors import OperationFailure
+
+    client = client or get_client()
+    resumo = {"aplicados": 0, "falhas": []}
+    for spec in manifest if manifest is not None else INDEX_MANIFEST:
+        options: Dict[str, Any] = {"name": spec.name}
+        if spec.unique:
+            options["unique"] = True
+        if spec.sparse:
+            options["sparse"] = True
+        if spec.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = spec.expire_after_seconds
+        try:
+            await client[spec.database or DB_NAME][spec.collection].create_index(spec.key_pattern, **options)
+            resumo["aplicados"] += 1
+        except OperationFailure as e:
+            logger.warning("Índice %s.%s não aplicado: %s", spec.collection, spec.name, e)
+            resumo["falhas"].append({"collection": spec.collection, "index": spec.name, "erro": str(e)})
+    logger.info("🗂️ Manifesto de índices aplicado: %s índices, %s falhas", resumo["aplicados"], len(resumo["falhas"]))
+    return resumo
+
+
+def _direcao(valor):
+    """1/-1 (às vezes 1.0) viram int; "text", "2dsphere", "hashed"... ficam como estão"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return int(valor)
+    return valor
+
+
+async def index_report(manifest: Optional[List[IndexSpec]] = None, client=None) -> Dict[str, Any]:
+    """
+    Compara o manifesto com os índices existentes:
+    - missing: declarados e inexistentes
+    - unused: existentes com zero acessos desde o último restart ($indexStats);
+      None quando o servidor não suporta $indexStats (unused_unavailable lista as coleções)
+    - collections_without_indexes: coleções com apenas _id
+    """
+    from pymongo.errors import OperationFailure
+
+    client = client or get_client()
+    manifest = manifest if manifest is not None else INDEX_MANIFEST
+    missing, unused, sem_indices, sem_stats = [], [], [], []
+    com_stats = False
+
+    por_banco: Dict[str, List[IndexSpec]] = {}
+    for spec in manifest:
+        por_banco.setdefault(spec.database or DB_NAME, []).append(spec)
+
+    for nome_banco, specs in por_banco.items():
+        database = client[nome_banco]
+        colecoes = await database.list_collection_names()
+        existentes: Dict[str, List[Tuple[str, int]]] = {}
+        for colecao in colecoes:
+            indices = await database[colecao].list_indexes().to_list(None)
+            existentes[colecao] = [tuple((k, _direcao(v)) for k, v in idx["key"].items()) for idx in indices]
+            if len(indices) <= 1:
+                sem_indices.append(f"{nome_banco}.{colecao}")
+            try:
+                stats = await database[colecao].aggregate([{"$indexStats": {}}]).to_list(None)
+                com_stats = True
+            except (OperationFailure, NotImplementedError):
+                # mongomock e servidores sem permissão/suporte a $indexStats
+                sem_stats.append(f"{nome_banco}.{colecao}")
+                stats = []
+            for stat in stats:
+                if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append({
+                        "database": nome_banco,
+                        "collection": colecao,
+                        "index": stat["name"],
+                        "since": stat.get("accesses", {}).get("since")
+                    })
+        for spec in specs:
+            if tuple(spec.key_pattern) not in existentes.get(spec.collection, []):
+                missing.append({"database": nome_banco, "collection": spec.collection, "index": spec.name})
+
+    return {
+        "missing": missing,
+        "unused": unused if com_stats or not sem_stats else None,
+        "unused_unavailable": sorted(sem_stats),
+        "collections_without_indexes": sorted(sem_indices)
+    }
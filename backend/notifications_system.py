@@ -4,14 +4,14 @@ AP ELITE ATHENA - Sistema de Notificações em Tempo Real
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional, List
 import uuid
 import os
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
@@ -9,7 +9,7 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
 import base64
 import httpx
@@ -17,7 +17,7 @@ import httpx
 router = APIRouter(prefix="/api/ocr", tags=["OCR Advanced"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 OCR_DIR = "/app/backend/ocr_processed"
@@ -4,19 +4,22 @@ Integra ferramentas e fontes abertas para investigação
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
+import json
+import asyncio
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
-import httpx
+from osint_executor import executor as osint_executor
 
 router = APIRouter(prefix="/api/osint", tags=["OSINT Enhanced"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class OSINTSource(BaseModel):
@@ -31,6 +34,10 @@ class OSINTQuery(BaseModel):
     query: str
     sources: List[str] = []
     use_ai_analysis: bool = True
+    use_cache: bool = True
+
+# Máximo de consultas por chamada de /bulk-search
+BULK_LIMIT = int(os.environ.get("OSINT_BULK_LIMIT", 50))
 
 class OSINTResult(BaseModel):
     query: str
@@ -308,63 +315,64 @@ async def get_category_sources(category: str):
     
     return OSINT_CATEGORIES[category]
 
-@router.post("/query")
-async def execute_osint_query(query: OSINTQuery):
-    """Executa consulta OSINT com análise de IA"""
+async def _categorias_para(query_text: str, categories: Optional[List[str]]) -> List[str]:
+    """Categorias informadas ou, na falta delas, as 3 sugeridas pela IA"""
+    if categories:
+        return categories
+    prompt = f"""
+    Para a seguinte consulta OSINT: "{query_text}"
     
-    # Determinar fontes baseado na consulta se não especificado
-    if not query.sources:
-        # Usar IA para determinar fontes relevantes
-        prompt = f"""
-        Para a seguinte consulta OSINT: "{query.query}"
-        
-        Categorias disponíveis: {list(OSINT_CATEGORIES.keys())}
-        
-        Sugira as 3 categorias mais relevantes para esta investigação.
-        Responda apenas com os nomes das categorias separados por vírgula.
-        """
-        
-        ai_result = await ai_orchestrator.intelligent_analysis(
-            'osint_analysis',
-            prompt
-        )
-        
-        suggested_categories = ai_result.get('response', '').strip().split(',')
-        suggested_categories = [cat.strip() for cat in suggested_categories]
-    else:
-        suggested_categories = query.sources
-    
-    # Coletar fontes das categorias
-    sources_used = []
-    for category in suggested_categories:
-        if category in OSINT_CATEGORIES:
-            sources_used.extend(OSINT_CATEGORIES[category]['sources'])
+    Categorias disponíveis: {list(OSINT_CATEGORIES.keys())}
+    
+    Sugira as 3 categorias mais relevantes para esta investigação.
+    Responda apenas com os nomes das categorias separados por vírgula.
+    """
+    
+    ai_result = await ai_orchestrator.intelligent_analysis(
+        'osint_analysis',
+        prompt
+    )
     
-    # Simular coleta de dados (em produção, isso faria requisições reais)
+    return [cat.strip() for cat in ai_result.get('response', '').strip().split(',')]
+
+def _fontes_das_categorias(categories: List[str]) -> List[Dict[str, Any]]:
+    sources = []
+    for category in categories:
+        if category in OSINT_CATEGORIES:
+            sources.extend({**source, 'category': category} for source in OSINT_CATEGORIES[category]['sources'])
+    return sources
+
+async def _concluir_consulta(query_text: str, categories: List[str], sources_used: List[Dict[str, Any]],
+                             results: List[Dict[str, Any]], use_ai_analysis: bool) -> Dict[str, Any]:
+    """Análise de IA sobre os resultados coletados e registro no histórico"""
+    fetched = [r for r in results if r['status'] != 'manual']
     collected_data = {
-        "query": query.query,
+        "query": query_text,
         "timestamp": datetime.now().isoformat(),
-        "categories_searched": suggested_categories,
+        "categories_searched": categories,
         "sources_checked": len(sources_used),
-        "source_details": sources_used[:5]  # Primeiras 5 fontes
+        "sources_queried": len(fetched),
+        "results": fetched,
+        "manual_sources": [{'name': r['source'], 'url': r['url']} for r in results if r['status'] == 'manual']
     }
     
-    # Análise com IA se solicitado
     ai_analysis = None
-    if query.use_ai_analysis:
+    if use_ai_analysis:
         analysis_result = await ai_orchestrator.osint_intelligence(
-            query.query,
+            query_text,
             collected_data
         )
         
         if analysis_result['success']:
             ai_analysis = analysis_result['response']
     
-    # Salvar consulta no histórico
     osint_record = {
-        "query": query.query,
-        "categories": suggested_categories,
+        "query": query_text,
+        "categories": categories,
         "sources_used": [s['name'] for s in sources_used],
+        "results_summary": [
+            {"source": r['source'], "status": r['status'], "cached": r.get('cached', False)} for r in fetched
+        ],
         "timestamp": datetime.now().isoformat(),
         "ai_analysis": ai_analysis
     }
@@ -372,14 +380,25 @@ async def execute_osint_query(query: OSINTQuery):
     await db.osint_queries.insert_one(osint_record)
     
     return {
-        "query": query.query,
-        "categories_searched": suggested_categories,
+        "query": query_text,
+        "categories_searched": categories,
         "sources": sources_used,
         "collected_data": collected_data,
         "ai_analysis": ai_analysis,
         "timestamp": datetime.now().isoformat()
     }
 
+@router.post("/query")
+async def execute_osint_query(query: OSINTQuery):
+    """Executa consulta OSINT nas fontes com endpoint de consulta, com análise de IA"""
+    
+    suggested_categories = await _categorias_para(query.query, query.sources)
+    sources_used = _fontes_das_categorias(suggested_categories)
+    
+    results = await osint_executor.run(query.query, sources_used, use_cache=query.use_cache)
+    
+    return await _concluir_consulta(query.query, suggested_categories, sources_used, results, query.use_ai_analysis)
+
 @router.get("/history")
 async def get_osint_history(limit: int = 20):
     """Histórico de consultas OSINT"""
@@ -525,34 +544,117 @@ async def get_osint_tools():
     }
 
 @router.post("/bulk-search")
-async def bulk_osint_search(queries: List[str], categories: Optional[List[str]] = None):
-    """Busca OSINT em lote"""
-    
-    results = []
+async def bulk_osint_search(
+    queries: List[str],
+    categories: Optional[List[str]] = None,
+    stream: bool = False,
+    use_ai_analysis: bool = True,
+    use_cache: bool = True
+):
+    """
+    Busca OSINT em lote, com todas as consultas em paralelo (limitadas pelo
+    executor). Com stream=true a resposta é NDJSON: um evento "result" por
+    (consulta, fonte) assim que fica pronto, "query_done" ao fim de cada
+    consulta e "done" no final.
+    """
+    if len(queries) > BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BULK_LIMIT} consultas por lote")
+    
+    if not stream:
+        async def executar(query_text: str) -> Dict[str, Any]:
+            try:
+                result = await execute_osint_query(
+                    OSINTQuery(
+                        query=query_text,
+                        sources=categories if categories else [],
+                        use_ai_analysis=use_ai_analysis,
+                        use_cache=use_cache
+                    )
+                )
+                return {"query": query_text, "success": True, "result": result}
+            except Exception as e:
+                return {"query": query_text, "success": False, "error": str(e)}
+        
+        results = await asyncio.gather(*[executar(q) for q in queries])
+        return {
+            "processed": len(results),
+            "results": results,
+            "executor": osint_executor.stats(),
+            "timestamp": datetime.now().isoformat()
+        }
     
-    for query_text in queries[:10]:  # Limite de 10 por vez
+    planos = await asyncio.gather(*[_categorias_para(q, categories) for q in queries])
+    fontes = [_fontes_das_categorias(cats) for cats in planos]
+    
+    async def eventos():
+        pendentes = {i: len(f) for i, f in enumerate(fontes)}
+        coletados: Dict[int, List[Dict[str, Any]]] = {i: [] for i in pendentes}
+        pares = [(i, source) for i, f in enumerate(fontes) for source in f]
+        # Resultados e resumos chegam pela mesma fila: a análise de IA de uma
+        # consulta roda em tarefa própria e não segura os resultados das demais
+        fila: asyncio.Queue = asyncio.Queue()
+        tarefas: List[asyncio.Task] = []
+        
+        async def concluir(i: int):
+            try:
+                resumo = await _concluir_consulta(queries[i], planos[i], fontes[i], coletados[i], use_ai_analysis)
+                evento = {"type": "query_done", "index": i, "query": queries[i],
+                          "ai_analysis": resumo["ai_analysis"],
+                          "sources_queried": resumo["collected_data"]["sources_queried"]}
+            except Exception as e:
+                evento = {"type": "query_done", "index": i, "query": queries[i], "error": str(e)}
+            await fila.put(("query_done", json.dumps(evento, ensure_ascii=False, default=str) + "\n"))
+        
+        def agendar(i: int):
+            tarefas.append(asyncio.create_task(concluir(i)))
+        
+        async def coletar():
+            try:
+                async for posicao, result in osint_executor.stream(
+                    ((queries[i], source) for i, source in pares), use_cache=use_cache
+                ):
+                    i = pares[posicao][0]
+                    coletados[i].append(result)
+                    pendentes[i] -= 1
+                    await fila.put(("result", json.dumps({"type": "result", "index": i, **result},
+                                                        ensure_ascii=False, default=str) + "\n"))
+                    if pendentes[i] == 0:
+                        agendar(i)
+            finally:
+                await fila.put(("fim", None))
+        
+        for i, f in enumerate(fontes):
+            if not f:
+                agendar(i)
+        produtor = asyncio.create_task(coletar())
+        
         try:
-            result = await execute_osint_query(
-                OSINTQuery(
-                    query=query_text,
-                    sources=categories if categories else [],
-                    use_ai_analysis=True
-                )
-            )
-            results.append({
-                "query": query_text,
-                "success": True,
-                "result": result
-            })
-        except Exception as e:
-            results.append({
-                "query": query_text,
-                "success": False,
-                "error": str(e)
-            })
+            restantes = len(queries)
+            coletando = True
+            while coletando or restantes:
+                tipo, linha = await fila.get()
+                if tipo == "fim":
+                    coletando = False
+                    # Executor interrompido: conclui as consultas com o que chegou
+                    for i, n in pendentes.items():
+                        if n > 0:
+                            pendentes[i] = 0
+                            agendar(i)
+                    continue
+                if tipo == "query_done":
+                    restantes -= 1
+                yield linha
+        finally:
+            # Cliente desconectou no meio do streaming
+            for tarefa in [produtor, *tarefas]:
+                tarefa.cancel()
+        
+        yield json.dumps({"type": "done", "processed": len(queries), "executor": osint_executor.stats(),
+                          "timestamp": datetime.now().isoformat()}, ensure_ascii=False) + "\n"
     
-    return {
-        "processed": len(results),
-        "results": results,
-        "timestamp": datetime.now().isoformat()
-    }
+    return StreamingResponse(eventos(), media_type="application/x-ndjson")
+
+@router.get("/executor/status")
+async def get_executor_status():
+    """Estado do executor OSINT: cache, limitadores e circuit breakers por fonte"""
+    return osint_executor.stats()
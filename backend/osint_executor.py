@@ -0,0 +1,390 @@
+"""
+Executor Concorrente de Consultas OSINT
+Um único httpx.AsyncClient (keep-alive) atende todas as fontes, com limite
+global de requisições simultâneas, token bucket por fonte e circuit breaker
+por fonte (falhas seguidas abrem o circuito; após o intervalo de espera uma
+requisição de teste decide se ele fecha de novo). Resultados ficam num cache
+LRU com TTL indexado por (fonte, consulta normalizada), e consultas idênticas
+em andamento são coalescidas. stream() devolve cada resultado assim que fica
+pronto.
+
+Só fontes com endpoint de consulta são requisitadas; as demais voltam como
+"manual" (link para consulta pelo analista). Endpoints extras ou substitutos
+vêm de OSINT_SOURCE_ENDPOINTS (JSON: nome da fonte -> modelo de URL com
+{query}, ou objeto com url, rate e burst).
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from ai_orchestrator import ResponseCache
+from identificadores import dobrar_texto
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.environ.get("OSINT_MAX_CONNECTIONS", 20))
+CONCURRENCY = int(os.environ.get("OSINT_CONCURRENCY", 8))
+REQUEST_TIMEOUT = float(os.environ.get("OSINT_TIMEOUT", 15))
+RATE_PER_SECOND = float(os.environ.get("OSINT_RATE_PER_SECOND", 1.0))
+BURST = int(os.environ.get("OSINT_BURST", 3))
+BREAKER_FAILURES = int(os.environ.get("OSINT_BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.environ.get("OSINT_BREAKER_RESET_SECONDS", 60))
+CACHE_TTL_SECONDS = int(os.environ.get("OSINT_CACHE_TTL_SECONDS", 6 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("OSINT_CACHE_MAX_ENTRIES", 5000))
+MAX_TEXT_CHARS = int(os.environ.get("OSINT_MAX_TEXT_CHARS", 5000))
+USER_AGENT = os.environ.get("OSINT_USER_AGENT", "AP-Elite-Athena/1.0 (+consultas OSINT)")
+
+# Fontes públicas com API de consulta direta
+DEFAULT_ENDPOINTS: Dict[str, Dict[str, Any]] = {
+    "OpenStreetMap": {"url": "https://nominatim.openstreetmap.org/search?format=json&limit=10&q={query}", "rate": 1.0, "burst": 1},
+    "Ahmia": {"url": "https://ahmia.fi/search/?q={query}"},
+    "Consulta CEP": {"url": "https://brasilapi.com.br/api/cep/v1/{query}"},
+}
+
+
+def normalize_query(query: str) -> str:
+    """Consulta sem acentos, em minúsculas e com espaços colapsados"""
+    return dobrar_texto(query)
+
+
+# ==================== LIMITADORES ====================
+
+class TokenBucket:
+    """Token bucket assíncrono: rate fichas/s, até capacity acumuladas"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.not_before = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Espera uma ficha; devolve o tempo esperado em segundos"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = max(self.not_before - now, 0.0)
+                if not delay and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                if not delay:
+                    delay = (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def penalize(self, seconds: float):
+        """Suspende a fonte (ex.: 429 com Retry-After)"""
+        now = time.monotonic()
+        self.not_before = max(self.not_before, now + seconds)
+        self._refill(now)
+        self.tokens = 0.0
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_in: float):
+        super().__init__(f"Circuito aberto; nova tentativa em {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """closed -> open após N falhas seguidas -> half_open após o reset -> closed no primeiro sucesso"""
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open":
+            raise CircuitOpen(self.reset_seconds - (time.monotonic() - self.opened_at))
+        if state == "half_open":
+            # Uma única requisição de teste por vez
+            if self._trial:
+                raise CircuitOpen(self.reset_seconds)
+            self._trial = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            if self.opened_at is None or self._trial:
+                logger.warning("🔌 Circuito OSINT aberto após %s falhas", self.failures)
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    def release_trial(self):
+        """Requisição de teste cancelada: libera a vaga sem decidir o estado"""
+        self._trial = False
+
+
+# ==================== EXECUTOR ====================
+
+@dataclass
+class Endpoint:
+    url: str
+    rate: float = RATE_PER_SECOND
+    burst: int = BURST
+
+
+def load_endpoints() -> Dict[str, Endpoint]:
+    raw: Dict[str, Any] = dict(DEFAULT_ENDPOINTS)
+    extra = os.environ.get("OSINT_SOURCE_ENDPOINTS")
+    if extra:
+        try:
+            raw.update(json.loads(extra))
+        except ValueError as e:
+            logger.error("OSINT_SOURCE_ENDPOINTS inválido: %s", e)
+    endpoints = {}
+    for name, spec in raw.items():
+        if not spec:
+            continue
+        if isinstance(spec, str):
+            spec = {"url": spec}
+        endpoints[name] = Endpoint(url=spec["url"], rate=float(spec.get("rate", RATE_PER_SECOND)),
+                                   burst=int(spec.get("burst", BURST)))
+    return endpoints
+
+
+class OsintExecutor:
+    def __init__(self, endpoints: Optional[Dict[str, Endpoint]] = None, concurrency: int = CONCURRENCY,
+                 max_connections: int = MAX_CONNECTIONS, timeout: float = REQUEST_TIMEOUT):
+        self.endpoints = load_endpoints() if endpoints is None else endpoints
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache = ResponseCache(
+            max_entries=CACHE_MAX_ENTRIES,
+            ttl_seconds=CACHE_TTL_SECONDS,
+            disk_path=os.environ.get("OSINT_CACHE_DB") or None
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.metrics = {"requests": 0, "cache_hits": 0, "coalesced": 0, "errors": 0,
+                        "circuit_rejections": 0, "throttled_seconds": 0.0}
+
+    def _cliente(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT}
+            )
+        return self._client
+
+    def _limite(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _bucket(self, source: str) -> TokenBucket:
+        if source not in self._buckets:
+            endpoint = self.endpoints[source]
+            self._buckets[source] = TokenBucket(endpoint.rate, endpoint.burst)
+        return self._buckets[source]
+
+    def breaker(self, source: str) -> CircuitBreaker:
+        if source not in self._breakers:
+            self._breakers[source] = CircuitBreaker()
+        return self._breakers[source]
+
+    def register(self, name: str, url: str, rate: float = RATE_PER_SECOND, burst: int = BURST):
+        self.endpoints[name] = Endpoint(url=url, rate=rate, burst=burst)
+        self._buckets.pop(name, None)
+        self._breakers.pop(name, None)
+
+    @staticmethod
+    def cache_key(source: str, query: str) -> str:
+        return hashlib.sha256(f"{source}\x1f{normalize_query(query)}".encode()).hexdigest()
+
+    # ---- consulta a uma fonte ----
+
+    async def fetch(self, source: Dict[str, Any], query: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Consulta uma fonte; nunca levanta exceção (erros voltam em "status")"""
+        name = source["name"]
+        result = {"query": query, "source": name, "category": source.get("category"),
+                  "url": source.get("url"), "cached": False}
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            return {**result, "status": "manual"}
+
+        key = self.cache_key(name, query)
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self.metrics["cache_hits"] += 1
+                return {**result, **cached["result"], "cached": True}
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.metrics["coalesced"] += 1
+                try:
+                    return {**result, **(await asyncio.shield(inflight)), "coalesced": True}
+                except asyncio.CancelledError:
+                    # Quem fazia a requisição foi cancelado; refaz se esta tarefa segue viva
+                    if asyncio.current_task().cancelling():
+                        raise
+                    return await self.fetch(source, query, use_cache)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            outcome = await self._request(name, endpoint, query)
+            if outcome["status"] in ("ok", "empty"):
+                await self.cache.set(key, {"result": outcome, "created_at": time.time()})
+            future.set_result(outcome)
+            return {**result, **outcome}
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita "exception was never retrieved" quando não há chamadas coalescidas
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _request(self, name: str, endpoint: Endpoint, query: str) -> Dict[str, Any]:
+        breaker = self.breaker(name)
+        try:
+            breaker.before_call()
+        except CircuitOpen as e:
+            self.metrics["circuit_rejections"] += 1
+            return {"status": "circuit_open", "error": str(e), "retry_in_seconds": round(e.retry_in, 1)}
+
+        url = endpoint.url.format(query=quote(query.strip(), safe=""))
+        completed = False
+        try:
+            self.metrics["throttled_seconds"] += await self._bucket(name).acquire()
+            async with self._limite():
+                self.metrics["requests"] += 1
+                started = time.monotonic()
+                response = await self._cliente().get(url)
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            completed = True
+        except httpx.HTTPError as e:
+            completed = True
+            breaker.record_failure()
+            self.metrics["errors"] += 1
+            return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        finally:
+            if not completed:
+                breaker.release_trial()
+
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure()
+            self.metrics["errors"] += 1
+            if response.status_code == 429:
+                retry_after = response.headers.get("retry-after", "")
+                self._bucket(name).penalize(float(retry_after) if retry_after.isdigit() else 1 / max(endpoint.rate, 0.01))
+            return {"status": "error", "http_status": response.status_code, "elapsed_ms": elapsed_ms,
+                    "error": f"HTTP {response.status_code}"}
+
+        # 4xx do cliente não indicam fonte fora do ar
+        breaker.record_success()
+        if response.status_code == 404:
+            return {"status": "empty", "http_status": 404, "elapsed_ms": elapsed_ms, "data": None}
+        if response.status_code >= 400:
+            return {"status": "error", "http_status": response.status_code, "elapsed_ms": elapsed_ms,
+                    "error": f"HTTP {response.status_code}"}
+
+        content_type = response.headers.get("content-type", "")
+        if "json" in content_type:
+            try:
+                data: Any = response.json()
+            except ValueError:
+                data = response.text[:MAX_TEXT_CHARS]
+        else:
+            data = response.text[:MAX_TEXT_CHARS]
+        return {"status": "ok" if data not in (None, "", [], {}) else "empty", "http_status": response.status_code,
+                "elapsed_ms": elapsed_ms, "content_type": content_type, "data": data}
+
+    # ---- lote ----
+
+    async def stream(self, pairs: Iterable[Tuple[str, Dict[str, Any]]],
+                     use_cache: bool = True) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Executa os pares (consulta, fonte) em paralelo e devolve
+        (posição do par, resultado) na ordem em que terminam
+        """
+        async def indexed(position: int, query: str, source: Dict[str, Any]):
+            return position, await self.fetch(source, query, use_cache)
+
+        tasks = [asyncio.create_task(indexed(position, query, source))
+                 for position, (query, source) in enumerate(pairs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Cliente desconectou no meio do streaming
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, query: str, sources: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Resultados de todas as fontes, na ordem das fontes"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(sources)
+        async for position, result in self.stream(((query, s) for s in sources), use_cache):
+            results[position] = result
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.metrics.items()},
+            "concurrency": self.concurrency,
+            "inflight": len(self._inflight),
+            "cache_entries": len(self.cache._memory),
+            "cache_ttl_seconds": self.cache.ttl_seconds,
+            "sources": {
+                name: {
+                    "rate_per_second": endpoint.rate,
+                    "burst": endpoint.burst,
+                    "circuit": self._breakers[name].state if name in self._breakers else "closed",
+                    "consecutive_failures": self._breakers[name].failures if name in self._breakers else 0
+                }
+                for name, endpoint in self.endpoints.items()
+            }
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+executor = OsintExecutor()
@@ -6,20 +6,21 @@ Baseado em 19 ferramentas forenses profissionais
 
 from fastapi import APIRouter, HTTPException, Header, UploadFile, File, BackgroundTasks
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone
 import os
 import uuid
 import jwt
 import asyncio
 import hashlib
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+import password_recovery_engine as engine
 
 router = APIRouter(prefix="/api/password-recovery-elite", tags=["password_recovery_elite"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client['ap_elite']
 
 # Authentication
@@ -53,6 +54,56 @@ class PasswordRecoveryCreate(BaseModel):
     max_length: int = 16
     use_gpu: bool = False
     enable_ai_optimization: bool = True
+    arquivo_path: Optional[str] = None  # caminho do arquivo de evidência no laboratório
+    wordlist_path: Optional[str] = None  # dictionary / hybrid
+    mask: Optional[str] = None  # mask_attack, ex: ?u?l?l?l?d?d
+    rules: Optional[List[str]] = None  # hybrid, ex: ["c", "$1", "sa@"]
+    custom_charset: Optional[str] = None  # brute_force com charset "custom"
+
+async def build_engine_spec(recovery: PasswordRecoveryCreate) -> Tuple[Dict[str, Any], Any]:
+    """
+    Valida a requisição e monta a especificação do job para o motor, junto
+    com o espaço de chaves (reaproveitado pelo job para não reler a wordlist)
+    """
+    if recovery.metodo_ataque not in engine.SUPPORTED_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Método não suportado pelo motor CPU: {recovery.metodo_ataque}. Use: {', '.join(engine.SUPPORTED_METHODS)}"
+        )
+    if recovery.arquivo_tipo not in engine.SUPPORTED_FILE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato sem verificador local: {recovery.arquivo_tipo}. Use: {', '.join(engine.SUPPORTED_FILE_TYPES)}"
+        )
+    if not recovery.arquivo_path or not os.path.isfile(recovery.arquivo_path):
+        raise HTTPException(status_code=400, detail="arquivo_path inválido ou inexistente")
+    if recovery.metodo_ataque in ("dictionary", "hybrid"):
+        if not recovery.wordlist_path or not os.path.isfile(recovery.wordlist_path):
+            raise HTTPException(status_code=400, detail="wordlist_path inválido ou inexistente")
+    if recovery.metodo_ataque == "mask_attack" and not recovery.mask:
+        raise HTTPException(status_code=400, detail="Informe a máscara (mask) para mask_attack")
+    if recovery.min_length < 1 or recovery.max_length < recovery.min_length:
+        raise HTTPException(status_code=400, detail="Intervalo min_length/max_length inválido")
+    
+    spec = {
+        "arquivo_tipo": recovery.arquivo_tipo,
+        "arquivo_path": recovery.arquivo_path,
+        "metodo_ataque": recovery.metodo_ataque,
+        "wordlist_path": recovery.wordlist_path,
+        "mask": recovery.mask,
+        "rules": recovery.rules,
+        "charset": recovery.charset,
+        "custom_charset": recovery.custom_charset,
+        "min_length": recovery.min_length,
+        "max_length": recovery.max_length
+    }
+    try:
+        # Contar uma wordlist grande lê o arquivo inteiro; fora do event loop
+        keyspace = await asyncio.to_thread(engine.build_keyspace, spec)
+        spec["keyspace_total"] = keyspace.size
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return spec, keyspace
 
 @router.get("/stats")
 async def get_stats(authorization: str = Header(None)):
@@ -86,7 +137,7 @@ async def get_stats(authorization: str = Header(None)):
             "success_rate": round(success_rate, 2),
             "by_type": {item["_id"]: item["count"] for item in by_type},
             "by_method": {item["_id"]: item["count"] for item in by_method},
-            "gpu_enabled": True,
+            "gpu_enabled": False,
             "ai_optimization": True
         }
     except Exception as e:
@@ -115,9 +166,8 @@ async def create_recovery_attempt(recovery: PasswordRecoveryCreate, background_t
     
     try:
         attempt_id = str(uuid.uuid4())
-        
-        # Estima tempo baseado no método e complexidade
-        estimated_time = estimate_recovery_time(recovery.metodo_ataque, recovery.complexidade, recovery.max_length)
+        spec, keyspace = await build_engine_spec(recovery)
+        lease = engine.new_lease()
         
         attempt_doc = {
             "attempt_id": attempt_id,
@@ -134,7 +184,9 @@ async def create_recovery_attempt(recovery: PasswordRecoveryCreate, background_t
             "ai_optimization_enabled": recovery.enable_ai_optimization,
             "status": "recovering",
             "progresso": 0,
-            "estimated_time_hours": estimated_time,
+            "estimated_time_hours": None,
+            "engine_spec": spec,
+            "checkpoint": {"keyspace_done": 0, "keyspace_total": spec["keyspace_total"]},
             "tentativas_realizadas": 0,
             "combinacoes_testadas": 0,
             "velocidade_atual": "0 passwords/sec",
@@ -147,8 +199,8 @@ async def create_recovery_attempt(recovery: PasswordRecoveryCreate, background_t
                 "salt": None
             },
             "attack_details": {
-                "dictionary_used": None,
-                "mask_pattern": None,
+                "dictionary_used": recovery.wordlist_path,
+                "mask_pattern": recovery.mask,
                 "rainbow_table": None,
                 "gpu_cores_used": 0
             },
@@ -159,22 +211,26 @@ async def create_recovery_attempt(recovery: PasswordRecoveryCreate, background_t
             },
             "created_by": user.get("email"),
             "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **lease
         }
         
         await db.password_recovery.insert_one(attempt_doc)
         attempt_doc.pop("_id", None)
         
-        # Simula início do processo em background
-        # background_tasks.add_task(process_password_recovery, attempt_id)
+        background_tasks.add_task(
+            engine.run_recovery, attempt_id, spec, db.password_recovery, lease["lease_owner"], keyspace
+        )
         
         return {
             "success": True,
             "attempt_id": attempt_id,
             "message": f"Recuperação de senha iniciada com {recovery.metodo_ataque}",
-            "estimated_time_hours": estimated_time,
+            "keyspace_total": spec["keyspace_total"],
             "data": attempt_doc
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -198,71 +254,63 @@ async def get_recovery_attempt(attempt_id: str, authorization: str = Header(None
 
 @router.post("/recovery-attempts/{attempt_id}/simulate-progress")
 async def simulate_recovery_progress(attempt_id: str, authorization: str = Header(None)):
-    """Simular progresso de recuperação (para demo)"""
+    """Progresso medido pelo motor (mantido com o nome antigo para o frontend)"""
     user = await get_current_user(authorization)
     
     try:
-        import random
-        
-        # Simula progresso
-        progresso = random.randint(10, 100)
-        tentativas = random.randint(1000000, 100000000)
-        
-        # Simula velocidade baseada em GPU ou CPU
         attempt = await db.password_recovery.find_one({"attempt_id": attempt_id})
-        if attempt and attempt.get("use_gpu"):
-            velocidade = random.randint(100000000, 1000000000)  # 100M-1B passwords/sec (GPU)
-        else:
-            velocidade = random.randint(1000000, 10000000)  # 1M-10M passwords/sec (CPU)
-        
-        # Simula senha recuperada se progresso = 100%
-        recovered_password = None
-        recovery_method = None
-        if progresso >= 100:
-            recovered_password = generate_sample_password()
-            recovery_method = attempt.get("metodo_ataque") if attempt else "dictionary"
-        
-        # Calcula tempo decorrido
-        tempo_decorrido = f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
+        if not attempt:
+            raise HTTPException(status_code=404, detail="Tentativa não encontrada")
         
-        # Atualiza tentativa
-        update_data = {
-            "progresso": progresso,
-            "tentativas_realizadas": tentativas,
-            "combinacoes_testadas": tentativas,
-            "velocidade_atual": f"{velocidade:,} passwords/sec",
-            "tempo_decorrido": tempo_decorrido,
-            "status": "recovered" if progresso >= 100 else "recovering",
-            "updated_at": datetime.now(timezone.utc).isoformat()
+        recovered = attempt.get("status") == "recovered"
+        return {
+            "success": True,
+            "message": "Progresso atualizado",
+            "status": attempt.get("status"),
+            "progresso": attempt.get("progresso", 0),
+            "velocidade": attempt.get("velocidade_atual"),
+            "candidates_per_second": attempt.get("candidates_per_second", 0),
+            "checkpoint": attempt.get("checkpoint"),
+            "recovered": recovered,
+            "password": attempt.get("recovered_password") if recovered else None
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/recovery-attempts/{attempt_id}/resume")
+async def resume_recovery(attempt_id: str, background_tasks: BackgroundTasks, authorization: str = Header(None)):
+    """
+    Retomar tentativa a partir do último checkpoint: parada, com falha ou
+    órfã (status "recovering" sem worker vivo, ex.: após restart)
+    """
+    user = await get_current_user(authorization)
+    
+    try:
+        attempt = await db.password_recovery.find_one({"attempt_id": attempt_id})
+        if not attempt:
+            raise HTTPException(status_code=404, detail="Tentativa não encontrada")
+        if not attempt.get("engine_spec"):
+            raise HTTPException(status_code=400, detail="Tentativa criada sem motor de recuperação")
+        if attempt.get("status") == "recovered":
+            raise HTTPException(status_code=409, detail="Tentativa com status recovered")
         
-        if progresso >= 100:
-            update_data["recovered_password"] = recovered_password
-            update_data["recovery_method_used"] = recovery_method
-            update_data["ai_insights"] = {
-                "password_patterns_detected": ["common_words", "numeric_suffix", "special_chars"],
-                "estimated_strength": "medium",
-                "recommendations": [
-                    "Use passwords with at least 12 characters",
-                    "Include uppercase, lowercase, numbers and symbols",
-                    "Avoid dictionary words",
-                    "Use password manager"
-                ]
-            }
-        
-        await db.password_recovery.update_one(
-            {"attempt_id": attempt_id},
-            {"$set": update_data}
+        # Só assume o job se nenhum worker vivo detém o lease
+        lease = await engine.claim(db.password_recovery, attempt_id)
+        if lease is None:
+            raise HTTPException(status_code=409, detail="Tentativa em execução em outro worker")
+        background_tasks.add_task(
+            engine.run_recovery, attempt_id, attempt["engine_spec"], db.password_recovery, lease["lease_owner"]
         )
         
         return {
             "success": True,
-            "message": "Progresso atualizado",
-            "progresso": progresso,
-            "velocidade": f"{velocidade:,} passwords/sec",
-            "recovered": progresso >= 100,
-            "password": recovered_password if progresso >= 100 else None
+            "message": "Recuperação retomada",
+            "checkpoint": attempt.get("checkpoint")
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -437,6 +485,8 @@ async def stop_recovery(attempt_id: str, authorization: str = Header(None)):
             {
                 "$set": {
                     "status": "stopped",
+                    # Lido pelo worker que executa o job na renovação do lease
+                    "stop_requested": True,
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }
             }
@@ -445,6 +495,8 @@ async def stop_recovery(attempt_id: str, authorization: str = Header(None)):
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Tentativa não encontrada")
         
+        engine.cancel(attempt_id)
+        
         return {
             "success": True,
             "message": "Recuperação de senha parada"
@@ -455,31 +507,6 @@ async def stop_recovery(attempt_id: str, authorization: str = Header(None)):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Helper functions
-def estimate_recovery_time(method: str, complexity: str, max_length: int) -> float:
-    """Estima tempo de recuperação em horas"""
-    base_times = {
-        "dictionary": 0.1,
-        "brute_force": 1000.0,
-        "mask_attack": 10.0,
-        "rainbow_tables": 0.01,
-        "hybrid": 5.0,
-        "gpu_accelerated": 0.1
-    }
-    
-    complexity_multipliers = {
-        "baixa": 0.5,
-        "media": 1.0,
-        "alta": 5.0,
-        "extrema": 50.0
-    }
-    
-    length_multiplier = 2 ** (max_length - 6)  # Exponencial com o tamanho
-    
-    base = base_times.get(method, 10.0)
-    complexity_mult = complexity_multipliers.get(complexity, 1.0)
-    
-    return round(base * complexity_mult * length_multiplier, 2)
-
 def detect_hash_algorithm(file_type: str) -> str:
     """Detecta algoritmo de hash baseado no tipo de arquivo"""
     algorithms = {
@@ -492,21 +519,3 @@ def detect_hash_algorithm(file_type: str) -> str:
         "office_excel": "AES-256"
     }
     return algorithms.get(file_type, "Unknown")
-
-def generate_sample_password() -> str:
-    """Gera senha de exemplo para demo"""
-    import random
-    import string
-    
-    patterns = [
-        "Passw0rd!",
-        "Admin123!",
-        "Senha@2024",
-        "Test1234",
-        "Welcome!23",
-        "User@2024",
-        "MyP@ssw0rd",
-        "Secure123!"
-    ]
-    
-    return random.choice(patterns)
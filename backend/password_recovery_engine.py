@@ -0,0 +1,638 @@
+"""
+Motor de Recuperação de Senhas (CPU)
+Geradores de candidatos (dicionário, máscara, regras) particionados em um
+pool de processos, com verificadores locais para ZIP (AES/ZipCrypto) e PDF
+(Standard Security Handler R2-R6).
+
+Uso restrito à recuperação autorizada de arquivos de evidência em laboratório.
+O espaço de chaves é percorrido em blocos; o maior prefixo contíguo concluído
+é gravado como checkpoint, permitindo retomar o job de onde parou.
+
+Quem executa o job mantém um lease no documento (lease_owner/lease_expires_at,
+como na job_queue), renovado a cada LEASE_SECONDS / 4. Um job cujo worker
+morreu tem o lease vencido e pode ser retomado por qualquer processo; um
+pedido de parada (stop_requested) é lido na renovação, valendo entre workers.
+"""
+
+import os
+import hmac
+import uuid
+import socket
+import struct
+import asyncio
+import hashlib
+import zipfile
+import itertools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 20000
+# Uma entrada do índice de offsets da wordlist a cada N linhas
+WORDLIST_INDEX_STRIDE = 1024
+PROGRESS_INTERVAL_SECONDS = 1.0
+LEASE_SECONDS = int(os.environ.get("PASSWORD_RECOVERY_LEASE_SECONDS", 60))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+MASK_CHARSETS = {
+    "l": "abcdefghijklmnopqrstuvwxyz",
+    "u": "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "d": "0123456789",
+    "s": " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+}
+MASK_CHARSETS["a"] = MASK_CHARSETS["l"] + MASK_CHARSETS["u"] + MASK_CHARSETS["d"] + MASK_CHARSETS["s"]
+
+# Charsets aceitos em brute_force (mesmos nomes de /charset-options)
+BRUTE_FORCE_CHARSETS = {
+    "all": MASK_CHARSETS["a"],
+    "lowercase": MASK_CHARSETS["l"],
+    "uppercase": MASK_CHARSETS["u"],
+    "numbers": MASK_CHARSETS["d"],
+    "alphanumeric": MASK_CHARSETS["l"] + MASK_CHARSETS["u"] + MASK_CHARSETS["d"],
+    "symbols": MASK_CHARSETS["s"],
+}
+
+DEFAULT_RULES = [":", "c", "u", "$1", "$123", "$!", "c$1", "c$123", "c$!", "sa@", "se3", "so0", "r"]
+
+SUPPORTED_METHODS = ["dictionary", "brute_force", "mask_attack", "hybrid"]
+SUPPORTED_FILE_TYPES = ["zip", "pdf"]
+
+# Jobs cancelados neste processo (consultado entre blocos); preenchido por
+# cancel() e pela renovação do lease quando outro worker pede a parada
+_cancelled: set = set()
+
+
+# ==================== GERADORES DE CANDIDATOS ====================
+
+def parse_mask(mask: str) -> List[str]:
+    """Converte máscara estilo hashcat (?l?u?d?s?a e literais) em lista de charsets"""
+    positions = []
+    i = 0
+    while i < len(mask):
+        if mask[i] == "?" and i + 1 < len(mask):
+            key = mask[i + 1]
+            if key == "?":
+                positions.append("?")
+            elif key in MASK_CHARSETS:
+                positions.append(MASK_CHARSETS[key])
+            else:
+                raise ValueError(f"Classe de máscara inválida: ?{key}")
+            i += 2
+        else:
+            positions.append(mask[i])
+            i += 1
+    return positions
+
+
+class MaskKeyspace:
+    """Espaço de chaves de uma máscara; índice -> candidato por base mista"""
+
+    def __init__(self, positions: List[str]):
+        self.positions = positions
+        self.size = 1
+        for charset in positions:
+            self.size *= len(charset)
+
+    def candidates(self, start: int, end: int) -> Iterator[str]:
+        # Decodifica o índice inicial e incrementa como um odômetro
+        digits = []
+        rest = start
+        for charset in reversed(self.positions):
+            rest, d = divmod(rest, len(charset))
+            digits.append(d)
+        digits.reverse()
+        chars = [self.positions[i][d] for i, d in enumerate(digits)]
+        for _ in range(end - start):
+            yield "".join(chars)
+            for pos in range(len(digits) - 1, -1, -1):
+                digits[pos] += 1
+                if digits[pos] < len(self.positions[pos]):
+                    chars[pos] = self.positions[pos][digits[pos]]
+                    break
+                digits[pos] = 0
+                chars[pos] = self.positions[pos][0]
+
+
+class DictionaryKeyspace:
+    """
+    Espaço de chaves de uma wordlist (uma palavra por linha)
+
+    A contagem de linhas monta também um índice esparso de offsets (um a cada
+    WORDLIST_INDEX_STRIDE linhas); cada bloco faz seek() até o offset mais
+    próximo em vez de reler o arquivo desde o início.
+    """
+
+    def __init__(self, wordlist_path: str):
+        self.wordlist_path = wordlist_path
+        self._offsets = array("q")
+        size = 0
+        offset = 0
+        with open(wordlist_path, "rb") as f:
+            for line in f:
+                if size % WORDLIST_INDEX_STRIDE == 0:
+                    self._offsets.append(offset)
+                offset += len(line)
+                size += 1
+        self.size = size
+
+    def words(self, start: int, end: int) -> Iterator[str]:
+        end = min(end, self.size)
+        if start >= end:
+            return
+        block, skip = divmod(start, WORDLIST_INDEX_STRIDE)
+        with open(self.wordlist_path, "rb") as f:
+            f.seek(self._offsets[block])
+            for line in itertools.islice(f, skip, skip + end - start):
+                yield line.rstrip(b"\r\n").decode("utf-8", errors="ignore")
+
+    def candidates(self, start: int, end: int) -> Iterator[str]:
+        return self.words(start, end)
+
+
+def apply_rule(word: str, rule: str) -> Optional[str]:
+    """
+    Aplica uma regra (subconjunto da sintaxe hashcat) a uma palavra
+
+    Suporta: ':' (nada), l, u, c, r, d, $X (sufixo), ^X (prefixo), sXY (troca).
+    Regras podem ser encadeadas, ex.: "c$1$2".
+    """
+    i = 0
+    while i < len(rule):
+        op = rule[i]
+        if op == ":":
+            i += 1
+        elif op == "l":
+            word, i = word.lower(), i + 1
+        elif op == "u":
+            word, i = word.upper(), i + 1
+        elif op == "c":
+            word, i = word.capitalize(), i + 1
+        elif op == "r":
+            word, i = word[::-1], i + 1
+        elif op == "d":
+            word, i = word + word, i + 1
+        elif op == "$" and i + 1 < len(rule):
+            word, i = word + rule[i + 1], i + 2
+        elif op == "^" and i + 1 < len(rule):
+            word, i = rule[i + 1] + word, i + 2
+        elif op == "s" and i + 2 < len(rule):
+            word, i = word.replace(rule[i + 1], rule[i + 2]), i + 3
+        else:
+            return None
+    return word
+
+
+class RulesKeyspace:
+    """Dicionário x regras; índice = palavra * n_regras + regra"""
+
+    def __init__(self, wordlist_path: str, rules: List[str]):
+        self.dictionary = DictionaryKeyspace(wordlist_path)
+        self.rules = rules
+        self.size = self.dictionary.size * len(rules)
+
+    def candidates(self, start: int, end: int) -> Iterator[str]:
+        n = len(self.rules)
+        first_word = start // n
+        last_word = (end + n - 1) // n
+        index = first_word * n
+        for word in self.dictionary.words(first_word, last_word):
+            for rule in self.rules:
+                if start <= index < end:
+                    candidate = apply_rule(word, rule)
+                    # Regras inválidas consomem o índice para manter o particionamento estável
+                    yield candidate if candidate is not None else ""
+                index += 1
+
+
+class CompositeKeyspace:
+    """Concatena espaços de chaves (ex.: brute force de min a max caracteres)"""
+
+    def __init__(self, parts: List[Any]):
+        self.parts = parts
+        self.size = sum(p.size for p in parts)
+
+    def candidates(self, start: int, end: int) -> Iterator[str]:
+        offset = 0
+        for part in self.parts:
+            lo, hi = max(start, offset), min(end, offset + part.size)
+            if lo < hi:
+                yield from part.candidates(lo - offset, hi - offset)
+            offset += part.size
+
+
+def build_keyspace(spec: Dict[str, Any]):
+    """Constrói o espaço de chaves a partir da especificação do job"""
+    method = spec["metodo_ataque"]
+    if method == "dictionary":
+        return DictionaryKeyspace(spec["wordlist_path"])
+    if method == "hybrid":
+        return RulesKeyspace(spec["wordlist_path"], spec.get("rules") or DEFAULT_RULES)
+    if method == "mask_attack":
+        return MaskKeyspace(parse_mask(spec["mask"]))
+    if method == "brute_force":
+        charset = spec.get("custom_charset") or BRUTE_FORCE_CHARSETS.get(spec.get("charset") or "all")
+        if not charset:
+            raise ValueError(f"Charset inválido: {spec.get('charset')}")
+        return CompositeKeyspace([
+            MaskKeyspace([charset] * length)
+            for length in range(spec["min_length"], spec["max_length"] + 1)
+        ])
+    raise ValueError(f"Método sem gerador de candidatos: {method}")
+
+
+# ==================== VERIFICADORES ====================
+
+AES_SALT_LENGTHS = {1: 8, 2: 12, 3: 16}
+AES_KEY_LENGTHS = {1: 16, 2: 24, 3: 32}
+
+
+def extract_zip_params(path: str) -> Dict[str, Any]:
+    """Extrai do menor membro cifrado os dados necessários à verificação"""
+    with zipfile.ZipFile(path) as zf:
+        encrypted = [i for i in zf.infolist() if i.flag_bits & 0x1]
+        if not encrypted:
+            raise ValueError("Arquivo ZIP não possui membros cifrados")
+        info = min(encrypted, key=lambda i: i.compress_size)
+
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+        if header[:4] != b"PK\x03\x04":
+            raise ValueError("Cabeçalho local ZIP inválido")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        data = f.read(info.compress_size)
+
+    if info.compress_type == 99:
+        extra = info.extra
+        strength = None
+        pos = 0
+        while pos + 4 <= len(extra):
+            header_id, size = struct.unpack("<HH", extra[pos:pos + 4])
+            if header_id == 0x9901:
+                strength = extra[pos + 8]
+                break
+            pos += 4 + size
+        if strength not in AES_SALT_LENGTHS:
+            raise ValueError("Campo extra AES (0x9901) ausente ou inválido")
+        salt_len = AES_SALT_LENGTHS[strength]
+        return {
+            "type": "zip_aes",
+            "strength": strength,
+            "salt": data[:salt_len],
+            "verifier": data[salt_len:salt_len + 2],
+            "ciphertext": data[salt_len + 2:-10],
+            "auth_code": data[-10:],
+        }
+
+    return {"type": "zip_crypto", "path": path, "member": info.filename}
+
+
+PDF_PADDING = bytes.fromhex(
+    "28bf4e5e4e758a4164004e56fffa01082e2e00b6d0683e802f0ca9fe6453697a"
+)
+
+
+def _pdf_key_length(encrypt, revision: int) -> int:
+    """Tamanho da chave RC4/AES em bytes (R2 é sempre 40 bits)"""
+    if revision == 2:
+        return 5
+    length = None
+    if revision == 4:
+        # R4 declara a chave no filtro de criptografia (/CF/StdCF), não em /Length
+        filters = encrypt.get("/CF")
+        crypt_filter = filters.get_object().get(encrypt.get("/StmF", "/StdCF")) if filters else None
+        if crypt_filter is not None:
+            crypt_filter = crypt_filter.get_object()
+            length = crypt_filter.get("/Length")
+            if length is None and crypt_filter.get("/CFM") == "/AESV2":
+                length = 16
+    if length is None:
+        length = encrypt.get("/Length", 40)
+    length = int(length)
+    # /Length do filtro costuma vir em bytes (16); o do dicionário, em bits (40-128)
+    return length if length <= 32 else length // 8
+
+
+def extract_pdf_params(path: str) -> Dict[str, Any]:
+    """Lê o dicionário /Encrypt e o /ID do trailer"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    if not reader.is_encrypted:
+        raise ValueError("PDF não está cifrado")
+    encrypt = reader.trailer["/Encrypt"].get_object()
+    if encrypt.get("/Filter") != "/Standard":
+        raise ValueError(f"Handler de segurança não suportado: {encrypt.get('/Filter')}")
+
+    def raw(value) -> bytes:
+        return value.original_bytes if hasattr(value, "original_bytes") else bytes(value)
+
+    ids = reader.trailer.get("/ID")
+    revision = int(encrypt["/R"])
+    return {
+        "type": "pdf",
+        "revision": revision,
+        "length": _pdf_key_length(encrypt, revision),
+        "O": raw(encrypt["/O"]),
+        "U": raw(encrypt["/U"]),
+        "P": int(encrypt["/P"]),
+        "id0": raw(ids[0]) if ids else b"",
+        "encrypt_metadata": bool(encrypt.get("/EncryptMetadata", True)),
+    }
+
+
+def extract_params(file_type: str, path: str) -> Dict[str, Any]:
+    """Extrai parâmetros de verificação conforme o tipo de arquivo"""
+    if file_type == "zip":
+        return extract_zip_params(path)
+    if file_type == "pdf":
+        return extract_pdf_params(path)
+    raise ValueError(f"Formato sem verificador local: {file_type}")
+
+
+def _rc4(key: bytes, data: bytes) -> bytes:
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + s[i] + key[i % len(key)]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) & 0xFF
+        j = (j + s[i]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+        out.append(byte ^ s[(s[i] + s[j]) & 0xFF])
+    return bytes(out)
+
+
+def _pdf_hash_r6(password: bytes, salt: bytes, udata: bytes = b"") -> bytes:
+    """Algoritmo 2.B (ISO 32000-2) para R6"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    k = hashlib.sha256(password + salt + udata).digest()
+    rounds = 0
+    while True:
+        k1 = (password + k + udata) * 64
+        encryptor = Cipher(algorithms.AES(k[:16]), modes.CBC(k[16:32])).encryptor()
+        e = encryptor.update(k1) + encryptor.finalize()
+        rounds += 1
+        k = (hashlib.sha256, hashlib.sha384, hashlib.sha512)[sum(e[:16]) % 3](e).digest()
+        if rounds >= 64 and e[-1] <= rounds - 32:
+            return k[:32]
+
+
+class Verifier:
+    """Testa candidatos contra os parâmetros extraídos (instanciado no worker)"""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self.kind = params["type"]
+        if self.kind == "zip_crypto":
+            self._zip = zipfile.ZipFile(params["path"])
+        elif self.kind == "pdf" and params["revision"] <= 4:
+            p = params
+            self._pdf_suffix = p["O"] + struct.pack("<i", p["P"]) + p["id0"]
+            if p["revision"] >= 4 and not p["encrypt_metadata"]:
+                self._pdf_suffix += b"\xff\xff\xff\xff"
+            self._pdf_u_seed = hashlib.md5(PDF_PADDING + p["id0"]).digest()
+
+    def check(self, candidate: str) -> bool:
+        password = candidate.encode("utf-8")
+        return getattr(self, f"_check_{self.kind}")(password)
+
+    def _check_zip_aes(self, password: bytes) -> bool:
+        p = self.params
+        key_len = AES_KEY_LENGTHS[p["strength"]]
+        derived = hashlib.pbkdf2_hmac("sha1", password, p["salt"], 1000, 2 * key_len + 2)
+        if derived[-2:] != p["verifier"]:
+            return False
+        # Verificador de 2 bytes tem falsos positivos; confirma pelo HMAC dos dados
+        mac = hmac.new(derived[key_len:2 * key_len], p["ciphertext"], hashlib.sha1).digest()[:10]
+        return hmac.compare_digest(mac, p["auth_code"])
+
+    def _check_zip_crypto(self, password: bytes) -> bool:
+        try:
+            # zipfile valida o byte de verificação e o CRC ao ler o membro
+            with self._zip.open(self.params["member"], pwd=password) as member:
+                while member.read(1024 * 1024):
+                    pass
+            return True
+        except Exception:
+            # Senha errada: RuntimeError (byte de verificação), BadZipFile (CRC) ou zlib.error
+            return False
+
+    def _check_pdf(self, password: bytes) -> bool:
+        p = self.params
+        revision = p["revision"]
+        if revision >= 5:
+            password = password[:127]
+            salt = p["U"][32:40]
+            if revision == 5:
+                digest = hashlib.sha256(password + salt).digest()
+            else:
+                digest = _pdf_hash_r6(password, salt)
+            return digest == p["U"][:32]
+
+        padded = (password + PDF_PADDING)[:32]
+        digest = hashlib.md5(padded + self._pdf_suffix).digest()
+        n = p["length"]
+        if revision >= 3:
+            for _ in range(50):
+                digest = hashlib.md5(digest[:n]).digest()
+        key = digest[:n]
+        if revision == 2:
+            return _rc4(key, PDF_PADDING) == p["U"]
+        x = _rc4(key, self._pdf_u_seed)
+        for i in range(1, 20):
+            x = _rc4(bytes(b ^ i for b in key), x)
+        return x == p["U"][:16]
+
+
+# ==================== EXECUÇÃO EM WORKERS ====================
+
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(keyspace, params: Dict[str, Any]):
+    # O espaço de chaves chega pronto (com o índice de offsets da wordlist)
+    _worker_state["keyspace"] = keyspace
+    _worker_state["verifier"] = Verifier(params)
+
+
+def _run_chunk(start: int, end: int) -> Tuple[int, int, Optional[str]]:
+    """Testa o intervalo [start, end); devolve (start, end, senha encontrada)"""
+    check = _worker_state["verifier"].check
+    for candidate in _worker_state["keyspace"].candidates(start, end):
+        if candidate and check(candidate):
+            return start, end, candidate
+    return start, end, None
+
+
+def cancel(attempt_id: str):
+    """Sinaliza parada do job (verificado entre blocos)"""
+    _cancelled.add(attempt_id)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_lease() -> Dict[str, Any]:
+    """Campos de lease para quem vai executar o job agora"""
+    return {
+        "lease_owner": f"{WORKER_ID}:{uuid.uuid4().hex[:8]}",
+        "lease_expires_at": _now() + timedelta(seconds=LEASE_SECONDS),
+        "stop_requested": False,
+    }
+
+
+async def claim(collection, attempt_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Assume a execução de um job não concluído sem worker vivo (sem lease ou
+    com lease vencido). Devolve os campos de lease, ou None se não for possível
+    """
+    lease = new_lease()
+    result = await collection.update_one(
+        {
+            "attempt_id": attempt_id,
+            "status": {"$ne": "recovered"},
+            "$or": [{"lease_owner": None}, {"lease_expires_at": {"$lt": _now()}}],
+        },
+        {"$set": {**lease, "status": "recovering", "updated_at": _now().isoformat()}}
+    )
+    return lease if result.modified_count else None
+
+
+async def _keep_lease(collection, attempt_id: str, owner: str):
+    """Renova o lease; pedido de parada ou perda do lease cancelam o job aqui"""
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 4)
+        doc = await collection.find_one_and_update(
+            {"attempt_id": attempt_id, "lease_owner": owner},
+            {"$set": {"lease_expires_at": _now() + timedelta(seconds=LEASE_SECONDS)}},
+            projection={"stop_requested": 1}
+        )
+        if doc is None or doc.get("stop_requested"):
+            _cancelled.add(attempt_id)
+            return
+
+
+async def run_recovery(
+    attempt_id: str,
+    spec: Dict[str, Any],
+    collection,
+    lease_owner: str,
+    keyspace=None,
+    max_workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """
+    Executa (ou retoma) um job de recuperação e persiste progresso na coleção
+
+    O checkpoint `keyspace_done` é o maior prefixo do espaço de chaves cujos
+    blocos já foram todos testados; ao retomar, o job recomeça dali. O chamador
+    já detém o lease (`lease_owner`, de new_lease()/claim()); `keyspace`, se
+    informado, evita reler a wordlist.
+    """
+    _cancelled.discard(attempt_id)
+    owner = {"attempt_id": attempt_id, "lease_owner": lease_owner}
+    heartbeat = asyncio.create_task(_keep_lease(collection, attempt_id, lease_owner))
+    try:
+        await _run_claimed(attempt_id, spec, collection, owner, keyspace, max_workers, chunk_size)
+    finally:
+        heartbeat.cancel()
+        _cancelled.discard(attempt_id)
+        await collection.update_one(owner, {"$set": {"lease_owner": None, "lease_expires_at": None}})
+
+
+async def _run_claimed(attempt_id: str, spec: Dict[str, Any], collection, owner: Dict[str, Any],
+                       keyspace, max_workers: Optional[int], chunk_size: int):
+    loop = asyncio.get_running_loop()
+    try:
+        params = await loop.run_in_executor(None, extract_params, spec["arquivo_tipo"], spec["arquivo_path"])
+        if keyspace is None:
+            keyspace = await loop.run_in_executor(None, build_keyspace, spec)
+    except Exception as e:
+        await collection.update_one(
+            owner,
+            {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        return
+
+    doc = await collection.find_one({"attempt_id": attempt_id}, {"checkpoint": 1, "tentativas_realizadas": 1}) or {}
+    frontier = (doc.get("checkpoint") or {}).get("keyspace_done", 0)
+    total = keyspace.size
+    tested_before = doc.get("tentativas_realizadas", 0)
+    workers = max_workers or os.cpu_count() or 1
+
+    started = loop.time()
+    tested = 0
+    found: Optional[str] = None
+    done_chunks: Dict[int, int] = {}
+    last_report = 0.0
+
+    async def report(status: str, extra: Optional[Dict[str, Any]] = None, final: bool = False):
+        elapsed = loop.time() - started
+        rate = tested / elapsed if elapsed > 0 else 0.0
+        update = {
+            "status": status,
+            "progresso": round(frontier / total * 100, 2) if total else 100,
+            "tentativas_realizadas": tested_before + tested,
+            "combinacoes_testadas": tested_before + tested,
+            "velocidade_atual": f"{int(rate):,} passwords/sec",
+            "candidates_per_second": round(rate, 1),
+            "estimated_time_hours": round((total - frontier) / rate / 3600, 4) if rate else None,
+            "tempo_decorrido": f"{int(elapsed // 3600):02d}:{int(elapsed % 3600 // 60):02d}:{int(elapsed % 60):02d}",
+            "checkpoint": {"keyspace_done": frontier, "keyspace_total": total},
+            "engine": {"workers": workers, "chunk_size": chunk_size},
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        update.update(extra or {})
+        # Relatório parcial não sobrescreve uma parada pedida por outro worker
+        query = owner if final else {**owner, "stop_requested": {"$ne": True}}
+        await collection.update_one(query, {"$set": update})
+
+    await report("recovering", {"hash_info.hash_type": params["type"]})
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keyspace, params)) as pool:
+        pending = set()
+        next_start = frontier
+        while (next_start < total or pending) and found is None:
+            while next_start < total and len(pending) < workers * 2 and attempt_id not in _cancelled:
+                end = min(next_start + chunk_size, total)
+                pending.add(asyncio.wrap_future(pool.submit(_run_chunk, next_start, end), loop=loop))
+                next_start = end
+            if not pending:
+                break
+            finished, pending = await asyncio.wait(
+                pending, timeout=PROGRESS_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                start, end, password = future.result()
+                tested += end - start
+                done_chunks[start] = end
+                if password is not None:
+                    found = password
+            # Avança o checkpoint apenas sobre blocos contíguos concluídos
+            while frontier in done_chunks:
+                frontier = done_chunks.pop(frontier)
+            if loop.time() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                last_report = loop.time()
+                await report("stopped" if attempt_id in _cancelled else "recovering")
+        for future in pending:
+            future.cancel()
+
+    if found is not None:
+        await report("recovered", {
+            "progresso": 100,
+            "recovered_password": found,
+            "recovery_method_used": spec["metodo_ataque"],
+        }, final=True)
+    elif attempt_id in _cancelled:
+        await report("stopped", final=True)
+    else:
+        await report("failed", {"error": "Espaço de chaves esgotado sem encontrar a senha"}, final=True)
@@ -5,7 +5,7 @@ Baseado nas melhores práticas de inteligência policial e investigação crimin
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
 import os
@@ -18,7 +18,7 @@ router = APIRouter(prefix="/api/athena/interceptions", tags=["Interceptações T
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "test_database")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[DB_NAME]
 
 # Security
@@ -7,15 +7,17 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
-from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timedelta
+import numpy as np
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
+import predictive_engine
 import random
 
 router = APIRouter(prefix="/api/predictive", tags=["Predictive Analytics"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class PredictionRequest(BaseModel):
@@ -24,21 +26,53 @@ class PredictionRequest(BaseModel):
     lawyer_experience: int  # years
     judge_profile: Optional[str] = None
     historical_data: Optional[Dict[str, Any]] = None
+    description: Optional[str] = None
+    court: Optional[str] = None
+
+class SimilarCasesRequest(BaseModel):
+    description: str
+    title: Optional[str] = None
+    service_type: Optional[str] = None
+    court: Optional[str] = None
+    judge: Optional[str] = None
+    parties: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+
+# Peso (em casos) da estimativa por regras ao combinar com o histórico
+PRIOR_WEIGHT = 10
+NEIGHBORS = 25
 
 @router.post("/predict-outcome")
 async def predict_outcome(request: PredictionRequest):
     """Prediz resultado de processo"""
     
-    # Em produção: usar modelo ML treinado (scikit-learn, TensorFlow, etc.)
-    # Aqui: simulação baseada em regras + IA
-    
-    # Fatores de peso
-    evidence_score = {'low': 0.3, 'medium': 0.6, 'high': 0.9}[request.evidence_quality]
+    evidence_score = {'low': 0.3, 'medium': 0.6, 'high': 0.9}.get(request.evidence_quality)
+    if evidence_score is None:
+        raise HTTPException(status_code=400, detail="evidence_quality deve ser low, medium ou high")
     experience_score = min(request.lawyer_experience / 20, 1.0)
     
-    # Cálculo de probabilidade (simplificado)
+    # Estimativa por regras, usada como priori
     base_probability = (evidence_score * 0.5 + experience_score * 0.3 + 0.2)
-    success_probability = min(base_probability + random.uniform(-0.1, 0.1), 1.0)
+    
+    # Histórico: desfechos dos casos mais parecidos e do mesmo tipo
+    neighbors = await predictive_engine.find_similar({
+        'description': request.description or '',
+        'service_type': request.case_type,
+        'court': request.court,
+        'judge': request.judge_profile
+    }, limit=NEIGHBORS)
+    decided = [n for n in neighbors if n['outcome']]
+    weights = np.array([n['similarity'] for n in decided])
+    wins = np.array([n['outcome'] == 'favorable' for n in decided], dtype=float)
+    neighbor_weight = float(weights.sum())
+    favorable, total = predictive_engine.similarity_index.outcome_rate({'service_type': request.case_type})
+    
+    # Beta-binomial: priori das regras + casos do tipo + vizinhos ponderados pela similaridade
+    alpha = PRIOR_WEIGHT * base_probability + favorable + float(weights @ wins)
+    beta = PRIOR_WEIGHT * (1 - base_probability) + (total - favorable) + neighbor_weight - float(weights @ wins)
+    n = alpha + beta
+    success_probability = alpha / n
+    margin = float(1.96 * np.sqrt(success_probability * (1 - success_probability) / (n + 1)))
     
     # Análise adicional com IA
     ai_prompt = f"""Analise as seguintes informações de um caso jurídico e forneça insights:
@@ -62,15 +96,23 @@ Forneça:
     prediction = {
         'case_type': request.case_type,
         'success_probability': round(success_probability * 100, 2),
-        'confidence_interval': [round((success_probability - 0.1) * 100, 2), round((success_probability + 0.1) * 100, 2)],
+        'confidence_interval': [
+            round(max(success_probability - margin, 0.0) * 100, 2),
+            round(min(success_probability + margin, 1.0) * 100, 2)
+        ],
         'key_factors': {
             'evidence_quality': evidence_score,
             'lawyer_experience': experience_score,
-            'combined_score': base_probability
+            'combined_score': round(base_probability, 4),
+            'historical_cases': total,
+            'historical_success_rate': round(favorable / total * 100, 2) if total else None,
+            'similar_decided_cases': len(decided)
         },
+        'similar_cases': [{'id': c['id'], 'title': c['title'], 'similarity': c['similarity'], 'outcome': c['outcome']}
+                          for c in decided[:5]],
         'ai_insights': ai_analysis['response'],
         'predicted_at': datetime.now().isoformat(),
-        'model_version': 'v1.0-simulated'
+        'model_version': 'v2.0-bayes-similarity'
     }
     
     # Salvar predição
@@ -82,21 +124,53 @@ Forneça:
     return prediction
 
 @router.post("/find-similar-cases")
-async def find_similar_cases(case_description: str, limit: int = 10):
-    """Encontra casos similares para benchmarking"""
+async def find_similar_cases(
+    case_description: Optional[str] = None,
+    limit: int = 10,
+    request: Optional[SimilarCasesRequest] = None,
+    case_id: Optional[str] = None,
+    analyze: bool = True
+):
+    """
+    Encontra casos similares (TF-IDF + MinHash/LSH) para benchmarking.
+    Aceita a descrição como parâmetro (compatível com a versão anterior), um
+    corpo com tipo/vara/partes ou o id de um caso já cadastrado.
+    """
+    limit = max(1, min(limit, 100))
+    if case_id:
+        case = await db.cases.find_one({'id': case_id}, predictive_engine.CASE_PROJECTION)
+        if not case:
+            raise HTTPException(status_code=404, detail="Caso não encontrado")
+    elif request:
+        case = request.model_dump()
+    elif case_description:
+        case = {'description': case_description}
+    else:
+        raise HTTPException(status_code=400, detail="Informe case_description, um corpo ou case_id")
+    case_description = case.get('description') or case.get('title') or ''
     
-    # Em produção: usar embeddings e busca vetorial
-    # Aqui: busca simples + IA
+    cases = await predictive_engine.find_similar(case, limit=limit, exclude=case_id)
     
-    # Buscar casos no banco
-    cursor = db.cases.find().limit(limit)
-    cases = await cursor.to_list(length=limit)
+    response = {
+        'case_description': case_description,
+        'similar_cases_found': len(cases),
+        'cases': cases,
+        'index': predictive_engine.similarity_index.stats(),
+        'recommendations': 'Baseado na análise de casos similares'
+    }
+    if not analyze:
+        return response
     
     # Análise de similaridade com IA
+    precedentes = "\n".join(f"- {c['title']} ({c['service_type'] or 'tipo n/d'}, desfecho: {c['outcome'] or 'em andamento'})"
+                            for c in cases[:5])
     ai_prompt = f"""Analise a seguinte descrição de caso e identifique padrões, precedentes e casos similares:
 
 {case_description}
 
+Casos mais parecidos no acervo:
+{precedentes or '- nenhum'}
+
 Forneça:
 1. Padrões identificados
 2. Tipos de casos similares
@@ -108,13 +182,8 @@ Forneça:
         ai_prompt
     )
     
-    return {
-        'case_description': case_description,
-        'similar_cases_found': len(cases),
-        'cases': [{'id': str(c['_id']), 'title': c.get('title', 'Caso')} for c in cases],
-        'pattern_analysis': analysis['response'],
-        'recommendations': 'Baseado na análise de casos similares'
-    }
+    response['pattern_analysis'] = analysis['response']
+    return response
 
 @router.get("/financial-forecast/{case_id}")
 async def financial_forecast(case_id: str, months: int = 6):
@@ -146,30 +215,73 @@ async def financial_forecast(case_id: str, months: int = 6):
     }
 
 @router.post("/detect-anomalies")
-async def detect_anomalies(data: List[Dict[str, Any]]):
-    """Detecta anomalias em dados financeiros/processuais"""
-    
-    # Simulação de detecção de anomalias
-    anomalies = []
-    
-    for i, item in enumerate(data):
-        # Simular detecção (em produção: usar Isolation Forest, LSTM, etc.)
-        if random.random() > 0.8:  # 20% chance de anomalia
-            anomalies.append({
-                'index': i,
-                'item': item,
-                'anomaly_score': round(random.uniform(0.6, 0.99), 2),
-                'reason': 'Desvio estatístico significativo'
-            })
+async def detect_anomalies(data: List[Dict[str, Any]], threshold: float = 3.5, group_by: Optional[str] = None):
+    """
+    Detecta anomalias em dados financeiros/processuais: z-score robusto
+    (mediana/MAD) de todos os campos numéricos de uma vez, opcionalmente
+    dentro de cada grupo (ex.: group_by=category)
+    """
+    matrix, fields = predictive_engine.numeric_matrix(data)
+    if group_by:
+        groups = np.array([str(item.get(group_by)) for item in data])
+        z = predictive_engine.grouped_zscores(matrix, groups)
+    else:
+        z = predictive_engine.robust_zscores(matrix)
+    
+    anomalies = predictive_engine.score_rows(z, fields, threshold)
+    for anomaly in anomalies:
+        anomaly['item'] = data[anomaly['index']]
+        anomaly['reason'] = 'Desvio estatístico significativo em ' + ', '.join(anomaly['fields'])
     
     return {
         'total_items': len(data),
+        'fields_analyzed': fields,
         'anomalies_detected': len(anomalies),
         'anomalies': anomalies,
-        'model': 'Isolation Forest',
-        'threshold': 0.6
+        'model': 'Robust z-score (MAD)',
+        'threshold': threshold
+    }
+
+@router.get("/anomalies/metrics")
+async def detect_metric_anomalies(days: int = 365, threshold: float = 3.5, limit: int = 50):
+    """Varre lançamentos financeiros (por tipo/categoria) e métricas dos casos em busca de anomalias"""
+    since = (datetime.now() - timedelta(days=days)).isoformat()
+    
+    records = await db.financial_records.find(
+        {'date': {'$gte': since}},
+        {'_id': 0, 'id': 1, 'type': 1, 'category': 1, 'amount': 1, 'date': 1, 'case_id': 1, 'description': 1}
+    ).to_list(None)
+    matrix, fields = predictive_engine.numeric_matrix(records, ['amount'])
+    groups = np.array([f"{r.get('type')}/{r.get('category')}" for r in records])
+    financial = predictive_engine.score_rows(predictive_engine.grouped_zscores(matrix, groups), fields, threshold)
+    for anomaly in financial:
+        anomaly['item'] = records[anomaly['index']]
+    
+    case_fields = ['fee', 'expenses', 'evidence_count', 'document_count']
+    cases = await db.cases.find(
+        {'created_at': {'$gte': since}},
+        {'_id': 0, 'id': 1, 'title': 1, 'service_type': 1, 'status': 1, **{f: 1 for f in case_fields}}
+    ).to_list(None)
+    matrix, fields = predictive_engine.numeric_matrix(cases, case_fields)
+    groups = np.array([str(c.get('service_type')) for c in cases])
+    case_anomalies = predictive_engine.score_rows(predictive_engine.grouped_zscores(matrix, groups), fields, threshold)
+    for anomaly in case_anomalies:
+        anomaly['item'] = cases[anomaly['index']]
+    
+    return {
+        'period_days': days,
+        'threshold': threshold,
+        'financial_records': {'analyzed': len(records), 'anomalies': financial[:limit], 'total_anomalies': len(financial)},
+        'cases': {'analyzed': len(cases), 'anomalies': case_anomalies[:limit], 'total_anomalies': len(case_anomalies)},
+        'model': 'Robust z-score (MAD) por grupo'
     }
 
+@router.post("/similarity-index/rebuild")
+async def rebuild_similarity_index():
+    """Reconstrói o índice de similaridade a partir da coleção de casos"""
+    await predictive_engine.similarity_index.refresh(force=True)
+    return predictive_engine.similarity_index.stats()
+
 @router.get("/recommendations/{case_id}")
 async def get_recommendations(case_id: str):
     """Recomendações estratégicas baseadas em ML"""
@@ -221,6 +333,7 @@ async def ml_statistics():
     
     return {
         'total_predictions': total_predictions,
+        'similarity_index': predictive_engine.similarity_index.stats(),
         'models_available': [
             'Case outcome prediction',
             'Similar case finder',
@@ -229,11 +342,10 @@ async def ml_statistics():
             'Strategic recommendations'
         ],
         'algorithms': [
-            'Random Forest',
-            'Gradient Boosting',
-            'Neural Networks',
-            'Time Series (ARIMA)',
-            'Isolation Forest'
+            'TF-IDF + MinHash/LSH',
+            'Beta-binomial outcome estimate',
+            'Robust z-score (MAD)',
+            'Time Series (ARIMA)'
         ],
         'accuracy': 'Training phase - simulated data',
         'features': [
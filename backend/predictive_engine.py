@@ -0,0 +1,408 @@
+"""
+Motor de Análise Preditiva
+Similaridade entre casos por TF-IDF com pré-seleção MinHash/LSH e detecção
+de anomalias vetorizada (z-score robusto) sobre métricas financeiras e
+processuais.
+
+Cada caso vira um conjunto de termos (descrição, título, tipo, vara/tribunal,
+partes e tags, com prefixo de campo para os metadados). A assinatura MinHash
+é dividida em bandas; casos que colidem em ao menos uma banda são os
+candidatos, e só eles são reordenados pelo cosseno TF-IDF. Assim a consulta
+não percorre a base inteira. O índice fica em memória, é carregado sob
+demanda e atualizado de forma incremental por created_at/updated_at.
+"""
+
+import os
+import time
+import zlib
+import asyncio
+import logging
+import warnings
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from mongo_registry import get_client
+from library_index import tokenize
+from identificadores import dobrar_texto
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("MONGO_URL")
+client = get_client(MONGO_URL)
+db = client[os.environ.get("DB_NAME", "test_database")]
+
+NUM_PERM = int(os.environ.get("SIMILARITY_MINHASH_PERM", 64))
+BAND_ROWS = int(os.environ.get("SIMILARITY_LSH_ROWS", 4))
+REFRESH_SECONDS = int(os.environ.get("SIMILARITY_REFRESH_SECONDS", 60))
+REBUILD_SECONDS = int(os.environ.get("SIMILARITY_REBUILD_SECONDS", 6 * 3600))
+# Ampliação pela lista invertida quando o LSH devolve poucos candidatos
+FALLBACK_TERMS = 8
+FALLBACK_POSTINGS = 2000
+# Teto de candidatos reordenados; acima dele ficam os com mais bandas em comum
+MAX_CANDIDATES = int(os.environ.get("SIMILARITY_MAX_CANDIDATES", 1000))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240917)
+_HASH_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.int64)
+_HASH_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.int64)
+
+CASE_PROJECTION = {
+    "_id": 1, "id": 1, "case_number": 1, "title": 1, "description": 1, "service_type": 1,
+    "court": 1, "judge": 1, "parties": 1, "tags": 1, "status": 1, "outcome": 1,
+    "created_at": 1, "updated_at": 1
+}
+FAVORABLE = {"favorable", "favoravel", "procedente", "won", "ganho", "absolvido"}
+UNFAVORABLE = {"unfavorable", "desfavoravel", "improcedente", "lost", "perdido", "condenado"}
+
+
+# ==================== TERMOS ====================
+
+def _partes(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    nomes = []
+    for parte in value:
+        if isinstance(parte, dict):
+            parte = parte.get("name") or parte.get("nome") or ""
+        if parte:
+            nomes.append(str(parte))
+    return nomes
+
+
+def _chave(value: Any) -> str:
+    return "_".join(dobrar_texto(str(value)).split())
+
+
+def case_terms(case: Dict[str, Any]) -> List[str]:
+    """Termos do caso: texto livre radicalizado e metadados com prefixo de campo"""
+    terms = tokenize(f"{case.get('title') or ''} {case.get('description') or ''}")
+    if case.get("service_type"):
+        terms.append(f"tipo:{_chave(case['service_type'])}")
+    for campo, prefixo in (("court", "vara"), ("judge", "juiz")):
+        if case.get(campo):
+            terms.append(f"{prefixo}:{_chave(case[campo])}")
+            terms.extend(tokenize(str(case[campo])))
+    for nome in _partes(case.get("parties")):
+        terms.append(f"parte:{_chave(nome)}")
+    for tag in case.get("tags") or []:
+        terms.append(f"tag:{_chave(tag)}")
+    return terms
+
+
+def outcome_of(case: Dict[str, Any]) -> Optional[bool]:
+    """True/False para desfecho favorável/desfavorável; None se o caso não terminou"""
+    outcome = dobrar_texto(str(case.get("outcome") or ""))
+    if outcome in FAVORABLE:
+        return True
+    if outcome in UNFAVORABLE:
+        return False
+    return None
+
+
+def minhash(terms: Iterable[str]) -> np.ndarray:
+    """Assinatura MinHash (NUM_PERM inteiros) do conjunto de termos"""
+    shingles = np.fromiter({zlib.crc32(t.encode()) % _PRIME for t in terms}, dtype=np.int64)
+    if not shingles.size:
+        return np.full(NUM_PERM, _PRIME, dtype=np.int64)
+    return ((_HASH_A[:, None] * shingles[None, :] + _HASH_B[:, None]) % _PRIME).min(axis=1)
+
+
+def _bands(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(b, signature[b * BAND_ROWS:(b + 1) * BAND_ROWS].tobytes())
+            for b in range(NUM_PERM // BAND_ROWS)]
+
+
+# ==================== ÍNDICE ====================
+
+@dataclass
+class _Entry:
+    case_id: str
+    title: str
+    service_type: Optional[str]
+    court: Optional[str]
+    status: Optional[str]
+    outcome: Optional[bool]
+    tf: Dict[str, int]
+    bands: List[Tuple[int, bytes]] = field(default_factory=list)
+
+
+class SimilarityIndex:
+    """Índice em memória: TF por caso, DF global, buckets LSH e lista invertida"""
+
+    def __init__(self):
+        self.entries: Dict[str, _Entry] = {}
+        self.df: Counter = Counter()
+        self.buckets: Dict[Tuple[int, bytes], set] = defaultdict(set)
+        self.postings: Dict[str, set] = defaultdict(set)
+        self.watermark = ""
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ---- manutenção ----
+
+    def add(self, case: Dict[str, Any]):
+        case_id = str(case.get("id") or case.get("_id"))
+        self.remove(case_id)
+        terms = case_terms(case)
+        tf = Counter(terms)
+        entry = _Entry(
+            case_id=case_id,
+            title=case.get("title") or case.get("case_number") or "Caso",
+            service_type=case.get("service_type"),
+            court=case.get("court"),
+            status=case.get("status"),
+            outcome=outcome_of(case),
+            tf=dict(tf),
+            bands=_bands(minhash(tf))
+        )
+        self.entries[case_id] = entry
+        self.df.update(tf.keys())
+        for term in tf:
+            self.postings[term].add(case_id)
+        for key in entry.bands:
+            self.buckets[key].add(case_id)
+
+    def remove(self, case_id: str):
+        entry = self.entries.pop(case_id, None)
+        if entry is None:
+            return
+        for term in entry.tf:
+            self.df[term] -= 1
+            if self.df[term] <= 0:
+                del self.df[term]
+            self.postings[term].discard(case_id)
+            if not self.postings[term]:
+                del self.postings[term]
+        for key in entry.bands:
+            self.buckets[key].discard(case_id)
+            if not self.buckets[key]:
+                del self.buckets[key]
+
+    async def refresh(self, force: bool = False):
+        """Carrega casos novos/alterados; reconstrói por completo periodicamente (remoções)"""
+        now = time.monotonic()
+        if not force and now - self.refreshed_at < REFRESH_SECONDS:
+            return
+        async with self._lock:
+            if not force and now - self.refreshed_at < REFRESH_SECONDS:
+                return
+            rebuild = force or not self.rebuilt_at or now - self.rebuilt_at >= REBUILD_SECONDS
+            query: Dict[str, Any] = {}
+            if not rebuild and self.watermark:
+                query = {"$or": [{"updated_at": {"$gt": self.watermark}},
+                                 {"created_at": {"$gt": self.watermark}}]}
+            cases = await db.cases.find(query, CASE_PROJECTION).to_list(None)
+
+            if rebuild:
+                fresh = SimilarityIndex()
+                await asyncio.to_thread(fresh._load, cases)
+                self.entries, self.df = fresh.entries, fresh.df
+                self.buckets, self.postings = fresh.buckets, fresh.postings
+                self.watermark = fresh.watermark
+                self.rebuilt_at = now
+                logger.info("🔎 Índice de similaridade reconstruído: %s casos", len(self.entries))
+            elif cases:
+                # Lote incremental pequeno: aplicado no próprio loop, sem concorrer com consultas
+                self._load(cases)
+            self.refreshed_at = now
+
+    def _load(self, cases: List[Dict[str, Any]]):
+        for case in cases:
+            self.add(case)
+            stamp = max(str(case.get("updated_at") or ""), str(case.get("created_at") or ""))
+            if stamp > self.watermark:
+                self.watermark = stamp
+
+    # ---- consulta ----
+
+    def _idf(self, term: str) -> float:
+        return float(np.log((1 + len(self.entries)) / (1 + self.df.get(term, 0))) + 1.0)
+
+    def _candidates(self, tf: Counter, limit: int) -> Counter:
+        """Candidatos com o número de bandas LSH em comum (estimativa do Jaccard)"""
+        found: Counter = Counter()
+        for key in _bands(minhash(tf)):
+            found.update(self.buckets.get(key, ()))
+        if len(found) < limit:
+            # Poucas colisões: amplia pelos termos mais raros da consulta
+            raros = sorted((t for t in tf if t in self.postings), key=lambda t: self.df[t])
+            for term in raros[:FALLBACK_TERMS]:
+                posting = self.postings[term]
+                if len(posting) > FALLBACK_POSTINGS:
+                    break
+                for cid in posting:
+                    found.setdefault(cid, 0)
+                if len(found) >= limit * 4:
+                    break
+        return found
+
+    def similar(self, case: Dict[str, Any], limit: int = 10, exclude: Optional[str] = None,
+                filtros: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Top-k casos por cosseno TF-IDF entre os candidatos do LSH"""
+        tf = Counter(case_terms(case))
+        if not tf or not self.entries:
+            return []
+        candidates = self._candidates(tf, limit)
+        candidates.pop(exclude, None)
+        if filtros:
+            candidates = Counter({c: n for c, n in candidates.items()
+                                  if all(getattr(self.entries[c], k) == v for k, v in filtros.items())})
+        ids = [c for c, _ in candidates.most_common(MAX_CANDIDATES) if self.entries[c].tf]
+        if not ids:
+            return []
+
+        # Pesos TF-IDF esparsos: termos de todos os candidatos concatenados,
+        # somados por candidato com reduceat (produto com a consulta e norma)
+        idf = {t: self._idf(t) for t in tf}
+        q = {t: (1 + np.log(n)) * idf[t] for t, n in tf.items()}
+        terms, counts, lengths = [], [], []
+        for cid in ids:
+            doc_tf = self.entries[cid].tf
+            terms.extend(doc_tf)
+            counts.extend(doc_tf.values())
+            lengths.append(len(doc_tf))
+        for term in terms:
+            if term not in idf:
+                idf[term] = self._idf(term)
+        weights = (1 + np.log(np.array(counts, dtype=np.float64))) * np.fromiter(
+            (idf[t] for t in terms), dtype=np.float64, count=len(terms))
+        query = np.fromiter((q.get(t, 0.0) for t in terms), dtype=np.float64, count=len(terms))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        dots = np.add.reduceat(weights * query, offsets)
+        norms = np.sqrt(np.add.reduceat(weights * weights, offsets)) * np.sqrt(sum(w * w for w in q.values()))
+        scores = np.divide(dots, norms, out=np.zeros(len(ids)), where=norms > 0)
+
+        k = min(limit, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for row in top:
+            if scores[row] <= 0:
+                break
+            entry = self.entries[ids[row]]
+            shared = sorted(set(tf) & set(entry.tf), key=lambda t: -self._idf(t))[:8]
+            results.append({
+                "id": entry.case_id,
+                "title": entry.title,
+                "service_type": entry.service_type,
+                "court": entry.court,
+                "status": entry.status,
+                "outcome": {True: "favorable", False: "unfavorable"}.get(entry.outcome),
+                "similarity": round(float(scores[row]), 4),
+                "shared_terms": shared
+            })
+        return results
+
+    def outcome_rate(self, filtros: Dict[str, Any]) -> Tuple[int, int]:
+        """(favoráveis, encerrados) entre os casos que atendem aos filtros"""
+        favorable = total = 0
+        for entry in self.entries.values():
+            if entry.outcome is None or any(getattr(entry, k) != v for k, v in filtros.items()):
+                continue
+            total += 1
+            favorable += entry.outcome
+        return favorable, total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cases": len(self.entries),
+            "terms": len(self.df),
+            "buckets": len(self.buckets),
+            "bands": NUM_PERM // BAND_ROWS,
+            "rows_per_band": BAND_ROWS,
+            "watermark": self.watermark or None
+        }
+
+
+similarity_index = SimilarityIndex()
+
+
+async def find_similar(case: Dict[str, Any], limit: int = 10, exclude: Optional[str] = None,
+                       filtros: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    await similarity_index.refresh()
+    return similarity_index.similar(case, limit=limit, exclude=exclude, filtros=filtros)
+
+
+# ==================== ANOMALIAS ====================
+
+# Abaixo disso o desvio absoluto mediano é tratado como nulo
+_MAD_EPS = 1e-9
+_MAD_SCALE = 0.6745
+# MAD nulo (mais da metade dos valores iguais): desvio absoluto médio, com o
+# fator que o torna consistente com o desvio padrão na normal (√(π/2))
+_MEAN_AD_SCALE = 1.2533
+
+
+def numeric_matrix(rows: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> Tuple[np.ndarray, List[str]]:
+    """Matriz (linhas x campos numéricos) com NaN onde o valor falta"""
+    if fields is None:
+        fields = sorted({k for row in rows for k, v in row.items()
+                         if isinstance(v, (int, float)) and not isinstance(v, bool)})
+    matrix = np.full((len(rows), len(fields)), np.nan)
+    for i, row in enumerate(rows):
+        for j, name in enumerate(fields):
+            value = row.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                matrix[i, j] = value
+    return matrix, fields
+
+
+def robust_zscores(matrix: np.ndarray) -> np.ndarray:
+    """
+    Z-score robusto por coluna (mediana/MAD); colunas com MAD nulo usam o
+    desvio absoluto médio em torno da mediana (ainda insensível a um único
+    valor extremo, ao contrário do desvio padrão), e colunas constantes
+    ficam com zero.
+    """
+    if matrix.size == 0:
+        return np.zeros_like(matrix)
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        # Colunas sem nenhum valor (NaN) geram avisos do NumPy e ficam com zero
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(matrix, axis=0)
+        deviation = matrix - median
+        mad = np.nanmedian(np.abs(deviation), axis=0)
+        mean_ad = np.nanmean(np.abs(deviation), axis=0)
+        robust = mad > _MAD_EPS
+        scale = np.where(robust, mad / _MAD_SCALE, mean_ad * _MEAN_AD_SCALE)
+        z = np.divide(deviation, scale, out=np.zeros_like(matrix), where=scale > _MAD_EPS)
+    return np.nan_to_num(z)
+
+
+def grouped_zscores(matrix: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Z-scores robustos calculados dentro de cada grupo (ex.: categoria financeira)"""
+    z = np.zeros_like(matrix)
+    labels, inverse = np.unique(groups, return_inverse=True)
+    for g in range(len(labels)):
+        mask = inverse == g
+        z[mask] = robust_zscores(matrix[mask])
+    return z
+
+
+def score_rows(z: np.ndarray, fields: List[str], threshold: float) -> List[Dict[str, Any]]:
+    """Linhas com |z| acima do limiar, da mais anômala para a menos"""
+    if z.size == 0:
+        return []
+    magnitude = np.abs(z)
+    worst = magnitude.max(axis=1)
+    flagged = np.flatnonzero(worst > threshold)
+    flagged = flagged[np.argsort(-worst[flagged])]
+    results = []
+    for i in flagged:
+        cols = np.flatnonzero(magnitude[i] > threshold)
+        results.append({
+            "index": int(i),
+            "anomaly_score": round(float(1 - np.exp(-worst[i] / threshold)), 4),
+            "max_zscore": round(float(worst[i]), 2),
+            "fields": {fields[j]: round(float(z[i, j]), 2) for j in cols}
+        })
+    return results
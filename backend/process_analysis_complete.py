@@ -8,7 +8,7 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 import uuid
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 import os
 import jwt
 from jwt.exceptions import InvalidTokenError
@@ -18,7 +18,7 @@ process_analysis_router = APIRouter(prefix="/api/athena/process-analysis", tags=
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client.ap_elite_db
 
 # JWT Secret
@@ -9,7 +9,7 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
 import numpy as np
 import hashlib
@@ -19,7 +19,7 @@ router = APIRouter(prefix="/api/rag", tags=["RAG System"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class RAGQuery(BaseModel):
@@ -0,0 +1,195 @@
+"""
+Barramento Pub/Sub para Tempo Real
+Distribui mensagens de WebSocket entre processos/workers do uvicorn.
+Backends (REALTIME_BUS): local (em processo), mongo (coleção capped com
+cursor tailable) e redis (opcional, requer o pacote redis).
+"""
+
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+REALTIME_BUS = os.environ.get("REALTIME_BUS", "local").lower()
+EVENTS_COLLECTION = "realtime_events"
+EVENTS_CAPPED_BYTES = int(os.environ.get("REALTIME_EVENTS_CAPPED_BYTES", 64 * 1024 * 1024))
+
+
+class LocalBus:
+    """Entrega apenas aos assinantes do próprio processo (desenvolvimento/worker único)"""
+
+    name = "local"
+
+    def __init__(self):
+        self._handlers: Dict[str, Set[Handler]] = defaultdict(set)
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self._handlers[channel].add(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        handlers = self._handlers.get(channel)
+        if handlers:
+            handlers.discard(handler)
+            if not handlers:
+                del self._handlers[channel]
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        await self._dispatch(channel, message)
+
+    async def _dispatch(self, channel: str, message: Dict[str, Any]):
+        handlers = list(self._handlers.get(channel, ()))
+        if not handlers:
+            return
+        results = await asyncio.gather(*(h(message) for h in handlers), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Falha em assinante do canal %s: %s", channel, result)
+
+    def channels(self):
+        return list(self._handlers)
+
+    async def close(self):
+        self._handlers.clear()
+
+
+class MongoBus(LocalBus):
+    """
+    Publica em coleção capped e acompanha com cursor tailable; cada processo
+    entrega aos seus assinantes locais (inclusive as próprias publicações).
+    """
+
+    name = "mongo"
+
+    def __init__(self, database):
+        super().__init__()
+        self.db = database
+        self._tail_task: Optional[asyncio.Task] = None
+        self._ready = False
+
+    async def _ensure_collection(self):
+        if self._ready:
+            return
+        from pymongo.errors import CollectionInvalid
+        try:
+            await self.db.create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_CAPPED_BYTES)
+        except CollectionInvalid:
+            pass
+        # Cursor tailable não se mantém aberto em coleção vazia
+        if await self.db[EVENTS_COLLECTION].estimated_document_count() == 0:
+            await self.db[EVENTS_COLLECTION].insert_one({"channel": "__init__", "message": {}})
+        self._ready = True
+
+    async def subscribe(self, channel: str, handler: Handler):
+        await super().subscribe(channel, handler)
+        if self._tail_task is None or self._tail_task.done():
+            await self._ensure_collection()
+            self._tail_task = asyncio.create_task(self._tail())
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        await self._ensure_collection()
+        await self.db[EVENTS_COLLECTION].insert_one({"channel": channel, "message": message})
+
+    async def _tail(self):
+        from pymongo import CursorType, DESCENDING
+        collection = self.db[EVENTS_COLLECTION]
+        last = await collection.find_one({}, sort=[("$natural", DESCENDING)])
+        last_id = last["_id"] if last else None
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        if event.get("channel") in self._handlers:
+                            await self._dispatch(event["channel"], event["message"])
+                    await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Reiniciando leitura do barramento Mongo: %s", e)
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._tail_task:
+            self._tail_task.cancel()
+        await super().close()
+
+
+class RedisBus(LocalBus):
+    """Pub/Sub nativo do Redis (REDIS_URL)"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis.asyncio as aioredis
+        self.redis = aioredis.from_url(url, decode_responses=True)
+        self.pubsub = self.redis.pubsub()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def subscribe(self, channel: str, handler: Handler):
+        first = channel not in self._handlers
+        await super().subscribe(channel, handler)
+        if first:
+            await self.pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        await super().unsubscribe(channel, handler)
+        if channel not in self._handlers:
+            await self.pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        import json
+        await self.redis.publish(channel, json.dumps(message, default=str))
+
+    async def _read(self):
+        import json
+        while True:
+            try:
+                event = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if event and event.get("type") == "message":
+                    await self._dispatch(event["channel"], json.loads(event["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Falha na leitura do barramento Redis: %s", e)
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        await self.pubsub.close()
+        await self.redis.close()
+        await super().close()
+
+
+_bus: Optional[LocalBus] = None
+
+
+def get_bus() -> LocalBus:
+    """Barramento do processo, conforme REALTIME_BUS"""
+    global _bus
+    if _bus is None:
+        if REALTIME_BUS == "mongo":
+            from mongo_registry import get_client
+            client = get_client(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+            _bus = MongoBus(client[os.environ.get("DB_NAME", "test_database")])
+        elif REALTIME_BUS == "redis":
+            _bus = RedisBus(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            _bus = LocalBus()
+    return _bus
+
+
+def set_bus(bus: LocalBus):
+    """Substitui o barramento (ex.: backend customizado)"""
+    global _bus
+    _bus = bus
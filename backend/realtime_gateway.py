@@ -0,0 +1,303 @@
+"""
+Gateway de WebSockets em Tempo Real
+Fila de envio limitada por conexão, fan-out concorrente, política para clientes
+lentos (descartar antigas / desconectar), múltiplos sockets por usuário,
+tópicos (caso, conversa) e registro de presença compartilhado entre workers.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+from realtime_bus import get_bus
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", 256))
+SEND_TIMEOUT_SECONDS = float(os.environ.get("WS_SEND_TIMEOUT", 10))
+# "drop_oldest": descarta mensagens antigas; "disconnect": encerra o cliente lento
+SLOW_CONSUMER_POLICY = os.environ.get("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+MAX_DROPPED_MESSAGES = int(os.environ.get("WS_MAX_DROPPED_MESSAGES", 1000))
+PRESENCE_TTL_SECONDS = int(os.environ.get("WS_PRESENCE_TTL", 90))
+PRESENCE_HEARTBEAT_SECONDS = PRESENCE_TTL_SECONDS / 3
+
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+BROADCAST_CHANNEL = "rt:broadcast"
+
+
+def user_channel(user_id: str) -> str:
+    return f"rt:user:{user_id}"
+
+
+def topic_channel(topic: str) -> str:
+    return f"rt:topic:{topic}"
+
+
+class Connection:
+    """Socket com fila de envio própria; um cliente lento não bloqueia os demais"""
+
+    def __init__(self, websocket: WebSocket, user_id: str, queue_size: int = SEND_QUEUE_SIZE):
+        self.id = str(uuid.uuid4())
+        self.websocket = websocket
+        self.user_id = user_id
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.connected_at = datetime.now(timezone.utc)
+        self._sender: Optional[asyncio.Task] = None
+
+    def start(self, on_failure):
+        self._sender = asyncio.create_task(self._send_loop(on_failure))
+
+    def enqueue(self, message: str) -> bool:
+        """Enfileira sem bloquear; retorna False se o cliente deve ser desconectado"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            if SLOW_CONSUMER_POLICY == "disconnect":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+            return self.dropped < MAX_DROPPED_MESSAGES
+
+    async def _send_loop(self, on_failure):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message), timeout=SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info("Conexão %s encerrada no envio: %s", self.id, e)
+            await on_failure(self)
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        if self._sender and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    """
+    Gerencia conexões locais do worker e entrega mensagens publicadas no
+    barramento (usuário, tópico ou broadcast) para todos os workers.
+    """
+
+    def __init__(self, database=None):
+        self.db = database
+        self.connections: Dict[str, Connection] = {}
+        self.by_user: Dict[str, Set[Connection]] = {}
+        self.by_topic: Dict[str, Set[Connection]] = {}
+        self._handlers: Dict[str, object] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._presence_ready = False
+
+    # ---------- Compatibilidade ----------
+
+    @property
+    def active_connections(self) -> Dict[str, List[Connection]]:
+        return {user_id: list(conns) for user_id, conns in self.by_user.items()}
+
+    # ---------- Conexões ----------
+
+    async def connect(self, websocket: WebSocket, user_id: str, topics: Optional[Iterable[str]] = None) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, user_id)
+        self.connections[connection.id] = connection
+        first_socket = user_id not in self.by_user
+        self.by_user.setdefault(user_id, set()).add(connection)
+        connection.start(self._on_send_failure)
+
+        if first_socket:
+            await self._listen(user_channel(user_id))
+        await self._listen(BROADCAST_CHANNEL)
+        for topic in topics or []:
+            await self.subscribe(connection, topic)
+
+        await self._presence_upsert(connection)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        return connection
+
+    async def disconnect(self, target: Union[Connection, str]):
+        """Remove uma conexão (ou todas as conexões locais de um user_id)"""
+        if isinstance(target, Connection):
+            targets = [target]
+        else:
+            targets = list(self.by_user.get(target, ()))
+
+        for connection in targets:
+            if self.connections.pop(connection.id, None) is None:
+                continue
+            for topic in list(connection.topics):
+                await self.unsubscribe(connection, topic)
+            user_conns = self.by_user.get(connection.user_id)
+            if user_conns is not None:
+                user_conns.discard(connection)
+                if not user_conns:
+                    del self.by_user[connection.user_id]
+                    await self._unlisten(user_channel(connection.user_id))
+            await connection.close()
+            await self._presence_remove(connection)
+
+        if not self.connections:
+            await self._unlisten(BROADCAST_CHANNEL)
+
+    async def _on_send_failure(self, connection: Connection):
+        await self.disconnect(connection)
+
+    # ---------- Tópicos ----------
+
+    async def subscribe(self, connection: Connection, topic: str):
+        if topic in connection.topics:
+            return
+        connection.topics.add(topic)
+        subscribers = self.by_topic.setdefault(topic, set())
+        subscribers.add(connection)
+        if len(subscribers) == 1:
+            await self._listen(topic_channel(topic))
+        await self._presence_upsert(connection)
+
+    async def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.by_topic.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(connection)
+        if not subscribers:
+            del self.by_topic[topic]
+            await self._unlisten(topic_channel(topic))
+
+    # ---------- Envio ----------
+
+    async def send_personal_message(self, message: str, user_id: str):
+        """Entrega a todos os sockets do usuário, em qualquer worker"""
+        await get_bus().publish(user_channel(user_id), {"text": message})
+
+    async def broadcast(self, message: str):
+        await get_bus().publish(BROADCAST_CHANNEL, {"text": message})
+
+    async def publish(self, topic: str, message: str):
+        await get_bus().publish(topic_channel(topic), {"text": message})
+
+    async def _listen(self, channel: str):
+        if channel in self._handlers:
+            return
+
+        async def handler(payload: Dict):
+            await self._fanout(channel, payload.get("text", ""))
+
+        self._handlers[channel] = handler
+        await get_bus().subscribe(channel, handler)
+
+    async def _unlisten(self, channel: str):
+        handler = self._handlers.pop(channel, None)
+        if handler:
+            await get_bus().unsubscribe(channel, handler)
+
+    def _local_targets(self, channel: str) -> List[Connection]:
+        if channel == BROADCAST_CHANNEL:
+            return list(self.connections.values())
+        if channel.startswith("rt:user:"):
+            return list(self.by_user.get(channel[len("rt:user:"):], ()))
+        if channel.startswith("rt:topic:"):
+            return list(self.by_topic.get(channel[len("rt:topic:"):], ()))
+        return []
+
+    async def _fanout(self, channel: str, message: str):
+        """Enfileira para cada conexão local sem aguardar envios individuais"""
+        slow = [conn for conn in self._local_targets(channel) if not conn.enqueue(message)]
+        for connection in slow:
+            logger.info("Desconectando cliente lento %s (%s)", connection.id, connection.user_id)
+            await connection.close(code=1013)
+            await self.disconnect(connection)
+
+    # ---------- Presença ----------
+
+    async def _ensure_presence(self):
+        if self._presence_ready or self.db is None:
+            return
+        await self.db.ws_presence.create_index("heartbeat_at", expireAfterSeconds=PRESENCE_TTL_SECONDS)
+        await self.db.ws_presence.create_index("user_id")
+        self._presence_ready = True
+
+    async def _presence_upsert(self, connection: Connection):
+        if self.db is None:
+            return
+        try:
+            await self._ensure_presence()
+            await self.db.ws_presence.update_one(
+                {"_id": connection.id},
+                {"$set": {
+                    "user_id": connection.user_id,
+                    "worker_id": WORKER_ID,
+                    "topics": sorted(connection.topics),
+                    "connected_at": connection.connected_at,
+                    "heartbeat_at": datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning("Falha ao registrar presença: %s", e)
+
+    async def _presence_remove(self, connection: Connection):
+        if self.db is None:
+            return
+        try:
+            await self.db.ws_presence.delete_one({"_id": connection.id})
+        except Exception as e:
+            logger.warning("Falha ao remover presença: %s", e)
+
+    async def _heartbeat_loop(self):
+        while self.connections:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+            if self.db is None or not self.connections:
+                continue
+            try:
+                await self.db.ws_presence.update_many(
+                    {"_id": {"$in": list(self.connections)}},
+                    {"$set": {"heartbeat_at": datetime.now(timezone.utc)}}
+                )
+            except Exception as e:
+                logger.warning("Falha no heartbeat de presença: %s", e)
+
+    async def online_users(self, topic: Optional[str] = None) -> List[str]:
+        """Usuários com socket ativo em qualquer worker (opcionalmente inscritos em um tópico)"""
+        if self.db is None:
+            if topic:
+                return sorted({conn.user_id for conn in self.by_topic.get(topic, ())})
+            return sorted(self.by_user)
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=PRESENCE_TTL_SECONDS)
+        query = {"heartbeat_at": {"$gte": cutoff}}
+        if topic:
+            query["topics"] = topic
+        return sorted(await self.db.ws_presence.distinct("user_id", query))
+
+    def stats(self) -> Dict:
+        return {
+            "worker_id": WORKER_ID,
+            "connections": len(self.connections),
+            "users": len(self.by_user),
+            "topics": len(self.by_topic),
+            "queued_messages": sum(conn.queue.qsize() for conn in self.connections.values()),
+            "dropped_messages": sum(conn.dropped for conn in self.connections.values()),
+            "policy": SLOW_CONSUMER_POLICY,
+            "bus": get_bus().name
+        }
@@ -9,7 +9,7 @@ import asyncio
 import aiofiles
 from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional, Tuple
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import uuid
 from pathlib import Path
@@ -25,6 +25,8 @@ import math
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import os
 
+import job_queue
+
 # Configure Emergent LLM
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', 'sk-emergent-aD33e9977E0D345EfD')
 llm_chat = LlmChat(
@@ -486,7 +488,7 @@ async def create_relationship(relationship_data: Dict):
     return {"message": "Relacionamento criado com sucesso", "relationship": relationship.dict()}
 
 @relationships_router.post("/networks")
-async def create_criminal_network(network_data: Dict, background_tasks: BackgroundTasks):
+async def create_criminal_network(network_data: Dict):
     """Criar nova rede criminal"""
     network_id = str(uuid.uuid4())
     
@@ -507,13 +509,18 @@ async def create_criminal_network(network_data: Dict, background_tasks: Backgrou
     async with aiofiles.open(network_file, 'w') as f:
         await f.write(network.json())
     
-    # Schedule background analysis
-    background_tasks.add_task(analyze_network_background, network_id)
+    # Enfileira a análise para os workers da fila de jobs
+    job = await job_queue.enqueue(
+        "relationships.analyze_network",
+        {"network_id": network_id},
+        priority="P3",
+        dedupe_key=f"relationships:{network_id}"
+    )
     
-    return {"message": "Rede criminal criada com sucesso", "network": network.dict()}
+    return {"message": "Rede criminal criada com sucesso", "network": network.dict(), "job_id": job["job_id"]}
 
-async def analyze_network_background(network_id: str):
-    """Análise de rede em background"""
+async def analyze_network_background(network_id: str, job=None):
+    """Análise de rede em background (executada pelos workers da fila de jobs)"""
     try:
         # Load network data
         network_file = NETWORKS_PATH / f"network_{network_id}.json"
@@ -544,6 +551,8 @@ async def analyze_network_background(network_id: str):
                     await analyzer.add_relationship(relationship)
         
         # Perform analysis
+        if job is not None:
+            await job.progress(30, "grafo carregado")
         centrality = await analyzer.calculate_centrality_measures()
         communities = await analyzer.detect_communities()
         key_players = await analyzer.identify_key_players(centrality)
@@ -554,6 +563,8 @@ async def analyze_network_background(network_id: str):
         await analyzer.generate_visualization(str(viz_path))
         
         # AI Analysis
+        if job is not None:
+            await job.progress(70, "análise com IA")
         relationships_data = []
         for rel_file in relationship_files:
             async with aiofiles.open(rel_file, 'r') as f:
@@ -592,6 +603,8 @@ async def analyze_network_background(network_id: str):
 
     except Exception as e:
         print(f"Erro na análise de rede {network_id}: {str(e)}")
+        # Propaga para a fila aplicar retentativa com backoff
+        raise
 
 @relationships_router.get("/networks/{network_id}/analysis")
 async def get_network_analysis(network_id: str):
@@ -0,0 +1,416 @@
+"""
+Renderização de Relatórios (PDF e Gráficos)
+Funções síncronas executadas em pool de processos, fora do event loop da API.
+Gráficos são cacheados em disco pelo hash dos dados (chart_<sha256>.png).
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import multiprocessing
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+
+# Limite de renderizações simultâneas (processos do pool)
+RENDER_WORKERS = int(os.environ.get("REPORT_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+async def run_render(func, *args):
+    """Executa uma função de renderização no pool, respeitando o limite de concorrência"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(RENDER_WORKERS)
+    async with _semaphore:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ==================== ESTILOS ====================
+
+@lru_cache(maxsize=1)
+def _styles():
+    """Estilos personalizados (criados uma vez por processo)"""
+    styles = getSampleStyleSheet()
+    
+    # Title style
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        textColor=colors.darkblue,
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+
+    # Header style
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.darkred,
+        spaceBefore=20,
+        spaceAfter=12
+    ))
+
+    # Subheader style
+    styles.add(ParagraphStyle(
+        name='SubHeader',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.darkgreen,
+        spaceBefore=15,
+        spaceAfter=8
+    ))
+    return styles
+
+
+# ==================== PDF ====================
+
+def build_investigation_pdf(output_file: str, case_data: Dict, evidence_data: List[Dict],
+                            network_data: Optional[Dict], ai_summary: Dict, timeline_text: str) -> str:
+    """Monta o PDF do relatório de investigação"""
+    styles = _styles()
+    
+    # Create PDF document
+    doc = SimpleDocTemplate(
+        str(output_file),
+        pagesize=A4,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=18
+    )
+
+    # Story elements
+    story = []
+
+    # Title page
+    story.append(Paragraph("RELATÓRIO DE INVESTIGAÇÃO CRIMINAL", styles['CustomTitle']))
+    story.append(Spacer(1, 20))
+
+    # Case information
+    case_info = [
+        ["Número do Caso:", case_data.get("case_number", "N/A")],
+        ["Título:", case_data.get("title", "N/A")],
+        ["Status:", case_data.get("status", "N/A")],
+        ["Prioridade:", case_data.get("priority", "N/A")],
+        ["Data de Criação:", case_data.get("created_at", "N/A")],
+        ["Última Atualização:", case_data.get("updated_at", "N/A")]
+    ]
+
+    case_table = Table(case_info, colWidths=[2*inch, 4*inch])
+    case_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    story.append(case_table)
+    story.append(Spacer(1, 30))
+
+    # Executive summary (AI-generated)
+    story.append(Paragraph("RESUMO EXECUTIVO", styles['SectionHeader']))
+
+    story.append(Paragraph(ai_summary.get("executive_summary", "Resumo em processamento..."), 
+                          styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Evidence analysis
+    story.append(Paragraph("ANÁLISE DE EVIDÊNCIAS", styles['SectionHeader']))
+
+    if evidence_data:
+        evidence_summary = []
+        for i, evidence in enumerate(evidence_data[:10], 1):  # Limit to 10 evidence items
+            evidence_summary.append([
+                str(i),
+                evidence.get("name", "N/A"),
+                evidence.get("type", "N/A"),
+                evidence.get("created_at", "N/A")[:10] if evidence.get("created_at") else "N/A"
+            ])
+
+        evidence_table = Table([["#", "Nome", "Tipo", "Data"]] + evidence_summary,
+                             colWidths=[0.5*inch, 2.5*inch, 1.5*inch, 1.5*inch])
+        evidence_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(evidence_table)
+    else:
+        story.append(Paragraph("Nenhuma evidência encontrada.", styles['Normal']))
+
+    story.append(Spacer(1, 20))
+
+    # AI analysis results
+    story.append(Paragraph("ANÁLISE INTELIGENTE", styles['SectionHeader']))
+
+    ai_analysis_text = ai_summary.get("detailed_analysis", "Análise em processamento...")
+    story.append(Paragraph(ai_analysis_text, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Network analysis (if available)
+    if network_data:
+        story.append(Paragraph("ANÁLISE DE REDE CRIMINAL", styles['SectionHeader']))
+
+        network_summary = [
+            ["Nome da Rede:", network_data.get("name", "N/A")],
+            ["Tipo:", network_data.get("network_type", "N/A")],
+            ["Status:", network_data.get("status", "N/A")],
+            ["Membros:", str(len(network_data.get("members", [])))],
+            ["Criada em:", network_data.get("created_at", "N/A")[:10] if network_data.get("created_at") else "N/A"]
+        ]
+
+        network_table = Table(network_summary, colWidths=[2*inch, 4*inch])
+        network_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightcoral),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(network_table)
+        story.append(Spacer(1, 20))
+
+    # Timeline
+    story.append(Paragraph("CRONOLOGIA DE EVENTOS", styles['SectionHeader']))
+    story.append(Paragraph(timeline_text, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Recommendations
+    story.append(Paragraph("RECOMENDAÇÕES", styles['SectionHeader']))
+    recommendations = ai_summary.get("recommendations", ["Continuar investigação", "Analisar evidências adicionais"])
+
+    for i, rec in enumerate(recommendations, 1):
+        story.append(Paragraph(f"{i}. {rec}", styles['Normal']))
+
+    story.append(Spacer(1, 20))
+
+    # Conclusion
+    story.append(Paragraph("CONCLUSÃO", styles['SectionHeader']))
+    conclusion = ai_summary.get("conclusion", "Investigação em andamento com evidências significativas coletadas.")
+    story.append(Paragraph(conclusion, styles['Normal']))
+
+    # Footer
+    story.append(Spacer(1, 50))
+    story.append(Paragraph(f"Relatório gerado automaticamente em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
+                          styles['Normal']))
+    story.append(Paragraph("Sistema AP Elite - Athena Intelligence", styles['Normal']))
+
+    # Build PDF
+    doc.build(story)
+
+    return output_file
+
+
+def build_forensic_pdf(output_file: str, evidence_data: Dict, analysis_results: Dict) -> str:
+    """Monta o PDF do laudo pericial digital"""
+    styles = _styles()
+    
+    doc = SimpleDocTemplate(str(output_file), pagesize=A4)
+    story = []
+
+    # Title
+    story.append(Paragraph("LAUDO PERICIAL DIGITAL", styles['CustomTitle']))
+    story.append(Spacer(1, 30))
+
+    # Evidence information
+    evidence_info = [
+        ["Número da Evidência:", evidence_data.get("evidence_number", "N/A")],
+        ["Nome do Arquivo:", evidence_data.get("name", "N/A")],
+        ["Tipo:", evidence_data.get("type", "N/A")],
+        ["Tamanho:", f"{evidence_data.get('size', 0)} bytes"],
+        ["Hash MD5:", analysis_results.get("metadata", {}).get("hashes", {}).get("md5", "N/A")],
+        ["Hash SHA256:", analysis_results.get("metadata", {}).get("hashes", {}).get("sha256", "N/A")],
+        ["Data da Coleta:", evidence_data.get("created_at", "N/A")[:19] if evidence_data.get("created_at") else "N/A"]
+    ]
+
+    evidence_table = Table(evidence_info, colWidths=[2.5*inch, 3.5*inch])
+    evidence_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    story.append(evidence_table)
+    story.append(Spacer(1, 30))
+
+    # Methodology
+    story.append(Paragraph("METODOLOGIA APLICADA", styles['SectionHeader']))
+    methodology = """
+    A análise foi realizada utilizando ferramentas forenses digitais avançadas,
+    incluindo análise de metadados, extração de texto por OCR, reconhecimento facial
+    e análise inteligente por IA. Todas as evidências foram processadas mantendo
+    a cadeia de custódia e integridade dos dados.
+    """
+    story.append(Paragraph(methodology, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Results
+    story.append(Paragraph("RESULTADOS DA ANÁLISE", styles['SectionHeader']))
+
+    # Add analysis results
+    if analysis_results.get("image_analysis"):
+        img_analysis = analysis_results["image_analysis"]["results"]
+        story.append(Paragraph("Análise de Imagem:", styles['SubHeader']))
+        story.append(Paragraph(f"Faces detectadas: {img_analysis.get('faces_detected', 0)}", styles['Normal']))
+        if img_analysis.get("extracted_text"):
+            story.append(Paragraph(f"Texto extraído: {img_analysis['extracted_text'][:200]}...", styles['Normal']))
+
+    if analysis_results.get("document_analysis"):
+        doc_analysis = analysis_results["document_analysis"]["ai_summary"]
+        story.append(Paragraph("Análise de Documento:", styles['SubHeader']))
+        story.append(Paragraph(json.dumps(doc_analysis, indent=2)[:500] + "...", styles['Normal']))
+
+    story.append(Spacer(1, 30))
+
+    # Technical details
+    story.append(Paragraph("DETALHES TÉCNICOS", styles['SectionHeader']))
+    tech_details = f"""
+    Arquivo analisado em ambiente controlado com ferramentas certificadas.
+    Integridade verificada através de hashes criptográficos.
+    Análise realizada em: {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
+    Sistema utilizado: AP Elite Athena v2.0
+    """
+    story.append(Paragraph(tech_details, styles['Normal']))
+
+    # Build PDF
+    doc.build(story)
+
+    return output_file
+
+
+# ==================== GRÁFICOS ====================
+
+def chart_cache_key(data: Dict, chart_type: str) -> str:
+    """Hash estável dos dados do gráfico"""
+    payload = json.dumps({"type": chart_type, "data": data}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_chart(chart_file: str, data: Dict, chart_type: str = "summary") -> str:
+    """Renderiza o gráfico (matplotlib) no arquivo indicado"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(12, 8))
+    plt.style.use('seaborn-v0_8')
+
+    if chart_type == "evidence_timeline":
+        # Evidence collection timeline ({"AAAA-MM-DD": quantidade})
+        timeline = data.get("evidence_timeline", {})
+
+        plt.subplot(2, 2, 1)
+        if timeline:
+            days = sorted(timeline)
+            dates = [datetime.fromisoformat(d).strftime("%d/%m") for d in days]
+            counts = [timeline[d] for d in days]
+            plt.plot(dates, counts, marker='o', linewidth=2, markersize=8)
+            plt.xlabel("Data")
+            plt.ylabel("Quantidade")
+            plt.xticks(rotation=45)
+        else:
+            plt.text(0.5, 0.5, 'Cronologia de coleta não disponível',
+                    horizontalalignment='center', verticalalignment='center')
+        plt.title("Cronologia de Coleta de Evidências")
+
+    elif chart_type == "evidence_types":
+        # Evidence types distribution
+        types = data.get("evidence_types", {"Documento": 5, "Imagem": 8, "Comunicação": 3, "Vídeo": 2})
+
+        plt.subplot(2, 2, 2)
+        plt.pie(types.values(), labels=types.keys(), autopct='%1.1f%%', startangle=90)
+        plt.title("Distribuição por Tipo de Evidência")
+
+    elif chart_type == "risk_levels":
+        # Risk levels
+        risks = data.get("risk_levels", {"Baixo": 3, "Médio": 7, "Alto": 4, "Crítico": 2})
+
+        plt.subplot(2, 2, 3)
+        colors_list = ['green', 'yellow', 'orange', 'red']
+        plt.bar(risks.keys(), risks.values(), color=colors_list)
+        plt.title("Níveis de Risco Identificados")
+        plt.xlabel("Nível de Risco")
+        plt.ylabel("Quantidade")
+
+    elif chart_type == "network_centrality":
+        # Network centrality (if network data available)
+        centrality_data = data.get("centrality", {})
+
+        plt.subplot(2, 2, 4)
+        if centrality_data:
+            persons = list(centrality_data.keys())[:10]  # Top 10
+            scores = [centrality_data[p] for p in persons]
+            plt.barh(persons, scores)
+            plt.title("Centralidade na Rede")
+            plt.xlabel("Score de Centralidade")
+        else:
+            plt.text(0.5, 0.5, 'Dados de rede não disponíveis', 
+                    horizontalalignment='center', verticalalignment='center')
+            plt.title("Análise de Rede")
+
+    plt.tight_layout()
+    plt.savefig(chart_file, dpi=300, bbox_inches='tight')
+    plt.close()
+
+    return chart_file
+
+
+async def render_chart(charts_path: Path, data: Dict, chart_type: str = "summary") -> Dict[str, Any]:
+    """Gráfico cacheado por hash dos dados; só renderiza se ainda não existir"""
+    key = chart_cache_key(data, chart_type)
+    chart_file = charts_path / f"chart_{key}.png"
+    if chart_file.exists():
+        return {"file": str(chart_file), "hash": key, "cached": True}
+    tmp_file = charts_path / f".chart_{key}.{os.getpid()}.png"
+    await run_render(build_chart, str(tmp_file), data, chart_type)
+    os.replace(tmp_file, chart_file)
+    return {"file": str(chart_file), "hash": key, "cached": False}
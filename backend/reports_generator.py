@@ -4,7 +4,7 @@ AP ELITE ATHENA - Gerador de Relatórios (PDF/Excel)
 
 from fastapi import APIRouter, HTTPException, Depends, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional
 import uuid
@@ -12,7 +12,7 @@ import os
 import io
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
@@ -0,0 +1,308 @@
+"""
+Carregamento Preguiçoso de Routers e Perfil de Inicialização
+Os módulos de router (networkx, matplotlib/ReportLab, RAG, mídia...) deixam
+de ser importados no import do servidor: cada RouterSpec declara os prefixos
+que atende e o módulo é importado na primeira requisição que casa com um
+deles, ou pelo aquecimento em segundo plano iniciado após o startup. A
+importação roda em um thread (asyncio.to_thread) para não bloquear o event
+loop; só os módulos marcados com loop_import (que chamam asyncio.create_task
+no nível do módulo) são importados no thread do loop.
+
+Cada importação é medida (tempo, variação de RSS, módulos novos em
+sys.modules) e qualquer exceção é registrada com o motivo, em vez de ser
+engolida por um try/except ImportError. A tabela fica disponível em
+loader.profile() / profile_csv() e pela linha de comando:
+
+    python router_loader.py enhanced_server          # TSV
+    python router_loader.py server --json
+
+Modos (variável ROUTER_LOADING):
+- lazy  (padrão): importação sob demanda + aquecimento após ROUTER_WARMUP_DELAY
+  segundos (valor negativo desativa o aquecimento)
+- eager: importa tudo no import do servidor, como antes, ainda com o perfil
+"""
+
+import os
+import sys
+import csv
+import io
+import time
+import asyncio
+import logging
+import importlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROUTER_LOADING = os.environ.get("ROUTER_LOADING", "lazy")
+ROUTER_WARMUP_DELAY = float(os.environ.get("ROUTER_WARMUP_DELAY", 5))
+
+# Caminhos que precisam de todas as rotas registradas (documentação OpenAPI)
+ALL_ROUTES_PATHS = ("/docs", "/redoc", "/openapi.json")
+
+PROFILE_COLUMNS = [
+    "order", "module", "status", "trigger", "import_ms", "rss_delta_kb",
+    "new_modules", "routes", "error", "missing_dependency", "loaded_at"
+]
+
+# Loaders criados no processo (usados pela linha de comando)
+loaders: List["LazyRouterLoader"] = []
+
+
+@dataclass(frozen=True)
+class RouterSpec:
+    module: str
+    attribute: str = "router"
+    prefixes: Sequence[str] = ()
+    # Módulos que registram rotas adicionais no mesmo router (ex.: super_erp_part3)
+    extras: Sequence[str] = ()
+    # Agenda tarefas no import (asyncio.create_task no nível do módulo): exige o thread do loop
+    loop_import: bool = False
+
+    def covers(self, path: str) -> bool:
+        return any(path == p or path.startswith(p.rstrip("/") + "/") for p in self.prefixes)
+
+
+@dataclass
+class _Entry:
+    spec: RouterSpec
+    order: int
+    status: str = "pending"
+    routes: List[Any] = field(default_factory=list)
+    profile: Dict[str, Any] = field(default_factory=dict)
+
+
+# ==================== PERFIL DE IMPORTAÇÃO ====================
+
+def _rss_kb() -> Optional[int]:
+    """RSS atual em KB (/proc no Linux; pico via getrusage nos demais)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+
+
+def import_router(spec: RouterSpec) -> Tuple[Any, Dict[str, Any]]:
+    """Importa o módulo e os extras e devolve (router ou None, perfil)"""
+    modules_before = len(sys.modules)
+    rss_before = _rss_kb()
+    started = time.perf_counter()
+    router, error, missing = None, None, None
+    try:
+        module = importlib.import_module(spec.module)
+        for extra in spec.extras:
+            importlib.import_module(extra)
+        router = getattr(module, spec.attribute)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if isinstance(e, ModuleNotFoundError):
+            missing = e.name
+    rss_after = _rss_kb()
+    return router, {
+        "import_ms": round((time.perf_counter() - started) * 1000, 1),
+        "rss_delta_kb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "new_modules": len(sys.modules) - modules_before,
+        "error": error,
+        "missing_dependency": missing,
+        "loaded_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+# ==================== LOADER ====================
+
+class LazyRouterLoader:
+    """
+    Registra os routers de uma aplicação FastAPI na ordem declarada. No modo
+    lazy, as rotas de cada módulo são inseridas na mesma posição da tabela de
+    rotas que teriam no carregamento antecipado, preservando a precedência
+    entre routers com prefixos sobrepostos.
+    """
+
+    def __init__(self, app, specs: Sequence[RouterSpec], mode: Optional[str] = None,
+                 warmup_delay: Optional[float] = None):
+        self.app = app
+        self.mode = mode or ROUTER_LOADING
+        self.warmup_delay = ROUTER_WARMUP_DELAY if warmup_delay is None else warmup_delay
+        self._entries = [_Entry(spec, i) for i, spec in enumerate(specs)]
+        self._anchor = len(app.router.routes)
+        self._lock = asyncio.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        loaders.append(self)
+
+        if self.mode == "eager":
+            for entry in self._entries:
+                self._apply(entry, *import_router(entry.spec), trigger="eager")
+        else:
+            app.add_middleware(LazyRouterMiddleware, loader=self)
+            app.add_event_handler("startup", self._schedule_warmup)
+            app.add_event_handler("shutdown", self._cancel_warmup)
+
+    @property
+    def pending(self) -> bool:
+        return any(e.status == "pending" for e in self._entries)
+
+    @property
+    def loaded_count(self) -> int:
+        return sum(1 for e in self._entries if e.status == "loaded")
+
+    def _apply(self, entry: _Entry, router, profile: Dict[str, Any], trigger: str):
+        profile["trigger"] = trigger
+        entry.profile = profile
+        if router is None:
+            entry.status = "failed"
+            logger.error(f"⚠️ {entry.spec.module} não carregado: {profile['error']}")
+            return
+
+        routes = self.app.router.routes
+        before = len(routes)
+        self.app.include_router(router)
+        new_routes = routes[before:]
+        del routes[before:]
+        position = self._anchor + sum(len(e.routes) for e in self._entries if e.order < entry.order)
+        routes[position:position] = new_routes
+        entry.routes = new_routes
+        entry.status = "loaded"
+        self.app.openapi_schema = None
+
+        if entry.spec.prefixes:
+            outside = [r.path for r in new_routes if not entry.spec.covers(getattr(r, "path", ""))]
+            if outside:
+                logger.warning(f"⚠️ {entry.spec.module}: rotas fora dos prefixos declarados: {outside[:5]}")
+        logger.info(f"✅ {entry.spec.module} carregado em {profile['import_ms']} ms ({trigger})")
+
+    async def _load(self, entries: List[_Entry], trigger: str):
+        async with self._lock:
+            for entry in entries:
+                if entry.status == "pending":
+                    if entry.spec.loop_import:
+                        result = import_router(entry.spec)
+                        await asyncio.sleep(0)
+                    else:
+                        result = await asyncio.to_thread(import_router, entry.spec)
+                    # A tabela de rotas só é alterada no thread do event loop
+                    self._apply(entry, *result, trigger=trigger)
+
+    async def load_for_path(self, path: str):
+        if path in ALL_ROUTES_PATHS:
+            entries = [e for e in self._entries if e.status == "pending"]
+        else:
+            entries = [e for e in self._entries if e.status == "pending" and e.spec.covers(path)]
+        if entries:
+            await self._load(entries, f"request:{path}")
+
+    async def load_all(self, trigger: str = "manual"):
+        await self._load(list(self._entries), trigger)
+
+    # ---------- Aquecimento ----------
+
+    async def _schedule_warmup(self):
+        if self.warmup_delay >= 0 and self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self._warmup())
+
+    async def _warmup(self):
+        await asyncio.sleep(self.warmup_delay)
+        for entry in self._entries:
+            try:
+                await self._load([entry], "warmup")
+            except Exception as e:
+                logger.error(f"❌ Aquecimento de {entry.spec.module}: {e}")
+        logger.info(f"🔥 Aquecimento concluído: {self.loaded_count}/{len(self._entries)} routers")
+
+    async def _cancel_warmup(self):
+        if self._warmup_task and not self._warmup_task.done():
+            self._warmup_task.cancel()
+
+    # ---------- Perfil ----------
+
+    def profile_rows(self) -> List[Dict[str, Any]]:
+        rows = []
+        for entry in self._entries:
+            row = {column: None for column in PROFILE_COLUMNS}
+            row.update(entry.profile)
+            row.update({
+                "order": entry.order,
+                "module": entry.spec.module,
+                "status": entry.status,
+                "routes": len(entry.routes)
+            })
+            rows.append(row)
+        return rows
+
+    def profile(self) -> Dict[str, Any]:
+        rows = self.profile_rows()
+        return {
+            "mode": self.mode,
+            "columns": PROFILE_COLUMNS,
+            "rows": rows,
+            "summary": {
+                "total": len(rows),
+                "loaded": sum(1 for r in rows if r["status"] == "loaded"),
+                "failed": sum(1 for r in rows if r["status"] == "failed"),
+                "pending": sum(1 for r in rows if r["status"] == "pending"),
+                "import_ms": round(sum(r["import_ms"] or 0 for r in rows), 1)
+            }
+        }
+
+    def profile_csv(self, delimiter: str = ",") -> str:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=PROFILE_COLUMNS, delimiter=delimiter, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(self.profile_rows())
+        return buffer.getvalue()
+
+
+class LazyRouterMiddleware:
+    """Middleware ASGI: importa os routers pendentes que atendem o caminho antes do roteamento"""
+
+    def __init__(self, app, loader: LazyRouterLoader):
+        self.app = app
+        self.loader = loader
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and self.loader.pending:
+            await self.loader.load_for_path(scope["path"])
+        await self.app(scope, receive, send)
+
+
+# ==================== LINHA DE COMANDO ====================
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Perfil de importação dos routers da aplicação")
+    parser.add_argument("app_module", nargs="?", default="server", help="módulo da aplicação (server, enhanced_server)")
+    parser.add_argument("--json", action="store_true", help="saída JSON em vez de TSV")
+    args = parser.parse_args(argv)
+
+    os.environ["ROUTER_LOADING"] = "eager"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+
+    async def import_app():
+        # Como no uvicorn, a aplicação é importada com o event loop em execução
+        importlib.import_module(args.app_module)
+
+    asyncio.run(import_app())
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    from router_loader import loaders as app_loaders
+    for loader in app_loaders:
+        if args.json:
+            print(json.dumps({"app_import_ms": total_ms, **loader.profile()}, ensure_ascii=False, default=str))
+        else:
+            print(loader.profile_csv(delimiter="\t"), end="")
+    if not args.json:
+        print(f"# {args.app_module}: {total_ms} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
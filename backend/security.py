@@ -146,6 +146,9 @@ def validate_password_strength(password: str) -> tuple[bool, str]:
     
     return True, "Senha forte"
 
+# Papéis com acesso às rotas administrativas (/api/admin/*)
+ADMIN_ROLES = ["super_admin", "administrator"]
+
 # RBAC - Papéis e permissões
 ROLES = {
     "super_admin": {
@@ -244,7 +247,7 @@ async def get_current_user(authorization: str = Header(None)) -> Dict[str, Any]:
     
     return payload
 
-async def require_role(required_roles: list[str]):
+def require_role(required_roles: list[str]):
     """
     Dependency para verificar papel do usuário
     Uso: user = Depends(require_role(["administrator", "perito"]))
@@ -259,7 +262,7 @@ async def require_role(required_roles: list[str]):
     
     return role_checker
 
-async def require_permission(permission: str):
+def require_permission(permission: str):
     """
     Dependency para verificar permissão específica
     Uso: user = Depends(require_permission("cases.delete"))
@@ -1,7 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Depends
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+import mongo_registry
+from router_loader import LazyRouterLoader, RouterSpec
+from security import ADMIN_ROLES, require_role
 import os
 import logging
 from pathlib import Path
@@ -73,7 +77,7 @@ validate_env()
 # MongoDB connection com tratamento de erro
 try:
     mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
+    client = get_client(mongo_url)
     db = client[os.environ['DB_NAME']]
     logger.info(f"✅ MongoDB conectado: {os.environ['DB_NAME']}")
 except Exception as e:
@@ -636,6 +640,18 @@ async def get_admin_statistics():
         "unread_messages": unread_messages
     }
 
+@api_router.get("/admin/indexes", dependencies=[Depends(require_role(ADMIN_ROLES))])
+async def get_index_report():
+    """Índices do manifesto ausentes, índices sem uso ($indexStats) e coleções sem índices"""
+    return await mongo_registry.index_report()
+
+@api_router.get("/admin/startup-profile", dependencies=[Depends(require_role(ADMIN_ROLES))])
+async def get_startup_profile(formato: str = "json"):
+    """Tempo de importação, variação de memória e falhas de cada módulo de router"""
+    if formato in ("csv", "tsv"):
+        return PlainTextResponse(lazy_routers.profile_csv(delimiter="," if formato == "csv" else "\t"))
+    return lazy_routers.profile()
+
 # Appointment Management
 @api_router.put("/appointments/{appointment_id}/status")
 async def update_appointment_status(appointment_id: str, status: str):
@@ -668,192 +684,37 @@ async def get_client_appointments(client_id: str):
     
     return appointments
 
-# Import and include advanced features
-try:
-    from advanced_features import advanced_router
-    app.include_router(advanced_router)
-    logger.info("✅ Advanced features loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ Advanced features not available: {e}")
-
-# Import and include advanced integrations
-try:
-    from advanced_integrations import integrations_router
-    app.include_router(integrations_router)
-    logger.info("✅ Advanced integrations loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ Advanced integrations not available: {e}")
-
-# Import and include Perícia & Investigação modules (CISAI-Forense 3.0)
-logger.info("🔍 Loading CISAI-Forense 3.0 modules...")
-modules_loaded = 0
-try:
-    from modules.forensics_digital import router as forensics_digital_router
-    app.include_router(forensics_digital_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ forensics_digital module error: {e}")
-
-try:
-    from modules.forensics_advanced import router as forensics_advanced_router
-    app.include_router(forensics_advanced_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ forensics_advanced module error: {e}")
-
-try:
-    from modules.telephony_interceptions import router as telephony_router
-    app.include_router(telephony_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ telephony_interceptions module error: {e}")
-
-try:
-    from modules.telematics_interceptions import router as telematics_router
-    app.include_router(telematics_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ telematics_interceptions module error: {e}")
-
-try:
-    from modules.data_extraction import router as data_extraction_router
-    app.include_router(data_extraction_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ data_extraction module error: {e}")
-
-try:
-    from modules.data_extraction_advanced import router as data_extraction_adv_router
-    app.include_router(data_extraction_adv_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ data_extraction_advanced module error: {e}")
-
-try:
-    from modules.erbs_analysis import router as erbs_analysis_router
-    app.include_router(erbs_analysis_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ erbs_analysis module error: {e}")
-
-try:
-    from modules.erbs_radiobase import router as erbs_radiobase_router
-    app.include_router(erbs_radiobase_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ erbs_radiobase module error: {e}")
-
-try:
-    from modules.erbs_advanced import router as erbs_advanced_router
-    app.include_router(erbs_advanced_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ erbs_advanced module error: {e}")
-
-try:
-    from modules.erbs_geospatial import router as erbs_geospatial_router
-    app.include_router(erbs_geospatial_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ erbs_geospatial module error: {e}")
-
-try:
-    from modules.iped_integration import router as iped_router
-    app.include_router(iped_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ iped_integration module error: {e}")
-
-try:
-    from modules.evidence_processing import router as evidence_processing_router
-    app.include_router(evidence_processing_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ evidence_processing module error: {e}")
-
-try:
-    from modules.custody_chain import router as custody_chain_router
-    app.include_router(custody_chain_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ custody_chain module error: {e}")
-
-try:
-    from modules.processing_advanced import router as processing_advanced_router
-    app.include_router(processing_advanced_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ processing_advanced module error: {e}")
-
-try:
-    from modules.evidence_advanced import router as evidence_advanced_router
-    app.include_router(evidence_advanced_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ evidence_advanced module error: {e}")
-
-try:
-    from modules.evidence_ai import router as evidence_ai_router
-    app.include_router(evidence_ai_router)
-    modules_loaded += 1
-except ImportError as e:
-    logger.error(f"⚠️ evidence_ai module error: {e}")
-
-# Import Análise Processual Profissional
-try:
-    from modules.analise_processual import router as analise_processual_router
-    app.include_router(analise_processual_router)
-    modules_loaded += 1
-    logger.info("✅ Análise Processual Profissional loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ analise_processual module error: {e}")
-
-# Import Forensics Enhanced
-try:
-    from forensics_enhanced import forensics_enhanced_router
-    app.include_router(forensics_enhanced_router)
-    modules_loaded += 1
-    logger.info("✅ Forensics Enhanced loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ forensics_enhanced module error: {e}")
-
-# Import Gestão de Processos
-try:
-    from modules.gestao_processos import router as gestao_processos_router
-    app.include_router(gestao_processos_router)
-    modules_loaded += 1
-    logger.info("✅ Gestão de Processos loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ gestao_processos module error: {e}")
-
-# Import Intelligence & OSINT HyperSuite
-try:
-    from intelligence_osint_suite import router as intelligence_router
-    app.include_router(intelligence_router)
-    modules_loaded += 1
-    logger.info("✅ Intelligence & OSINT HyperSuite loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ intelligence_osint_suite module error: {e}")
-
-# Import Integração com Tribunais
-try:
-    from modules.integracao_tribunais import router as tribunais_router
-    app.include_router(tribunais_router)
-    modules_loaded += 1
-    logger.info("✅ Integração com Tribunais loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ integracao_tribunais module error: {e}")
-
-# Import Dosimetria Penal
-try:
-    from modules.dosimetria_penal import router as dosimetria_router
-    app.include_router(dosimetria_router)
-    modules_loaded += 1
-    logger.info("✅ Dosimetria Penal loaded successfully")
-except ImportError as e:
-    logger.error(f"⚠️ dosimetria_penal module error: {e}")
-
-logger.info(f"✅ CISAI-Forense 3.0: {modules_loaded}/22 modules loaded successfully")
+# Routers dos módulos: importados sob demanda (router_loader), na ordem abaixo
+ROUTER_SPECS = [
+    RouterSpec("advanced_features", "advanced_router", ["/api/advanced"]),
+    RouterSpec("advanced_integrations", "integrations_router", ["/api/integrations"]),
+
+    # Perícia & Investigação (CISAI-Forense 3.0)
+    RouterSpec("modules.forensics_digital", prefixes=["/api/forensics/digital"]),
+    RouterSpec("modules.forensics_advanced", prefixes=["/api/forensics/advanced"]),
+    RouterSpec("modules.telephony_interceptions", prefixes=["/api/telephony"]),
+    RouterSpec("modules.telematics_interceptions", prefixes=["/api/telematics"]),
+    RouterSpec("modules.data_extraction", prefixes=["/api/extraction"]),
+    RouterSpec("modules.data_extraction_advanced", prefixes=["/api/extraction/advanced"]),
+    RouterSpec("modules.erbs_analysis", prefixes=["/api/erbs"]),
+    RouterSpec("modules.erbs_radiobase", prefixes=["/api/erbs/radiobase"]),
+    RouterSpec("modules.erbs_advanced", prefixes=["/api/erbs/advanced"]),
+    RouterSpec("modules.erbs_geospatial", prefixes=["/api/geo/erbs"]),
+    RouterSpec("modules.iped_integration", prefixes=["/api/iped"]),
+    RouterSpec("modules.evidence_processing", prefixes=["/api/evidence"]),
+    RouterSpec("modules.custody_chain", prefixes=["/api/custody"]),
+    RouterSpec("modules.processing_advanced", prefixes=["/api/processing/advanced"]),
+    RouterSpec("modules.evidence_advanced", prefixes=["/api/processing/evidence-advanced"]),
+    RouterSpec("modules.evidence_ai", prefixes=["/api/evidence-ai"]),
+    RouterSpec("modules.analise_processual", prefixes=["/api/processo"]),
+    RouterSpec("forensics_enhanced", "forensics_enhanced_router", ["/api/forensics/enhanced"]),
+    RouterSpec("modules.gestao_processos", prefixes=["/api/athena"]),
+    RouterSpec("modules.integracao_tribunais", prefixes=["/api/tribunais"]),
+    RouterSpec("modules.dosimetria_penal", prefixes=["/api/dosimetria"]),
+]
+
+lazy_routers = LazyRouterLoader(app, ROUTER_SPECS)
+logger.info(f"🔍 CISAI-Forense 3.0: {len(ROUTER_SPECS)} módulos registrados (modo {lazy_routers.mode})")
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -892,11 +753,52 @@ async def pericia_health():
     return {
         "system": "CISAI-Forense 3.0",
         "total_modules": 16,
-        "modules_loaded": modules_loaded,
+        "modules_loaded": lazy_routers.loaded_count,
         "status": "operational",
         "modules": modules
     }
 
+@app.on_event("startup")
+async def bootstrap_indexes():
+    try:
+        await mongo_registry.ensure_indexes()
+    except Exception as e:
+        logger.error(f"❌ Falha ao aplicar manifesto de índices: {e}")
+
+@app.on_event("startup")
+async def start_background_services():
+    import job_queue
+    if job_queue.ensure_started():
+        logger.info(f"⚙️ Worker da fila de jobs ativo na API (concorrência {job_queue.INPROCESS_CONCURRENCY})")
+    else:
+        logger.info("⚙️ Fila de jobs atendida por workers dedicados (python job_queue.py)")
+    import diario_sync
+    if diario_sync.AUTOSTART:
+        await diario_sync.ensure_started()
+        logger.info(f"📰 Sincronização de diários ativa (a cada {diario_sync.SYNC_INTERVAL_SECONDS}s)")
+    import mail_outbox
+    if mail_outbox.AUTOSTART:
+        await mail_outbox.ensure_started()
+        logger.info("📧 Caixa de saída de e-mails ativa")
+    import alert_scheduler
+    if alert_scheduler.AUTOSTART:
+        try:
+            await alert_scheduler.ensure_started()
+            logger.info("⏰ Agendador de alertas de prazos ativo")
+        except Exception as e:
+            logger.error(f"❌ Falha ao iniciar o agendador de alertas: {e}")
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    import job_queue
+    import diario_sync
+    import mail_outbox
+    import alert_scheduler
+    await job_queue.inprocess_worker.stop()
+    await diario_sync.agendador.stop()
+    await mail_outbox.worker.stop()
+    await alert_scheduler.scheduler.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    mongo_registry.close_all()
\ No newline at end of file
@@ -8,12 +8,14 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import correcao_monetaria
 
 router = APIRouter(prefix="/api/fees", tags=["Smart Fees"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class FeeCalculation(BaseModel):
@@ -24,6 +26,15 @@ class FeeCalculation(BaseModel):
     hourly_rate: float
     success_fee: Optional[float] = None
 
+class OverdueInstallments(BaseModel):
+    installments: List[Dict[str, Any]]  # [{'id': 'x', 'amount': 1500, 'due': '2024-03-10'}, ...]
+    index: str = 'IPCA'
+    reference_date: Optional[str] = None
+    late_interest_monthly: float = 0.01
+    late_fee_percent: float = 2.0
+    # Estima meses sem série histórica com a taxa de referência em vez de recusar
+    allow_reference_rates: bool = False
+
 class FeeSplit(BaseModel):
     fee_id: str
     splits: List[Dict[str, Any]]  # [{'lawyer_id': 'x', 'percentage': 40}, ...]
@@ -152,6 +163,32 @@ async def split_fee(split: FeeSplit):
     except:
         raise HTTPException(status_code=400, detail="ID inválido")
 
+@router.post("/installments/correct")
+async def correct_overdue_installments(data: OverdueInstallments):
+    """Atualiza parcelas de honorários em atraso (correção + juros + multa)"""
+    reference_date = data.reference_date or datetime.now().date().isoformat()
+    try:
+        result = correcao_monetaria.corrigir_parcelas(
+            [{'id': i.get('id'), 'valor': i['amount'], 'vencimento': i['due']} for i in data.installments],
+            data.index,
+            reference_date,
+            juros_mensal=data.late_interest_monthly,
+            multa_percentual=data.late_fee_percent,
+            exigir_serie=not data.allow_reference_rates
+        )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f'Parcelas inválidas: {e}')
+    
+    return {
+        'success': True,
+        'reference_date': reference_date,
+        'index': result['indice'],
+        'index_coverage': result['cobertura'],
+        'total_original': result['soma_original'],
+        'total_updated': result['soma_total'],
+        'installments': result['parcelas']
+    }
+
 @router.post("/generate-invoice")
 async def generate_invoice(fee_id: str, client_info: Dict[str, Any]):
     """Gera nota fiscal / recibo"""
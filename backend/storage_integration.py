@@ -1,20 +1,24 @@
 """
 AP ELITE ATHENA - Cloud Storage Integration
 Local + Prepared for AWS S3/Azure/GCP
+Arquivos locais em blob_store (endereçado por SHA-256, deduplicado),
+downloads com Range e If-None-Match.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional
 import uuid
 import os
-import shutil
 from pathlib import Path
 
+import blob_store
+from file_streaming import range_file_response
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client.ap_elite
 
 security = HTTPBearer()
@@ -49,6 +53,7 @@ async def upload_file(
     file: UploadFile = File(...),
     category: str = "general",
     description: str = "",
+    case_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Upload file to storage"""
@@ -65,32 +70,31 @@ async def upload_file(
             detail=f"File type not allowed. Allowed: {', '.join(config['allowed_extensions'])}"
         )
     
-    # Generate unique filename
+    # Save file (conteúdo idêntico já armazenado só ganha mais uma referência)
     file_id = str(uuid.uuid4())
-    filename = f"{file_id}.{file_ext}"
-    file_path = UPLOAD_DIR / filename
-    
-    # Save file
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        blob = await blob_store.put_stream(file, max_size=config["max_file_size"], mime_type=file.content_type)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    blob_store.ensure_gc_started()
     
-    # Get file size
-    file_size = os.path.getsize(file_path)
+    file_size = blob.size
     
     # Save metadata to database
     file_metadata = {
         "id": file_id,
         "original_filename": file.filename,
-        "stored_filename": filename,
-        "file_path": str(file_path),
+        "stored_filename": blob.sha256,
+        "file_path": str(blob.path),
+        "sha256": blob.sha256,
         "file_size": file_size,
         "file_type": file_ext,
         "mime_type": file.content_type,
         "category": category,
         "description": description,
+        "case_id": case_id,
         "uploaded_by": current_user.get("email"),
         "uploaded_at": datetime.now(timezone.utc).isoformat(),
         "storage_type": config["type"]
@@ -103,7 +107,9 @@ async def upload_file(
         "file_id": file_id,
         "filename": file.filename,
         "size": file_size,
-        "url": f"/api/storage/download/{file_id}"
+        "sha256": blob.sha256,
+        "deduplicated": blob.deduplicated,
+        "url": f"/api/storage/files/{file_id}"
     }
 
 @storage_router.get("/download/{file_id}")
@@ -127,9 +133,29 @@ async def download_file(file_id: str, current_user: dict = Depends(get_current_u
         "file_id": file_id,
         "filename": file_metadata["original_filename"],
         "file_path": str(file_path),
+        "sha256": file_metadata.get("sha256"),
         "download_url": f"/api/storage/files/{file_id}"
     }
 
+@storage_router.get("/files/{file_id}")
+async def stream_file(file_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Conteúdo do arquivo em streaming (Range para retomada/parcial, ETag = SHA-256)"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    file_metadata = await db.file_storage.find_one({"id": file_id}, {"_id": 0})
+    if not file_metadata:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return range_file_response(
+        request,
+        file_metadata["file_path"],
+        media_type=file_metadata.get("mime_type") or "application/octet-stream",
+        filename=file_metadata["original_filename"],
+        etag=file_metadata.get("sha256"),
+        extra_headers={"Cache-Control": "private, max-age=0, must-revalidate"}
+    )
+
 @storage_router.get("/list")
 async def list_files(
     category: Optional[str] = None,
@@ -160,10 +186,14 @@ async def delete_file(file_id: str, current_user: dict = Depends(get_current_use
     if not file_metadata:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Delete physical file
-    file_path = Path(file_metadata["file_path"])
-    if file_path.exists():
-        os.remove(file_path)
+    # Blobs compartilhados perdem uma referência (a coleta remove os sem uso);
+    # arquivos anteriores ao blob_store são apagados diretamente
+    if file_metadata.get("sha256"):
+        await blob_store.release(file_metadata["sha256"])
+    else:
+        file_path = Path(file_metadata["file_path"])
+        if file_path.exists():
+            os.remove(file_path)
     
     # Delete metadata
     await db.file_storage.delete_one({"id": file_id})
@@ -189,9 +219,20 @@ async def get_storage_stats(current_user: dict = Depends(get_current_user)):
         count = await db.file_storage.count_documents({"category": cat})
         by_category[cat] = count
     
+    blobs = await blob_store.stats()
+    
     return {
         "total_files": total_files,
         "total_size_bytes": total_size,
         "total_size_mb": round(total_size / (1024 * 1024), 2),
-        "by_category": by_category
-    }
\ No newline at end of file
+        "by_category": by_category,
+        "deduplication": blobs
+    }
+
+@storage_router.post("/gc")
+async def collect_storage_garbage(current_user: dict = Depends(get_current_user)):
+    """Remove blobs sem referência (após a carência) e arquivos órfãos"""
+    if not current_user or current_user.get("role") != "administrator":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await blob_store.collect_garbage()
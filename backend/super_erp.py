@@ -5,7 +5,7 @@ AP ELITE ATHENA - Sistema ERP Completo
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -24,10 +24,12 @@ import base64
 from pydantic import BaseModel
 import aiofiles
 from pathlib import Path
+from realtime_gateway import ConnectionManager
+import dashboard_rollups
 
 # Environment
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Google Maps
@@ -57,28 +59,8 @@ security = HTTPBearer(auto_error=False)
 # Router
 super_router = APIRouter(prefix="/api/athena")
 
-# WebSocket connections manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-    
-    async def connect(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-    
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-    
-    async def send_personal_message(self, message: str, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
-    
-    async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
-
-manager = ConnectionManager()
+# WebSocket connections manager (bounded per-socket queues, cross-worker fan-out and presence)
+manager = ConnectionManager(db)
 
 # ==================== E2E ENCRYPTION ====================
 
@@ -299,6 +281,7 @@ async def create_client(client: ClientCreate, current_user: dict = Depends(get_c
     client_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.clients.insert_one(client_dict)
+    await dashboard_rollups.notify_write("clients", client_dict)
     
     return {"id": client_dict["id"], "message": "Client created successfully"}
 
@@ -426,16 +409,48 @@ async def get_messages(current_user: dict = Depends(get_current_user)):
     return {"messages": messages}
 
 @super_router.websocket("/ws/chat/{user_id}")
-async def websocket_chat(websocket: WebSocket, user_id: str):
-    """WebSocket for real-time chat"""
-    await manager.connect(websocket, user_id)
+async def websocket_chat(websocket: WebSocket, user_id: str, topics: Optional[str] = None):
+    """
+    WebSocket for real-time chat.
+    Optional ?topics=case:123,conversation:abc; control messages
+    {"action": "subscribe"|"unsubscribe", "topic"} and
+    {"action": "publish", "topic", "message"}. Other text is broadcast.
+    """
+    initial_topics = [t.strip() for t in (topics or "").split(",") if t.strip()]
+    connection = await manager.connect(websocket, user_id, initial_topics)
     try:
         while True:
             data = await websocket.receive_text()
+            
+            try:
+                command = json.loads(data)
+            except ValueError:
+                command = None
+            
+            if isinstance(command, dict) and command.get("action") in ("subscribe", "unsubscribe", "publish"):
+                topic = command.get("topic")
+                if not topic:
+                    connection.enqueue(json.dumps({"type": "error", "detail": "topic required"}))
+                    continue
+                if command["action"] == "subscribe":
+                    await manager.subscribe(connection, topic)
+                elif command["action"] == "unsubscribe":
+                    await manager.unsubscribe(connection, topic)
+                else:
+                    await manager.publish(topic, json.dumps({
+                        "type": "topic_message",
+                        "topic": topic,
+                        "user_id": user_id,
+                        "message": command.get("message")
+                    }))
+                continue
+            
             # Broadcast message
             await manager.broadcast(f"User {user_id}: {data}")
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
+    finally:
+        await manager.disconnect(connection)
 
 # ==================== MODULE 5: CALENDÁRIO CORPORATIVO ====================
 
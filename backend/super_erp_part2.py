@@ -930,7 +930,13 @@ async def get_online_status(current_user: dict = Depends(get_current_user)):
         {"_id": 0, "id": 1}
     ).to_list(100)
     
-    return {"onlineUsers": [u["id"] for u in online_users]}
+    # Users with an active WebSocket on any worker
+    connected = await manager.online_users()
+    
+    return {
+        "onlineUsers": sorted(set(u["id"] for u in online_users) | set(connected)),
+        "connectedUsers": connected
+    }
 
     
     await db.interceptions.insert_one(interception)
@@ -11,6 +11,7 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 import matplotlib.pyplot as plt
 import io
+import dashboard_rollups
 
 # ==================== MODULE 15: ANÁLISE PROCESSUAL ====================
 
@@ -281,6 +282,7 @@ async def create_financial_transaction(
     }
     
     await db.financial_records.insert_one(transaction)
+    await dashboard_rollups.notify_write("financial_records", transaction)
     
     return {"transaction_id": transaction["id"], "message": "Transaction created successfully"}
 
@@ -8,18 +8,17 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from ai_orchestrator import ai_orchestrator
-from docx import Document
-from docx.shared import Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-import io
+import aiofiles
+import json
+import document_engine
 
 router = APIRouter(prefix="/api/templates", tags=["Document Templates"])
 
 # MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 TEMPLATES_DIR = "/app/backend/templates"
@@ -234,36 +233,46 @@ async def generate_document(request: GenerateDocumentRequest):
         missing_fields = set(template_info['fields']) - set(request.case_data.keys())
         
         if missing_fields:
-            prompt = f"""
-            Complete os seguintes campos para um documento {template_info['name']}:
-            
-            Dados fornecidos:
-            {request.case_data}
-            
-            Campos a completar:
-            {list(missing_fields)}
-            
-            Forneça sugestões apropriadas e profissionais para cada campo faltante,
-            considerando o contexto jurídico e investigativo.
-            
-            Responda em formato JSON com os campos faltantes.
-            """
-            
-            ai_result = await ai_orchestrator.analyze_with_provider(
-                request.ai_provider,
-                prompt,
-                context=f"Geração de documento: {template_info['name']}"
+            cache_key = document_engine.chave_sugestao(
+                request.template_id, request.case_data, missing_fields, request.ai_provider
             )
+            ai_suggestions = await document_engine.obter_sugestao(cache_key)
             
-            if ai_result['success']:
-                # Tentar parsear resposta da IA
-                try:
-                    import json
-                    ai_suggestions = json.loads(ai_result['response'])
-                    request.case_data.update(ai_suggestions)
-                except:
-                    # Se não for JSON válido, adicionar como texto
-                    request.case_data['ai_suggestions'] = ai_result['response']
+            if ai_suggestions is None:
+                prompt = f"""
+                Complete os seguintes campos para um documento {template_info['name']}:
+                
+                Dados fornecidos:
+                {request.case_data}
+                
+                Campos a completar:
+                {sorted(missing_fields)}
+                
+                Forneça sugestões apropriadas e profissionais para cada campo faltante,
+                considerando o contexto jurídico e investigativo.
+                
+                Responda em formato JSON com os campos faltantes.
+                """
+                
+                ai_result = await ai_orchestrator.analyze_with_provider(
+                    request.ai_provider,
+                    prompt,
+                    context=f"Geração de documento: {template_info['name']}"
+                )
+                
+                if ai_result['success']:
+                    # Tentar parsear resposta da IA
+                    try:
+                        ai_suggestions = json.loads(ai_result['response'])
+                    except (ValueError, TypeError):
+                        # Se não for JSON válido, adicionar como texto
+                        ai_suggestions = {'ai_suggestions': ai_result['response']}
+                    if not isinstance(ai_suggestions, dict):
+                        ai_suggestions = {'ai_suggestions': ai_result['response']}
+                    await document_engine.salvar_sugestao(cache_key, ai_suggestions)
+            
+            if ai_suggestions:
+                request.case_data.update(ai_suggestions)
     
     # Gerar conteúdo do documento com IA
     prompt = f"""
@@ -290,27 +299,15 @@ async def generate_document(request: GenerateDocumentRequest):
     if not content_result['success']:
         raise HTTPException(status_code=500, detail="Erro ao gerar conteúdo do documento")
     
-    # Criar documento Word
-    doc = Document()
-    
-    # Título
-    title = doc.add_heading(template_info['name'], level=0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Adicionar conteúdo gerado pela IA
-    doc.add_paragraph(content_result['response'])
-    
-    # Adicionar rodapé com informações
-    section = doc.sections[0]
-    footer = section.footer
-    footer_para = footer.paragraphs[0]
-    footer_para.text = f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} | AP Elite - Sistema ATHENA"
-    footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    # Criar documento Word a partir do esqueleto pré-compilado (título e rodapé)
+    skeleton = document_engine.obter_esqueleto(template_info['name'])
+    docx_bytes = skeleton.render(content_result['response'], document_engine.rodape_padrao())
     
     # Salvar documento
     filename = f"{request.template_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
     filepath = os.path.join(GENERATED_DIR, filename)
-    doc.save(filepath)
+    async with aiofiles.open(filepath, 'wb') as f:
+        await f.write(docx_bytes)
     
     # Salvar registro no banco
     doc_record = {
@@ -352,7 +349,7 @@ async def download_document(document_id: str):
     
     return FileResponse(
         doc['filepath'],
-        media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        media_type=document_engine.DOCX_MEDIA_TYPE,
         filename=doc['filename']
     )
 
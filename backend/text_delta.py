@@ -0,0 +1,210 @@
+"""
+Deltas de Texto (Operational Transformation)
+Operações compactas sobre texto no formato:
+  inteiro positivo -> manter N caracteres
+  string           -> inserir texto
+  inteiro negativo -> remover N caracteres
+Permite aplicar, compor, transformar edições concorrentes e gerar delta entre versões.
+"""
+
+from typing import List, Tuple, Union
+
+Op = Union[int, str]
+
+
+def _push(ops: List[Op], op: Op):
+    """Acrescenta op mesclando com a anterior quando do mesmo tipo"""
+    if op == 0 or op == "":
+        return
+    if ops:
+        last = ops[-1]
+        if isinstance(op, str) and isinstance(last, str):
+            ops[-1] = last + op
+            return
+        if isinstance(op, int) and isinstance(last, int) and (op > 0) == (last > 0):
+            ops[-1] = last + op
+            return
+        # Inserção antes de remoção (forma canônica)
+        if isinstance(op, str) and isinstance(last, int) and last < 0:
+            if len(ops) > 1 and isinstance(ops[-2], str):
+                ops[-2] = ops[-2] + op
+            else:
+                ops.insert(len(ops) - 1, op)
+            return
+    ops.append(op)
+
+
+def normalize(ops: List[Op]) -> List[Op]:
+    result: List[Op] = []
+    for op in ops:
+        if isinstance(op, bool) or not isinstance(op, (int, str)):
+            raise ValueError(f"Operação inválida: {op!r}")
+        _push(result, op)
+    # Retenção final é implícita
+    if result and isinstance(result[-1], int) and result[-1] > 0:
+        result.pop()
+    return result
+
+
+def base_length(ops: List[Op]) -> int:
+    return sum(abs(op) for op in ops if isinstance(op, int))
+
+
+def target_length(ops: List[Op]) -> int:
+    return sum(op if isinstance(op, int) and op > 0 else len(op) if isinstance(op, str) else 0 for op in ops)
+
+
+def apply(text: str, ops: List[Op]) -> str:
+    """Aplica o delta ao texto; retenção final implícita até o fim do texto"""
+    if base_length(ops) > len(text):
+        raise ValueError("Delta incompatível com o tamanho do documento")
+    parts = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(text[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def _pad(ops: List[Op], length: int) -> List[Op]:
+    """Explicita a retenção final para que o delta cubra `length` caracteres"""
+    ops = list(ops)
+    missing = length - base_length(ops)
+    if missing < 0:
+        raise ValueError("Delta incompatível com o tamanho do documento")
+    if missing:
+        ops.append(missing)
+    return ops
+
+
+def transform(a: List[Op], b: List[Op], length: int) -> Tuple[List[Op], List[Op]]:
+    """
+    Transforma deltas concorrentes a e b (ambos sobre um texto de `length` caracteres)
+    em (a', b') tais que apply(apply(s, a), b') == apply(apply(s, b), a').
+    Em empate de inserção na mesma posição, a tem precedência.
+    """
+    a = _pad(a, length)
+    b = _pad(b, length)
+    a_prime: List[Op] = []
+    b_prime: List[Op] = []
+    i = j = 0
+    op1 = a[0] if a else None
+    op2 = b[0] if b else None
+
+    def next_a():
+        nonlocal i
+        i += 1
+        return a[i] if i < len(a) else None
+
+    def next_b():
+        nonlocal j
+        j += 1
+        return b[j] if j < len(b) else None
+
+    while op1 is not None or op2 is not None:
+        if isinstance(op1, str):
+            _push(a_prime, op1)
+            _push(b_prime, len(op1))
+            op1 = next_a()
+            continue
+        if isinstance(op2, str):
+            _push(a_prime, len(op2))
+            _push(b_prime, op2)
+            op2 = next_b()
+            continue
+        if op1 is None or op2 is None:
+            raise ValueError("Deltas concorrentes com tamanhos de base diferentes")
+
+        if op1 > 0 and op2 > 0:
+            m = min(op1, op2)
+            _push(a_prime, m)
+            _push(b_prime, m)
+        elif op1 < 0 and op2 < 0:
+            m = min(-op1, -op2)
+            op1, op2 = op1 + m, op2 + m
+            op1 = op1 if op1 else next_a()
+            op2 = op2 if op2 else next_b()
+            continue
+        elif op1 < 0:
+            m = min(-op1, op2)
+            _push(a_prime, -m)
+        else:
+            m = min(op1, -op2)
+            _push(b_prime, -m)
+
+        op1 = (op1 - m if op1 > 0 else op1 + m) or next_a()
+        op2 = (op2 - m if op2 > 0 else op2 + m) or next_b()
+
+    return normalize(a_prime), normalize(b_prime)
+
+
+def compose(a: List[Op], b: List[Op], length: int) -> List[Op]:
+    """Combina a seguido de b (a sobre texto de `length` caracteres) em um único delta"""
+    a = _pad(a, length)
+    b = _pad(b, target_length(a))
+    result: List[Op] = []
+    i = j = 0
+    op1 = a[0] if a else None
+    op2 = b[0] if b else None
+
+    def next_a():
+        nonlocal i
+        i += 1
+        return a[i] if i < len(a) else None
+
+    def next_b():
+        nonlocal j
+        j += 1
+        return b[j] if j < len(b) else None
+
+    while op1 is not None or op2 is not None:
+        if isinstance(op1, int) and op1 < 0:
+            _push(result, op1)
+            op1 = next_a()
+            continue
+        if isinstance(op2, str):
+            _push(result, op2)
+            op2 = next_b()
+            continue
+        if op1 is None or op2 is None:
+            raise ValueError("Deltas incompatíveis para composição")
+
+        if isinstance(op1, str):
+            if op2 > 0:
+                m = min(len(op1), op2)
+                _push(result, op1[:m])
+                op1 = op1[m:] or next_a()
+                op2 = (op2 - m) or next_b()
+            else:
+                m = min(len(op1), -op2)
+                op1 = op1[m:] or next_a()
+                op2 = (op2 + m) or next_b()
+        else:
+            m = min(op1, abs(op2))
+            _push(result, m if op2 > 0 else -m)
+            op1 = (op1 - m) or next_a()
+            op2 = (op2 - m if op2 > 0 else op2 + m) or next_b()
+
+    return normalize(result)
+
+
+def diff(old: str, new: str) -> List[Op]:
+    """Delta de old para new pelo trecho alterado (prefixo/sufixo comuns preservados), O(n)"""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    ops: List[Op] = []
+    _push(ops, prefix)
+    _push(ops, new[prefix:len(new) - suffix])
+    _push(ops, -(len(old) - prefix - suffix))
+    return normalize(ops)
@@ -5,7 +5,7 @@ Sistema completo de gerenciamento de usuários com permissões por níveis
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
 from datetime import datetime, timezone
 from typing import Optional, List
 import uuid
@@ -14,7 +14,7 @@ import os
 
 # Database connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = get_client(mongo_url)
 db = client[os.environ.get('DB_NAME', 'test_database')]
 
 # Security
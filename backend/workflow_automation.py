@@ -8,12 +8,14 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
+from mongo_registry import get_client
+
+import alert_scheduler
 
 router = APIRouter(prefix="/api/workflows", tags=["Workflow Automation"])
 
 MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
+client = get_client(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "test_database")]
 
 class WorkflowTemplate(BaseModel):
@@ -110,13 +112,14 @@ async def create_from_template(template_key: str, case_id: str):
     # Criar tarefas da primeira fase
     first_stage = template['stages'][0]
     for task_name in first_stage['tasks']:
-        await db.workflow_tasks.insert_one({
+        task_result = await db.workflow_tasks.insert_one({
             'workflow_id': str(result.inserted_id),
             'stage': 0,
             'title': task_name,
             'status': 'pending',
             'created_at': datetime.now().isoformat()
         })
+        await alert_scheduler.notify_change('workflow_tasks', str(task_result.inserted_id))
     
     return {
         'success': True,
@@ -183,13 +186,14 @@ async def advance_stage(workflow_id: str):
             # Criar tarefas da próxima fase
             next_stage_info = workflow['stages'][next_stage]
             for task_name in next_stage_info.get('tasks', []):
-                await db.workflow_tasks.insert_one({
+                task_result = await db.workflow_tasks.insert_one({
                     'workflow_id': workflow_id,
                     'stage': next_stage,
                     'title': task_name,
                     'status': 'pending',
                     'created_at': datetime.now().isoformat()
                 })
+                await alert_scheduler.notify_change('workflow_tasks', str(task_result.inserted_id))
             
             return {
                 'success': True,
@@ -206,17 +210,14 @@ async def advance_stage(workflow_id: str):
 async def upcoming_deadlines(days: int = 7):
     """Prazos próximos"""
     
-    deadline_date = datetime.now() + timedelta(days=days)
-    
-    cursor = db.workflow_tasks.find({
-        'status': 'pending',
-        'due_date': {'$lte': deadline_date.isoformat()}
-    }).sort('due_date', 1)
-    
-    tasks = await cursor.to_list(length=50)
+    # Servido do agendador de alertas em memória
+    await alert_scheduler.ensure_started()
     
-    for task in tasks:
-        task['id'] = str(task.pop('_id'))
+    until = datetime.now(alert_scheduler.TZ) + timedelta(days=days)
+    tasks = [
+        dict(entry.data)
+        for entry in alert_scheduler.scheduler.upcoming("workflow_tasks", until=until, limit=50)
+    ]
     
     return {
         'upcoming_deadlines': tasks,
@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+# Módulos do backend são importados pelo nome (ex.: `import file_streaming`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+try:
+    from mongomock_motor import AsyncMongoMockClient
+except ImportError:
+    AsyncMongoMockClient = None
+
+if AsyncMongoMockClient is not None:
+    # Módulos que criam `db` no import passam a usar o banco em memória
+    import mongo_registry
+
+    mongo_registry.set_client(AsyncMongoMockClient())
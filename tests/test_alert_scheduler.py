@@ -0,0 +1,30 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+import alert_scheduler
+from alert_scheduler import AlertScheduler, Entry
+
+
+def test_alerta_disparado_vai_para_o_banco_das_notificacoes():
+    vencimento = datetime.now(timezone.utc) + timedelta(days=1)
+    entrada = Entry(source="deadlines", ref_id="prazo-1", due=vencimento, title="Contestação")
+
+    async def cenario():
+        agendador = AlertScheduler()
+        await agendador._dispatch(entrada, "d-1")
+        await agendador._dispatch(entrada, "d-1")
+        notificacoes = await alert_scheduler.client.ap_elite.notifications.find(
+            {"reference_id": "prazo-1"}, {"_id": 0}
+        ).to_list(None)
+        return agendador, notificacoes
+
+    agendador, notificacoes = asyncio.run(cenario())
+
+    assert len(notificacoes) == 1
+    assert notificacoes[0]["alert"] == "d-1"
+    assert notificacoes[0]["title"] == "⚠️ D-1: Contestação"
+    assert agendador.fired == 1
@@ -0,0 +1,154 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+pytest.importorskip("PyPDF2")
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DictionaryObject, NameObject, NumberObject, StreamObject
+
+import autos_paginas
+import job_queue
+
+# JPEG 1x1; o segmento de comentário torna cada "digitalização" única
+_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAP//////////////////////////////////////////////////////////"
+    "////////////////////////////wgALCAABAAEBAREA/8QAFBABAAAAAAAAAAAAAAAAAAAAAP/aAAgBAQABPxA="
+)
+
+
+def _jpeg(marca: str) -> bytes:
+    comentario = marca.encode()
+    return _JPEG[:2] + b"\xff\xfe" + (len(comentario) + 2).to_bytes(2, "big") + comentario + _JPEG[2:]
+
+
+def _pdf_digitalizado(caminho, marcas):
+    """Páginas só com imagem e o mesmo content stream, como as de um scanner"""
+    escritor = PdfWriter()
+    for marca in marcas:
+        escritor.add_blank_page(200, 200)
+        pagina = escritor.pages[-1]
+        imagem = StreamObject()
+        imagem._data = _jpeg(marca)
+        imagem.update({
+            NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(1), NameObject("/Height"): NumberObject(1),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8), NameObject("/Filter"): NameObject("/DCTDecode"),
+        })
+        conteudo = StreamObject()
+        conteudo._data = b"q 200 0 0 200 0 0 cm /Im0 Do Q"
+        pagina[NameObject("/Contents")] = escritor._add_object(conteudo)
+        pagina[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): escritor._add_object(imagem)})
+        })
+    with open(caminho, "wb") as arquivo:
+        escritor.write(arquivo)
+    with open(caminho, "rb") as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+def _volume(tmp_path, nome, marcas):
+    caminho = tmp_path / nome
+    return {"id": nome, "filename": nome, "path": str(caminho), "sha256": _pdf_digitalizado(caminho, marcas)}
+
+
+@pytest.fixture(autouse=True)
+def _pool():
+    yield
+    autos_paginas.shutdown()
+
+
+def test_paginas_digitalizadas_tem_hashes_distintos_e_ocr_incremental(tmp_path):
+    volume = _volume(tmp_path, "vol1.pdf", ["fl1", "fl2"])
+
+    async def cenario():
+        db = autos_paginas.db
+        await db.analises_processuais.insert_one({"id": "ocr-1", "documentos": [volume]})
+        primeira = await autos_paginas.indexar_analise("ocr-1", ocr="stub")
+        paginas = await db.autos_paginas.find({"analise_id": "ocr-1"}).sort("pagina", 1).to_list(None)
+
+        # Nova digitalização só da segunda folha
+        volume["sha256"] = _pdf_digitalizado(volume["path"], ["fl1", "fl2-redigitalizada"])
+        await db.analises_processuais.update_one(
+            {"id": "ocr-1", "documentos.id": volume["id"]}, {"$set": {"documentos.$.sha256": volume["sha256"]}}
+        )
+        segunda = await autos_paginas.indexar_analise("ocr-1", ocr="stub")
+        depois = await db.autos_paginas.find({"analise_id": "ocr-1"}).sort("pagina", 1).to_list(None)
+        return primeira, paginas, segunda, depois
+
+    primeira, paginas, segunda, depois = asyncio.run(cenario())
+    assert primeira["volumes"][0]["ocr"] == 2
+    assert [p["origem"] for p in paginas] == ["ocr", "ocr"]
+    assert paginas[0]["sha256_conteudo"] != paginas[1]["sha256_conteudo"]
+    assert paginas[0]["texto"] != paginas[1]["texto"]
+    assert segunda["volumes"][0]["inalteradas"] == 1
+    assert segunda["volumes"][0]["ocr"] == 1
+    assert depois[0]["texto"] == paginas[0]["texto"]
+    assert depois[1]["texto"] != paginas[1]["texto"]
+
+
+def test_volume_anexado_durante_a_indexacao_reexecuta_o_job(tmp_path):
+    chave = "processo.indexar_paginas:ocr-2"
+
+    async def cenario():
+        db = autos_paginas.db
+        await db.analises_processuais.insert_one(
+            {"id": "ocr-2", "documentos": [_volume(tmp_path, "a.pdf", ["a1"])]}
+        )
+        job = await job_queue.enqueue("processo.indexar_paginas", {"analise_id": "ocr-2"},
+                                      dedupe_key=chave, rerun_if_running=True)
+        while True:
+            em_execucao = await job_queue.claim("teste")
+            if em_execucao["job_id"] == job["job_id"]:
+                break
+
+        # Upload durante a execução: o enqueue encontra o job rodando
+        await db.analises_processuais.update_one(
+            {"id": "ocr-2"}, {"$push": {"documentos": _volume(tmp_path, "b.pdf", ["b1", "b2"])}}
+        )
+        mesmo = await job_queue.enqueue("processo.indexar_paginas", {"analise_id": "ocr-2"},
+                                        dedupe_key=chave, rerun_if_running=True)
+        await job_queue.execute(em_execucao, "teste")
+        apos_primeira = await job_queue.get_job(job["job_id"])
+
+        await job_queue.execute(await job_queue.claim("teste"), "teste")
+        return mesmo, apos_primeira, await job_queue.get_job(job["job_id"])
+
+    mesmo, apos_primeira, final = asyncio.run(cenario())
+    assert mesmo["job_id"] == final["job_id"]
+    assert apos_primeira["status"] == "queued"
+    assert final["status"] == "completed"
+    assert final["result"]["total_paginas"] == 3
+
+
+def test_volumes_com_o_mesmo_nome_nao_se_sobrescrevem(tmp_path, monkeypatch):
+    import io
+
+    from starlette.datastructures import UploadFile
+
+    from modules import analise_processual
+
+    monkeypatch.setattr(autos_paginas, "AUTOS_DIR", str(tmp_path))
+    volumes = [_pdf_digitalizado(tmp_path / f"origem{i}.pdf", [f"vol{i}"]) for i in (1, 2)]
+
+    async def cenario():
+        await analise_processual.db.analises_processuais.insert_one({"id": "nomes-1", "responsavel": "ana"})
+        for i in (1, 2):
+            conteudo = (tmp_path / f"origem{i}.pdf").read_bytes()
+            await analise_processual.upload_documento(
+                "nomes-1", UploadFile(file=io.BytesIO(conteudo), filename="autos.pdf"), "processo"
+            )
+        analise = await analise_processual.db.analises_processuais.find_one({"id": "nomes-1"})
+        return analise["documentos"]
+
+    documentos = asyncio.run(cenario())
+
+    assert [d["sha256"] for d in documentos] == volumes
+    assert documentos[0]["path"] != documentos[1]["path"]
+    for documento in documentos:
+        with open(documento["path"], "rb") as arquivo:
+            assert hashlib.sha256(arquivo.read()).hexdigest() == documento["sha256"]
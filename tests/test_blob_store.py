@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+pytest.importorskip("aiofiles")
+
+import blob_store
+
+
+class _Upload:
+    def __init__(self, dados: bytes):
+        self._buffer = io.BytesIO(dados)
+
+    async def read(self, tamanho: int) -> bytes:
+        return self._buffer.read(tamanho)
+
+
+@pytest.fixture
+def loja(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", tmp_path / "blobs")
+    asyncio.run(blob_store.db.blobs.delete_many({}))
+    return blob_store
+
+
+def _envelhecer(caminho, segundos=7200):
+    antigo = time.time() - segundos
+    os.utime(caminho, (antigo, antigo))
+
+
+def test_deduplica_e_coleta_sem_referencia(loja):
+    async def cenario():
+        primeiro = await loja.put_stream(_Upload(b"laudo"))
+        segundo = await loja.put_stream(_Upload(b"laudo"))
+        await loja.release(primeiro.sha256)
+        parcial = await loja.collect_garbage(grace_seconds=0)
+        await loja.release(primeiro.sha256)
+        final = await loja.collect_garbage(grace_seconds=0)
+        return primeiro, segundo, parcial, final, await loja.db.blobs.count_documents({})
+
+    primeiro, segundo, parcial, final, registros = asyncio.run(cenario())
+
+    assert primeiro.sha256 == hashlib.sha256(b"laudo").hexdigest()
+    assert segundo.deduplicated and not primeiro.deduplicated
+    assert parcial["removed"] == 0
+    assert final["removed"] == 1 and final["freed_bytes"] == 5
+    assert not primeiro.path.exists() and registros == 0
+
+
+def test_gc_de_coleta_em_andamento_nao_e_orfao(loja):
+    async def cenario():
+        blob = await loja.put_stream(_Upload(b"evidencia"))
+        # Outro processo acabou de renomear o blob para .gc (mtime antigo, ctime agora)
+        doomed = blob.path.with_name(blob.path.name + ".gc")
+        os.replace(blob.path, doomed)
+        _envelhecer(doomed)
+        orfao = loja.blob_path("f" * 64)
+        orfao.parent.mkdir(parents=True, exist_ok=True)
+        orfao.write_bytes(b"sem registro")
+        _envelhecer(orfao)
+        resultado = await loja.collect_garbage(grace_seconds=0)
+        return doomed, orfao, resultado
+
+    doomed, orfao, resultado = asyncio.run(cenario())
+
+    assert doomed.exists()
+    assert not orfao.exists()
+    assert resultado["orphans"] == 1
+
+
+def test_sobras_antigas_de_coleta_interrompida(loja, monkeypatch):
+    async def cenario():
+        referenciado = await loja.put_stream(_Upload(b"ainda em uso"))
+        liberado = await loja.put_stream(_Upload(b"descartado"))
+        await loja.db.blobs.delete_one({"_id": liberado.sha256})
+        sobras = []
+        for blob in (referenciado, liberado):
+            doomed = blob.path.with_name(blob.path.name + ".gc")
+            os.replace(blob.path, doomed)
+            sobras.append(doomed)
+        monkeypatch.setattr(loja, "GC_LEFTOVER_SECONDS", -60)
+        resultado = await loja.collect_garbage(grace_seconds=0)
+        return referenciado, liberado, sobras, resultado
+
+    referenciado, liberado, sobras, resultado = asyncio.run(cenario())
+
+    assert referenciado.path.read_bytes() == b"ainda em uso"
+    assert not liberado.path.exists()
+    assert not any(s.exists() for s in sobras)
+    assert resultado["restored"] == 1
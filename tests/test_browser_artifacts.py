@@ -0,0 +1,87 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import browser_artifacts
+
+# 2024-01-01T00:00:00Z em microssegundos desde 1601 (WebKit)
+WEBKIT_2024 = (1704067200 * 1_000_000) + browser_artifacts.WEBKIT_EPOCH_OFFSET_US
+
+
+def _history_com_wal(perfil):
+    """History em modo WAL com as visitas ainda só no -wal (navegador aberto)"""
+    perfil.mkdir()
+    conn = sqlite3.connect(perfil / "History")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT, visit_count INTEGER)")
+    conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER, transition INTEGER)")
+    conn.execute("CREATE TABLE downloads (start_time INTEGER, end_time INTEGER, target_path TEXT, "
+                 "tab_url TEXT, total_bytes INTEGER, danger_type INTEGER)")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.executemany("INSERT INTO urls VALUES (?, ?, ?, 1)", [
+        (1, "https://www.google.com/search?q=prova", "prova - Google"),
+        (2, "https://exemplo.com.br/pagina", "Exemplo"),
+    ])
+    conn.executemany("INSERT INTO visits (url, visit_time, transition) VALUES (?, ?, 0)", [
+        (1, WEBKIT_2024), (2, WEBKIT_2024 + 60_000_000),
+    ])
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    cliente = mongomock.MongoClient()
+    monkeypatch.setattr(browser_artifacts, "MongoClient", lambda url: cliente)
+    monkeypatch.setattr(cliente, "close", lambda: None)
+    # Threads em vez de processos: o banco simulado fica visível ao teste
+    monkeypatch.setattr(browser_artifacts, "ProcessPoolExecutor", ThreadPoolExecutor)
+    return cliente
+
+
+def test_transacoes_do_wal_entram_na_leitura(tmp_path, mongo):
+    conn = _history_com_wal(tmp_path / "Default")
+    try:
+        resultado = browser_artifacts.parse_profile(str(tmp_path / "Default"), "a1", "mongodb://teste", "forense")
+    finally:
+        conn.close()
+
+    fonte = resultado["sources"][0]
+    assert resultado["errors"] == []
+    assert resultado["summary"]["visits"] == 2
+    assert resultado["summary"]["search_queries"] == 1
+    assert resultado["summary"]["first_event"] == "2024-01-01T00:00:00+00:00"
+    assert fonte["wal_replayed"] is True
+    assert fonte["wal"]["size_bytes"] > 0 and "shm" in fonte
+    assert mongo["forense"][browser_artifacts.TIMELINE_COLLECTION].count_documents({"analysis_id": "a1"}) == 2
+
+
+def test_falha_em_um_perfil_nao_descarta_os_demais(tmp_path, mongo, monkeypatch):
+    conn = _history_com_wal(tmp_path / "Bom")
+    (tmp_path / "Ruim").mkdir()
+    (tmp_path / "Ruim" / "History").write_bytes(b"x")
+    original = browser_artifacts.parse_profile
+
+    def parse_profile(path, *args, **kwargs):
+        if path.endswith("Ruim"):
+            raise OSError("disco ilegível")
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(browser_artifacts, "parse_profile", parse_profile)
+    try:
+        resultado = browser_artifacts.parse_profiles(
+            [str(tmp_path / "Ruim"), str(tmp_path / "Bom")], "a2", "mongodb://teste", "forense"
+        )
+    finally:
+        conn.close()
+
+    ruim, bom = resultado["profiles"]
+    assert ruim["errors"] == ["OSError: disco ilegível"]
+    assert ruim["browser"] == "chromium"
+    assert bom["summary"]["visits"] == 2
+    assert resultado["failed_profiles"] == [str(tmp_path / "Ruim")]
+    assert resultado["totals"]["visits"] == 2
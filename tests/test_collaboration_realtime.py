@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from fastapi import HTTPException
+
+import collaboration_realtime as collab
+from collaboration_realtime import Document, apply_operations, rebuild_version
+
+
+def _criar(conteudo):
+    documento = Document(title="Peça", content=conteudo, doc_type="peticao", created_by="ana")
+    return asyncio.run(collab.create_document(documento))["document_id"]
+
+
+def test_delta_sem_atualizacao_do_documento_e_reaplicado():
+    doc_id = _criar("abc")
+
+    async def cenario():
+        # Queda entre a gravação do delta (v2) e a do documento
+        await collab.ensure_indexes()
+        await collab.db.document_deltas.insert_one({
+            "document_id": doc_id, "version": 2, "ops": [3, "d"],
+            "length_before": 3, "user_id": "ana", "created_at": "2026-01-01T00:00:00"
+        })
+        resultado = await apply_operations(doc_id, "bia", 1, ["X", 3])
+        documento = await collab.db.collaborative_docs.find_one({"_id": collab._object_id(doc_id)})
+        return resultado, documento, await rebuild_version(doc_id, 3)
+
+    resultado, documento, reconstruido = asyncio.run(cenario())
+    assert resultado["version"] == 3
+    assert documento["version"] == 3
+    assert documento["content"] == "Xabcd" == reconstruido
+
+
+def test_id_invalido_retorna_400():
+    edicao = collab.DeltaEdit(user_id="ana", base_version=1, operations=["x"])
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(collab.submit_operations("nao-e-objectid", edicao))
+    assert erro.value.status_code == 400
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import correcao_monetaria as cm
+
+PONTOS_IPCA = [
+    {"mes": "2024-01", "valor": 0.5},
+    {"mes": "2024-02", "valor": 1.0},
+    {"mes": "2024-03", "valor": 0.2},
+]
+
+
+@pytest.fixture
+def series(tmp_path, monkeypatch):
+    semente = tmp_path / "semente.json"
+    semente.write_text(json.dumps({"series": {}}), encoding="utf-8")
+    monkeypatch.setattr(cm, "DATA_PATH", semente)
+    monkeypatch.setattr(cm, "SERIES_PATH", tmp_path / "indices" / "indices_economicos.json")
+    cm.salvar_serie("IPCA", PONTOS_IPCA)
+    yield cm
+    monkeypatch.undo()
+    cm.carregar_series()
+
+
+def test_fator_e_o_produto_das_taxas_do_periodo(series):
+    resultado = series.corrigir_valor(1000.0, "ipca", "2024-01-15", "2024-04-01", juros_mensal=0.01)
+
+    fator = 1.005 * 1.01 * 1.002
+    assert resultado["meses"] == 3
+    assert resultado["fator"] == pytest.approx(fator, abs=1e-8)
+    assert resultado["valor_corrigido"] == round(1000 * fator, 2)
+    assert resultado["juros"] == round(1000 * fator * 0.01 * 3, 2)
+    assert resultado["cobertura"] == "completa"
+    assert resultado["fonte_indice"] == "serie_historica"
+
+
+def test_periodo_sem_serie_e_recusado_salvo_estimativa_explicita(series):
+    with pytest.raises(ValueError, match="não cobre o período"):
+        series.corrigir_valor(1000.0, "IPCA", "2024-01-01", "2024-05-01")
+
+    estimativa = series.corrigir_valor(1000.0, "IPCA", "2024-01-01", "2024-05-01", exigir_serie=False)
+    taxa_abril = series.TAXAS_REFERENCIA["IPCA"]
+    assert estimativa["fator"] == pytest.approx(1.005 * 1.01 * 1.002 * (1 + taxa_abril), abs=1e-8)
+    assert estimativa["cobertura"] == "parcial"
+    assert estimativa["meses_serie_historica"] == 3
+
+
+def test_lote_vetorizado_igual_ao_calculo_individual(series):
+    parcelas = [
+        {"id": "a", "valor": 1500.0, "vencimento": "2024-01-10"},
+        {"id": "b", "valor": 800.0, "vencimento": "2024-02-10"},
+        {"id": "c", "valor": 300.0, "vencimento": "2024-04-10"},
+    ]
+    lote = series.corrigir_parcelas(parcelas, "IPCA", "2024-04-30", juros_mensal=0.01, multa_percentual=2.0)
+
+    for parcela, item in zip(parcelas, lote["parcelas"]):
+        individual = series.corrigir_valor(parcela["valor"], "IPCA", parcela["vencimento"], "2024-04-30",
+                                           juros_mensal=0.01)
+        assert item["fator"] == individual["fator"]
+        assert item["valor_corrigido"] == individual["valor_corrigido"]
+        assert item["juros"] == individual["juros"]
+        multa = round(individual["valor_corrigido"] * 0.02, 2) if individual["meses"] else 0.0
+        assert item["multa"] == pytest.approx(multa, abs=0.01)
+    assert lote["parcelas"][2]["meses"] == 0
+    assert lote["soma_original"] == 2600.0
+
+
+def test_saldo_de_depositos_mensais(series):
+    saldo = series.saldo_depositos_mensais(100.0, "2024-01-01", "2024-03-01", indice="IPCA")
+
+    assert saldo["depositos"] == 3
+    assert saldo["total_depositado"] == 300.0
+    assert saldo["saldo_corrigido"] == pytest.approx(100 * (1.005 * 1.01 + 1.01 + 1), abs=0.01)
+    assert saldo["cobertura"] == "completa"
+
+
+def test_importacao_com_mes_faltante_e_recusada(series):
+    with pytest.raises(ValueError, match="meses faltantes"):
+        series.salvar_serie("INPC", [{"mes": "2024-01", "valor": 0.3}, {"mes": "2024-03", "valor": 0.1}])
+
+
+def test_alterar_series_exige_administrador(series):
+    pytest.importorskip("mongomock_motor")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from modules import calculus_universal
+    from security import create_access_token
+
+    app = FastAPI()
+    app.include_router(calculus_universal.router)
+    cliente = TestClient(app)
+    corpo = {"pontos": [{"mes": "2024-04", "valor": 0.38}]}
+
+    def token(papel):
+        return {"Authorization": f"Bearer {create_access_token({'user_id': 'u1', 'role': papel})}"}
+
+    assert cliente.post("/api/calculus/indices/IPCA/importar", json=corpo).status_code == 401
+    assert cliente.post("/api/calculus/indices/IPCA/importar", json=corpo,
+                        headers=token("advogado")).status_code == 403
+    assert cliente.post("/api/calculus/indices/atualizar", headers=token("cliente")).status_code == 403
+
+    resposta = cliente.post("/api/calculus/indices/IPCA/importar", json=corpo, headers=token("administrator"))
+    assert resposta.status_code == 200
+    assert resposta.json()["series"]["IPCA"]["fim"] == "2024-04"
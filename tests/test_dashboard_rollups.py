@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+import dashboard_rollups
+from dashboard_rollups import RollupEngine
+
+
+def test_interceptacoes_lidas_do_banco_em_que_sao_gravadas():
+    interceptacoes = dashboard_rollups.client.ap_elite.phone_interceptions
+
+    async def cenario():
+        await interceptacoes.insert_many([
+            {"id": "i1", "created_at": "2026-03-02T10:00:00", "relevance": "critical"},
+            {"id": "i2", "created_at": "2026-03-02T15:00:00", "relevance": "low", "transcription": "alô"},
+        ])
+        await RollupEngine()._recompute_gauges(["phone_interceptions"])
+        return await dashboard_rollups.db.dashboard_rollups.find_one({"_id": "gauges"})
+
+    gauges = asyncio.run(cenario())
+
+    assert dashboard_rollups.source("phone_interceptions").database.name == "ap_elite"
+    assert dashboard_rollups.source("cases").database.name == dashboard_rollups.DB_NAME
+    assert gauges["interceptions_total"] == 2
+    assert gauges["interceptions_critical"] == 1
+    assert gauges["interceptions_analyzed"] == 1
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import data_recovery_engine as engine
+
+SETOR = engine.SECTOR_SIZE
+
+
+def _imagem(caminho):
+    """Imagem bruta sem partições com um JPEG e um PNG alinhados a setor"""
+    dados = bytearray(64 * SETOR)
+    jpeg = b"\xff\xd8\xff\xe0" + b"\x00" * 100 + b"\xff\xd9"
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100 + b"IEND\xaeB`\x82"
+    dados[0:len(jpeg)] = jpeg
+    dados[8 * SETOR:8 * SETOR + len(png)] = png
+    caminho.write_bytes(bytes(dados))
+
+
+def test_retomada_nao_conta_de_novo_arquivos_ja_gravados(tmp_path):
+    imagem = tmp_path / "disco.dd"
+    _imagem(imagem)
+    banco = mongomock_motor.AsyncMongoMockClient()["ap_elite"]
+
+    async def cenario():
+        await banco.data_recovery.insert_one({"recovery_id": "r1"})
+        await engine.run_recovery_job("r1", str(imagem), {}, banco.data_recovery, banco.recovered_files)
+        primeira = await banco.data_recovery.find_one({"recovery_id": "r1"})
+        # Queda antes de o checkpoint avançar: a retomada reemite os mesmos arquivos
+        await banco.data_recovery.update_one(
+            {"recovery_id": "r1"}, {"$set": {"checkpoint": {"sector": 0, "metadata_done": False}}}
+        )
+        await engine.run_recovery_job("r1", str(imagem), {}, banco.data_recovery, banco.recovered_files)
+        segunda = await banco.data_recovery.find_one({"recovery_id": "r1"})
+        return primeira, segunda, await banco.recovered_files.count_documents({"recovery_id": "r1"})
+
+    primeira, segunda, gravados = asyncio.run(cenario())
+
+    assert primeira["status"] == "completed"
+    assert primeira["arquivos_encontrados"]["imagens"] == 2
+    assert segunda["arquivos_encontrados"]["imagens"] == 2
+    assert gravados == 2
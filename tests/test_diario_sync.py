@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+import diario_sync
+
+PROCESSO = "0001234-56.2024.8.26.0100"
+EDICAO = f"<html><body><p>Intimação no processo {PROCESSO}.</p></body></html>".encode()
+ETAG = '"edicao-1"'
+
+
+class _Diario(BaseHTTPRequestHandler):
+    condicionais = []
+
+    def do_GET(self):
+        if self.path.startswith("/falha"):
+            self.send_response(500)
+            self.end_headers()
+            return
+        _Diario.condicionais.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(EDICAO)))
+        self.end_headers()
+        self.wfile.write(EDICAO)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Diario)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _Diario.condicionais = []
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_validadores_so_apos_processar_e_falhas_isoladas(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(diario_sync, "DIARIOS_DIR", tmp_path)
+    processar = diario_sync.processar_edicao
+    chamadas = {"n": 0}
+
+    async def processar_falhando_uma_vez(*args, **kwargs):
+        chamadas["n"] += 1
+        if chamadas["n"] == 1:
+            raise RuntimeError("parser indisponível")
+        return await processar(*args, **kwargs)
+
+    monkeypatch.setattr(diario_sync, "processar_edicao", processar_falhando_uma_vez)
+    data = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+    async def cenario():
+        db = diario_sync.db
+        await db.diarios_oficiais_configs.insert_many([
+            {"id": "sp", "uf": "SP", "habilitado": True, "url_diario": servidor + "/dje/{data}"},
+            {"id": "rj", "uf": "RJ", "habilitado": True, "url_diario": servidor + "/falha/{data}"},
+            {"id": "mg", "uf": "MG", "habilitado": True},
+        ])
+        await diario_sync.monitorar([PROCESSO], origem="teste")
+        try:
+            primeira = await diario_sync.sincronizar_diarios(data)
+            estado = await db.crawler_estado.find_one({"url": servidor + "/dje/2026-03-02"})
+            segunda = await diario_sync.sincronizar_diarios(data)
+            terceira = await diario_sync.sincronizar_diarios(data)
+            edicao = await db.diarios_edicoes.find_one({"fonte_id": "sp"})
+            ocorrencias = await db.diarios_ocorrencias.count_documents({"edicao_hash": edicao["hash"]})
+        finally:
+            await diario_sync.pool.close()
+        return primeira, estado, segunda, terceira, edicao, ocorrencias
+
+    primeira, estado, segunda, terceira, edicao, ocorrencias = asyncio.run(cenario())
+
+    status = lambda resumo: {r["fonte_id"]: r["status"] for r in resumo["resultados"]}
+    assert status(primeira) == {"sp": "erro", "rj": "erro", "mg": "erro"}
+    # Falha no processamento não grava o ETag: a captura seguinte baixa de novo
+    assert estado is None
+    assert status(segunda)["sp"] == "duplicada"
+    assert status(terceira)["sp"] == "nao_modificado"
+    assert _Diario.condicionais == [None, None, ETAG]
+    assert edicao["processado_em"] is not None
+    assert ocorrencias == 1
@@ -0,0 +1,133 @@
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.dosimetria_penal import router
+
+BASE = {
+    "reu_nome": "Réu Teste",
+    "crimes": [{"tipo_penal": "Furto (CP Art. 155)", "artigo": "155", "pena_minima_anos": 1, "pena_maxima_anos": 4}],
+    "circunstancias_art59": {},
+    "responsavel": "perito",
+}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("data", ["15/03/2024", "2024-13-40", "ontem"])
+def test_data_referencia_invalida_retorna_422(client, data):
+    resposta = client.post("/api/dosimetria/simular", json={"base": BASE, "data_referencia": data})
+    assert resposta.status_code == 422
+    assert [erro["loc"] for erro in resposta.json()["detail"]] == [["body", "data_referencia"]]
+
+
+def test_data_referencia_valida_calcula_prescricao(client):
+    resposta = client.post("/api/dosimetria/simular", json={"base": BASE, "data_referencia": "2024-03-15"})
+    assert resposta.status_code == 200
+    assert all(p["data_prescricao"] for p in resposta.json()["prescricao"])
+
+
+CENARIO = {
+    "reu_nome": "Réu Paridade",
+    "crimes": [
+        {"tipo_penal": "Roubo (CP Art. 157)", "artigo": "157", "pena_minima_anos": 4, "pena_maxima_anos": 10},
+        {"tipo_penal": "Furto (CP Art. 155)", "artigo": "155", "pena_minima_anos": 1, "pena_maxima_anos": 4},
+        {"tipo_penal": "Receptação (CP Art. 180)", "artigo": "180", "pena_minima_anos": 1, "pena_maxima_anos": 4,
+         "pena_minima_meses": 6},
+    ],
+    "concurso": "material",
+    "circunstancias_art59": {"culpabilidade": "normal", "motivos": "torpes"},
+    "atenuantes": [{"artigo": "65, III, d", "descricao": "Confissão espontânea", "aplicavel": False}],
+    "agravantes": [{"artigo": "61, II, h", "descricao": "Vítima idosa"}],
+    "reincidencia": {"possui_reincidencia": False},
+    "causas_aumento": [{"tipo": "aumento", "artigo": "157, §2º", "descricao": "Concurso de agentes", "fracao": "1/3"}],
+    "causas_diminuicao": [{"tipo": "diminuicao", "artigo": "14, II", "descricao": "Tentativa", "fracao": "2/3",
+                           "aplicavel": False}],
+    "responsavel": "perito",
+}
+VARIACOES = {
+    "art59": {"culpabilidade": ["leve", "normal", "grave"], "antecedentes": ["primario", "maus_antecedentes"]},
+    "reincidencia": [False, True],
+    "concursos": ["unico", "material", "formal", "continuidade"],
+}
+
+
+def _payload_do_cenario(fatores, valores):
+    """Dados do cálculo individual equivalentes a uma combinação da simulação"""
+    import copy
+
+    dados = copy.deepcopy(CENARIO)
+    for fator, valor in zip(fatores, valores):
+        nome = fator["fator"]
+        if nome.startswith("art59."):
+            dados["circunstancias_art59"][nome[len("art59."):]] = valor
+        elif nome == "reincidencia":
+            dados["reincidencia"]["possui_reincidencia"] = valor
+        elif nome == "concurso":
+            dados["concurso"] = valor
+        else:
+            grupo, descricao = nome.split(": ", 1)
+            lista = {"atenuante": "atenuantes", "agravante": "agravantes",
+                     "causa_aumento": "causas_aumento", "causa_diminuicao": "causas_diminuicao"}[grupo]
+            item = next(i for i in dados[lista] if descricao.startswith(i["descricao"]))
+            item["aplicavel"] = valor
+    return dados
+
+
+def test_simulacao_vetorizada_igual_ao_calculo_individual():
+    import asyncio
+    import itertools
+    from collections import Counter
+
+    from modules.dosimetria_penal import (
+        DosimetriaCreate, SimulacaoDosimetria, calcular_dosimetria, simular_cenarios,
+    )
+
+    sim = simular_cenarios(SimulacaoDosimetria(base=CENARIO, variacoes=VARIACOES, exemplos_por_regime=50))
+    fatores = sim["fatores"]
+    combinacoes = list(itertools.product(*[f["valores"] for f in fatores]))
+
+    async def calcular_todos():
+        return [await calcular_dosimetria(DosimetriaCreate(**_payload_do_cenario(fatores, c))) for c in combinacoes]
+
+    individuais = asyncio.run(calcular_todos())
+    resumo = {c: (d["pena_final"]["total_meses"], d["regime_inicial"], d["prescricao"]["prazo_executoria_anos"])
+              for c, d in zip(combinacoes, individuais)}
+
+    assert sim["total_cenarios"] == len(combinacoes) == 3 * 2 * 2 * 2 * 2 * 2 * 2 * 4
+    assert set(sim["regimes"]) == {"aberto", "semiaberto", "fechado"}
+    assert {d["concurso"] for d in individuais} == {"unico", "material", "formal", "continuidade"}
+    assert Counter(p for p, _, _ in resumo.values()) == {
+        d["pena_meses"]: d["cenarios"] for d in sim["pena"]["distribuicao"]
+    }
+    assert Counter(r for _, r, _ in resumo.values()) == {r: d["cenarios"] for r, d in sim["regimes"].items()}
+    assert Counter(p for _, _, p in resumo.values()) == {d["prazo_anos"]: d["cenarios"] for d in sim["prescricao"]}
+
+    def conferir(cenario):
+        chave = tuple(cenario["fatores"][f["fator"]] for f in fatores)
+        assert (cenario["pena_meses"], cenario["regime"], cenario["prescricao_anos"]) == resumo[chave]
+
+    conferir(sim["cenario_base"])
+    conferir(sim["melhor_cenario"])
+    conferir(sim["pior_cenario"])
+
+    # Mudanças de regime: o menor número de alterações confere com a busca exaustiva
+    base = tuple(f["base"] for f in fatores)
+    regime_base = resumo[base][1]
+    assert {m["regime"] for m in sim["mudancas_de_regime"]} == set(sim["regimes"]) - {regime_base}
+    for mudanca in sim["mudancas_de_regime"]:
+        distancias = [sum(a != b for a, b in zip(c, base)) for c, (_, r, _) in resumo.items() if r == mudanca["regime"]]
+        assert mudanca["minimo_alteracoes"] == min(distancias)
+        assert mudanca["cenarios_com_minimo"] == distancias.count(min(distancias))
+        for exemplo in mudanca["exemplos"]:
+            assert exemplo["regime"] == mudanca["regime"]
+            assert len(exemplo["alteracoes"]) == mudanca["minimo_alteracoes"]
+            conferir(exemplo)
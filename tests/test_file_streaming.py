@@ -0,0 +1,46 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from file_streaming import range_file_response
+
+CONTEUDO = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path):
+    arquivo = tmp_path / "relatorio.bin"
+    arquivo.write_bytes(CONTEUDO)
+    app = FastAPI()
+
+    @app.get("/download")
+    async def download(request: Request):
+        return range_file_response(request, arquivo)
+
+    return TestClient(app)
+
+
+def test_intervalo_valido_retorna_206(client):
+    resposta = client.get("/download", headers={"Range": "bytes=10-19"})
+    assert resposta.status_code == 206
+    assert resposta.content == CONTEUDO[10:20]
+    assert resposta.headers["content-range"] == f"bytes 10-19/{len(CONTEUDO)}"
+
+
+def test_sufixo_retorna_ultimos_bytes(client):
+    resposta = client.get("/download", headers={"Range": "bytes=-5"})
+    assert resposta.status_code == 206
+    assert resposta.content == CONTEUDO[-5:]
+
+
+@pytest.mark.parametrize("cabecalho", ["bytes=abc", "items=0-10", "bytes=0-1,5-9", "bytes=20-10", "bytes=-"])
+def test_range_malformado_e_ignorado(client, cabecalho):
+    resposta = client.get("/download", headers={"Range": cabecalho})
+    assert resposta.status_code == 200
+    assert resposta.content == CONTEUDO
+
+
+def test_intervalo_alem_do_fim_retorna_416(client):
+    resposta = client.get("/download", headers={"Range": f"bytes={len(CONTEUDO)}-"})
+    assert resposta.status_code == 416
+    assert resposta.headers["content-range"] == f"bytes */{len(CONTEUDO)}"
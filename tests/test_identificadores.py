@@ -0,0 +1,79 @@
+import pytest
+
+from identificadores import (
+    MatcherMultiplo,
+    chave_identificador,
+    chaves_identificadores,
+    normalizar_texto_busca,
+    padroes_da_chave,
+)
+
+
+@pytest.mark.parametrize("grafia", [
+    "123.456/SP", "123456-SP", "OAB/SP 123456", "OAB/SP nº 123456", "OAB/SP Nº 123.456",
+    "OAB/SP n. 123.456", "oab sp no 123456", "SP123456", "nº 123.456/SP",
+])
+def test_oab_em_qualquer_grafia(grafia):
+    assert chave_identificador(grafia) == "oab:SP123456"
+
+
+def test_oab_com_letra_e_uf_invalida():
+    assert chave_identificador("OAB/RJ 98.765a") == "oab:RJ98765A"
+    assert not chave_identificador("OAB/XX 123456").startswith("oab:")
+
+
+@pytest.mark.parametrize("valor, chave", [
+    ("123.456.789-09", "num:12345678909"),
+    ("12.345.678/0001-95", "num:12345678000195"),
+    ("0001234-56.2024.8.26.0100", "num:00012345620248260100"),
+    ("(11) 98765-4321", "num:11987654321"),
+    ("Fulano@Exemplo.COM ", "email:fulano@exemplo.com"),
+    ("  José  da   Silva ", "nome:jose da silva"),
+    ("12.345.678-X", "doc:12345678x"),
+    ("", None),
+    (None, None),
+])
+def test_chaves_canonicas(valor, chave):
+    assert chave_identificador(valor) == chave
+
+
+def test_chaves_unicas_na_ordem():
+    assert chaves_identificadores(["123.456.789-09", "12345678909", "OAB/SP nº 1234", "1234/SP"]) == [
+        "num:12345678909", "oab:SP1234"
+    ]
+
+
+def _matcher(chaves):
+    matcher = MatcherMultiplo()
+    for chave in chaves:
+        for padrao in padroes_da_chave(chave):
+            matcher.adicionar(padrao, chave)
+    return matcher.construir()
+
+
+def test_aho_corasick_encontra_todas_as_chaves_em_uma_passada():
+    matcher = _matcher(["num:12345678909", "num:345678", "oab:SP123456", "nome:jose da silva"])
+    texto = normalizar_texto_busca(
+        "Intimado JOSÉ DA SILVA, CPF 123.456.789-09, adv. OAB/SP nº 123.456; "
+        "processo 99345678000 e o advogado 123.456/SP."
+    )
+
+    achados = [(texto[inicio:fim], valor) for inicio, fim, valor in matcher.buscar(texto)]
+
+    assert ("jose da silva", "nome:jose da silva") in achados
+    assert ("12345678909", "num:12345678909") in achados
+    assert ("oab/sp no 123456", "oab:SP123456") in achados
+    assert ("123456/sp", "oab:SP123456") in achados
+    # Ocorrências dentro de um número maior não são fronteira de palavra
+    assert all(valor != "num:345678" for _, valor in achados)
+
+
+def test_aho_corasick_padroes_sobrepostos():
+    matcher = MatcherMultiplo()
+    for padrao in ["he", "she", "his", "hers"]:
+        matcher.adicionar(padrao, padrao)
+    matcher.construir()
+
+    assert [v for _, _, v in matcher.buscar("she hers his")] == ["she", "hers", "his"]
+    assert [(i, f) for i, f, _ in matcher.buscar("ushers")] == []
+    assert matcher.total_padroes == 4
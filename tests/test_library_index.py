@@ -0,0 +1,35 @@
+import pytest
+
+from library_index import highlight, stem, tokenize
+
+
+@pytest.mark.parametrize("singular, plural", [
+    ("lei", "leis"),
+    ("pais", "paises"),
+    ("civil", "civis"),
+    ("fuzil", "fuzis"),
+    ("papel", "papeis"),
+    ("tribunal", "tribunais"),
+    ("juiz", "juizes"),
+    ("processo", "processos"),
+    ("acao", "acoes"),
+    ("leao", "leoes"),
+    ("limao", "limoes"),
+])
+def test_singular_e_plural_tem_o_mesmo_radical(singular, plural):
+    assert stem(singular) == stem(plural)
+
+
+@pytest.mark.parametrize("palavra", ["leis", "pais", "lapis", "cais", "onibus"])
+def test_regra_is_nao_gera_radical_em_il(palavra):
+    assert not stem(palavra).endswith(("il", "al"))
+
+
+def test_consulta_casa_com_acentos_e_plural():
+    assert tokenize("As leis do país") == tokenize("a lei dos países")
+
+
+def test_acao_e_acoes_casam_no_indice_e_no_destaque():
+    assert tokenize("ação") == tokenize("ações")
+    trecho = highlight("Foram propostas duas ações contra o réu.", tokenize("ação"))
+    assert "<mark>ações</mark>" in trecho
@@ -0,0 +1,75 @@
+import asyncio
+import socket
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+controller = pytest.importorskip("aiosmtpd.controller")
+
+import mail_outbox
+
+
+class _Sink:
+    def __init__(self):
+        self.recebidas = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("inexistente"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recebidas.extend(envelope.rcpt_tos)
+        return "250 queued"
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    with socket.socket() as livre:
+        livre.bind(("127.0.0.1", 0))
+        porta = livre.getsockname()[1]
+    handler = _Sink()
+    smtpd = controller.Controller(handler, hostname="127.0.0.1", port=porta)
+    smtpd.start()
+    for nome, valor in {"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(porta), "SMTP_USE_TLS": "false",
+                        "SMTP_AUTH": "false", "SMTP_FROM": "athena@teste.local"}.items():
+        monkeypatch.setenv(nome, valor)
+    yield handler
+    smtpd.stop()
+
+
+def test_lease_cobre_timeout_smtp():
+    assert mail_outbox.lease_seconds({"timeout": 30}) >= 3 * 30
+    assert mail_outbox.lease_seconds({"timeout": 90}) >= 3 * 90
+
+
+def test_entrega_fila_pendente_apos_restart(sink):
+    async def cenario():
+        db = mail_outbox.db
+        # Mensagens gravadas antes do restart, inclusive uma com lease vencido
+        await db.email_outbox.insert_many([
+            mail_outbox._new_message(f"cliente{i}@teste.local", "Intimação", "corpo") for i in range(25)
+        ])
+        orfa = mail_outbox._new_message("orfa@teste.local", "Prazo", "corpo")
+        orfa.update(status="sending", worker_id="outro-host:1", attempts=1,
+                    lease_until=mail_outbox._now() - timedelta(seconds=1))
+        await db.email_outbox.insert_one(orfa)
+        recusada = await mail_outbox.enqueue("inexistente@teste.local", "Aviso", "corpo")
+
+        await mail_outbox.ensure_started()
+        try:
+            for _ in range(100):
+                por_status = (await mail_outbox.stats())["by_status"]
+                if por_status.get("sent") == 26 and por_status.get("failed") == 1:
+                    break
+                await asyncio.sleep(0.05)
+            return por_status, await mail_outbox.get_message(recusada["id"])
+        finally:
+            await mail_outbox.worker.stop()
+
+    por_status, recusada = asyncio.run(cenario())
+    assert por_status == {"sent": 26, "failed": 1}
+    assert sorted(sink.recebidas) == sorted([f"cliente{i}@teste.local" for i in range(25)] + ["orfa@teste.local"])
+    assert "550" in recusada["last_error"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from mongo_registry import IndexSpec, ensure_indexes, index_report
+
+MANIFESTO = [
+    IndexSpec("casos", "case_id", unique=True, database="registry_test"),
+    IndexSpec("casos", [("status", 1), ("created_at", -1)], database="registry_test"),
+]
+
+
+def test_index_report_no_mongomock():
+    cliente = mongomock_motor.AsyncMongoMockClient()
+
+    async def cenario():
+        banco = cliente["registry_test"]
+        await banco.casos.insert_one({"case_id": "c1", "status": "aberto", "resumo": "furto"})
+        await banco.casos.create_index([("resumo", "text")])
+        await banco.anotacoes.insert_one({"texto": "sem índices"})
+        await ensure_indexes(MANIFESTO[:1], client=cliente)
+        return await index_report(MANIFESTO, client=cliente)
+
+    relatorio = asyncio.run(cenario())
+    assert relatorio["missing"] == [
+        {"database": "registry_test", "collection": "casos", "index": "status_1_created_at_-1"}
+    ]
+    # mongomock não implementa $indexStats: "unused" fica indisponível em vez de vazio
+    assert relatorio["unused"] is None
+    assert relatorio["unused_unavailable"] == ["registry_test.anotacoes", "registry_test.casos"]
+    assert relatorio["collections_without_indexes"] == ["registry_test.anotacoes"]
+
+
+def test_colecoes_do_ap_elite_indexadas_no_ap_elite():
+    import mongo_registry
+
+    cliente = mongomock_motor.AsyncMongoMockClient()
+    especificacoes = [s for s in mongo_registry.INDEX_MANIFEST
+                      if s.collection in ("notifications", "phone_interceptions")]
+
+    async def cenario():
+        await ensure_indexes(especificacoes, client=cliente)
+        return {
+            nome: await cliente["ap_elite"][nome].index_information()
+            for nome in ("notifications", "phone_interceptions")
+        }
+
+    indices = asyncio.run(cenario())
+    assert "user_id_1_created_at_-1" in indices["notifications"]
+    assert "created_at_-1" in indices["phone_interceptions"]
+
+
+def test_relatorio_de_indices_exige_administrador():
+    from fastapi.testclient import TestClient
+
+    import server
+    from security import create_access_token
+
+    cliente = TestClient(server.app)
+    cabecalho = {"Authorization": f"Bearer {create_access_token({'user_id': 'u1', 'role': 'cliente'})}"}
+    assert cliente.get("/api/admin/indexes").status_code == 401
+    assert cliente.get("/api/admin/indexes", headers=cabecalho).status_code == 403
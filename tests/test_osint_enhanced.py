@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+pytest.importorskip("emergentintegrations")
+
+import osint_enhanced
+import osint_executor
+
+ATRASO_FONTE = 0.3
+ATRASO_IA = 1.5
+
+
+class _Fonte(BaseHTTPRequestHandler):
+    def do_GET(self):
+        consulta = unquote(self.path.rsplit("/", 1)[-1])
+        if consulta == "lenta":
+            time.sleep(ATRASO_FONTE)
+        corpo = json.dumps({"consulta": consulta, "fonte": self.path.split("/")[1]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Fonte)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_stream_nao_espera_analise_de_ia(servidor, monkeypatch):
+    monkeypatch.setenv("OSINT_SOURCE_ENDPOINTS", json.dumps({
+        "Consulta Placa DETRAN": {"url": servidor + "/detran/{query}", "rate": 100, "burst": 10},
+        "ANTT - Consultas": {"url": servidor + "/antt/{query}", "rate": 100, "burst": 10},
+    }))
+    executor = osint_executor.OsintExecutor()
+    monkeypatch.setattr(osint_enhanced, "osint_executor", executor)
+
+    async def analise_demorada(query, data):
+        if query == "rapida":
+            await asyncio.sleep(ATRASO_IA)
+        return {"success": True, "response": f"análise de {query}"}
+
+    monkeypatch.setattr(osint_enhanced.ai_orchestrator, "osint_intelligence", analise_demorada)
+
+    async def cenario():
+        resposta = await osint_enhanced.bulk_osint_search(
+            ["rapida", "lenta"], categories=["vehicles"], stream=True, use_cache=False
+        )
+        inicio = time.monotonic()
+        eventos = []
+        async for linha in resposta.body_iterator:
+            eventos.append((time.monotonic() - inicio, json.loads(linha)))
+        await executor.close()
+        return eventos
+
+    eventos = asyncio.run(cenario())
+
+    tipos = [(e["type"], e.get("query")) for _, e in eventos]
+    assert tipos[-1] == ("done", None)
+    resultados_lenta = [t for t, e in eventos if e["type"] == "result" and e["query"] == "lenta"]
+    assert len(resultados_lenta) == 2
+    assert all(e["status"] == "ok" for _, e in eventos if e["type"] == "result")
+
+    # Os resultados da consulta lenta saem antes da análise de IA da rápida terminar
+    resumo_rapida = next(t for t, e in eventos if e["type"] == "query_done" and e["query"] == "rapida")
+    assert max(resultados_lenta) < ATRASO_IA
+    assert resumo_rapida >= ATRASO_IA
+    assert tipos.index(("query_done", "lenta")) < tipos.index(("query_done", "rapida"))
+
+    feitos = {e["query"]: e for _, e in eventos if e["type"] == "query_done"}
+    assert feitos["rapida"]["ai_analysis"] == "análise de rapida"
+    assert feitos["lenta"]["sources_queried"] == 2
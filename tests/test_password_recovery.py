@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+pytest.importorskip("PyPDF2")
+
+from fastapi import BackgroundTasks, HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from PyPDF2 import PdfWriter
+
+import password_recovery_elite as elite
+import password_recovery_engine as engine
+
+SENHA = "sol123"
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    pdf = tmp_path / "evidencia.pdf"
+    writer = PdfWriter()
+    writer.add_blank_page(72, 72)
+    writer.encrypt(SENHA, "dono")
+    with open(pdf, "wb") as f:
+        writer.write(f)
+    wordlist = tmp_path / "wordlist.txt"
+    wordlist.write_text("\n".join([f"palavra{i}" for i in range(3000)] + [SENHA]) + "\n", encoding="utf-8")
+    return str(pdf), str(wordlist)
+
+
+def _spec(pdf, **extra):
+    return {"arquivo_tipo": "pdf", "arquivo_path": pdf, "min_length": 1, "max_length": 4, **extra}
+
+
+def test_wordlist_lida_uma_vez_e_lease_liberado(arquivos, monkeypatch):
+    pdf, wordlist = arquivos
+    spec = _spec(pdf, metodo_ataque="dictionary", wordlist_path=wordlist)
+    keyspace = engine.build_keyspace(spec)
+
+    def nao_reler(_spec):
+        raise AssertionError("wordlist relida")
+
+    monkeypatch.setattr(engine, "build_keyspace", nao_reler)
+    colecao = AsyncMongoMockClient()["ap_elite"]["password_recovery"]
+
+    async def cenario():
+        lease = engine.new_lease()
+        await colecao.insert_one({"attempt_id": "a1", "status": "recovering", **lease})
+        await engine.run_recovery("a1", spec, colecao, lease["lease_owner"], keyspace,
+                                  max_workers=1, chunk_size=500)
+        return await colecao.find_one({"attempt_id": "a1"})
+
+    doc = asyncio.run(cenario())
+
+    assert doc["status"] == "recovered"
+    assert doc["recovered_password"] == SENHA
+    assert doc["lease_owner"] is None
+
+
+def test_retomar_tentativa_orfa_mas_nao_a_de_worker_vivo(arquivos):
+    pdf, _ = arquivos
+    agora = datetime.now(timezone.utc)
+
+    async def cenario():
+        await elite.db.password_recovery.insert_many([
+            {"attempt_id": "orfa", "status": "recovering", "engine_spec": _spec(pdf, metodo_ataque="mask_attack", mask="?d"),
+             "lease_owner": "worker-morto", "lease_expires_at": agora - timedelta(minutes=5)},
+            {"attempt_id": "viva", "status": "recovering", "engine_spec": _spec(pdf, metodo_ataque="mask_attack", mask="?d"),
+             "lease_owner": "worker-vivo", "lease_expires_at": agora + timedelta(minutes=5)},
+        ])
+        tarefas = BackgroundTasks()
+        retomada = await elite.resume_recovery("orfa", tarefas)
+        with pytest.raises(HTTPException) as erro:
+            await elite.resume_recovery("viva", BackgroundTasks())
+        orfa = await elite.db.password_recovery.find_one({"attempt_id": "orfa"})
+        return retomada, tarefas, erro.value, orfa
+
+    retomada, tarefas, erro, orfa = asyncio.run(cenario())
+
+    assert retomada["success"] is True
+    assert len(tarefas.tasks) == 1
+    assert orfa["lease_owner"] not in (None, "worker-morto")
+    assert tarefas.tasks[0].args[3] == orfa["lease_owner"]
+    assert erro.status_code == 409
+
+
+def test_parada_pedida_por_outro_worker(arquivos, monkeypatch):
+    pdf, _ = arquivos
+    monkeypatch.setattr(engine, "LEASE_SECONDS", 0.4)
+    spec = _spec(pdf, metodo_ataque="mask_attack", mask="?a?a?a?a")
+    colecao = AsyncMongoMockClient()["ap_elite"]["password_recovery"]
+
+    async def cenario():
+        lease = engine.new_lease()
+        await colecao.insert_one({"attempt_id": "a2", "status": "recovering", **lease})
+        execucao = asyncio.create_task(
+            engine.run_recovery("a2", spec, colecao, lease["lease_owner"], max_workers=1, chunk_size=200)
+        )
+        await asyncio.sleep(0.5)
+        # Outro worker da API só consegue marcar o pedido no documento
+        await colecao.update_one({"attempt_id": "a2"}, {"$set": {"status": "stopped", "stop_requested": True}})
+        await asyncio.wait_for(execucao, timeout=20)
+        return await colecao.find_one({"attempt_id": "a2"})
+
+    doc = asyncio.run(cenario())
+
+    assert doc["status"] == "stopped"
+    assert doc["lease_owner"] is None
+    assert 0 < doc["checkpoint"]["keyspace_done"] < doc["checkpoint"]["keyspace_total"]
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pytest
+
+from predictive_engine import SimilarityIndex, grouped_zscores, numeric_matrix, robust_zscores, score_rows
+
+
+def test_zscore_robusto_pela_mediana_e_mad():
+    coluna = np.array([10.0, 12.0, 11.0, 13.0, 50.0])
+    z = robust_zscores(coluna[:, None])[:, 0]
+
+    mediana, mad = 12.0, 1.0
+    assert z == pytest.approx(0.6745 * (coluna - mediana) / mad)
+
+
+def test_mad_nulo_usa_desvio_absoluto_medio():
+    # Mais da metade dos valores iguais: MAD = 0; o desvio padrão (270) esconderia o extremo
+    valores = [100.0] * 9 + [1000.0]
+    matrix, campos = numeric_matrix([{"valor": v, "constante": 7, "vazio": None} for v in valores])
+    z = robust_zscores(matrix)
+
+    desvio_medio = 900.0 / 10
+    assert campos == ["constante", "valor"]
+    assert z[:, 1] == pytest.approx([0.0] * 9 + [900.0 / (1.2533 * desvio_medio)])
+    assert z[-1, 1] > 3.5
+    assert not z[:, 0].any()
+
+
+def test_colunas_vazias_e_valores_faltantes_ficam_com_zero():
+    matrix = np.array([[1.0, np.nan], [2.0, np.nan], [np.nan, np.nan], [3.0, np.nan]])
+    z = robust_zscores(matrix)
+
+    assert np.isfinite(z).all()
+    assert z[2, 0] == 0 and not z[:, 1].any()
+    assert robust_zscores(np.empty((0, 3))).shape == (0, 3)
+
+
+def test_zscores_por_grupo():
+    matrix = np.array([[10.0], [11.0], [12.0], [1000.0], [1001.0], [1002.0]])
+    z = grouped_zscores(matrix, np.array(["a", "a", "a", "b", "b", "b"]))
+
+    assert z[:, 0] == pytest.approx([-0.6745, 0, 0.6745] * 2)
+
+
+def test_linhas_acima_do_limiar_da_mais_anomala_para_a_menos():
+    z = np.array([
+        [0.5, -1.0],
+        [4.0, 0.2],
+        [-9.0, 5.0],
+        [3.5, 0.0],
+    ])
+    linhas = score_rows(z, ["valor", "dias"], threshold=3.5)
+
+    assert [l["index"] for l in linhas] == [2, 1]
+    assert linhas[0]["fields"] == {"valor": -9.0, "dias": 5.0}
+    assert linhas[0]["max_zscore"] == 9.0
+    assert linhas[1]["fields"] == {"valor": 4.0}
+    assert linhas[1]["anomaly_score"] == round(1 - math.exp(-4.0 / 3.5), 4)
+    assert score_rows(np.empty((0, 2)), ["valor", "dias"], 3.5) == []
+
+
+CASOS = [
+    {"id": "c1", "title": "Habeas corpus tráfico de drogas", "description": "prisão preventiva excesso de prazo",
+     "service_type": "criminal", "court": "1ª Vara Criminal", "outcome": "favoravel"},
+    {"id": "c2", "title": "Tráfico de drogas flagrante", "description": "prisão preventiva revogação",
+     "service_type": "criminal", "court": "2ª Vara Criminal", "outcome": "condenado"},
+    {"id": "c3", "title": "Divórcio consensual", "description": "partilha de bens e guarda compartilhada",
+     "service_type": "familia", "court": "Vara de Família"},
+    {"id": "c4", "title": "Execução fiscal", "description": "embargos à execução prescrição intercorrente",
+     "service_type": "tributario", "court": "Vara da Fazenda"},
+]
+
+
+def test_casos_similares_por_tfidf():
+    indice = SimilarityIndex()
+    for caso in CASOS:
+        indice.add(caso)
+    consulta = {"title": "Tráfico de drogas", "description": "pedido de revogação da prisão preventiva",
+                "service_type": "criminal"}
+
+    similares = indice.similar(consulta, limit=3)
+
+    assert [s["id"] for s in similares][:2] == ["c2", "c1"]
+    assert all(s["id"] not in ("c3", "c4") for s in similares)
+    assert similares[0]["outcome"] == "unfavorable"
+    assert "tipo:criminal" in similares[0]["shared_terms"]
+    assert 0 < similares[1]["similarity"] < similares[0]["similarity"] <= 1
+
+    assert [s["id"] for s in indice.similar(consulta, exclude="c2")] == ["c1"]
+    assert [s["id"] for s in indice.similar(consulta, filtros={"outcome": True})] == ["c1"]
+    assert indice.outcome_rate({"service_type": "criminal"}) == (1, 2)
+
+    indice.remove("c2")
+    assert [s["id"] for s in indice.similar(consulta)] == ["c1"]
+    assert "c2" not in {cid for ids in indice.postings.values() for cid in ids}
+    assert indice.similar({"title": ""}) == []
@@ -0,0 +1,78 @@
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from router_loader import LazyRouterLoader, RouterSpec
+
+MODULO = '''
+import asyncio
+import threading
+from fastapi import APIRouter
+
+IMPORT_THREAD = threading.current_thread().name
+{extra}
+router = APIRouter(prefix="/api/{nome}")
+
+
+@router.get("/thread")
+async def thread():
+    return {{"import": IMPORT_THREAD, "loop": threading.current_thread().name}}
+'''
+
+
+@pytest.fixture
+def modulos(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    nomes = {"rl_pesado": "", "rl_agenda": "\nasyncio.create_task(asyncio.sleep(0))\n"}
+    for nome, extra in nomes.items():
+        (tmp_path / f"{nome}.py").write_text(textwrap.dedent(MODULO.format(nome=nome, extra=extra)))
+    yield
+    for nome in nomes:
+        sys.modules.pop(nome, None)
+
+
+def test_importacao_fora_do_event_loop_salvo_loop_import(modulos):
+    app = FastAPI()
+    loader = LazyRouterLoader(app, [
+        RouterSpec("rl_pesado", prefixes=["/api/rl_pesado"]),
+        RouterSpec("rl_agenda", prefixes=["/api/rl_agenda"], loop_import=True),
+        RouterSpec("rl_inexistente", prefixes=["/api/rl_inexistente"]),
+    ], mode="lazy", warmup_delay=-1)
+    cliente = TestClient(app)
+
+    pesado = cliente.get("/api/rl_pesado/thread").json()
+    agenda = cliente.get("/api/rl_agenda/thread").json()
+    assert cliente.get("/api/rl_inexistente/x").status_code == 404
+
+    assert pesado["import"] != pesado["loop"]
+    assert agenda["import"] == agenda["loop"]
+    status = {r["module"]: (r["status"], r["missing_dependency"]) for r in loader.profile()["rows"]}
+    assert status == {
+        "rl_pesado": ("loaded", None),
+        "rl_agenda": ("loaded", None),
+        "rl_inexistente": ("failed", "rl_inexistente"),
+    }
+
+
+def test_perfil_de_inicializacao_exige_administrador():
+    import server
+    from security import create_access_token
+
+    cliente = TestClient(server.app)
+
+    def token(papel):
+        return {"Authorization": f"Bearer {create_access_token({'user_id': 'u1', 'role': papel})}"}
+
+    assert cliente.get("/api/admin/startup-profile").status_code == 401
+    assert cliente.get("/api/admin/startup-profile", headers=token("cliente")).status_code == 403
+    resposta = cliente.get("/api/admin/startup-profile", headers=token("super_admin"))
+    assert resposta.status_code == 200
+    modulos = [r["module"] for r in resposta.json()["rows"]]
+    assert "intelligence_osint_suite" not in modulos
+    assert modulos == [spec.module for spec in server.ROUTER_SPECS]